@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+'''Render a manifest of jobs, shared by workers on any number of hosts.
+
+The manifest is a JSON list of requests, like service.py's, each with an
+optional "name" for its output file:
+
+  [
+    {"name": "torus-40", "model": "torus", "major_radius": 40},
+    {"name": "cylinder-c", "model": "cylinder", "format": "paths"}
+  ]
+
+The manifest is split into shards of consecutive requests. Workers claim
+shards through files in the output directory, which only needs to be on a
+shared filesystem:
+
+  plan.json: The manifest's hash and shard size, written by the first
+             worker. Other workers stop if their manifest differs, and use
+             the plan's shard size, whatever their --shard_size.
+   N.lock: Shard N is claimed. The owner touches it after each request, and
+           a lock untouched for longer than --stale_after is taken over,
+           from a worker that has died.
+   N.done: Shard N is finished, with each request's time and any error.
+
+Locks are created with O_EXCL, and stale locks are renamed away before they
+are taken over, so only one worker wins either race. Each result is written
+to a temporary file and renamed into place, so results that exist are
+complete, and a resumed shard skips them.
+
+Example, on each host:
+
+  python3 batch.py manifest.json /shared/catalogue --processes 4
+
+Then report the shards' timing:
+
+  python3 batch.py manifest.json /shared/catalogue --report
+
+'''
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import time
+
+import service
+
+SHARDS = 'shards'
+
+EXTENSIONS = {'image/svg+xml': '.svg', 'application/json': '.json'}
+
+
+def read_manifest(filename: str) -> tuple[list[dict], str]:
+    '''Return the manifest's requests, and a hash of its contents.'''
+    with open(filename, 'rb') as f:
+        data = f.read()
+    requests = json.loads(data)
+    assert isinstance(requests, list), \
+        'Error: The manifest must be a JSON list'
+    return requests, hashlib.sha256(data).hexdigest()
+
+
+def request_name(request: dict, index: int) -> str:
+    return str(request.get('name', '{:06d}'.format(index)))
+
+
+def write_atomic(filename: str, data: bytes):
+    '''Write a file that other workers never see partly written.'''
+    temporary = '{}.{}.{}.tmp'.format(filename, socket.gethostname(),
+                                      os.getpid())
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, filename)
+
+
+def create_exclusive(filename: str, data: bytes) -> bool:
+    '''Create filename with data, unless it exists. Returns True if created.'''
+    try:
+        fd = os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return True
+
+
+class Batch:
+    '''One manifest's shards, in one output directory.'''
+    def __init__(self, manifest: str, directory: str, shard_size: int,
+                 stale_after: float):
+        self.requests, self.digest = read_manifest(manifest)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.stale_after = stale_after
+        self.worker = '{}:{}'.format(socket.gethostname(), os.getpid())
+
+    def path(self, *names: str) -> str:
+        return os.path.join(self.directory, *names)
+
+    def plan(self):
+        '''Create the output directory and plan, or check the plan.
+
+        An existing plan's shard size replaces this worker's, so every worker
+        splits the manifest the same way.
+
+        '''
+        os.makedirs(self.path(SHARDS), exist_ok=True)
+        plan = json.dumps({'manifest': self.digest,
+                           'shard_size': self.shard_size}).encode()
+        if not create_exclusive(self.path('plan.json'), plan):
+            with open(self.path('plan.json')) as f:
+                existing = json.load(f)
+            assert existing['manifest'] == self.digest, \
+                'Error: {} holds results for a different manifest'.format(
+                    self.directory)
+            self.shard_size = existing['shard_size']
+
+    @property
+    def num_shards(self) -> int:
+        return -(-len(self.requests) // self.shard_size)
+
+    def lock_name(self, shard: int) -> str:
+        return self.path(SHARDS, '{}.lock'.format(shard))
+
+    def done_name(self, shard: int) -> str:
+        return self.path(SHARDS, '{}.done'.format(shard))
+
+    def claim(self, shard: int) -> bool:
+        '''Try to claim a shard. Returns True if this worker owns it.'''
+        if os.path.exists(self.done_name(shard)):
+            return False
+        lock = self.lock_name(shard)
+        owner = json.dumps({'worker': self.worker,
+                            'claimed': time.time()}).encode()
+        if create_exclusive(lock, owner):
+            return True
+        try:
+            age = time.time() - os.stat(lock).st_mtime
+        except FileNotFoundError:
+            # Released, or taken over, since the last check.
+            return False
+        if age < self.stale_after:
+            return False
+        # Rename the stale lock away. Only one worker's rename succeeds.
+        stale = '{}.stale.{}'.format(lock, self.worker.replace(':', '.'))
+        try:
+            os.rename(lock, stale)
+        except FileNotFoundError:
+            return False
+        os.remove(stale)
+        return create_exclusive(lock, owner)
+
+    def run_shard(self, shard: int) -> dict:
+        '''Render a claimed shard's requests, and return its record.'''
+        start = time.time()
+        first = shard * self.shard_size
+        entries = []
+        for index in range(first, min(first + self.shard_size,
+                                      len(self.requests))):
+            request = dict(self.requests[index])
+            name = request_name(request, index)
+            request.pop('name', None)
+            entry = {'name': name}
+            request_start = time.time()
+            existing = [name + extension for extension in EXTENSIONS.values()
+                        if os.path.exists(self.path(name + extension))]
+            if existing:
+                entry['skipped'] = True
+            else:
+                try:
+                    result = service.render(service.canonical(request))
+                    write_atomic(
+                        self.path(name + EXTENSIONS[result.content_type]),
+                        result.body)
+                    if result.warnings:
+                        entry['warnings'] = result.warnings
+                except (AssertionError, ValueError) as e:
+                    entry['error'] = str(e)
+                except Exception as e:
+                    # A failure in the generator's calculations only fails
+                    # this request, so the shard still finishes and releases
+                    # its lock.
+                    entry['error'] = 'Error: {}: {}'.format(
+                        type(e).__name__, e)
+            entry['seconds'] = time.time() - request_start
+            entries.append(entry)
+            # Show other workers that this shard is still running.
+            os.utime(self.lock_name(shard))
+        return {'shard': shard, 'worker': self.worker, 'started': start,
+                'seconds': time.time() - start, 'entries': entries}
+
+    def work(self) -> list[dict]:
+        '''Claim and run shards until none are left. Returns their records.'''
+        records = []
+        for shard in range(self.num_shards):
+            if not self.claim(shard):
+                continue
+            record = self.run_shard(shard)
+            write_atomic(self.done_name(shard),
+                         json.dumps(record, indent=1).encode())
+            os.remove(self.lock_name(shard))
+            records.append(record)
+            print(summary(record), flush=True)
+        return records
+
+    def report(self) -> list[str]:
+        '''Return a line per shard, and a total line.'''
+        lines = []
+        seconds = 0
+        done = 0
+        for shard in range(self.num_shards):
+            if os.path.exists(self.done_name(shard)):
+                with open(self.done_name(shard)) as f:
+                    record = json.load(f)
+                lines.append(summary(record))
+                seconds += record['seconds']
+                done += 1
+            elif os.path.exists(self.lock_name(shard)):
+                age = time.time() - os.stat(self.lock_name(shard)).st_mtime
+                lines.append('shard {}: running, last progress {:.0f} s '
+                             'ago'.format(shard, age))
+            else:
+                lines.append('shard {}: waiting'.format(shard))
+        lines.append('{} of {} shards done, {:.1f} s of work'.format(
+            done, self.num_shards, seconds))
+        return lines
+
+
+def summary(record: dict) -> str:
+    '''Return a one line summary of a shard's record.'''
+    entries = record['entries']
+    skipped = sum(1 for e in entries if e.get('skipped'))
+    failed = sum(1 for e in entries if 'error' in e)
+    return ('shard {}: {} requests in {:.2f} s, {} skipped, {} failed, '
+            'by {}'.format(record['shard'], len(entries), record['seconds'],
+                           skipped, failed, record['worker']))
+
+
+def work(arguments: tuple):
+    '''Run one worker process.'''
+    Batch(*arguments).work()
+
+
+def main():
+    pars = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    pars.add_argument('manifest', help='JSON list of requests')
+    pars.add_argument('directory', help='Shared output directory')
+    pars.add_argument('--shard_size', type=int, default=20,
+                      help='Requests per shard, for a new output directory')
+    pars.add_argument('--stale_after', type=float, default=600,
+                      help='Seconds before an untouched lock is taken over')
+    pars.add_argument('--processes', type=int, default=1,
+                      help='Worker processes on this host')
+    pars.add_argument('--report', action='store_true',
+                      help='Report shard progress and timing, and exit')
+    options = pars.parse_args()
+    assert options.shard_size > 0, \
+        'Error: shard_size must be greater than zero'
+
+    batch = Batch(options.manifest, options.directory, options.shard_size,
+                  options.stale_after)
+    batch.plan()
+    # The plan's shard size, which may differ from --shard_size.
+    arguments = (options.manifest, options.directory, batch.shard_size,
+                 options.stale_after)
+    if options.report:
+        print('\n'.join(batch.report()))
+        return
+    if options.processes == 1:
+        batch.work()
+        return
+    with multiprocessing.Pool(options.processes) as pool:
+        pool.map(work, [arguments] * options.processes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import batch
+
+MANIFEST = [
+    {'name': 'torus', 'model': 'torus', 'num_slices': 6},
+    {'name': 'furlong', 'model': 'cylinder', 'units': 'furlong'},
+    {'model': 'torus', 'num_slices': 6, 'format': 'paths'},
+]
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.manifest = os.path.join(self.directory, 'manifest.json')
+        with open(self.manifest, 'w') as f:
+            json.dump(MANIFEST, f)
+        self.output = os.path.join(self.directory, 'output')
+
+    def batch(self, shard_size=2, stale_after=600):
+        result = batch.Batch(self.manifest, self.output, shard_size,
+                             stale_after)
+        result.plan()
+        return result
+
+    def test_plan(self):
+        self.assertEqual(self.batch().num_shards, 2)
+        # Later workers use the plan's shard size.
+        self.assertEqual(self.batch(shard_size=1).shard_size, 2)
+        with open(self.manifest, 'w') as f:
+            json.dump(MANIFEST[:1], f)
+        with self.assertRaisesRegex(AssertionError,
+                                    'Error: .* different manifest'):
+            self.batch()
+
+    def test_claim(self):
+        first = self.batch()
+        second = self.batch()
+        second.worker = 'other:1'
+        self.assertTrue(first.claim(0))
+        self.assertFalse(second.claim(0))
+        self.assertTrue(second.claim(1))
+
+        # A lock untouched for longer than stale_after is taken over.
+        second.stale_after = 60
+        old = time.time() - 120
+        os.utime(first.lock_name(0), (old, old))
+        self.assertTrue(second.claim(0))
+        with open(first.lock_name(0)) as f:
+            self.assertEqual(json.load(f)['worker'], 'other:1')
+        self.assertFalse(first.claim(0))
+
+    def test_work(self):
+        with mock.patch('builtins.print'):
+            records = self.batch().work()
+        self.assertEqual(len(records), 2)
+        entries = records[0]['entries'] + records[1]['entries']
+        self.assertEqual([e['name'] for e in entries],
+                         ['torus', 'furlong', '000002'])
+        # A bad request fails alone.
+        self.assertIn('Unknown units', entries[1]['error'])
+        self.assertNotIn('error', entries[0])
+        for name in ('torus.svg', '000002.json', 'shards/0.done',
+                     'shards/1.done'):
+            self.assertTrue(os.path.exists(os.path.join(self.output, name)))
+        self.assertFalse(os.path.exists(os.path.join(self.output,
+                                                     'shards/0.lock')))
+
+        # Resumed work skips finished shards.
+        with mock.patch('builtins.print'):
+            self.assertEqual(self.batch().work(), [])
+
+    def test_failure(self):
+        # Any failure in a request is recorded, and the lock released.
+        with mock.patch.object(batch.service, 'render',
+                               side_effect=ZeroDivisionError('division')), \
+                mock.patch('builtins.print'):
+            records = self.batch(shard_size=3).work()
+        self.assertEqual(
+            [e['error'] for e in records[0]['entries']],
+            ['Error: ZeroDivisionError: division'] * 3)
+        self.assertFalse(os.path.exists(os.path.join(self.output,
+                                                     'shards/0.lock')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+'''Inkscape extension that generates templates for several models at once.
+
+The job file is a JSON list, with one object per model. Each object names
+its model, and sets that model's parameters, in the extension's units:
+
+  [
+    {"model": "torus", "major_radius": 40, "minor_radius": 20},
+    {"model": "cylinder", "outer_radius": 35, "inner_radius": 26,
+     "slice_shape": "ring"}
+  ]
+
+Parameters that all models share, like the material thickness, come from
+this extension's options. All templates share one layout, so small slices
+fill larger slices' holes, see nest.arrange_blocks().
+
+'''
+
+import json
+
+import cylinder
+import generator
+import hyperboloid
+import nest
+import surface
+import torus
+import truncated_sphere
+
+__version__ = '0.3.1'
+
+MODELS = {
+    'cylinder': cylinder.SliceformCylinderGenerator,
+    'hyperboloid': hyperboloid.SliceformHyperboloidGenerator,
+    'surface': surface.SliceformSurfaceGenerator,
+    'torus': torus.SliceformTorusGenerator,
+    'truncated_sphere': truncated_sphere.SliceformTruncatedSphereGenerator,
+}
+
+# Options that each model reads from this extension.
+SHARED_OPTIONS = ['units', 'material_thickness', 'material_width',
+                  'precision', 'flatten_tolerance', 'kerf', 'fidelity',
+                  'labels', 'label_height']
+
+
+class SliceformCombinedGenerator(generator.SliceformGenerator):
+    def add_arguments(self, pars):
+        super().add_arguments(pars)
+        # Slices from one model rarely fit in each other's holes, so only
+        # combined jobs fill them by default.
+        pars.set_defaults(fill_cavities=True)
+
+    def add_model_arguments(self, pars):
+        pars.add_argument('--job', type=str,
+                          dest='job', default='',
+                          help='Job file')
+
+    def model_generator(self, config: dict) -> generator.SliceformGenerator:
+        '''Return a model's generator, with options from config.'''
+        config = dict(config)
+        model = config.pop('model', None)
+        assert model in MODELS, 'Error: Unknown model {}, expected {}'.format(
+            model, ', '.join(MODELS))
+        model_generator = MODELS[model]()
+        arguments = ['--{}={}'.format(name, getattr(self.options, name))
+                     for name in SHARED_OPTIONS]
+        arguments += ['--{}={}'.format(name, value)
+                      for name, value in config.items()]
+        model_generator.options = model_generator.arg_parser.parse_args(
+            arguments)
+        model_generator.svg = self.svg
+        model_generator.warn = self.warn
+        model_generator.setup()
+        return model_generator
+
+    def read_job(self) -> list[dict]:
+        assert self.options.job, 'Error: No job file'
+        with open(self.options.job) as f:
+            configs = json.load(f)
+        assert configs, 'Error: The job file has no models'
+        return configs
+
+    def template_counts(self):
+        blocks = []
+        for config in self.read_job():
+            counts = self.model_generator(config).template_counts()
+            if counts is None:
+                return None
+            blocks.extend(counts)
+        return blocks
+
+    def calibrate(self, blocks):
+        # Each model measures its own template.
+        calibrated = []
+        for config in self.read_job():
+            model_generator = self.model_generator(config)
+            calibrated += model_generator.calibrate(
+                model_generator.template_counts())
+        return calibrated
+
+    def generate_templates(self):
+        # Each model's templates, in the model's own layout.
+        self.blocks = []
+        for config in self.read_job():
+            model_generator = self.model_generator(config)
+            self.blocks.append(list(model_generator.generate_templates()))
+            if self.options.validate and model_generator.fit_model:
+                model_generator.check_fit(self.blocks[-1])
+        for block in self.blocks:
+            yield from block
+
+    def arrange(self, templates):
+        return nest.arrange_blocks(self.blocks, self.material_width,
+                                   self.template_spacing,
+                                   self.options.fill_cavities)
+
+    def preview_templates(self):
+        # Each model is previewed on its own, then the blocks are laid out
+        # without filling cavities.
+        blocks = [self.preview(self.counted(self.model_generator(config).
+                                            generate_templates()))
+                  for config in self.read_job()]
+        return nest.arrange_blocks(blocks, self.material_width,
+                                   self.template_spacing, fill=False)
+
+
+if __name__ == '__main__':
+    SliceformCombinedGenerator().run()
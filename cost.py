@@ -0,0 +1,166 @@
+'''Predict a job's output size and run time, before generating it.
+
+Large jobs can make Inkscape appear to hang, first while the extension runs,
+and then while Inkscape loads its output. The number of templates, distinct
+outlines and slots follows from each model's num_slices, slice shape and row
+layout, see SliceformGenerator.template_counts(), and the cost follows from
+those:
+
+  Each distinct outline has at most about SEGMENTS_PER_SLOT path segments
+  per slot. Slots that overlap are merged, so crowded outlines have fewer,
+  and calibrate() scales the estimate to an outline that was generated.
+  Generating, encoding, filling cavities, validating and placing labels
+  each cost time per segment of each distinct outline. Each template's
+  element repeats its outline's path data, so output size grows with
+  templates times segments. Each label is one more element.
+
+The constants were measured on a desktop computer, so estimates are rough,
+but good enough to tell a few seconds from a few minutes.
+
+When the estimate is over the limits, plan() applies cheaper settings from
+STRATEGIES, in order, until it is not, or none are left.
+
+'''
+
+import collections
+
+# Path segments per slot: two slot walls, the slot bottom, and the edge to
+# the next slot.
+SEGMENTS_PER_SLOT = 4
+
+# Seconds per segment of each distinct outline.
+GENERATE_SECONDS = 7e-6
+ENCODE_SECONDS = 5e-6
+CAVITY_SECONDS = 17e-6
+VALIDATE_SECONDS = 8e-6
+LABEL_SECONDS = 2e-6
+# Seconds per element, and per byte of output.
+ELEMENT_SECONDS = 2e-4
+BYTE_SECONDS = 3e-8
+
+# Output bytes per path segment, and per element, besides its path data.
+SEGMENT_BYTES = 10
+ELEMENT_BYTES = 250
+# Output bytes per label's path data.
+LABEL_BYTES = 60
+
+# Settings that plan() may change, with their cheaper values, and how they
+# are described to the user, in order of how much they lose.
+STRATEGIES = [
+    ('fill_cavities', False, 'templates are not placed inside holes'),
+    ('validate', False, 'slots and templates are not checked'),
+    ('fidelity', 'marks', 'slots are drawn as lines'),
+    ('fidelity', 'first_row', 'only the first row is drawn'),
+]
+
+# Preview fidelities, from most to least expensive.
+FIDELITIES = ['full', 'marks', 'first_row']
+
+# One model's templates.
+#
+#  templates: Number of templates.
+#   outlines: Number of distinct outlines. Other templates share these.
+#      slots: Slots in each outline.
+#  first_row: Templates in the first row.
+#   cavities: True if the templates have cavities to fill.
+#      edges: Path segments in each outline's edges, besides those that
+#             SEGMENTS_PER_SLOT counts. Edges drawn as polylines have many.
+#   segments: Path segments in each outline, if measured, see calibrate().
+Counts = collections.namedtuple(
+    'Counts', ['templates', 'outlines', 'slots', 'first_row', 'cavities',
+               'edges', 'segments'], defaults=[0, None])
+
+Cost = collections.namedtuple('Cost', ['elements', 'output_bytes', 'seconds'])
+
+
+def outline_segments(counts: Counts) -> int:
+    '''Return the path segments in each of counts' outlines.'''
+    if counts.segments is not None:
+        return counts.segments
+    return SEGMENTS_PER_SLOT * counts.slots + SEGMENTS_PER_SLOT + counts.edges
+
+
+def calibrate(blocks: list[Counts], segments: int) -> list[Counts]:
+    '''Return blocks, with their outlines' segments measured.
+
+    segments is the number of path segments in an outline of the first
+    block, as generated. Every block's estimate is scaled by the same ratio.
+
+    '''
+    ratio = segments / max(1, outline_segments(blocks[0]))
+    return [counts._replace(segments=round(outline_segments(counts) * ratio))
+            for counts in blocks]
+
+
+def estimate(blocks: list[Counts], fill_cavities: bool = True,
+             validate: bool = True, fidelity: str = 'full',
+             labels: bool = False) -> Cost:
+    '''Return the cost of generating blocks of templates, with settings.
+
+    If labels is set, each template is numbered, see labels.place().
+
+    '''
+    elements = output_bytes = seconds = 0
+    for counts in blocks:
+        segments = outline_segments(counts)
+        templates = counts.templates
+        outlines = counts.outlines
+        if fidelity == 'first_row':
+            # Only the first row is generated.
+            templates = counts.first_row
+            outlines = min(outlines, templates)
+        if fidelity == 'marks':
+            # The edges are drawn without slots, and each slot is marked
+            # with a move and a line.
+            segments = 2 * counts.slots + 1 + counts.edges
+        seconds += (GENERATE_SECONDS + ENCODE_SECONDS) * segments * outlines
+        # Previews skip arranging and validation.
+        if fidelity == 'full':
+            if fill_cavities and counts.cavities:
+                seconds += CAVITY_SECONDS * segments * outlines
+            if validate:
+                seconds += VALIDATE_SECONDS * segments * outlines
+        elements += templates
+        output_bytes += templates * (ELEMENT_BYTES + SEGMENT_BYTES * segments)
+        if labels:
+            # Labels are placed once for each distinct outline.
+            seconds += LABEL_SECONDS * segments * outlines
+            elements += templates
+            output_bytes += templates * (ELEMENT_BYTES + LABEL_BYTES)
+    seconds += ELEMENT_SECONDS * elements + BYTE_SECONDS * output_bytes
+    return Cost(elements=elements, output_bytes=output_bytes, seconds=seconds)
+
+
+def plan(blocks: list[Counts], settings: dict, max_seconds: float,
+         max_bytes: float) -> tuple[dict, Cost, list[str]]:
+    '''Return cheaper settings, their cost, and descriptions of the changes.
+
+    settings has the names in STRATEGIES, and may have the other arguments
+    of estimate(), which are kept. Strategies are only applied if
+    they lower a cost that is over its limit, and fidelity is never raised.
+    A limit of 0 means no limit.
+
+    '''
+    def over(cost):
+        return (bool(max_seconds and cost.seconds > max_seconds),
+                bool(max_bytes and cost.output_bytes > max_bytes))
+
+    settings = dict(settings)
+    cost = estimate(blocks, **settings)
+    # Descriptions of the changes, by setting name.
+    changes = {}
+    for name, value, description in STRATEGIES:
+        slow, big = over(cost)
+        if not (slow or big):
+            break
+        if name == 'fidelity' and (FIDELITIES.index(value) <=
+                                   FIDELITIES.index(settings[name])):
+            continue
+        cheaper = dict(settings, **{name: value})
+        cheaper_cost = estimate(blocks, **cheaper)
+        # Only apply strategies that help with a limit that is exceeded.
+        if (slow and cheaper_cost.seconds < cost.seconds) or \
+           (big and cheaper_cost.output_bytes < cost.output_bytes):
+            settings, cost = cheaper, cheaper_cost
+            changes[name] = description
+    return settings, cost, list(changes.values())
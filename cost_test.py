@@ -0,0 +1,118 @@
+import unittest
+
+import cost
+
+SETTINGS = {'fill_cavities': True, 'validate': True, 'fidelity': 'full'}
+
+
+def c_slices(num_slices):
+    return cost.Counts(templates=2 * num_slices, outlines=2,
+                       slots=num_slices - 1, first_row=6, cavities=True)
+
+
+def rings(num_slices):
+    return cost.Counts(templates=num_slices, outlines=num_slices,
+                       slots=2 * (num_slices - 1), first_row=2, cavities=True)
+
+
+class TestCost(unittest.TestCase):
+    def test_estimate(self):
+        small = cost.estimate([rings(20)])
+        large = cost.estimate([rings(200)])
+        self.assertEqual(large.elements, 200)
+        # Rings have distinct outlines, with slots for every slice, so the
+        # cost grows with the square of the number of slices.
+        self.assertGreater(large.seconds, 50 * small.seconds)
+        self.assertGreater(large.output_bytes, 50 * small.output_bytes)
+
+        # 'C' slices share outlines, but each element repeats its path data.
+        c = cost.estimate([c_slices(200)])
+        self.assertLess(c.seconds, large.seconds)
+        self.assertGreater(c.output_bytes, large.output_bytes)
+
+        both = cost.estimate([rings(20), c_slices(200)])
+        self.assertEqual(both.elements, 420)
+        self.assertAlmostEqual(both.output_bytes,
+                               small.output_bytes + c.output_bytes)
+
+    def test_previews(self):
+        full = cost.estimate([rings(200)])
+        marks = cost.estimate([rings(200)], fidelity='marks')
+        first_row = cost.estimate([rings(200)], fidelity='first_row')
+        self.assertLess(marks.seconds, full.seconds)
+        self.assertLess(marks.output_bytes, full.output_bytes)
+        self.assertLess(first_row.seconds, marks.seconds)
+        self.assertEqual(first_row.elements, 2)
+
+    def test_labels(self):
+        full = cost.estimate([rings(200)])
+        labeled = cost.estimate([rings(200)], labels=True)
+        # Each template gets a label element.
+        self.assertEqual(labeled.elements, 2 * full.elements)
+        self.assertGreater(labeled.seconds, full.seconds)
+        self.assertGreater(labeled.output_bytes, full.output_bytes)
+        # plan() keeps the labels, and counts their cost.
+        settings, estimate, _ = cost.plan(
+            [rings(200)], dict(SETTINGS, labels=True), 0, 0)
+        self.assertTrue(settings['labels'])
+        self.assertEqual(estimate, labeled)
+
+    def test_plan_within_limits(self):
+        settings, estimate, changes = cost.plan([rings(20)], SETTINGS, 30,
+                                                50e6)
+        self.assertEqual(settings, SETTINGS)
+        self.assertEqual(changes, [])
+        # 0 means no limit.
+        settings, _, changes = cost.plan([rings(1000)], SETTINGS, 0, 0)
+        self.assertEqual(changes, [])
+
+    def test_plan_time(self):
+        full = cost.estimate([rings(200)])
+        settings, estimate, changes = cost.plan(
+            [rings(200)], SETTINGS, full.seconds * .6, 0)
+        # Filling cavities is the most expensive step for rings.
+        self.assertEqual(settings, dict(SETTINGS, fill_cavities=False))
+        self.assertEqual(len(changes), 1)
+        self.assertLessEqual(estimate.seconds, full.seconds * .6)
+
+        settings, estimate, changes = cost.plan([rings(200)], SETTINGS,
+                                                .001, 0)
+        self.assertEqual(settings['fidelity'], 'first_row')
+        # The first row preview replaces the slot marks preview.
+        self.assertEqual(len(changes), 3)
+
+    def test_plan_size(self):
+        # Skipping steps does not shrink the output, so only previews are
+        # used.
+        settings, estimate, changes = cost.plan([c_slices(1000)], SETTINGS,
+                                                0, 50e6)
+        self.assertEqual(settings, dict(SETTINGS, fidelity='marks'))
+        self.assertLessEqual(estimate.output_bytes, 50e6)
+
+    def test_calibrate(self):
+        # Crowded slots are merged, so the generated outline has about one
+        # segment per slot.
+        blocks = cost.calibrate([c_slices(1000), rings(10)], 1002)
+        self.assertEqual(blocks[0].segments, 1002)
+        self.assertEqual(blocks[1].segments,
+                         round(cost.outline_segments(rings(10)) / 4))
+        full = cost.estimate(blocks)
+        uncalibrated = cost.estimate([c_slices(1000), rings(10)])
+        self.assertLess(full.output_bytes, uncalibrated.output_bytes)
+        settings, _, changes = cost.plan(blocks, SETTINGS, 30, 50e6)
+        self.assertEqual(changes, [])
+        # Slot marks are not merged.
+        self.assertEqual(
+            cost.estimate(blocks, fidelity='marks').output_bytes,
+            cost.estimate([c_slices(1000), rings(10)],
+                          fidelity='marks').output_bytes)
+
+    def test_plan_keeps_cheaper_fidelity(self):
+        settings, _, _ = cost.plan([c_slices(1000)],
+                                   dict(SETTINGS, fidelity='first_row'),
+                                   0, 1)
+        self.assertEqual(settings['fidelity'], 'first_row')
+
+
+if __name__ == '__main__':
+    unittest.main()
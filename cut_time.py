@@ -0,0 +1,246 @@
+'''Estimate how long a cutting machine takes to cut a job.
+
+Each subpath is one continuous cut. The machine accelerates and decelerates
+at a fixed rate, slows down at corners, and stops at the ends of each cut.
+Between cuts it travels, with the tool lifted, to the next cut's start.
+
+Corner speeds follow the junction deviation model: the machine takes a
+corner at the speed where a circle, tangent to both segments and deviating
+junction_deviation from the corner, needs exactly the machine's
+acceleration. Arcs are limited to the speed where their tightest curvature
+needs that acceleration. Corners sharper than lift_angle stop the tool, and
+add corner_time, like a drag knife swivelling its blade.
+
+Speeds at the segment ends are planned in two passes, forward and
+backward, so short segments, like slot walls, never reach full speed when
+there is not room to accelerate. Each segment then follows a trapezoidal
+speed profile.
+
+Example profiles are in the profiles directory. Profile lengths are in
+millimeters, and times are in seconds.
+
+'''
+
+import collections
+import json
+import math
+
+import geometry
+import metrics
+
+#            name: Machine name, for reports.
+#       feed_rate: Cutting speed, in mm/s.
+#     travel_rate: Speed between cuts, with the tool lifted, in mm/s.
+#    acceleration: In mm/s².
+# junction_deviation: How far from a corner the machine may stray, in mm.
+#      lift_angle: Direction changes above this angle, in degrees, stop the
+#                  tool.
+#     corner_time: Seconds added at each corner sharper than lift_angle.
+#     pierce_time: Seconds added at the start of each cut.
+Profile = collections.namedtuple(
+    'Profile', ['name', 'feed_rate', 'travel_rate', 'acceleration',
+                'junction_deviation', 'lift_angle', 'corner_time',
+                'pierce_time'])
+
+# Estimated seconds, by activity.
+#
+#  line_time, arc_time: Cutting lines and arcs.
+#         travel_time: Moving between cuts.
+#          pause_time: Pierces and lifted corners.
+#             travels: Number of moves between cuts.
+#       travel_length: Total length of those moves, in template units.
+Estimate = collections.namedtuple(
+    'Estimate', ['total_time', 'line_time', 'arc_time', 'travel_time',
+                 'pause_time', 'travels', 'travel_length'])
+
+# Per outline cutting times, and the start and end point of each subpath, in
+# template coordinates.
+OutlineTimes = collections.namedtuple(
+    'OutlineTimes', ['line_time', 'arc_time', 'pause_time', 'subpaths'])
+
+
+def load_profile(filename: str) -> Profile:
+    '''Read a machine profile from a JSON file.'''
+    with open(filename) as f:
+        values = json.load(f)
+    missing = set(Profile._fields) - set(values)
+    assert not missing, 'Error: {} is missing {}'.format(
+        filename, ', '.join(sorted(missing)))
+    return Profile(**{name: values[name] for name in Profile._fields})
+
+
+def move_time(length: float, v0: float, v1: float, v_max: float,
+              acceleration: float) -> float:
+    '''Return the time to move length, from speed v0 to v1.
+
+    The speed ramps at acceleration, and stays at or below v_max. v0 and v1
+    must be reachable from each other within length.
+
+    '''
+    if length <= 0:
+        return 0
+    peak = math.sqrt((2 * acceleration * length + v0 * v0 + v1 * v1) / 2)
+    if peak <= v_max:
+        return (2 * peak - v0 - v1) / acceleration
+    ramps = (2 * v_max * v_max - v0 * v0 - v1 * v1) / (2 * acceleration)
+    return ((2 * v_max - v0 - v1) / acceleration +
+            (length - ramps) / v_max)
+
+
+def junction_speed(into: tuple, out: tuple, profile: Profile) -> float:
+    '''Return the fastest speed through a corner, or 0 if the tool lifts.
+
+    into and out are unit direction vectors.
+
+    '''
+    cos_turn = into[0] * out[0] + into[1] * out[1]
+    turn = math.degrees(math.acos(max(-1, min(1, cos_turn))))
+    if turn > profile.lift_angle:
+        return 0
+    # sin of half the angle between the segments.
+    sin_half = math.sqrt(max(0, (1 + cos_turn) / 2))
+    if sin_half >= 1:
+        return profile.feed_rate
+    return math.sqrt(profile.acceleration * profile.junction_deviation *
+                     sin_half / (1 - sin_half))
+
+
+def unit(x: float, y: float) -> tuple:
+    length = math.hypot(x, y)
+    if length == 0:
+        return (0, 0)
+    return (x / length, y / length)
+
+
+def plan(lengths: list[float], limits: list[float], v_max: list[float],
+         acceleration: float) -> list[float]:
+    '''Return the speed at each segment end, for one continuous cut.
+
+    limits has the speed limit at each of the len(lengths) + 1 segment ends,
+    which is 0 at both ends of the cut. v_max has each segment's speed
+    limit.
+
+    '''
+    speeds = list(limits)
+    for i, length in enumerate(lengths):
+        speeds[i + 1] = min(speeds[i + 1], v_max[i], math.sqrt(
+            speeds[i] * speeds[i] + 2 * acceleration * length))
+    for i in range(len(lengths) - 1, -1, -1):
+        speeds[i] = min(speeds[i], v_max[i], math.sqrt(
+            speeds[i + 1] * speeds[i + 1] + 2 * acceleration * lengths[i]))
+    return speeds
+
+
+def outline_times(outline: geometry.Outline, profile: Profile,
+                  scale: float) -> OutlineTimes:
+    '''Estimate the time to cut each segment of outline.
+
+    scale converts outline units to millimeters.
+
+    '''
+    line_time = arc_time = pause_time = 0
+    subpaths = []
+
+    def cut(segments):
+        # segments: (length, v_max, start direction, end direction, is_arc)
+        nonlocal line_time, arc_time, pause_time
+        if not segments:
+            return
+        limits = [0]
+        for previous, following in zip(segments, segments[1:]):
+            speed = junction_speed(previous[3], following[2], profile)
+            if speed == 0:
+                pause_time += profile.corner_time
+            limits.append(speed)
+        limits.append(0)
+        lengths = [s[0] for s in segments]
+        v_max = [s[1] for s in segments]
+        speeds = plan(lengths, limits, v_max, profile.acceleration)
+        for i, (length, top, _, _, is_arc) in enumerate(segments):
+            time = move_time(length, speeds[i], speeds[i + 1], top,
+                             profile.acceleration)
+            if is_arc:
+                arc_time += time
+            else:
+                line_time += time
+
+    segments = []
+    start = None
+    for i, kind in enumerate(outline.kinds):
+        x1, y1 = outline.x[i] * scale, outline.y[i] * scale
+        if kind == geometry.Segment.MOVE:
+            cut(segments)
+            if start is not None:
+                subpaths.append((start, end))
+            segments = []
+            start = end = (outline.x[i], outline.y[i])
+            pause_time += profile.pierce_time
+            continue
+        x0, y0 = outline.x[i - 1] * scale, outline.y[i - 1] * scale
+        end = (outline.x[i], outline.y[i])
+        arc = None
+        if kind == geometry.Segment.ARC:
+            arc = geometry.center_parameters(outline, i)
+        if arc is not None and arc.sweep_angle != 0:
+            t0 = arc.start_angle
+            t1 = arc.start_angle + arc.sweep_angle
+            direction = 1 if arc.sweep_angle > 0 else -1
+            # Tightest radius of curvature of the ellipse.
+            radius = (min(arc.radius_x, arc.radius_y) ** 2 /
+                      max(arc.radius_x, arc.radius_y) * scale)
+            segments.append((
+                metrics.arc_length(arc) * scale,
+                min(profile.feed_rate,
+                    math.sqrt(profile.acceleration * radius)),
+                unit(-direction * arc.radius_x * math.sin(t0),
+                     direction * arc.radius_y * math.cos(t0)),
+                unit(-direction * arc.radius_x * math.sin(t1),
+                     direction * arc.radius_y * math.cos(t1)),
+                True))
+        elif (x1, y1) != (x0, y0):
+            direction = unit(x1 - x0, y1 - y0)
+            segments.append((math.hypot(x1 - x0, y1 - y0),
+                             profile.feed_rate, direction, direction, False))
+    cut(segments)
+    if start is not None:
+        subpaths.append((start, end))
+    return OutlineTimes(line_time=line_time, arc_time=arc_time,
+                        pause_time=pause_time, subpaths=subpaths)
+
+
+def estimate(templates: list, profile: Profile, scale: float = 1) -> Estimate:
+    '''Estimate the time to cut placed render.Templates, in order.
+
+    The machine starts at the sheet's origin. scale converts template units
+    to millimeters. Templates that share an outline share its cutting
+    times, so each distinct outline is planned once.
+
+    '''
+    planned = {}
+    line_time = arc_time = pause_time = 0
+    travel_time = travel_length = 0
+    travels = 0
+    position = (0, 0)
+    for template in templates:
+        key = id(template.outline)
+        if key not in planned:
+            planned[key] = outline_times(template.outline, profile, scale)
+        times = planned[key]
+        line_time += times.line_time
+        arc_time += times.arc_time
+        pause_time += times.pause_time
+        x, y = template.position.x, template.position.y
+        for start, end in times.subpaths:
+            start = ((start[0] + x) * scale, (start[1] + y) * scale)
+            length = math.hypot(start[0] - position[0],
+                                start[1] - position[1])
+            if length > 0:
+                travels += 1
+                travel_length += length / scale
+                travel_time += move_time(length, 0, 0, profile.travel_rate,
+                                         profile.acceleration)
+            position = ((end[0] + x) * scale, (end[1] + y) * scale)
+    return Estimate(
+        total_time=line_time + arc_time + travel_time + pause_time,
+        line_time=line_time, arc_time=arc_time, travel_time=travel_time,
+        pause_time=pause_time, travels=travels, travel_length=travel_length)
@@ -0,0 +1,132 @@
+import math
+import os
+import unittest
+from unittest import mock
+
+from common import path
+from common import point
+
+import cut_time
+import geometry
+import testing
+
+PROFILE = cut_time.Profile(
+    name='test', feed_rate=10, travel_rate=20, acceleration=100,
+    junction_deviation=.05, lift_angle=180, corner_time=0, pierce_time=0)
+
+
+def polyline(points, closed=False):
+    outline = geometry.Outline()
+    outline.move(point.Point(*points[0]))
+    for p in points[1:]:
+        outline.line(point.Point(*p))
+    if closed:
+        outline.close()
+    return outline
+
+
+class TestCutTime(unittest.TestCase):
+    def test_move_time(self):
+        # Cruise: 1s to reach 10, covering 5 at each end, then 90 at 10.
+        self.assertAlmostEqual(cut_time.move_time(100, 0, 0, 10, 10), 11)
+        # Triangle: accelerates for half of the length, then decelerates.
+        self.assertAlmostEqual(cut_time.move_time(2, 0, 0, 100, 2), 2)
+        self.assertEqual(cut_time.move_time(0, 0, 0, 10, 10), 0)
+
+    def test_junction_speed(self):
+        straight = cut_time.junction_speed((1, 0), (1, 0), PROFILE)
+        self.assertEqual(straight, PROFILE.feed_rate)
+        right_angle = cut_time.junction_speed((1, 0), (0, 1), PROFILE)
+        self.assertLess(right_angle, PROFILE.feed_rate)
+        self.assertGreater(right_angle, 0)
+        knife = PROFILE._replace(lift_angle=45)
+        self.assertEqual(cut_time.junction_speed((1, 0), (0, 1), knife), 0)
+
+    def test_plan(self):
+        # Short segments never reach full speed.
+        speeds = cut_time.plan([1, 1], [0, 100, 0], [100, 100], 2)
+        self.assertAlmostEqual(speeds[1], 2)
+
+    def test_straight_line(self):
+        # Collinear segments cut as fast as one line.
+        one = cut_time.estimate(
+            [testing.template(polyline([(0, 0), (100, 0)]))], PROFILE)
+        two = cut_time.estimate(
+            [testing.template(polyline([(0, 0), (50, 0), (100, 0)]))],
+            PROFILE)
+        self.assertAlmostEqual(one.line_time, 10.1)
+        self.assertAlmostEqual(two.line_time, one.line_time)
+        self.assertEqual(one.travels, 0)
+
+    def test_corners(self):
+        square = polyline([(0, 0), (10, 0), (10, 10), (0, 10)], closed=True)
+        smooth = cut_time.estimate([testing.template(square)], PROFILE)
+        knife = cut_time.estimate(
+            [testing.template(square)],
+            PROFILE._replace(lift_angle=45, corner_time=1, pierce_time=2))
+        self.assertGreater(smooth.line_time, 4)
+        self.assertGreater(knife.line_time, smooth.line_time)
+        self.assertAlmostEqual(knife.pause_time, 3 + 2)
+
+    def test_arcs(self):
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 1))
+        outline.arc(1, 1, path.Size.SMALL, path.Winding.CW,
+                    point.Point(0, -1))
+        outline.arc(1, 1, path.Size.SMALL, path.Winding.CW,
+                    point.Point(0, 1))
+        estimate = cut_time.estimate([testing.template(outline)], PROFILE)
+        self.assertEqual(estimate.line_time, 0)
+        # The tight circle limits the speed to sqrt(100 * 1) = 10.
+        self.assertAlmostEqual(estimate.arc_time, 2 * math.pi / 10 + .1)
+
+    def test_travel(self):
+        outline = polyline([(0, 0), (1, 0)])
+        templates = [testing.template(outline, 0, 0),
+                     testing.template(outline, 4, 3)]
+        estimate = cut_time.estimate(templates, PROFILE)
+        self.assertEqual(estimate.travels, 1)
+        self.assertAlmostEqual(estimate.travel_length, math.hypot(3, 3))
+        scaled = cut_time.estimate(templates, PROFILE, 2)
+        self.assertAlmostEqual(scaled.travel_length, estimate.travel_length)
+        self.assertGreater(scaled.line_time, estimate.line_time)
+
+    def test_profiles(self):
+        directory = os.path.join(os.path.dirname(__file__), 'profiles')
+        for name in os.listdir(directory):
+            profile = cut_time.load_profile(os.path.join(directory, name))
+            self.assertGreater(profile.feed_rate, 0)
+
+    def test_shared_outlines(self):
+        # Templates that share an outline are planned once. Timing the
+        # estimate would depend on the machine running the tests.
+        outlines = []
+        for k in range(10):
+            outline = geometry.Outline()
+            outline.move(point.Point(0, 30))
+            for j in range(10):
+                angle = math.pi * (j + 1) / 11
+                outline.arc(30, 40, path.Size.SMALL, path.Winding.CW,
+                            point.Point(30 * math.sin(angle),
+                                        30 * math.cos(angle)))
+                outline.line(point.Point((25 - k) * math.sin(angle),
+                                         (25 - k) * math.cos(angle)))
+                outline.line(point.Point((25 - k) * math.sin(angle + .02),
+                                         (25 - k) * math.cos(angle + .02)))
+                outline.line(point.Point(30 * math.sin(angle + .02),
+                                         30 * math.cos(angle + .02)))
+            outline.arc(30, 40, path.Size.SMALL, path.Winding.CW,
+                        point.Point(0, -30))
+            outline.close()
+            outlines.append(outline)
+        templates = [testing.template(outlines[k % 10], 70 * (k % 10),
+                                      90 * (k // 10))
+                     for k in range(1000)]
+        with mock.patch.object(cut_time, 'outline_times',
+                               wraps=cut_time.outline_times) as planned:
+            estimate = cut_time.estimate(templates, PROFILE)
+        self.assertEqual(planned.call_count, 10)
+        self.assertEqual(estimate.travels, 1000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import sys
 from common import point
 
 import calculations
+import solve
 
 
 def loxodromic_angle(height, radius):
@@ -123,8 +124,8 @@ def calculate_height(radius, loxodromic_angle):
 def main():
     radius = float(sys.argv[1])
     angle = float(sys.argv[2])
-    height = calculate_height(radius=radius,
-                              loxodromic_angle=math.radians(angle))
+    height = solve.solve('cylinder', 'loxodromic_angle', math.radians(angle),
+                         {'outer_radius': radius}, 'height')['height']
     print('height', height)
     print('angle',
           math.degrees(loxodromic_angle(height=height, radius=radius)))
@@ -0,0 +1,362 @@
+'''Explore model parameters, and find the best trade-offs.
+
+Each model's metrics are calculated for whole grids of parameter
+combinations at once, with numpy. Lengths are in millimeters, and areas in
+square millimeters. Metrics follow the generators' geometry and layout, but
+they are estimates:
+
+    sheet_area: Bounding box of all templates, laid out as the extension lays
+                them out, with 'C' shaped slices.
+    cut_length: Slice edges, plus slot walls, for all templates.
+    slot_width: Width of each slot, from calculations.slot_width().
+  slot_spacing: Narrowest web of material between neighbouring slots, at the
+                slot bottoms. Slots overlap where this is negative.
+
+Example:
+
+  python3 explore.py cylinder outer_radius=30:50:21 inner_radius=20:40:21 \\
+      height=40 num_slices=8:24:17 material_thickness=.25,.5
+
+'''
+
+import collections
+import math
+import sys
+
+import numpy as np
+
+# parameters: Names of the model's parameters, in command line order.
+#    metrics: Function that takes an array per parameter, plus
+#             material_width and template_spacing, and returns a dict with
+#             an array per metric.
+Model = collections.namedtuple('Model', ['parameters', 'metrics'])
+
+# Objectives for pareto_front(). 1 means larger is better, -1 means smaller
+# is better.
+DEFAULT_OBJECTIVES = {'sheet_area': -1, 'cut_length': -1, 'slot_spacing': 1}
+
+
+def slot_width(material_thickness: np.ndarray,
+               loxodromic_angle: np.ndarray) -> np.ndarray:
+    '''Vectorized calculations.slot_width(), for lie_flat_angle 2 * angle.'''
+    lie_flat_angle = 2 * loxodromic_angle
+    lie_flat_angle = np.where(lie_flat_angle > math.pi / 2,
+                              math.pi - lie_flat_angle, lie_flat_angle)
+    return (material_thickness / np.tan(lie_flat_angle) +
+            material_thickness / np.sin(lie_flat_angle))
+
+
+def slot_angles(num_slices: np.ndarray,
+                loxodromic_angle: np.ndarray) -> np.ndarray:
+    '''Vectorized calculations.slot_angles().
+
+    Returns an array with a row per parameter combination, and a column per
+    slot. Rows have (num_slices - 1) angles, in the same order as
+    calculations.slot_angles(), padded with NaN.
+
+    '''
+    num_slices = num_slices[:, np.newaxis]
+    k = np.arange(1, int(np.max(num_slices)))[np.newaxis, :]
+    t = k * 2 * math.pi / num_slices
+    angles = np.arccos(
+        np.sin(t / 2) /
+        np.sqrt(1 + np.tan(loxodromic_angle[:, np.newaxis]) ** 2 *
+                np.cos(t / 2) ** 2))
+    angles = np.where(k - 1 >= num_slices // 2, -angles, angles)
+    return np.where(k < num_slices, angles, np.nan)
+
+
+def ellipse_radius(radius_x, radius_y, angle):
+    '''Distance from an ellipse's center to its edge, in direction angle.'''
+    return radius_x * radius_y / np.hypot(radius_y * np.cos(angle),
+                                          radius_x * np.sin(angle))
+
+
+def half_ellipse_length(radius_x, radius_y):
+    '''Half of an ellipse's perimeter, using Ramanujan's approximation.'''
+    return math.pi / 2 * (3 * (radius_x + radius_y) -
+                          np.sqrt((3 * radius_x + radius_y) *
+                                  (radius_x + 3 * radius_y)))
+
+
+def templates_per_row(first_width, additional_width, material_width,
+                      template_spacing):
+    '''Return how many templates the extensions place in each row.'''
+    return 1 + np.floor((material_width - first_width) /
+                        (additional_width + template_spacing))
+
+
+def slot_metrics(angles, outer, inner, width):
+    '''Return (slot wall length, narrowest web) for each row of slots.
+
+    outer and inner are distances from the origin to the slice's outer and
+    inner edges, along each slot's center line. Slot bottoms are midway
+    between the edges. Neighbouring center lines at distance d, and angle a
+    apart, are d * sin(a) apart, and the slots take up one slot width of
+    that.
+
+    '''
+    walls = np.nansum(outer - inner, axis=1)
+    if angles.shape[1] < 2:
+        return walls, np.full(len(angles), np.inf)
+    middle = (outer + inner) / 2
+    web = (np.fmin(middle[:, 1:], middle[:, :-1]) *
+           np.abs(np.sin(np.diff(angles, axis=1))) - width[:, np.newaxis])
+    # Models with a single slot have no neighbouring slots.
+    web = np.where(np.isnan(web).all(axis=1, keepdims=True), np.inf, web)
+    return walls, np.nanmin(web, axis=1)
+
+
+def layout(per_row, first_width, additional_width, height, count,
+           template_spacing):
+    '''Return the sheet area of two sets of templates, laid out in rows.
+
+    Each set has count templates, with per_row templates in each row. The
+    first template in a row is first_width wide, and each additional template
+    adds additional_width. Returns NaN where a template does not fit on the
+    material.
+
+    '''
+    per_row = np.where(per_row >= 1, per_row, np.nan)
+    rows = np.ceil(count / per_row)
+    width = (first_width + (np.minimum(per_row, count) - 1) *
+             (additional_width + template_spacing))
+    return width * 2 * rows * (height + template_spacing)
+
+
+def cylinder(outer_radius, inner_radius, height, num_slices,
+             material_thickness, material_width, template_spacing):
+    loxodromic_angle = np.arctan((height / 2) / outer_radius)
+    width = slot_width(material_thickness, loxodromic_angle)
+    angles = slot_angles(num_slices, loxodromic_angle)
+    outer_radius_y = np.sqrt(outer_radius ** 2 + (height / 2) ** 2)
+    inner_radius_y = inner_radius / np.cos(loxodromic_angle)
+    outer = ellipse_radius(outer_radius[:, np.newaxis],
+                           outer_radius_y[:, np.newaxis], angles)
+    inner = ellipse_radius(inner_radius[:, np.newaxis],
+                           inner_radius_y[:, np.newaxis], angles)
+    walls, web = slot_metrics(angles, outer, inner, width)
+    edges = (half_ellipse_length(outer_radius, outer_radius_y) +
+             half_ellipse_length(inner_radius, inner_radius_y) +
+             2 * (outer_radius_y - inner_radius_y))
+    additional_width = outer_radius * np.sqrt(
+        np.maximum(0, 1 - (inner_radius_y / outer_radius_y) ** 2))
+    feasible = (outer_radius > inner_radius) & (inner_radius_y <
+                                                outer_radius_y)
+    return {
+        'sheet_area': np.where(feasible, layout(
+            templates_per_row(outer_radius, additional_width,
+                              material_width, template_spacing),
+            outer_radius, additional_width, 2 * outer_radius_y, num_slices,
+            template_spacing), np.nan),
+        'cut_length': 2 * num_slices * (edges + walls),
+        'slot_width': width,
+        'slot_spacing': web,
+    }
+
+
+def truncated_sphere(outer_radius, inner_radius, height, num_slices,
+                     material_thickness, material_width, template_spacing):
+    loxodromic_angle = np.arcsin(np.clip((height / 2) / outer_radius, -1, 1))
+    width = slot_width(material_thickness, loxodromic_angle)
+    angles = slot_angles(num_slices, loxodromic_angle)
+    outer = np.broadcast_to(outer_radius[:, np.newaxis], angles.shape)
+    inner = np.broadcast_to(inner_radius[:, np.newaxis], angles.shape)
+    walls, web = slot_metrics(angles, outer, inner, width)
+    edges = math.pi * (outer_radius + inner_radius) + 2 * (outer_radius -
+                                                           inner_radius)
+    additional_width = outer_radius * np.sqrt(
+        np.maximum(0, 1 - (inner_radius / outer_radius) ** 2))
+    feasible = (outer_radius > inner_radius) & (height < 2 * outer_radius)
+    return {
+        'sheet_area': np.where(feasible, layout(
+            templates_per_row(outer_radius, additional_width,
+                              material_width, template_spacing),
+            outer_radius, additional_width, 2 * outer_radius, num_slices,
+            template_spacing), np.nan),
+        'cut_length': 2 * num_slices * (edges + walls),
+        'slot_width': width,
+        'slot_spacing': web,
+    }
+
+
+def torus(major_radius, minor_radius, num_slices, material_thickness,
+          material_width, template_spacing):
+    ratio = np.clip(minor_radius / major_radius, -1, 1)
+    loxodromic_angle = np.arcsin(ratio)
+    width = slot_width(material_thickness, loxodromic_angle)
+    angles = slot_angles(num_slices, loxodromic_angle)
+    # The outer and inner edges are circles with major_radius, centered at
+    # (minor_radius, 0) and (-minor_radius, 0).
+    major = major_radius[:, np.newaxis]
+    minor = minor_radius[:, np.newaxis]
+    root = np.sqrt(major ** 2 - (minor * np.sin(angles)) ** 2)
+    outer = minor * np.cos(angles) + root
+    inner = -minor * np.cos(angles) + root
+    walls, web = slot_metrics(angles, outer, inner, width)
+    # The edges meet at (0, ±tip).
+    tip = np.sqrt(np.maximum(0, major_radius ** 2 - minor_radius ** 2))
+    edges = 2 * major_radius * (np.arctan2(tip, -minor_radius) +
+                                np.arctan2(tip, minor_radius))
+    feasible = major_radius > minor_radius
+    return {
+        'sheet_area': np.where(feasible, layout(
+            templates_per_row(major_radius + minor_radius, 2 * minor_radius,
+                              material_width, template_spacing),
+            major_radius + minor_radius, 2 * minor_radius, 2 * major_radius,
+            num_slices, template_spacing), np.nan),
+        'cut_length': 2 * num_slices * (edges + walls),
+        'slot_width': width,
+        'slot_spacing': web,
+    }
+
+
+def hyperboloid(outer_edge_radius, outer_waist_radius, inner_radius, height,
+                num_slices, material_thickness, material_width,
+                template_spacing):
+    slice_base = np.sqrt(np.maximum(
+        0, outer_edge_radius ** 2 - outer_waist_radius ** 2))
+    loxodromic_angle = np.arctan((height / 2) / slice_base)
+    width = slot_width(material_thickness, loxodromic_angle)
+    angles = slot_angles(num_slices, loxodromic_angle)
+    half_slice_height = np.sqrt(np.maximum(
+        0, outer_edge_radius ** 2 + (height / 2) ** 2 -
+        outer_waist_radius ** 2))
+    slice_width = outer_waist_radius - inner_radius
+    # Slots cross the inner (left) edge, and the outer (top, right, bottom)
+    # edges. Slots that pass above or below the inner edge do not cut the
+    # slice.
+    inner = inner_radius[:, np.newaxis] / np.cos(angles)
+    outer = np.fmin(
+        outer_waist_radius[:, np.newaxis] / np.cos(angles),
+        half_slice_height[:, np.newaxis] / np.abs(np.sin(angles)))
+    outer = np.where(inner < outer, outer, np.nan)
+    inner = np.where(inner < outer, inner, np.nan)
+    walls, web = slot_metrics(angles, outer, inner, width)
+    edges = 2 * (slice_width + 2 * half_slice_height)
+    feasible = ((outer_edge_radius > outer_waist_radius) &
+                (outer_waist_radius > inner_radius))
+    return {
+        'sheet_area': np.where(feasible, layout(
+            np.floor(material_width / (slice_width + template_spacing)),
+            slice_width, slice_width, 2 * half_slice_height, num_slices,
+            template_spacing), np.nan),
+        'cut_length': 2 * num_slices * (edges + walls),
+        'slot_width': width,
+        'slot_spacing': web,
+    }
+
+
+MODELS = {
+    'cylinder': Model(['outer_radius', 'inner_radius', 'height',
+                       'num_slices', 'material_thickness'], cylinder),
+    'hyperboloid': Model(['outer_edge_radius', 'outer_waist_radius',
+                          'inner_radius', 'height', 'num_slices',
+                          'material_thickness'], hyperboloid),
+    'torus': Model(['major_radius', 'minor_radius', 'num_slices',
+                    'material_thickness'], torus),
+    'truncated_sphere': Model(['outer_radius', 'inner_radius', 'height',
+                               'num_slices', 'material_thickness'],
+                              truncated_sphere),
+}
+
+
+def combinations(parameters: list[str], grid: dict) -> dict:
+    '''Return an array per parameter, for every combination in the grid.'''
+    assert set(grid) == set(parameters), \
+        'Error: Parameters are {}'.format(', '.join(parameters))
+    axes = [np.atleast_1d(np.asarray(grid[name], dtype=float))
+            for name in parameters]
+    return {name: values.ravel() for name, values in
+            zip(parameters, np.meshgrid(*axes, indexing='ij'))}
+
+
+def evaluate(model: str, grid: dict, material_width: float = 203,
+             template_spacing: float = 2) -> dict:
+    '''Evaluate a model over every combination of the grid's values.
+
+    grid maps each of the model's parameters to a value, or a sequence of
+    values. Returns a dict with an array per parameter and per metric, with
+    one entry per combination.
+
+    '''
+    columns = combinations(MODELS[model].parameters, grid)
+    columns['num_slices'] = columns['num_slices'].astype(int)
+    assert np.all(columns['num_slices'] > 0), \
+        'Error: num_slices must be greater than zero'
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns.update(MODELS[model].metrics(
+            material_width=material_width,
+            template_spacing=template_spacing, **columns))
+    return columns
+
+
+def pareto_front(columns: dict, objectives: dict = None) -> np.ndarray:
+    '''Return indices of the Pareto-optimal, feasible combinations.
+
+    A combination is feasible when all its metrics are known, and its slots
+    do not overlap. It is Pareto-optimal when no other combination is at
+    least as good in every objective, and better in one. Of several equal
+    combinations, one is kept.
+
+    Each pass keeps one optimal combination and drops everything it
+    dominates, so there are at most as many passes as combinations.
+
+    '''
+    objectives = objectives or DEFAULT_OBJECTIVES
+    costs = np.stack([-direction * columns[name]
+                      for name, direction in objectives.items()], axis=1)
+    feasible = (np.isfinite(costs).all(axis=1) &
+                (columns['slot_spacing'] >= 0))
+    indices = np.flatnonzero(feasible)
+    costs = costs[indices]
+    # Visit combinations from the smallest first cost, so that early passes
+    # drop the most.
+    order = np.lexsort(costs.T[::-1])
+    indices = indices[order]
+    costs = costs[order]
+    i = 0
+    while i < len(costs):
+        keep = (costs < costs[i]).any(axis=1)
+        keep[i] = True
+        indices = indices[keep]
+        costs = costs[keep]
+        i = np.count_nonzero(keep[:i]) + 1
+    return indices
+
+
+def parse_values(text: str) -> np.ndarray:
+    '''Parse 'a,b,c' as a list of values, or 'start:stop:count' as a range.'''
+    if ':' in text:
+        start, stop, count = text.split(':')
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(value) for value in text.split(',')])
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in MODELS:
+        print('Usage: explore.py MODEL NAME=VALUES...')
+        for name, model in MODELS.items():
+            print('  {}: {}'.format(name, ' '.join(model.parameters)))
+        print('VALUES is a,b,c or start:stop:count. Lengths are in mm.')
+        sys.exit(1)
+
+    model = sys.argv[1]
+    grid = dict(argument.split('=', 1) for argument in sys.argv[2:])
+    grid = {name: parse_values(values) for name, values in grid.items()}
+    columns = evaluate(model, grid)
+    front = pareto_front(columns)
+    front = front[np.argsort(columns['sheet_area'][front])]
+
+    names = MODELS[model].parameters + list(DEFAULT_OBJECTIVES) + [
+        'slot_width']
+    print('{} of {} combinations are Pareto-optimal'.format(
+        len(front), len(columns['num_slices'])))
+    print(' '.join('{:>18}'.format(name) for name in names))
+    for i in front:
+        print(' '.join('{:>18.2f}'.format(columns[name][i])
+                       for name in names))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import math
+import unittest
+
+import numpy as np
+
+import calculations
+import cylinder_calculations
+import explore
+import torus_calculations
+
+
+class TestExplore(unittest.TestCase):
+    def test_slot_width(self):
+        for angle in [.2, .7, 1.2]:
+            self.assertAlmostEqual(
+                explore.slot_width(np.array([.5]), np.array([angle]))[0],
+                calculations.slot_width(.5, 2 * angle))
+
+    def test_slot_angles(self):
+        num_slices = np.array([3, 8, 11])
+        loxodromic_angle = np.array([.3, .6, 1.1])
+        angles = explore.slot_angles(num_slices, loxodromic_angle)
+        self.assertEqual(angles.shape, (3, 10))
+        for row, n, angle in zip(angles, num_slices, loxodromic_angle):
+            expected = calculations.slot_angles(n, angle)
+            np.testing.assert_allclose(row[:n - 1], expected)
+            self.assertTrue(np.isnan(row[n - 1:]).all())
+
+    def test_ellipse_radius(self):
+        x_radius, y_radius, angle = 30, 45, .4
+        intersection = cylinder_calculations.intersect_ellipse_line(
+            x_radius, y_radius, angle, 0)
+        self.assertAlmostEqual(
+            explore.ellipse_radius(x_radius, y_radius, angle),
+            math.hypot(intersection.x, intersection.y))
+
+    def test_cylinder_layout(self):
+        # Matches the widths that cylinder.py lays templates out with.
+        columns = explore.evaluate('cylinder', {
+            'outer_radius': 40, 'inner_radius': 30, 'height': 40,
+            'num_slices': 12, 'material_thickness': .25})
+        outer_radius_y = math.hypot(40, 20)
+        inner_radius_y = 30 / math.cos(math.atan(20 / 40))
+        additional_width = cylinder_calculations.intersect_ellipse_line(
+            40, outer_radius_y, 0, inner_radius_y).x
+        per_row = 1 + math.floor((203 - 40) / (additional_width + 2))
+        rows = math.ceil(12 / per_row)
+        width = 40 + (per_row - 1) * (additional_width + 2)
+        self.assertAlmostEqual(
+            columns['sheet_area'][0],
+            width * 2 * rows * (2 * outer_radius_y + 2))
+
+    def test_torus_edges(self):
+        major_radius, minor_radius = 40, 17.5
+        columns = explore.evaluate('torus', {
+            'major_radius': major_radius, 'minor_radius': minor_radius,
+            'num_slices': 1, 'material_thickness': .25})
+        # With one slice, there are no slots, and the cut is the two arcs.
+        tip = torus_calculations.intersect_circle_line(
+            major_radius, minor_radius, math.pi / 2, 0).y
+        outer = 2 * major_radius * math.atan2(tip, -minor_radius)
+        inner = 2 * major_radius * math.atan2(tip, minor_radius)
+        self.assertAlmostEqual(columns['cut_length'][0],
+                               2 * (outer + inner))
+        self.assertEqual(columns['slot_spacing'][0], math.inf)
+
+    def test_pareto_front(self):
+        columns = {
+            'sheet_area': np.array([1, 2, 1, 3, 1, np.nan, 0]),
+            'cut_length': np.array([3, 1, 3, 3, 2, 0, 0]),
+            'slot_spacing': np.array([1, 1, 1, 0, 1, 5, -1]),
+        }
+        front = explore.pareto_front(columns)
+        # 0 and 2 are equal and dominated by 4, 3 is dominated by 1, 5 is
+        # incomplete, and 6 has overlapping slots.
+        self.assertEqual(sorted(front), [1, 4])
+
+    def test_parse_values(self):
+        np.testing.assert_allclose(explore.parse_values('1,2.5'), [1, 2.5])
+        np.testing.assert_allclose(explore.parse_values('0:1:5'),
+                                   [0, .25, .5, .75, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
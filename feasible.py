@@ -0,0 +1,350 @@
+'''Check model parameters before generating anything.
+
+Some parameters cannot make a model, and fail deep inside the geometry, after
+part of the job is done: a slot too wide to meet the inner edge has no
+corners, a zero height divides by zero, and a template wider than the
+material leaves no room for a row. Each model's constraints are evaluated
+for whole grids of parameter combinations at once, with numpy, in the same
+way as explore.py, so a single combination is checked instantly.
+
+For an infeasible combination, nearest() finds the nearest value of each
+parameter that makes it feasible, keeping the other parameters.
+
+Lengths are in any consistent unit.
+
+Example:
+
+  python3 feasible.py cylinder outer_radius=20 inner_radius=26 height=40 \\
+      num_slices=14 material_thickness=.25
+
+'''
+
+import collections
+import sys
+import typing
+
+import numpy as np
+
+import explore
+
+# parameters: Names of the model's parameters, as in explore.MODELS.
+# constraints: Function that takes an array per parameter, plus
+#              material_width, template_spacing and slice_shape, and returns
+#              a Constraint per constraint, in the order to report them.
+Model = collections.namedtuple('Model', ['parameters', 'constraints'])
+
+# message: Why a combination is infeasible.
+#      ok: Boolean array, True where the combination meets the constraint.
+Constraint = collections.namedtuple('Constraint', ['message', 'ok'])
+
+# nearest() tries values this many times each parameter's scale away, on
+# either side, then bisects between the nearest feasible value and the
+# infeasible value before it.
+OFFSETS = np.logspace(-4, 1, 51)
+BISECTIONS = 20
+
+
+def slots_meet_ellipse(width, radius_x, radius_y, angles):
+    '''Return True where every slot's walls cross an ellipse.
+
+    Slots are beams of width, through the ellipse's center, at angles. A
+    wall crosses the ellipse if it is nearer the center than the ellipse's
+    extent perpendicular to the slot.
+
+    '''
+    extent = np.hypot(radius_x[:, np.newaxis] * np.sin(angles),
+                      radius_y[:, np.newaxis] * np.cos(angles))
+    return width / 2 < np.nanmin(extent, axis=1, initial=np.inf)
+
+
+def slots_clear_middle(width, outer_radius_x, outer_radius_y,
+                       inner_radius_x, inner_radius_y, angles):
+    '''Return True where neighboring slots are apart at the slices' middle.
+
+    On ring slices, neighboring slots can come from opposite edges. Both
+    reach the ellipse halfway between the edges, so if they meet there, they
+    cut the slice in two. Beams of width, whose angles are a apart, overlap
+    out to width / (2 * sin(a / 2)) from their center.
+
+    '''
+    def middle(angle):
+        return (explore.ellipse_radius(outer_radius_x[:, np.newaxis],
+                                       outer_radius_y[:, np.newaxis], angle) +
+                explore.ellipse_radius(inner_radius_x[:, np.newaxis],
+                                       inner_radius_y[:, np.newaxis],
+                                       angle)) / 2
+
+    gaps = np.abs(np.diff(angles, axis=1))
+    reach = middle((angles[:, 1:] + angles[:, :-1]) / 2) * 2 * np.sin(
+        gaps / 2)
+    return np.all((reach > width[:, np.newaxis]) | np.isnan(gaps), axis=1)
+
+
+def common(num_slices, material_thickness):
+    return [
+        Constraint('num_slices must be greater than zero', num_slices > 0),
+        Constraint('Material thickness must be greater than zero',
+                   material_thickness > 0),
+    ]
+
+
+def cylinder(outer_radius, inner_radius, height, num_slices,
+             material_thickness, material_width, template_spacing,
+             slice_shape):
+    loxodromic_angle = np.arctan((height / 2) / outer_radius)
+    width = explore.slot_width(material_thickness, loxodromic_angle)
+    angles = explore.slot_angles(num_slices, loxodromic_angle)
+    inner_radius_y = inner_radius / np.cos(loxodromic_angle)
+    outer_radius_y = np.hypot(outer_radius, height / 2)
+    first_width = outer_radius if slice_shape == 'c' else 2 * outer_radius
+    # Only ring slices have slots from both edges.
+    apart = (slice_shape != 'ring') | slots_clear_middle(
+        width, outer_radius, outer_radius_y, inner_radius, inner_radius_y,
+        angles)
+    return common(num_slices, material_thickness) + [
+        Constraint('Height must be greater than zero', height > 0),
+        Constraint('Outer radius must be larger than inner radius',
+                   outer_radius > inner_radius),
+        Constraint('Inner radius must be greater than zero',
+                   inner_radius > 0),
+        Constraint('Slots must be narrower than the inner diameter',
+                   slots_meet_ellipse(width, inner_radius, inner_radius_y,
+                                      angles)),
+        Constraint('Slots must not cut ring slices apart', apart),
+        Constraint('Slices must fit on the material width',
+                   first_width <= material_width),
+    ]
+
+
+def truncated_sphere(outer_radius, inner_radius, height, num_slices,
+                     material_thickness, material_width, template_spacing,
+                     slice_shape):
+    loxodromic_angle = np.arcsin(np.clip((height / 2) / outer_radius, -1, 1))
+    width = explore.slot_width(material_thickness, loxodromic_angle)
+    angles = explore.slot_angles(num_slices, loxodromic_angle)
+    first_width = outer_radius if slice_shape == 'c' else 2 * outer_radius
+    # Only ring slices have slots from both edges.
+    apart = (slice_shape != 'ring') | slots_clear_middle(
+        width, outer_radius, outer_radius, inner_radius, inner_radius,
+        angles)
+    return common(num_slices, material_thickness) + [
+        Constraint('Height must be greater than zero', height > 0),
+        Constraint('Outer radius must be larger than inner radius',
+                   outer_radius > inner_radius),
+        Constraint('Height must be less than outer diameter',
+                   height < 2 * outer_radius),
+        Constraint('Inner radius must be greater than zero',
+                   inner_radius > 0),
+        Constraint('Slots must be narrower than the inner diameter',
+                   slots_meet_ellipse(width, inner_radius, inner_radius,
+                                      angles)),
+        Constraint('Slots must not cut ring slices apart', apart),
+        Constraint('Slices must fit on the material width',
+                   first_width <= material_width),
+    ]
+
+
+def torus(major_radius, minor_radius, num_slices, material_thickness,
+          material_width, template_spacing, slice_shape):
+    loxodromic_angle = np.arcsin(np.clip(minor_radius / major_radius, -1, 1))
+    width = explore.slot_width(material_thickness, loxodromic_angle)
+    angles = explore.slot_angles(num_slices, loxodromic_angle)
+    # The edges are circles with major_radius, centered minor_radius either
+    # side of the slots' center, so each slot's walls are up to
+    # minor_radius * |sin(angle)| further from the circles' centers.
+    reach = major_radius - minor_radius * np.nanmax(
+        np.abs(np.sin(angles)), axis=1, initial=0)
+    return common(num_slices, material_thickness) + [
+        Constraint('Minor radius must be greater than zero',
+                   minor_radius > 0),
+        Constraint('Major radius must be larger than minor radius',
+                   major_radius > minor_radius),
+        Constraint('Slots must be narrower than the slices',
+                   width / 2 < reach),
+        Constraint('Slices must fit on the material width',
+                   major_radius + minor_radius <= material_width),
+    ]
+
+
+def hyperboloid(outer_edge_radius, outer_waist_radius, inner_radius, height,
+                num_slices, material_thickness, material_width,
+                template_spacing, slice_shape):
+    return common(num_slices, material_thickness) + [
+        Constraint('Height must be greater than zero', height > 0),
+        Constraint('Outer edge radius must be larger than outer waist '
+                   'radius', outer_edge_radius > outer_waist_radius),
+        Constraint('Outer waist radius must be larger than inner radius',
+                   outer_waist_radius > inner_radius),
+        # Slices that reach past the axis would all cross there.
+        Constraint('Inner radius must not be negative', inner_radius >= 0),
+        Constraint('Slices must fit on the material width',
+                   outer_waist_radius - inner_radius + template_spacing <=
+                   material_width),
+    ]
+
+
+MODELS = {
+    'cylinder': Model(explore.MODELS['cylinder'].parameters, cylinder),
+    'hyperboloid': Model(explore.MODELS['hyperboloid'].parameters,
+                         hyperboloid),
+    'torus': Model(explore.MODELS['torus'].parameters, torus),
+    'truncated_sphere': Model(explore.MODELS['truncated_sphere'].parameters,
+                              truncated_sphere),
+}
+
+
+def constraints(model: str, columns: dict, material_width: float,
+                template_spacing: float,
+                slice_shape: str) -> list[Constraint]:
+    '''Return the model's constraints, for columns of combinations.'''
+    columns = dict(columns, num_slices=columns['num_slices'].astype(int))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return MODELS[model].constraints(
+            material_width=material_width, template_spacing=template_spacing,
+            slice_shape=slice_shape, **columns)
+
+
+def check(model: str, grid: dict, material_width: float = 203,
+          template_spacing: float = 2, slice_shape: str = 'c') -> dict:
+    '''Check every combination of the grid's values.
+
+    grid maps each of the model's parameters to a value, or a sequence of
+    values. Returns a dict with an array per parameter, plus 'feasible', and
+    'reason', the message of the first constraint that each combination
+    fails, or ''.
+
+    '''
+    columns = explore.combinations(MODELS[model].parameters, grid)
+    tests = constraints(model, columns, material_width, template_spacing,
+                        slice_shape)
+    feasible = np.ones(len(columns['num_slices']), dtype=bool)
+    reason = np.full(len(feasible), '', dtype=object)
+    for test in tests:
+        reason[feasible & ~test.ok] = test.message
+        feasible &= test.ok
+    columns['feasible'] = feasible
+    columns['reason'] = reason
+    return columns
+
+
+def nearest(model: str, parameters: dict, material_width: float = 203,
+            template_spacing: float = 2, slice_shape: str = 'c') -> dict:
+    '''Return the nearest feasible value of each parameter.
+
+    Each value is for changing that parameter alone. Parameters with no
+    feasible value in reach are left out. The dict is ordered from the
+    smallest relative change.
+
+    '''
+    names = MODELS[model].parameters
+    base = np.array([float(parameters[name]) for name in names])
+    # Lengths are searched on the scale of the model's largest length, and
+    # num_slices on its own scale.
+    lengths = np.array(names) != 'num_slices'
+    scales = np.where(lengths, np.max(np.abs(base[lengths])), np.abs(base))
+    scales = np.where(scales > 0, scales, 1)
+    offsets = np.concatenate([-OFFSETS[::-1], OFFSETS])
+
+    def meets(values):
+        '''values has a row per parameter, and a column per candidate.'''
+        rows = np.repeat(base[np.newaxis, :], values.size, axis=0)
+        rows[np.arange(values.size), np.repeat(np.arange(len(names)),
+                                               values.shape[1])] = \
+            values.ravel()
+        columns = {name: rows[:, i] for i, name in enumerate(names)}
+        # num_slices is a whole number.
+        columns['num_slices'] = np.round(columns['num_slices'])
+        ok = np.ones(len(rows), dtype=bool)
+        for test in constraints(model, columns, material_width,
+                                template_spacing, slice_shape):
+            ok &= test.ok
+        return ok.reshape(values.shape)
+
+    candidates = base[:, np.newaxis] + scales[:, np.newaxis] * offsets
+    ok = meets(candidates)
+    # The nearest feasible candidate on each side, as an index into offsets.
+    middle = len(OFFSETS)
+    below = np.where(ok[:, :middle].any(axis=1),
+                     middle - 1 - np.argmax(ok[:, middle - 1::-1], axis=1),
+                     -1)
+    above = np.where(ok[:, middle:].any(axis=1),
+                     middle + np.argmax(ok[:, middle:], axis=1), -1)
+    index = np.where(
+        (below < 0) | ((above >= 0) & (np.abs(offsets[above]) <
+                                       np.abs(offsets[below]))),
+        above, below)
+    found = index >= 0
+    index = np.where(found, index, middle)
+    # Bisect between the feasible candidate and the infeasible one nearer
+    # the original value.
+    good = np.abs(offsets[index])
+    bad = np.where(good == OFFSETS[0], 0, good / (OFFSETS[1] / OFFSETS[0]))
+    sign = np.sign(offsets[index])
+    for _ in range(BISECTIONS):
+        middle_offset = (good + bad) / 2
+        ok = meets((base + sign * scales * middle_offset)[:, np.newaxis])
+        ok = ok[:, 0]
+        good = np.where(ok, middle_offset, good)
+        bad = np.where(ok, bad, middle_offset)
+    values = base + sign * scales * good
+    # Round to 4 digits of the model's scale, and whole numbers of slices,
+    # or if that is not feasible, away from the original value.
+    step = np.where(lengths, 10.0 ** (np.floor(np.log10(scales)) - 3), 1)
+    rounded = np.round(values / step) * step
+    away = np.where(sign > 0, np.ceil(values / step),
+                    np.floor(values / step)) * step
+    values = np.where(meets(away[:, np.newaxis])[:, 0], away, values)
+    values = np.where(meets(rounded[:, np.newaxis])[:, 0], rounded,
+                      values)
+
+    changes = np.abs(values - base) / np.where(base != 0, np.abs(base), 1)
+    return {names[i]: float(values[i])
+            for i in np.argsort(changes, kind='stable') if found[i]}
+
+
+def problem(model: str, parameters: dict, material_width: float = 203,
+            template_spacing: float = 2,
+            slice_shape: str = 'c') -> typing.Optional[str]:
+    '''Return why one combination is infeasible, and how to fix it, or None.'''
+    columns = check(model, parameters, material_width, template_spacing,
+                    slice_shape)
+    if columns['feasible'][0]:
+        return None
+    suggestions = nearest(model, parameters, material_width,
+                          template_spacing, slice_shape)
+    if not suggestions:
+        return columns['reason'][0]
+    return '{}. Nearest valid values, changing one parameter: {}'.format(
+        columns['reason'][0], ', '.join(
+            '{} {:.4g}'.format(name, value)
+            for name, value in suggestions.items()))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in MODELS:
+        print('Usage: feasible.py MODEL NAME=VALUES...')
+        for name, model in MODELS.items():
+            print('  {}: {}'.format(name, ' '.join(model.parameters)))
+        print('VALUES is a,b,c or start:stop:count. Lengths are in mm.')
+        sys.exit(1)
+
+    model = sys.argv[1]
+    grid = dict(argument.split('=', 1) for argument in sys.argv[2:])
+    grid = {name: explore.parse_values(values)
+            for name, values in grid.items()}
+    columns = check(model, grid)
+    count = len(columns['feasible'])
+    print('{} of {} combinations are feasible'.format(
+        np.count_nonzero(columns['feasible']), count))
+    reasons = collections.Counter(columns['reason'][~columns['feasible']])
+    for reason, number in reasons.most_common():
+        print('  {}: {}'.format(number, reason))
+    if count == 1 and not columns['feasible'][0]:
+        parameters = {name: columns[name][0]
+                      for name in MODELS[model].parameters}
+        for name, value in nearest(model, parameters).items():
+            print('Nearest valid {}: {:.4g}'.format(name, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import math
+import unittest
+
+import numpy as np
+
+import calculations
+import cylinder_calculations
+import feasible
+
+CYLINDER = {'outer_radius': 35, 'inner_radius': 26, 'height': 40,
+            'num_slices': 14, 'material_thickness': .25}
+
+
+class TestFeasible(unittest.TestCase):
+    def test_check_grid(self):
+        columns = feasible.check('cylinder', dict(
+            CYLINDER, inner_radius=[-1, .1, 20, 40], height=[0, 40]))
+        self.assertEqual(len(columns['feasible']), 8)
+        # Each combination reports the first constraint that it fails.
+        self.assertEqual(list(columns['reason']), [
+            'Height must be greater than zero',
+            'Inner radius must be greater than zero',
+            'Height must be greater than zero',
+            'Slots must be narrower than the inner diameter',
+            'Height must be greater than zero', '',
+            'Height must be greater than zero',
+            'Outer radius must be larger than inner radius'])
+        np.testing.assert_array_equal(columns['feasible'],
+                                      columns['reason'] == '')
+
+    def test_slots_meet_inner_edge(self):
+        # Agrees with where the slot corners can be calculated.
+        loxodromic_angle = cylinder_calculations.loxodromic_angle(40, 35)
+        width = calculations.slot_width(.25, 2 * loxodromic_angle)
+        angles = calculations.slot_angles(14, loxodromic_angle)
+        for inner_radius in np.linspace(.1, .4, 13):
+            inner_radius_y = inner_radius / math.cos(loxodromic_angle)
+            try:
+                for angle in angles:
+                    for dy in (-1, 1):
+                        cylinder_calculations.intersect_ellipse_line(
+                            inner_radius, inner_radius_y, angle,
+                            dy * width / 2 / math.cos(angle))
+                expected = True
+            except ValueError:
+                expected = False
+            columns = feasible.check('cylinder', dict(
+                CYLINDER, inner_radius=inner_radius))
+            self.assertEqual(columns['feasible'][0], expected, inner_radius)
+
+    def test_slice_shape(self):
+        parameters = dict(CYLINDER, outer_radius=150)
+        self.assertTrue(feasible.check('cylinder', parameters)['feasible'][0])
+        columns = feasible.check('cylinder', parameters, slice_shape='ring')
+        self.assertEqual(columns['reason'][0],
+                         'Slices must fit on the material width')
+
+    def test_ring_slots(self):
+        # Ring slices have slots from both edges, which meet at the middle
+        # if neighboring slots are too close.
+        columns = feasible.check('cylinder', dict(
+            CYLINDER, num_slices=[219, 220]), slice_shape='ring')
+        self.assertEqual(list(columns['reason']),
+                         ['', 'Slots must not cut ring slices apart'])
+        self.assertTrue(feasible.check('cylinder', dict(
+            CYLINDER, num_slices=220))['feasible'][0])
+        self.assertEqual(feasible.nearest('cylinder', dict(
+            CYLINDER, num_slices=300), slice_shape='ring')['num_slices'], 219)
+
+    def test_nearest(self):
+        parameters = dict(CYLINDER, outer_radius=20)
+        nearest = feasible.nearest('cylinder', parameters)
+        self.assertEqual(list(nearest)[:2], ['inner_radius', 'outer_radius'])
+        self.assertAlmostEqual(nearest['inner_radius'], 19.99)
+        self.assertAlmostEqual(nearest['outer_radius'], 26.01)
+        for name, value in nearest.items():
+            self.assertTrue(feasible.check(
+                'cylinder', dict(parameters, **{name: value}))['feasible'][0])
+
+    def test_nearest_inclusive(self):
+        # The boundary itself is feasible.
+        nearest = feasible.nearest('cylinder', dict(CYLINDER,
+                                                    outer_radius=300))
+        self.assertEqual(nearest, {'outer_radius': 203})
+        nearest = feasible.nearest('truncated_sphere', dict(CYLINDER,
+                                                            num_slices=0))
+        self.assertEqual(nearest, {'num_slices': 1})
+
+    def test_problem(self):
+        self.assertIsNone(feasible.problem('torus', {
+            'major_radius': 40, 'minor_radius': 17.5, 'num_slices': 10,
+            'material_thickness': .25}))
+        self.assertEqual(
+            feasible.problem('hyperboloid', {
+                'outer_edge_radius': 60, 'outer_waist_radius': 30,
+                'inner_radius': -10, 'height': 60, 'num_slices': 18,
+                'material_thickness': .25}),
+            'Inner radius must not be negative. Nearest valid values, '
+            'changing one parameter: inner_radius 0')
+
+
+if __name__ == '__main__':
+    unittest.main()
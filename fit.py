@@ -0,0 +1,442 @@
+'''Check that slots line up with their partner slices in 3D.
+
+Every model's slices lie in planes through the model's center. A slice's
+template x-axis is the plane's horizontal direction, and its y-axis climbs
+at the loxodromic angle. The slices with slots on the outer edge are
+rotated copies of one plane, spaced 2 pi / num_slices apart. The slices
+with slots on the inner edge are their mirror images, through the model's
+base.
+
+Slot k (counting from 1) of outer slice i meets inner slice (i + k), turned
+by a further half turn, and that slice's slot (num_slices - k). For each of
+the num_slices * (num_slices - 1) pairs, this reconstructs both planes,
+intersects them, and compares:
+
+   angle_error: How far each template's slot angle, from
+                calculations.slot_angles(), is from the planes'
+                intersection line, in radians. The larger of the two.
+           gap: Distance between the two slots' bottoms, in 3D. Each slot
+                is cut halfway, so the bottoms meet when the slots fit.
+
+All pairs are checked at once, with numpy. verify() finds the bottoms from
+each model's slot_corners(). verify_templates() finds them in the slots that
+a generator drew, after they were merged into notches and clipped, and after
+kerf compensation, so it checks what is cut.
+
+Example:
+
+  python3 fit.py cylinder outer_radius=35 inner_radius=26 height=40 \\
+      num_slices=14 material_thickness=.25
+
+'''
+
+import collections
+import functools
+import math
+import sys
+
+import numpy as np
+
+from common import point
+
+import calculations
+import cylinder_calculations
+import flatten
+import geometry
+import hyperboloid_calculations
+import kerf
+import revolution
+import torus_calculations
+
+# A pair of slots that do not fit. slice and partner are slice indices, in
+# the outer and inner sets. slot and partner_slot are 1-based slot numbers,
+# in the order of calculations.slot_angles().
+Mismatch = collections.namedtuple(
+    'Mismatch', ['slice', 'slot', 'partner', 'partner_slot', 'angle_error',
+                 'gap'])
+
+# parameters: Names of the model's parameters, in command line order.
+#      slots: Function that takes the parameters, as keyword arguments, and
+#             returns (num_slices, loxodromic_angle, angles, bottoms), for
+#             check().
+Model = collections.namedtuple('Model', ['parameters', 'slots'])
+
+
+def slot_bottom(angle: float, outer: list[point.Point],
+                inner: list[point.Point]) -> float:
+    '''Return the distance from the origin to a slot's bottom.
+
+    outer and inner are the slot's wall intersections with the slice's outer
+    and inner edges, which may be None where a wall misses the slice. The
+    bottom is halfway between the edges, along the slot's center line.
+
+    '''
+    u = (math.cos(angle), math.sin(angle))
+    distances = [((o.x + i.x) * u[0] + (o.y + i.y) * u[1]) / 2
+                 for o, i in zip(outer, inner)
+                 if o is not None and i is not None]
+    if not distances:
+        return math.nan
+    return sum(distances) / len(distances)
+
+
+def swept_depth(p: np.ndarray, d: np.ndarray, u: np.ndarray,
+                depth: np.ndarray, radius: float) -> np.ndarray:
+    '''Return how far a cutter sweeps along lines, past a path's edges.
+
+    The cutter follows edges p + s * d, for s from 0 to 1, and removes
+    material up to radius away, in a capsule around each edge. Lines through
+    the origin have unit directions u, and cross the path at depth along
+    them. Returns the distance along each line to the end of the capsules
+    that cover it from there.
+
+    '''
+    def between(k, c, low, high):
+        # Where low <= k * t - c <= high, as (first, last).
+        inside = (low <= -c) & (-c <= high)
+        k = np.where(k == 0, np.nan, k)
+        first = np.fmin((low + c) / k, (high + c) / k)
+        last = np.fmax((low + c) / k, (high + c) / k)
+        return (np.where(np.isnan(k), np.where(inside, -np.inf, np.inf),
+                         first),
+                np.where(np.isnan(k), np.where(inside, np.inf, -np.inf),
+                         last))
+
+    length = np.hypot(d[:, 0], d[:, 1])
+    p = p[length > 0]
+    d = d[length > 0]
+    length = length[length > 0]
+    e = d / length[:, np.newaxis]
+    n = np.stack([-e[:, 1], e[:, 0]], axis=-1)
+    # The rectangle along each edge.
+    along_first, along_last = between(u @ e.T, np.sum(p * e, axis=1), 0,
+                                      length)
+    across_first, across_last = between(u @ n.T, np.sum(p * n, axis=1),
+                                        -radius, radius)
+    first = np.maximum(along_first, across_first)
+    last = np.minimum(along_last, across_last)
+    empty = first > last
+    firsts = [np.where(empty, np.inf, first)]
+    lasts = [np.where(empty, -np.inf, last)]
+    # The circles around its ends.
+    for center in (p, p + d):
+        along = u @ center.T
+        square = along ** 2 - np.sum(center ** 2, axis=1) + radius ** 2
+        root = np.sqrt(np.maximum(square, 0))
+        firsts.append(np.where(square >= 0, along - root, np.inf))
+        lasts.append(np.where(square >= 0, along + root, -np.inf))
+    first = np.min(firsts, axis=0)
+    last = np.max(lasts, axis=0)
+
+    end = depth
+    while True:
+        reach = np.max(np.where((first <= end[:, np.newaxis]) &
+                                (last > end[:, np.newaxis]), last,
+                                end[:, np.newaxis]), axis=1)
+        if np.array_equal(reach, end):
+            return end
+        end = reach
+
+
+def crossings(p: np.ndarray, d: np.ndarray,
+              u: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''Return where lines through the origin cross edges.
+
+    Edges are p + s * d, and lines are t * u, for unit directions u. Returns
+    (t, s), each with a row for each line, and a column for each edge. Both
+    are NaN where the line and the edge are parallel.
+
+    '''
+    determinant = u[:, np.newaxis, 0] * d[:, 1] - u[:, np.newaxis, 1] * d[:, 0]
+    determinant = np.where(determinant == 0, np.nan, determinant)
+    t = (p[:, 0] * d[:, 1] - p[:, 1] * d[:, 0]) / determinant
+    s = (p[:, 0] * u[:, np.newaxis, 1] -
+         p[:, 1] * u[:, np.newaxis, 0]) / determinant
+    return t, s
+
+
+def notch_bottoms(notches: list[list[point.Point]],
+                  angles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''Return the distance from the origin to each slot's bottom, as drawn.
+
+    notches are a template's slot corners, as in render.Template.slots, and
+    angles are its slots' angles. Each slot's bottom is where its center line
+    first crosses its notch's edges, coming in from the notch's opening,
+    between its last and first corners. Merged notches can be shallower than
+    their slots there.
+
+    Returns (bottoms, openings), with the distance to each slot's opening
+    too. Both are NaN for slots whose center line crosses no notch, which
+    are not cut.
+
+    '''
+    u = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    bottoms = np.full(len(angles), math.nan)
+    openings = np.full(len(angles), math.nan)
+    for notch in notches:
+        corners = np.array([(p.x, p.y) for p in notch])
+        # Each edge, and then the opening.
+        p = np.concatenate([corners[:-1], corners[-1:]])
+        d = np.concatenate([corners[1:], corners[:1]]) - p
+        t, s = crossings(p, d, u)
+        with np.errstate(invalid='ignore'):
+            crosses = (t[:, :-1] > 0) & (s[:, :-1] >= 0) & (s[:, :-1] <= 1)
+        distance = np.where(crosses, np.abs(t[:, :-1] - t[:, -1:]), np.inf)
+        edge = np.argmin(distance, axis=1)
+        cut = crosses.any(axis=1)
+        bottoms[cut] = t[np.arange(len(angles)), edge][cut]
+        openings[cut] = t[cut, -1]
+    return bottoms, openings
+
+
+def cut_bottoms(outline: geometry.Outline, angles: np.ndarray,
+                bottoms: np.ndarray, openings: np.ndarray, width: float,
+                tolerance: float) -> np.ndarray:
+    '''Return the slots' bottoms, as cut with a kerf.
+
+    The cutter follows outline, offset by half the kerf width as
+    kerf.offset() offsets it, and flattened within tolerance. bottoms and
+    openings are from notch_bottoms(). Each slot's center line crosses the
+    offset outline closest to the drawn bottom, and the cut bottom is where
+    the area that the cutter sweeps ends, past that, see swept_depth().
+
+    '''
+    lines, _ = flatten.polyline(kerf.offset(outline, width / 2), tolerance)
+    p = lines[:, :2]
+    d = lines[:, 2:] - p
+    # Away from each slot's opening.
+    sign = np.where(bottoms < openings, -1, 1)
+    u = np.stack([np.cos(angles), np.sin(angles)], axis=-1) * sign[:, None]
+    t, s = crossings(p, d, u)
+    with np.errstate(invalid='ignore'):
+        crosses = (s >= 0) & (s <= 1)
+    distance = np.where(crosses, np.abs(t - (bottoms * sign)[:, None]),
+                        np.inf)
+    depth = t[np.arange(len(angles)), np.argmin(distance, axis=1)]
+    cut = ~np.isnan(bottoms) & crosses.any(axis=1)
+    result = np.full(len(angles), math.nan)
+    result[cut] = sign[cut] * swept_depth(p, d, u[cut], depth[cut],
+                                          width / 2)
+    return result
+
+
+def plane_axes(rotation: np.ndarray,
+               tilt: float) -> tuple[np.ndarray, np.ndarray]:
+    '''Return each slice plane's template x and y axes, in 3D.
+
+    Returns two (..., 3) arrays. The planes are rotated by rotation around
+    the model's vertical axis, and climb at tilt.
+
+    '''
+    zeros = np.zeros_like(rotation)
+    x_axis = np.stack([-np.sin(rotation), np.cos(rotation), zeros], axis=-1)
+    y_axis = np.stack([math.cos(tilt) * np.cos(rotation),
+                       math.cos(tilt) * np.sin(rotation),
+                       np.full_like(rotation, math.sin(tilt))], axis=-1)
+    return x_axis, y_axis
+
+
+def check(num_slices: int, loxodromic_angle: float, angles: np.ndarray,
+          bottoms: np.ndarray, tolerance: float = 1e-6) -> list[Mismatch]:
+    '''Check every pair of intersecting slots.
+
+    angles and bottoms have each slot's angle, and distance from the origin
+    to its bottom, as returned by slot_bottom(). Each is a
+    (2, num_slices - 1) array, with the outer slices' slots, then the inner
+    slices' slots. NaN bottoms are slots that are not cut. Pairs with
+    neither slot cut do not meet, and are not checked.
+
+    Returns the pairs whose angle_error or gap is larger than tolerance.
+
+    '''
+    n = num_slices
+    i, k = np.meshgrid(np.arange(n), np.arange(1, n), indexing='ij')
+    x_a, y_a = plane_axes(i * 2 * math.pi / n, loxodromic_angle)
+    x_b, y_b = plane_axes((i + k) * 2 * math.pi / n + math.pi,
+                          -loxodromic_angle)
+    # The planes intersect along the cross product of their normals, which
+    # points into both 'C' shaped halves when it points along +x in the
+    # first.
+    line = np.cross(np.cross(x_a, y_a), np.cross(x_b, y_b))
+    line *= np.sign(np.sum(line * x_a, axis=-1))[..., np.newaxis]
+    line /= np.linalg.norm(line, axis=-1)[..., np.newaxis]
+
+    partner_slot = n - k
+    angle_a = angles[0][k - 1]
+    angle_b = angles[1][partner_slot - 1]
+    angle_error = np.maximum(
+        np.abs(np.arctan2(np.sum(line * y_a, axis=-1),
+                          np.sum(line * x_a, axis=-1)) - angle_a),
+        np.abs(np.arctan2(np.sum(line * y_b, axis=-1),
+                          np.sum(line * x_b, axis=-1)) - angle_b))
+
+    # Both bottoms are on the intersection line, so the gap is the
+    # difference in their distances from the origin.
+    bottom_a = bottoms[0][k - 1]
+    bottom_b = bottoms[1][partner_slot - 1]
+    gap = np.abs(bottom_a - bottom_b)
+    # One slot is cut, but its partner is not.
+    gap = np.where(np.isnan(bottom_a) != np.isnan(bottom_b), np.inf, gap)
+    meet = ~(np.isnan(bottom_a) & np.isnan(bottom_b))
+
+    bad = meet & ((angle_error > tolerance) | (gap > tolerance))
+    return [Mismatch(slice=int(i[p]), slot=int(k[p]), partner=int(
+                (i[p] + k[p]) % n), partner_slot=int(partner_slot[p]),
+                     angle_error=float(angle_error[p]), gap=float(gap[p]))
+            for p in zip(*np.nonzero(bad))]
+
+
+def cylinder_slots(outer_radius, inner_radius, height, num_slices,
+                   material_thickness):
+    angle = cylinder_calculations.loxodromic_angle(height, outer_radius)
+    width = calculations.slot_width(material_thickness, angle * 2)
+    outer_radius_y = math.hypot(outer_radius, height / 2)
+    inner_radius_y = inner_radius / math.cos(angle)
+    angles = calculations.slot_angles(num_slices, angle)
+    bottoms = [slot_bottom(
+        a, cylinder_calculations.slot_corners(outer_radius, outer_radius_y,
+                                              a, width),
+        cylinder_calculations.slot_corners(inner_radius, inner_radius_y, a,
+                                           width))
+        for a in angles]
+    return (num_slices, angle, np.array([angles, angles]),
+            np.array([bottoms, bottoms]))
+
+
+def truncated_sphere_slots(outer_radius, inner_radius, height, num_slices,
+                           material_thickness):
+    angle = math.asin((height / 2) / outer_radius)
+    width = calculations.slot_width(material_thickness, angle * 2)
+    angles = calculations.slot_angles(num_slices, angle)
+    bottoms = [slot_bottom(
+        a, cylinder_calculations.slot_corners(outer_radius, outer_radius, a,
+                                              width),
+        cylinder_calculations.slot_corners(inner_radius, inner_radius, a,
+                                           width))
+        for a in angles]
+    return (num_slices, angle, np.array([angles, angles]),
+            np.array([bottoms, bottoms]))
+
+
+def torus_slots(major_radius, minor_radius, num_slices, material_thickness):
+    angle = math.asin(minor_radius / major_radius)
+    width = calculations.slot_width(material_thickness, angle * 2)
+    angles = calculations.slot_angles(num_slices, angle)
+    bottoms = [slot_bottom(
+        a, torus_calculations.slot_corners(major_radius, minor_radius, width,
+                                           a),
+        torus_calculations.slot_corners(major_radius, -minor_radius, width,
+                                        a))
+        for a in angles]
+    return (num_slices, angle, np.array([angles, angles]),
+            np.array([bottoms, bottoms]))
+
+
+def hyperboloid_slots(outer_edge_radius, outer_waist_radius, inner_radius,
+                      height, num_slices, material_thickness):
+    angle = hyperboloid_calculations.loxodromic_angle(
+        height, outer_edge_radius, outer_waist_radius)
+    width = calculations.slot_width(material_thickness, angle * 2)
+    # As in hyperboloid.py.
+    half_slice_height = math.sqrt(outer_edge_radius ** 2 + (height / 2) ** 2 -
+                                  outer_waist_radius ** 2)
+
+    def corners(a, outer_inner):
+        return hyperboloid_calculations.slot_corners(
+            outer_waist_radius, inner_radius, half_slice_height, outer_inner,
+            a, width)
+    angles = calculations.slot_angles(num_slices, angle)
+    bottoms = [slot_bottom(
+        a, corners(a, hyperboloid_calculations.OuterInner.OUTER),
+        corners(a, hyperboloid_calculations.OuterInner.INNER))
+        for a in angles]
+    return (num_slices, angle, np.array([angles, angles]),
+            np.array([bottoms, bottoms]))
+
+
+def surface_slots(shape, num_slices, material_thickness, **parameters):
+    '''Return a revolution.SHAPES shape's slots, for check().'''
+    surface = revolution.surface(shape, **parameters)
+    angles, width = revolution.slots(surface, num_slices, material_thickness)
+    # The slices with slots on the inner edge are mirror images, so for
+    # shapes that are not symmetric, their slots are found separately.
+    bottoms = [[slot_bottom(a, i.outer, i.inner) for a, i in zip(
+        angles, revolution.intersections(surface, tilt, angles, width))]
+               for tilt in (surface.loxodromic_angle,
+                            -surface.loxodromic_angle)]
+    return (num_slices, surface.loxodromic_angle, np.array([angles, angles]),
+            np.array(bottoms))
+
+
+MODELS = {
+    'cylinder': Model(['outer_radius', 'inner_radius', 'height',
+                       'num_slices', 'material_thickness'], cylinder_slots),
+    'truncated_sphere': Model(['outer_radius', 'inner_radius', 'height',
+                               'num_slices', 'material_thickness'],
+                              truncated_sphere_slots),
+    'torus': Model(['major_radius', 'minor_radius', 'num_slices',
+                    'material_thickness'], torus_slots),
+    'hyperboloid': Model(['outer_edge_radius', 'outer_waist_radius',
+                          'inner_radius', 'height', 'num_slices',
+                          'material_thickness'], hyperboloid_slots),
+}
+MODELS.update({
+    shape: Model(revolution.SHAPES[shape].parameters +
+                 ['num_slices', 'material_thickness'],
+                 functools.partial(surface_slots, shape))
+    for shape in revolution.NEW_SHAPES})
+
+
+def verify(model: str, tolerance: float = 1e-6,
+           **parameters) -> list[Mismatch]:
+    '''Check a model's slots, with its parameters as keyword arguments.'''
+    assert model in MODELS, 'Error: Unknown model {}'.format(model)
+    parameters['num_slices'] = int(parameters['num_slices'])
+    return check(*MODELS[model].slots(**parameters), tolerance=tolerance)
+
+
+def verify_templates(model: str, templates: list, units: float = 1,
+                     width: float = 0, tolerance: float = 1e-6,
+                     **parameters) -> list[Mismatch]:
+    '''Check a model's slots, as drawn in its templates.
+
+    templates are a render.Template with slots on the outer edge, and one
+    with slots on the inner edge, drawn units long for each unit of the
+    parameters, and cut with a kerf width long. See notch_bottoms(), and
+    cut_bottoms().
+
+    '''
+    assert model in MODELS, 'Error: Unknown model {}'.format(model)
+    parameters['num_slices'] = int(parameters['num_slices'])
+    num_slices, angle, angles, _ = MODELS[model].slots(**parameters)
+    bottoms = []
+    for template, slot_angles in zip(templates, angles):
+        drawn, openings = notch_bottoms(template.slots, slot_angles)
+        if width > 0:
+            drawn = cut_bottoms(template.outline, slot_angles, drawn,
+                                openings, width, tolerance * units / 10)
+        bottoms.append(drawn / units)
+    return check(num_slices, angle, angles, np.array(bottoms),
+                 tolerance=tolerance)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in MODELS:
+        print('Usage: fit.py MODEL NAME=VALUE... [tolerance=VALUE]')
+        for name, model in MODELS.items():
+            print('  {}: {}'.format(name, ' '.join(model.parameters)))
+        sys.exit(1)
+
+    parameters = {name: float(value) for name, value in
+                  (argument.split('=', 1) for argument in sys.argv[2:])}
+    mismatches = verify(sys.argv[1], **parameters)
+    for m in mismatches:
+        print('slice {} slot {} and slice {} slot {}: angle error {:.2e}, '
+              'gap {:.2e}'.format(m.slice, m.slot, m.partner,
+                                  m.partner_slot, m.angle_error, m.gap))
+    print('{} mismatched slot pairs'.format(len(mismatches)))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import math
+import unittest
+
+import numpy as np
+
+from common import defaults
+from common import point
+
+import calculations
+import fit
+import geometry
+import render
+import service
+
+
+class TestFit(unittest.TestCase):
+    def test_cylinder(self):
+        for num_slices in (7, 8):
+            self.assertEqual(fit.verify(
+                'cylinder', outer_radius=35, inner_radius=26, height=40,
+                num_slices=num_slices, material_thickness=.25), [])
+
+    def test_truncated_sphere(self):
+        self.assertEqual(fit.verify(
+            'truncated_sphere', outer_radius=35, inner_radius=26, height=40,
+            num_slices=14, material_thickness=.25), [])
+
+    def test_torus(self):
+        self.assertEqual(fit.verify(
+            'torus', major_radius=40, minor_radius=17.5, num_slices=10,
+            material_thickness=.25), [])
+
+    def test_hyperboloid(self):
+        # Some slots miss the slice entirely.
+        self.assertEqual(fit.verify(
+            'hyperboloid', outer_edge_radius=60, outer_waist_radius=30,
+            inner_radius=20, height=60, num_slices=18,
+            material_thickness=.25), [])
+
+    def test_wrong_angle(self):
+        num_slices, angle, angles, bottoms = fit.cylinder_slots(
+            outer_radius=35, inner_radius=26, height=40, num_slices=7,
+            material_thickness=.25)
+        # Slots cut for a slightly different loxodromic angle.
+        angles[:] = calculations.slot_angles(num_slices, angle + 0.01)
+        mismatches = fit.check(num_slices, angle, angles, bottoms)
+        self.assertEqual(len(mismatches), 7 * 6)
+        for m in mismatches:
+            self.assertGreater(m.angle_error, 1e-6)
+            self.assertEqual(m.partner, (m.slice + m.slot) % 7)
+            self.assertEqual(m.partner_slot, 7 - m.slot)
+
+    def test_gap(self):
+        angle = math.radians(30)
+        angles = np.array([calculations.slot_angles(5, angle)] * 2)
+        bottoms = np.full((2, 4), 10.0)
+        bottoms[1][1] = 10.5
+        mismatches = fit.check(5, angle, angles, bottoms)
+        # Inner slot 2 pairs with outer slot 3, on every slice.
+        self.assertEqual(len(mismatches), 5)
+        for m in mismatches:
+            self.assertEqual((m.slot, m.partner_slot), (3, 2))
+            self.assertAlmostEqual(m.gap, 0.5)
+            self.assertLess(m.angle_error, 1e-9)
+
+    def test_missing_slot(self):
+        angle = math.radians(30)
+        angles = np.array([calculations.slot_angles(5, angle)] * 2)
+        bottoms = np.full((2, 4), 10.0)
+        bottoms[0][0] = math.nan
+        mismatches = fit.check(5, angle, angles, bottoms)
+        self.assertEqual(len(mismatches), 5)
+        self.assertTrue(all(math.isinf(m.gap) for m in mismatches))
+        # Neither slot is cut.
+        bottoms[1][3] = math.nan
+        self.assertEqual(fit.check(5, angle, angles, bottoms), [])
+
+    def test_notch_bottoms(self):
+        # One slot from the right, and a center line that misses it.
+        notch = [point.Point(10, 1), point.Point(6, 1), point.Point(6, -1),
+                 point.Point(10, -1)]
+        bottoms, openings = fit.notch_bottoms([notch], np.array([0, .5]))
+        np.testing.assert_allclose(bottoms, [6, np.nan])
+        np.testing.assert_allclose(openings, [10, np.nan])
+
+        # Two slots 6 deep, merged into one notch. The first one's bottom is
+        # cut short by the notch's edge to the second one's.
+        def slot(angle):
+            u = point.Point(math.cos(angle), math.sin(angle))
+            return [point.Point(x * u.x - y * u.y, x * u.y + y * u.x)
+                    for x, y in ((10, 1), (6, 1), (6, -1), (10, -1))]
+        notches = render.merge_slots([slot(0), slot(-.2)])
+        self.assertEqual(len(notches), 1)
+        bottoms, _ = fit.notch_bottoms(notches, np.array([0, -.2]))
+        self.assertGreater(bottoms[0], 6)
+        self.assertLess(bottoms[0], 6.1)
+        self.assertAlmostEqual(bottoms[1], 6)
+
+    def test_cut_bottoms(self):
+        # A slot from the right edge of a square, with a square bottom, and
+        # then a slanted one. The kerf rounds the slanted bottom's acute
+        # corner, past the center line.
+        for bottom, shallower in ((6, False), (6.5, True)):
+            corners = [point.Point(10, -1), point.Point(bottom, -1),
+                       point.Point(12 - bottom, 1), point.Point(10, 1)]
+            outline = geometry.Outline()
+            outline.move(point.Point(0, -5))
+            for corner in [point.Point(10, -5)] + corners + [
+                    point.Point(10, 5), point.Point(0, 5)]:
+                outline.line(corner)
+            outline.close()
+            angles = np.array([0])
+            drawn, openings = fit.notch_bottoms([corners], angles)
+            self.assertAlmostEqual(drawn[0], 6)
+            cut = fit.cut_bottoms(outline, angles, drawn, openings, 1.6,
+                                  1e-6)
+            if shallower:
+                self.assertGreater(cut[0], 6.01)
+            else:
+                self.assertAlmostEqual(cut[0], 6)
+
+    def test_templates(self):
+        def check_fit(parameters, change=None):
+            model = service.model_generator(parameters)
+            warnings = []
+            model.warn = warnings.append
+            model.setup()
+            templates = model.layout()
+            if change:
+                templates = [change(template) for template in templates]
+            model.check_fit(templates)
+            return warnings
+
+        # Crowded slots are merged into notches, and clipped.
+        for parameters in ({'model': 'cylinder', 'num_slices': 600},
+                           {'model': 'hyperboloid', 'num_slices': 1000},
+                           {'model': 'torus', 'kerf': .3},
+                           {'model': 'torus', 'num_slices': 201}):
+            self.assertEqual(check_fit(parameters), [], parameters)
+
+        # An outer slot that is not drawn.
+        outer_color = defaults.defaults['fill_colors'][render.OuterInner.OUTER]
+
+        def drop_slot(template):
+            if template.fill_color != outer_color:
+                return template
+            return template._replace(slots=template.slots[1:])
+        warnings = check_fit({'model': 'cylinder'}, drop_slot)
+        self.assertEqual(len(warnings), 1)
+        self.assertIn('not fitting', warnings[0])
+
+    def test_slot_angles(self):
+        # Partner slots' angles mirror each other.
+        angles = calculations.slot_angles(9, math.radians(25))
+        for k in range(1, 9):
+            self.assertAlmostEqual(angles[k - 1], -angles[9 - k - 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
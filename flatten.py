@@ -0,0 +1,236 @@
+import math
+
+import numpy as np
+
+import geometry
+
+# Points along each arc where the step size is sampled, to place its steps.
+SAMPLES = 32
+# Each time an arc's steps miss the tolerance, their number grows by this
+# factor.
+GROWTH = 1.1
+
+
+def curvature_radius(radius_x, radius_y, t):
+    '''Return the chord error scale of an ellipse, at parameter t.
+
+    For a chord between parameters (t - h) and (t + h), the farthest point on
+    the ellipse is at parameter t, because the ellipse is an affine image of
+    a circle, and affine maps preserve both parallel tangents and parameter
+    midpoints. That point's distance from the chord is:
+
+      (1 - cos(h)) * radius_x * radius_y /
+        sqrt(radius_x² * sin²(t) + radius_y² * cos²(t))
+
+    This returns the second factor. For a circle, it is the radius. Arguments
+    are numpy arrays, or single values.
+
+    '''
+    return (radius_x * radius_y /
+            np.hypot(radius_x * np.sin(t), radius_y * np.cos(t)))
+
+
+def chord_error(radius_x, radius_y, t, h):
+    '''Return the chord error between parameters (t - h) and (t + h).'''
+    return (1 - np.cos(h)) * curvature_radius(radius_x, radius_y, t)
+
+
+def half_step(tolerance: float, radius):
+    '''Return the largest h where (1 - cos(h)) * radius <= tolerance.
+
+    Steps are limited to a quarter turn, so chords stay well-conditioned.
+
+    '''
+    return np.minimum(math.pi / 4, np.arccos(
+        np.clip(1 - tolerance / radius, -1, 1)))
+
+
+def arc_steps(radius_x: np.ndarray, radius_y: np.ndarray,
+              start_angle: np.ndarray, sweep_angle: np.ndarray,
+              tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    '''Return the steps that flatten arcs within tolerance.
+
+    Returns (steps, parameters): the number of lines for each arc, and the
+    parameter where each line ends, arc after arc. Each arc's last line ends
+    at the end of the arc.
+
+    Circular arcs are split into equal steps, which is optimal because their
+    chord error is uniform. Elliptical arcs need smaller steps where they
+    curve more, so the number of steps that each part of the arc needs is
+    integrated over SAMPLES points, and each step covers an equal share of
+    the total. Arcs with any step that misses the tolerance, at the step's
+    own midpoint, get more steps, until none miss it.
+
+    '''
+    assert tolerance > 0, 'Error: tolerance must be greater than zero'
+    sweep = np.abs(sweep_angle)
+    arcs = (sweep > 0) & (radius_x > 0) & (radius_y > 0)
+    rx = np.where(arcs, radius_x, 1)[:, np.newaxis]
+    ry = np.where(arcs, radius_y, 1)[:, np.newaxis]
+    start = start_angle[:, np.newaxis]
+    sweep = np.where(arcs, sweep, 0)[:, np.newaxis]
+
+    # Steps needed per unit of sweep, and in total, from the start of each
+    # arc to each sample. Circles only need the total.
+    circles = (rx == ry)[:, 0]
+    ellipses = np.flatnonzero(~circles)
+    u = np.linspace(0, 1, SAMPLES + 1)
+    density = 1 / (2 * half_step(tolerance, curvature_radius(
+        rx[ellipses], ry[ellipses],
+        start[ellipses] + sweep_angle[ellipses, np.newaxis] * u)))
+    needed = np.zeros((len(ellipses), SAMPLES + 1))
+    needed[:, 1:] = np.cumsum(density[:, 1:] + density[:, :-1],
+                              axis=1) * sweep[ellipses] / (2 * SAMPLES)
+    total = sweep[:, 0] / (2 * half_step(tolerance, rx[:, 0]))
+    total[ellipses] = needed[:, -1]
+    steps = np.maximum(1, np.ceil(total)).astype(np.intp)
+    # Row of each ellipse in needed.
+    row = np.zeros(len(steps), dtype=np.intp)
+    row[ellipses] = np.arange(len(ellipses))
+
+    while True:
+        arc = np.repeat(np.arange(len(steps)), steps)
+        first = np.cumsum(steps) - steps
+        k = np.arange(len(arc)) - first[arc] + 1
+        fraction = k / steps[arc]
+        # Find each ellipse step's end in needed, and interpolate between
+        # samples.
+        on_ellipses = np.flatnonzero(~circles[arc])
+        rows = needed[row[arc[on_ellipses]]]
+        share = rows[:, -1] * fraction[on_ellipses]
+        sample = np.clip(np.count_nonzero(rows < share[:, np.newaxis],
+                                          axis=1), 1, SAMPLES)
+        low = rows[np.arange(len(rows)), sample - 1]
+        high = rows[np.arange(len(rows)), sample]
+        between = np.clip((share - low) / np.where(high > low, high - low, 1),
+                          0, 1)
+        fraction[on_ellipses] = (sample - 1 + between) / SAMPLES
+        fraction[k == steps[arc]] = 1
+        ends = start_angle[arc] + sweep_angle[arc] * fraction
+        starts = np.where(k == 1, start_angle[arc], np.roll(ends, 1))
+
+        # Equal steps on circles meet the tolerance by construction.
+        errors = chord_error(
+            rx[arc[on_ellipses], 0], ry[arc[on_ellipses], 0],
+            (starts + ends)[on_ellipses] / 2,
+            np.abs(ends - starts)[on_ellipses] / 2)
+        missed = np.bincount(
+            arc[on_ellipses][errors > tolerance * (1 + 1e-9)],
+            minlength=len(steps)) > 0
+        if not missed.any():
+            return steps, ends
+        steps[missed] = np.ceil(steps[missed] * GROWTH) + 1
+
+
+def arc_parameters(arc: geometry.EllipticalArc,
+                   tolerance: float) -> list[float]:
+    '''Return interior vertex parameters that flatten arc within tolerance.
+
+    See arc_steps().
+
+    '''
+    steps, parameters = arc_steps(
+        np.array([arc.radius_x]), np.array([arc.radius_y]),
+        np.array([arc.start_angle]), np.array([arc.sweep_angle]), tolerance)
+    return [float(t) for t in parameters[:-1]]
+
+
+def pieces(outline: geometry.Outline, tolerance: float
+           ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Return outline's segments, with arcs split into lines.
+
+    Returns (source, x, y), with one entry per piece: the index of the
+    outline segment that the piece comes from, and its end point. Each MOVE,
+    LINE and CLOSE segment is one piece, and each arc is split into the
+    fewest lines found by arc_steps(). Every segment's last piece ends
+    exactly on its end point.
+
+    '''
+    kinds = np.frombuffer(outline.kinds, dtype=np.uint8)
+    x1 = np.frombuffer(outline.x)
+    y1 = np.frombuffer(outline.y)
+    arcs = np.flatnonzero(kinds == geometry.Segment.ARC)
+    # Each arc starts at the previous segment's end point.
+    center_x, center_y, radius_x, radius_y, start_angle, sweep_angle = (
+        geometry.arc_centers(
+            x1[arcs - 1], y1[arcs - 1], x1[arcs], y1[arcs],
+            np.frombuffer(outline.radius_x)[arcs],
+            np.frombuffer(outline.radius_y)[arcs],
+            np.frombuffer(outline.large_arc, dtype=np.uint8)[arcs],
+            np.frombuffer(outline.sweep, dtype=np.uint8)[arcs]))
+    # Outlines repeat the same arcs, around a ring and from one template to
+    # the next, so each distinct arc is stepped once.
+    shapes = np.ascontiguousarray(np.column_stack(
+        [radius_x, radius_y, start_angle, sweep_angle]))
+    _, first, inverse = np.unique(
+        shapes.view(np.dtype((np.void, shapes.strides[0]))).ravel(),
+        return_index=True, return_inverse=True)
+    distinct_pieces, distinct_parameters = arc_steps(
+        *shapes[first].T, tolerance)
+    arc_pieces = distinct_pieces[inverse.ravel()]
+    offset = np.arange(np.sum(arc_pieces)) - np.repeat(
+        np.cumsum(arc_pieces) - arc_pieces, arc_pieces)
+    parameters = distinct_parameters[np.repeat(
+        (np.cumsum(distinct_pieces) - distinct_pieces)[inverse.ravel()],
+        arc_pieces) + offset]
+
+    counts = np.ones(len(kinds), dtype=np.intp)
+    counts[arcs] = arc_pieces
+    source = np.repeat(np.arange(len(kinds)), counts)
+    x = x1[source]
+    y = y1[source]
+    on_arcs = kinds[source] == geometry.Segment.ARC
+    x[on_arcs] = (np.repeat(center_x, arc_pieces) +
+                  np.repeat(radius_x, arc_pieces) * np.cos(parameters))
+    y[on_arcs] = (np.repeat(center_y, arc_pieces) +
+                  np.repeat(radius_y, arc_pieces) * np.sin(parameters))
+    # End exactly on each arc's end point.
+    last = np.cumsum(counts) - 1
+    x[last] = x1
+    y[last] = y1
+    return source, x, y
+
+
+def polyline(outline: geometry.Outline,
+             tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    '''Return outline's segments as lines, with arcs flattened.
+
+    Returns (lines, source). lines is an (n, 4) array, with one row of
+    (x0, y0, x1, y1) per line. source holds the index of the outline segment
+    that each line came from. MOVE segments have no lines.
+
+    '''
+    if len(outline) < 2:
+        return np.empty((0, 4)), np.empty(0, dtype=np.intp)
+    source, x, y = pieces(outline, tolerance)
+    lines = np.column_stack([np.roll(x, 1), np.roll(y, 1), x, y])
+    drawn = (np.frombuffer(outline.kinds, dtype=np.uint8)[source] !=
+             geometry.Segment.MOVE)
+    return lines[drawn], source[drawn]
+
+
+def flatten(outline: geometry.Outline,
+            tolerance: float) -> geometry.Outline:
+    '''Return a copy of outline, with arcs replaced by lines.
+
+    Each arc becomes the fewest lines found by arc_steps(), such that no
+    point on the arc is farther than tolerance from its line.
+
+    '''
+    source, x, y = pieces(outline, tolerance)
+    kinds = np.frombuffer(outline.kinds, dtype=np.uint8)[source]
+    kinds = np.where(kinds == geometry.Segment.ARC, geometry.Segment.LINE,
+                     kinds).astype(np.uint8)
+    # Lines have no radii or arc flags.
+    zeros = np.zeros(len(source))
+    return geometry.from_arrays(kinds, x, y, zeros, zeros, zeros, zeros,
+                                outline.subpath_start)
+
+
+def inside(lines: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    '''Return whether each point is inside lines, by the evenodd rule.'''
+    x0, y0, x1, y1 = (lines[:, i] for i in range(4))
+    spans = (y0 > y[:, None]) != (y1 > y[:, None])
+    dy = np.where(spans, y1 - y0, 1)
+    crossings = spans & (x[:, None] < x0 + (y[:, None] - y0) * (x1 - x0) / dy)
+    return np.count_nonzero(crossings, axis=1) % 2 == 1
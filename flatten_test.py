@@ -0,0 +1,135 @@
+import math
+import unittest
+
+import numpy as np
+
+from common import path
+from common import point
+
+import flatten
+import geometry
+
+
+def max_error(arc, parameters):
+    '''Measure the largest distance from the arc to its flattened chords.'''
+    def at(t):
+        return (arc.center.x + arc.radius_x * math.cos(t),
+                arc.center.y + arc.radius_y * math.sin(t))
+
+    vertices = ([arc.start_angle] + parameters +
+                [arc.start_angle + arc.sweep_angle])
+    worst = 0
+    for t0, t1 in zip(vertices, vertices[1:]):
+        (x0, y0), (x1, y1) = at(t0), at(t1)
+        length = math.hypot(x1 - x0, y1 - y0)
+        for k in range(1, 50):
+            x, y = at(t0 + (t1 - t0) * k / 50)
+            distance = abs((x1 - x0) * (y0 - y) - (x0 - x) * (y1 - y0))
+            worst = max(worst, distance / length)
+    return worst
+
+
+class TestFlatten(unittest.TestCase):
+    def test_center_parameters(self):
+        # Quarter circle, clockwise in display coordinates.
+        outline = geometry.Outline()
+        outline.move(point.Point(1, 0))
+        outline.arc(1, 1, path.Size.SMALL, path.Winding.CW,
+                    point.Point(0, 1))
+        arc = geometry.center_parameters(outline, 1)
+        self.assertAlmostEqual(arc.center.x, 0)
+        self.assertAlmostEqual(arc.center.y, 0)
+        self.assertAlmostEqual(arc.start_angle, 0)
+        self.assertAlmostEqual(arc.sweep_angle, math.pi / 2)
+
+        # Back to the start, the long way around the same circle.
+        outline.arc(1, 1, path.Size.LARGE, path.Winding.CW,
+                    point.Point(1, 0))
+        arc = geometry.center_parameters(outline, 2)
+        self.assertAlmostEqual(arc.center.x, 0)
+        self.assertAlmostEqual(arc.center.y, 0)
+        self.assertAlmostEqual(arc.sweep_angle, 3 * math.pi / 2)
+
+        # The other circle through both points.
+        outline.arc(1, 1, path.Size.SMALL, path.Winding.CCW,
+                    point.Point(0, 1))
+        arc = geometry.center_parameters(outline, 3)
+        self.assertAlmostEqual(arc.center.x, 1)
+        self.assertAlmostEqual(arc.center.y, 1)
+        self.assertAlmostEqual(arc.start_angle, -math.pi / 2)
+        self.assertAlmostEqual(arc.sweep_angle, -math.pi / 2)
+
+    def test_circle(self):
+        arc = geometry.EllipticalArc(point.Point(0, 0), 10, 10, 0, math.pi)
+        parameters = flatten.arc_parameters(arc, .01)
+        # Each chord covers 2 * acos(1 - .01 / 10) radians.
+        self.assertEqual(len(parameters) + 1,
+                         math.ceil(math.pi / (2 * math.acos(1 - .001))))
+        self.assertLessEqual(max_error(arc, parameters), .01)
+
+    def test_ellipse(self):
+        for sweep in [math.pi / 3, -math.pi, 2 * math.pi]:
+            arc = geometry.EllipticalArc(point.Point(1, 2), 40, 10, .5, sweep)
+            parameters = flatten.arc_parameters(arc, .01)
+            self.assertLessEqual(max_error(arc, parameters), .01 + 1e-9)
+
+            # Adaptive steps need fewer vertices than uniform steps sized for
+            # the flattest part of the ellipse.
+            uniform = math.ceil(abs(sweep) /
+                                (2 * flatten.half_step(.01, 40 * 40 / 10)))
+            self.assertLess(len(parameters) + 1, uniform)
+
+    def test_arc_steps(self):
+        # Arcs are flattened together, each as if on its own.
+        arcs = [geometry.EllipticalArc(point.Point(0, 0), 10, 10, 0, math.pi),
+                geometry.EllipticalArc(point.Point(0, 0), 40, 10, .5, -2),
+                geometry.EllipticalArc(point.Point(0, 0), 3, 5, 1, 0)]
+        steps, parameters = flatten.arc_steps(
+            *(np.array([getattr(arc, name) for arc in arcs])
+              for name in ('radius_x', 'radius_y', 'start_angle',
+                           'sweep_angle')), .01)
+        self.assertEqual(len(parameters), sum(steps))
+        self.assertEqual(steps[2], 1)
+        first = 0
+        for arc, count in zip(arcs, steps):
+            np.testing.assert_allclose(parameters[first:first + count - 1],
+                                       flatten.arc_parameters(arc, .01))
+            self.assertAlmostEqual(parameters[first + count - 1],
+                                   arc.start_angle + arc.sweep_angle)
+            first += count
+
+    def test_flatten(self):
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 5))
+        outline.arc(3, 5, path.Size.SMALL, path.Winding.CCW,
+                    point.Point(0, -5))
+        outline.close()
+        flat = flatten.flatten(outline, .001)
+        self.assertNotIn(geometry.Segment.ARC, flat.kinds)
+        self.assertEqual(flat.kinds[-1], geometry.Segment.CLOSE)
+        self.assertEqual((flat.x[-2], flat.y[-2]), (0, -5))
+        for x, y in zip(flat.x, flat.y):
+            self.assertAlmostEqual((x / 3) ** 2 + (y / 5) ** 2, 1)
+            self.assertGreaterEqual(x, 0)
+
+
+    def test_polyline(self):
+        outline = geometry.Outline()
+        outline.move(point.Point(1, 0))
+        outline.arc(1, 1, path.Size.LARGE, path.Winding.CW,
+                    point.Point(0, -1))
+        outline.line(point.Point(1, 0))
+        lines, source = flatten.polyline(outline, .001)
+        # Lines are connected, and end on the outline's points.
+        np.testing.assert_array_equal(lines[1:, :2], lines[:-1, 2:])
+        self.assertEqual(tuple(lines[0, :2]), (1, 0))
+        self.assertEqual(tuple(lines[-2, 2:]), (0, -1))
+        self.assertEqual(list(source[-2:]), [1, 2])
+        # Arc vertices are on the circle, and chords are within tolerance.
+        for x0, y0, x1, y1 in lines[:-1]:
+            self.assertAlmostEqual(math.hypot(x1, y1), 1)
+            midpoint = math.hypot((x0 + x1) / 2, (y0 + y1) / 2)
+            self.assertLessEqual(1 - midpoint, .001)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,558 @@
+'''Base class for the sliceform template generator extensions.'''
+
+import collections
+import itertools
+import json
+import typing
+
+import inkex
+from inkex import elements
+from inkex import transforms
+from lxml import etree
+
+from common import defaults
+
+import cost
+import cut_time
+import feasible
+import fit
+import flatten
+import geometry
+import kerf
+import labels
+import metrics
+import nest
+import render
+import svg_path
+import validate
+
+# Namespace for the metrics element in the SVG metadata, and for the
+# attributes that record how templates were generated.
+METRICS_NAMESPACE = 'https://github.com/fdxmw/inkscape_sliceforms'
+
+# On each run's group: the generator's class name, and its options, as JSON.
+GENERATOR_ATTRIBUTE = '{{{}}}generator'.format(METRICS_NAMESPACE)
+OPTIONS_ATTRIBUTE = '{{{}}}options'.format(METRICS_NAMESPACE)
+# On each template: geometry.digest() of its outline, and the options that
+# change its path data.
+GEOMETRY_ATTRIBUTE = '{{{}}}geometry'.format(METRICS_NAMESPACE)
+# On the group of each run's labels.
+LABELS_ATTRIBUTE = '{{{}}}labels'.format(METRICS_NAMESPACE)
+
+# Options that are not recorded on each run's group.
+UNRECORDED_OPTIONS = ['tab', 'input_file', 'update']
+
+etree.register_namespace('sliceform', METRICS_NAMESPACE)
+
+
+class SliceformGenerator(inkex.extensions.GenerateExtension):
+    '''Shared parameters, template rendering, validation, and metrics.
+
+    Subclasses add their model's parameters in add_model_arguments(), read
+    them in generate_templates(), and yield one render.Template per slice,
+    with its position set. Subclasses whose slots fit.py can check set
+    fit_model to their fit.MODELS name.
+
+    '''
+    fit_model = None
+    # The group of templates that --update updates, from create_container().
+    previous = None
+
+    def add_arguments(self, pars):
+        pars.add_argument('--tab', type=str, dest='tab')
+        pars.add_argument('--units', type=str,
+                          dest='units', default='mm',
+                          help='Units')
+        self.add_model_arguments(pars)
+        pars.add_argument('--material_thickness', type=float,
+                          dest='material_thickness', default='.25',
+                          help='Thickness of material')
+        pars.add_argument('--material_width', type=float,
+                          dest='material_width', default='203',
+                          help='Width of material')
+        pars.add_argument('--precision', type=float,
+                          dest='precision', default='.001',
+                          help='Path coordinate precision')
+        pars.add_argument('--flatten_tolerance', type=float,
+                          dest='flatten_tolerance', default='0',
+                          help='Maximum chord error when flattening arcs')
+        pars.add_argument('--kerf', type=float,
+                          dest='kerf', default='0',
+                          help='Width of material the cutter removes')
+        pars.add_argument('--fidelity', type=str,
+                          dest='fidelity', default='full',
+                          help='Preview fidelity')
+        pars.add_argument('--fill_cavities', type=inkex.Boolean,
+                          dest='fill_cavities', default=False,
+                          help='Place templates inside other templates')
+        pars.add_argument('--validate', type=inkex.Boolean,
+                          dest='validate', default=True,
+                          help='Check templates for collisions and slot fit')
+        pars.add_argument('--labels', type=inkex.Boolean,
+                          dest='labels', default=False,
+                          help='Number each slice, with strokes for a pen')
+        pars.add_argument('--label_height', type=float,
+                          dest='label_height', default='3',
+                          help='Largest label height')
+        pars.add_argument('--metrics_file', type=str,
+                          dest='metrics_file', default='',
+                          help='JSON file to write job metrics to')
+        pars.add_argument('--metrics_metadata', type=inkex.Boolean,
+                          dest='metrics_metadata', default=False,
+                          help='Add job metrics to the SVG metadata')
+        pars.add_argument('--machine_profile', type=str,
+                          dest='machine_profile', default='',
+                          help='Machine profile for cut time estimates')
+        pars.add_argument('--update', type=inkex.Boolean,
+                          dest='update', default=False,
+                          help='Update the templates from a previous run')
+        pars.add_argument('--max_seconds', type=float,
+                          dest='max_seconds', default='30',
+                          help='Use faster settings above this estimated '
+                          'time, 0 for no limit')
+        pars.add_argument('--max_megabytes', type=float,
+                          dest='max_megabytes', default='50',
+                          help='Use smaller settings above this estimated '
+                          'output size, 0 for no limit')
+
+    def add_model_arguments(self, pars):
+        '''Add the model's parameters.'''
+        pass
+
+    def warn(self, message: str):
+        '''Show a warning to the user.'''
+        inkex.errormsg(message)
+
+    def on_template(self, count: int):
+        '''Called after each template is generated, with the count so far.
+
+        Callers that report progress, or cancel jobs, replace this.
+
+        '''
+        pass
+
+    def template_counts(self) -> typing.Optional[list[cost.Counts]]:
+        '''Return the counts of each block of templates, or None if unknown.
+
+        Called after setup(), before generating anything.
+
+        '''
+        return None
+
+    def calibrate(self, blocks: list[cost.Counts]) -> list[cost.Counts]:
+        '''Return blocks, calibrated on the first template that is generated.
+
+        Called with the result of template_counts(). See cost.calibrate().
+
+        '''
+        template = next(iter(self.generate_templates()), None)
+        if template is None:
+            return blocks
+        return cost.calibrate(blocks, len(template.outline))
+
+    def preflight(self):
+        '''Switch to cheaper settings, if the job is estimated to be too big.
+
+        Warns about the estimate, and the settings it changes.
+
+        '''
+        blocks = self.template_counts()
+        if blocks is None:
+            return
+        settings = {name: getattr(self.options, name)
+                    for name, _, _ in cost.STRATEGIES}
+        settings['labels'] = self.options.labels
+        limits = (self.options.max_seconds, self.options.max_megabytes * 1e6)
+        _, _, changes = cost.plan(blocks, settings, *limits)
+        if not changes:
+            return
+        # The counts assume that no slots are merged, which overestimates
+        # crowded jobs. Measure a template before degrading the job.
+        blocks = self.calibrate(blocks)
+        settings, estimate, changes = cost.plan(blocks, settings, *limits)
+        if not changes:
+            return
+        for name, value in settings.items():
+            setattr(self.options, name, value)
+        self.warn(
+            'Warning: The full job has about {} templates, and would take '
+            'too long, or be too big for Inkscape. Instead, {}. This takes '
+            'about {:.1f} s, for {:.1f} MB. Raise the time and size limits '
+            'to generate the full job.'.format(
+                sum(block.templates for block in blocks),
+                '; '.join(changes), estimate.seconds,
+                estimate.output_bytes / 1e6))
+
+    def check_feasible(self, model: str):
+        '''Stop with an error if the options cannot make the model.
+
+        The error gives the reason, and the nearest valid values. model is a
+        feasible.MODELS key.
+
+        '''
+        parameters = {name: getattr(self.options, name)
+                      for name in feasible.MODELS[model].parameters}
+        message = feasible.problem(
+            model, parameters, self.options.material_width,
+            self.svg.uutounit(self.template_spacing, self.units),
+            getattr(self.options, 'slice_shape', 'c'))
+        assert message is None, 'Error: ' + message
+
+    def to_uu(self, n: float):
+        '''Convert from self.units to user units.'''
+        return self.svg.unittouu(str(n) + self.units)
+
+    def generate_templates(self):
+        '''Yield a render.Template for each slice.'''
+        raise NotImplementedError
+
+    def digest(self, outline: geometry.Outline) -> str:
+        '''Return outline's geometry attribute.'''
+        key = id(outline)
+        if key not in self.digests:
+            self.digests[key] = geometry.digest(
+                outline, self.kerf, self.flatten_tolerance, self.precision)
+        return self.digests[key]
+
+    def template_transform(self, template: render.Template
+                           ) -> transforms.Transform:
+        translate = transforms.Transform()
+        translate.add_translate(template.position.x, template.position.y)
+        return translate
+
+    def template_element(self, template: render.Template
+                         ) -> elements.PathElement:
+        # Templates often share outlines, so each outline is encoded once.
+        key = id(template.outline)
+        if key not in self.path_data:
+            outline = template.outline
+            if self.kerf > 0:
+                outline = kerf.offset(outline, self.kerf / 2)
+            # Replace arcs with lines, for cutters that only accept
+            # polylines.
+            if self.flatten_tolerance > 0:
+                outline = flatten.flatten(outline, self.flatten_tolerance)
+            self.path_data[key] = svg_path.encode(outline, self.precision)
+
+        element = elements.PathElement()
+        element.style = inkex.styles.Style(style={
+            'stroke-width': self.stroke_width,
+            'stroke': defaults.defaults['cut_color'],
+            'fill': template.fill_color,
+            'fill-rule': 'evenodd'})
+        # Set the path data directly, set_path() would reformat it.
+        element.set('d', self.path_data[key])
+        element.set(GEOMETRY_ATTRIBUTE, self.digest(template.outline))
+        element.transform = self.template_transform(template)
+        return element
+
+    def label_group(self, templates: list[render.Template]
+                    ) -> elements.Group:
+        '''Return a group with each template's number, drawn with a pen.
+
+        All pen strokes share one group, so a cutting machine draws them in
+        one pass, and cuts the templates in another, instead of changing
+        tools for each template. Templates that share an outline share their
+        label's placement. Warns about templates with no room for a label.
+
+        '''
+        group = elements.Group()
+        group.label = 'Labels'
+        group.set(LABELS_ATTRIBUTE, 'true')
+        style = inkex.styles.Style(style={
+            'stroke-width': self.stroke_width,
+            'stroke': labels.PEN_COLOR,
+            'fill': 'none',
+            'stroke-linecap': 'round',
+            'stroke-linejoin': 'round'})
+        missing = 0
+        for template in templates:
+            if template.label is None:
+                continue
+            label = str(template.label)
+            key = (id(template.outline), labels.extent(label))
+            if key not in self.label_places:
+                self.label_places[key] = labels.place(
+                    template.outline, label, self.label_height)
+            if self.label_places[key] is None:
+                missing += 1
+                continue
+            corner, height = self.label_places[key]
+            if (label, height) not in self.label_data:
+                self.label_data[label, height] = svg_path.encode(
+                    labels.text(label, height), self.precision)
+
+            element = elements.PathElement()
+            element.style = style
+            element.set('d', self.label_data[label, height])
+            element.transform = transforms.Transform(translate=(
+                template.position.x + corner.x,
+                template.position.y + corner.y))
+            group.append(element)
+        if missing:
+            self.warn('Warning: {} template{} too small for a label'.format(
+                missing, ' is' if missing == 1 else 's are'))
+        return group
+
+    def previous_container(self) -> typing.Optional[elements.Group]:
+        '''Return the group from a previous run of this generator.
+
+        That is the selected group, or the group of a selected template, or
+        else the document's last group from this generator.
+
+        '''
+        name = type(self).__name__
+        for element in self.svg.selection.values():
+            for group in itertools.chain([element], element.iterancestors()):
+                if group.get(GENERATOR_ATTRIBUTE) == name:
+                    return group
+        groups = [group for group in self.svg.iter()
+                  if group.get(GENERATOR_ATTRIBUTE) == name]
+        return groups[-1] if groups else None
+
+    def create_container(self):
+        '''Return the group for this run's templates.
+
+        With --update, this is the previous run's group, if there is one.
+        The group records the generator, and its options.
+
+        '''
+        if self.options.update:
+            self.previous = self.previous_container()
+        container = self.previous
+        if container is None:
+            container = super().create_container()
+        container.set(GENERATOR_ATTRIBUTE, type(self).__name__)
+        container.set(OPTIONS_ATTRIBUTE, json.dumps(
+            {name: value for name, value in sorted(vars(self.options).items())
+             if name not in UNRECORDED_OPTIONS and
+             isinstance(value, (str, int, float))}))
+        return container
+
+    def update(self, container: elements.Group,
+               templates: list[render.Template]):
+        '''Update container's templates to match templates, in place.
+
+        Each template keeps an element with the same geometry, preferably
+        at the same position, so unchanged templates are not touched, and
+        moved templates only change their transform. Elements left over are
+        given the remaining templates' path data, or removed. Yields the
+        elements for templates beyond those. Labels from the previous run are
+        removed, and generate() draws them again.
+
+        '''
+        for element in list(container):
+            if element.get(LABELS_ATTRIBUTE) is not None:
+                container.remove(element)
+
+        previous = collections.defaultdict(list)
+        for element in container:
+            if element.get(GEOMETRY_ATTRIBUTE) is not None:
+                previous[element.get(GEOMETRY_ATTRIBUTE)].append(element)
+
+        changed = []
+        for template in templates:
+            candidates = previous.get(self.digest(template.outline))
+            if not candidates:
+                changed.append(template)
+                continue
+            transform = self.template_transform(template)
+            # Templates at the origin have no transform attribute.
+            element = next((e for e in candidates
+                            if e.get('transform', '') == str(transform)),
+                           candidates[0])
+            candidates.remove(element)
+            if element.get('transform', '') != str(transform):
+                element.transform = transform
+            if element.style.get('fill') != template.fill_color:
+                element.style['fill'] = template.fill_color
+
+        leftover = [e for candidates in previous.values() for e in candidates]
+        for template in changed:
+            element = self.template_element(template)
+            if not leftover:
+                yield element
+                continue
+            old = leftover.pop()
+            for name in ('d', GEOMETRY_ATTRIBUTE, 'style'):
+                old.set(name, element.get(name))
+            old.transform = element.transform
+        for element in leftover:
+            element.getparent().remove(element)
+
+    def report(self, collisions: list[validate.Collision]):
+        '''Warn about collisions, with a few example locations per kind.'''
+        for kind in validate.Kind:
+            found = [c for c in collisions if c.kind == kind]
+            if not found:
+                continue
+            examples = ', '.join(
+                'template {} at ({:.2f}, {:.2f}) {}'.format(
+                    c.first + 1,
+                    self.svg.uutounit(c.location.x, self.units),
+                    self.svg.uutounit(c.location.y, self.units), self.units)
+                for c in found[:3])
+            self.warn('Warning: {} {} collision{}: {}{}'.format(
+                len(found), kind.value, '' if len(found) == 1 else 's',
+                examples, ', ...' if len(found) > 3 else ''))
+
+    def check_fit(self, templates: list[render.Template]):
+        '''Warn about slots that do not line up with their partner slices.
+
+        The slots are checked as drawn, in the first template of each set.
+
+        '''
+        fill_colors = defaults.defaults['fill_colors']
+        sets = [next((template for template in templates
+                      if template.fill_color == fill_colors[outer_inner]),
+                     None)
+                for outer_inner in render.OuterInner]
+        if None in sets:
+            return
+        parameters = {name: getattr(self.options, name)
+                      for name in fit.MODELS[self.fit_model].parameters}
+        mismatches = fit.verify_templates(
+            self.fit_model, sets, units=self.to_uu(1), width=self.kerf,
+            tolerance=self.options.precision, **parameters)
+        if mismatches:
+            m = mismatches[0]
+            self.warn(
+                'Warning: {} slot pair{} not fitting: slice {} slot {} and '
+                'slice {} slot {}, ...'.format(
+                    len(mismatches), '' if len(mismatches) == 1 else 's',
+                    m.slice + 1, m.slot, m.partner + 1, m.partner_slot))
+
+    def write_metrics(self, templates: list[render.Template]):
+        '''Write job metrics, in self.units, where the options ask.
+
+        With a machine profile, the metrics include estimated cut times, in
+        seconds.
+
+        '''
+        factor = self.svg.uutounit(1, self.units)
+        values = metrics.scale(metrics.measure(templates), factor)._asdict()
+        if self.options.machine_profile:
+            profile = cut_time.load_profile(self.options.machine_profile)
+            estimate = cut_time.estimate(templates, profile,
+                                         self.svg.uutounit(1, 'mm'))
+            values.update(estimate._replace(
+                travel_length=estimate.travel_length * factor)._asdict())
+            values['machine'] = profile.name
+        values['units'] = self.units
+        if self.options.metrics_file:
+            metrics.write_json(values, self.options.metrics_file)
+        if self.options.metrics_metadata:
+            tag = '{{{}}}metrics'.format(METRICS_NAMESPACE)
+            metadata = self.svg.metadata
+            for old in metadata.findall(tag):
+                metadata.remove(old)
+            element = etree.SubElement(metadata, tag)
+            for name, value in values.items():
+                element.set(name, value if isinstance(value, str)
+                            else '{:g}'.format(value))
+
+    def setup(self):
+        '''Read the options that all models share.'''
+        self.stroke_width = str(self.svg.unittouu(
+            defaults.defaults['stroke_width']))
+        self.units = self.options.units
+        assert self.to_uu(1) > 0, 'Error: Unknown units {}'.format(self.units)
+
+        self.material_thickness = self.to_uu(self.options.material_thickness)
+        self.material_width = self.to_uu(self.options.material_width)
+        self.precision = self.to_uu(self.options.precision)
+        self.flatten_tolerance = self.to_uu(self.options.flatten_tolerance)
+        self.kerf = self.to_uu(self.options.kerf)
+        self.label_height = self.to_uu(self.options.label_height)
+        assert self.label_height > 0, \
+            'Error: Label height must be greater than zero'
+
+        # Spacing between templates.
+        self.template_spacing = self.svg.unittouu(
+            defaults.defaults['template_spacing'])
+
+    def arrange(self, templates: list[render.Template]
+                ) -> list[render.Template]:
+        '''Return templates, with their final positions.'''
+        if self.options.fill_cavities:
+            templates = nest.fill_cavities(templates, self.template_spacing)
+        return templates
+
+    def preview(self, templates: typing.Iterable[render.Template]
+                ) -> list[render.Template]:
+        '''Return quickly drawn templates, for the fidelity option.
+
+        'marks' templates are drawn by the models, which mark each slot
+        with a line instead of cutting it. 'first_row' keeps only the
+        templates in the first row, and stops generating after it.
+
+        '''
+        templates = iter(templates)
+        if self.options.fidelity == 'marks':
+            return list(templates)
+        assert self.options.fidelity == 'first_row', \
+            'Error: Unknown fidelity {}'.format(self.options.fidelity)
+        first = next(templates, None)
+        if first is None:
+            return []
+        return [first] + list(itertools.takewhile(
+            lambda t: t.position.y == first.position.y, templates))
+
+    def counted(self, templates: typing.Iterable[render.Template]
+                ) -> typing.Iterator[render.Template]:
+        '''Yield templates, calling on_template() as each is generated.'''
+        for template in templates:
+            self.generated += 1
+            self.on_template(self.generated)
+            yield template
+
+    def preview_templates(self) -> list[render.Template]:
+        '''Return the preview's templates, with their final positions.'''
+        return self.preview(self.counted(self.generate_templates()))
+
+    def layout(self) -> list[render.Template]:
+        '''Return the templates, or the preview's, with final positions.'''
+        self.generated = 0
+        if self.options.fidelity != 'full':
+            return self.preview_templates()
+        return self.arrange(list(self.counted(self.generate_templates())))
+
+    def check(self, templates: list[render.Template]):
+        '''Warn about collisions, and slots that do not fit.'''
+        self.report(validate.validate(templates, self.precision))
+        if self.fit_model is not None:
+            self.check_fit(templates)
+
+    def emit(self, templates: list[render.Template]
+             ) -> typing.Iterator[elements.BaseElement]:
+        '''Yield the elements for templates, and their labels.
+
+        With a previous run's group, its elements are updated in place, and
+        only new elements are yielded, see update().
+
+        '''
+        if self.previous is not None:
+            yield from self.update(self.previous, templates)
+        else:
+            for template in templates:
+                yield self.template_element(template)
+        if self.options.labels:
+            yield self.label_group(templates)
+
+    def generate(self):
+        self.setup()
+        self.preflight()
+        self.path_data = {}
+        self.digests = {}
+        self.label_places = {}
+        self.label_data = {}
+        self.templates = self.layout()
+        yield from self.emit(self.templates)
+
+        # Previews skip validation, and metrics.
+        if self.options.fidelity != 'full':
+            return
+        if self.options.validate:
+            self.check(self.templates)
+        if self.options.metrics_file or self.options.metrics_metadata:
+            self.write_metrics(self.templates)
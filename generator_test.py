@@ -0,0 +1,102 @@
+import unittest
+
+from lxml import etree
+
+import generator
+import service
+
+
+def run(document=None, **parameters):
+    '''Run the torus generator with --update, and return it.
+
+    The templates are added to document, or to a new document.
+
+    '''
+    model = service.model_generator(dict(
+        {'model': 'torus', 'num_slices': 6, 'update': True}, **parameters))
+    if document is not None:
+        model.svg = document
+    model.warn = lambda message: None
+    model.effect()
+    return model
+
+
+def containers(document) -> list:
+    return [group for group in document.iter()
+            if group.get(generator.GENERATOR_ATTRIBUTE) is not None]
+
+
+def templates(container) -> list:
+    return [element for element in container
+            if element.get(generator.GEOMETRY_ATTRIBUTE) is not None]
+
+
+def labels(container) -> list:
+    return [element for element in container
+            if element.get(generator.LABELS_ATTRIBUTE) is not None]
+
+
+class TestUpdate(unittest.TestCase):
+    def test_unchanged(self):
+        document = run().svg
+        before = etree.tostring(document)
+        run(document)
+        self.assertEqual(etree.tostring(document), before)
+        self.assertEqual(len(containers(document)), 1)
+
+    def test_fewer_templates(self):
+        document = run().svg
+        container, = containers(document)
+        run(document, num_slices=4)
+        self.assertEqual(containers(document), [container])
+        self.assertEqual(len(templates(container)), 8)
+
+    def test_more_templates(self):
+        document = run(num_slices=4).svg
+        container, = containers(document)
+        before = templates(container)
+        run(document)
+        # The previous elements are kept, with new path data where their
+        # templates changed, and the elements for the other templates are
+        # added after them.
+        after = templates(container)
+        self.assertEqual(len(after), 12)
+        self.assertEqual(after[:len(before)], before)
+        reference = templates(containers(run().svg)[0])
+        self.assertEqual(
+            sorted(element.get('d') for element in after),
+            sorted(element.get('d') for element in reference))
+
+    def test_labels_replaced(self):
+        document = run(labels=True).svg
+        container, = containers(document)
+        old, = labels(container)
+        run(document, labels=True, num_slices=4)
+        new, = labels(container)
+        self.assertIsNot(new, old)
+        self.assertIsNone(old.getparent())
+        self.assertEqual(len(new), 8)
+        # Without labels, the previous labels are removed.
+        run(document, num_slices=4)
+        self.assertEqual(labels(container), [])
+
+    def test_selected_container(self):
+        document = run(update=False).svg
+        run(document, update=False)
+        first, last = containers(document)
+        first.set('id', 'first')
+        last_before = etree.tostring(last)
+        document.selection.set(first)
+        run(document, num_slices=4)
+        self.assertEqual(len(templates(first)), 8)
+        self.assertEqual(etree.tostring(last), last_before)
+
+        # Without a selection, the last group is updated.
+        document.selection.clear()
+        run(document, num_slices=5)
+        self.assertEqual(len(templates(first)), 8)
+        self.assertEqual(len(templates(last)), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,327 @@
+import array
+import collections
+import enum
+import hashlib
+import math
+
+import numpy as np
+
+from common import path
+from common import point
+
+
+class Segment(enum.IntEnum):
+    MOVE = 0
+    LINE = 1
+    ARC = 2
+    CLOSE = 3
+
+
+# Center parameterization of an elliptical arc, with axis-aligned radii.
+#
+# The arc's points are (center.x + radius_x * cos(t),
+#                       center.y + radius_y * sin(t)),
+# for t from start_angle to start_angle + sweep_angle.
+EllipticalArc = collections.namedtuple(
+    'EllipticalArc',
+    ['center', 'radius_x', 'radius_y', 'start_angle', 'sweep_angle'])
+
+
+class Outline:
+    '''Path geometry, stored as typed arrays with one entry per segment.
+
+        kinds: Segment type.
+         x, y: End point. CLOSE segments end at their subpath's start point.
+    radius_x,
+     radius_y: Arc radii. Zero for other segment types.
+    large_arc,
+        sweep: Arc flags, as in SVG path data. Zero for other segment types.
+
+    Each segment starts at the previous segment's end point. Consumers, like
+    svg_path.encode(), walk the arrays directly, and transforms produce new
+    arrays without building per-segment objects.
+
+    '''
+    def __init__(self):
+        self.kinds = array.array('B')
+        self.x = array.array('d')
+        self.y = array.array('d')
+        self.radius_x = array.array('d')
+        self.radius_y = array.array('d')
+        self.large_arc = array.array('B')
+        self.sweep = array.array('B')
+        # Start point of the current subpath.
+        self.subpath_start = (0.0, 0.0)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, kind: Segment, x: float, y: float, radius_x: float = 0,
+               radius_y: float = 0, large_arc: int = 0, sweep: int = 0):
+        self.kinds.append(kind)
+        self.x.append(x)
+        self.y.append(y)
+        self.radius_x.append(radius_x)
+        self.radius_y.append(radius_y)
+        self.large_arc.append(large_arc)
+        self.sweep.append(sweep)
+
+    def move(self, p: point.Point):
+        self.append(Segment.MOVE, p.x, p.y)
+        self.subpath_start = (p.x, p.y)
+
+    def line(self, p: point.Point):
+        self.append(Segment.LINE, p.x, p.y)
+
+    def arc(self, radius_x: float, radius_y: float, size: path.Size,
+            winding: path.Winding, p: point.Point):
+        self.append(Segment.ARC, p.x, p.y, radius_x, radius_y,
+                    1 if size == path.Size.LARGE else 0,
+                    1 if winding == path.Winding.CW else 0)
+
+    def close(self):
+        self.append(Segment.CLOSE, *self.subpath_start)
+
+    def replace_end(self, p: point.Point):
+        '''Move the last segment's end point to p.'''
+        self.x[-1] = p.x
+        self.y[-1] = p.y
+        if self.kinds[-1] == Segment.MOVE:
+            self.subpath_start = (p.x, p.y)
+
+    def end_point(self, i: int) -> point.Point:
+        return point.Point(self.x[i], self.y[i])
+
+    def extend(self, other: 'Outline'):
+        self.kinds.extend(other.kinds)
+        self.x.extend(other.x)
+        self.y.extend(other.y)
+        self.radius_x.extend(other.radius_x)
+        self.radius_y.extend(other.radius_y)
+        self.large_arc.extend(other.large_arc)
+        self.sweep.extend(other.sweep)
+        if len(other):
+            self.subpath_start = other.subpath_start
+
+    def copy(self) -> 'Outline':
+        result = Outline()
+        result.extend(self)
+        return result
+
+
+def from_arrays(kinds, x, y, radius_x, radius_y, large_arc, sweep,
+                subpath_start: tuple[float, float]) -> Outline:
+    '''Return an outline with the segments in numpy arrays.'''
+    result = Outline()
+    result.kinds.frombytes(np.asarray(kinds, dtype=np.uint8).tobytes())
+    result.x.frombytes(np.asarray(x, dtype=float).tobytes())
+    result.y.frombytes(np.asarray(y, dtype=float).tobytes())
+    result.radius_x.frombytes(np.asarray(radius_x, dtype=float).tobytes())
+    result.radius_y.frombytes(np.asarray(radius_y, dtype=float).tobytes())
+    result.large_arc.frombytes(np.asarray(large_arc, dtype=np.uint8).tobytes())
+    result.sweep.frombytes(np.asarray(sweep, dtype=np.uint8).tobytes())
+    result.subpath_start = subpath_start
+    return result
+
+
+def translate(outline: Outline, dx: float, dy: float) -> Outline:
+    '''Return a copy of outline, moved by (dx, dy).'''
+    result = outline.copy()
+    result.x = array.array('d', (np.frombuffer(outline.x) + dx).tobytes())
+    result.y = array.array('d', (np.frombuffer(outline.y) + dy).tobytes())
+    result.subpath_start = (outline.subpath_start[0] + dx,
+                            outline.subpath_start[1] + dy)
+    return result
+
+
+def mirror(outline: Outline) -> Outline:
+    '''Return a copy of outline, mirrored about the y-axis.
+
+    Mirroring reverses each arc's drawing direction, so the sweep flags flip.
+
+    '''
+    result = outline.copy()
+    result.x = array.array('d', (-np.frombuffer(outline.x)).tobytes())
+    arcs = np.frombuffer(outline.kinds, dtype=np.uint8) == Segment.ARC
+    result.sweep = array.array('B', (
+        np.frombuffer(outline.sweep, dtype=np.uint8) ^ arcs).tobytes())
+    result.subpath_start = (-outline.subpath_start[0],
+                            outline.subpath_start[1])
+    return result
+
+
+def reverse(outline: Outline) -> Outline:
+    '''Return a copy of outline, with each subpath drawn backwards.
+
+    Subpaths keep their order, and closed subpaths stay closed. Reversed arcs
+    keep their radii and size, but sweep in the opposite direction.
+
+    '''
+    kinds = np.frombuffer(outline.kinds, dtype=np.uint8)
+    # Indices of each subpath's MOVE segment, plus a sentinel.
+    starts = np.append(np.flatnonzero(kinds == Segment.MOVE), len(kinds))
+    # For each reversed segment: the original segment that it reverses, or
+    # -1 for MOVE and CLOSE segments, and the original end point where it
+    # ends.
+    segments = []
+    points = []
+    closes = []
+    for start, end in zip(starts[:-1], starts[1:]):
+        closed = kinds[end - 1] == Segment.CLOSE
+        last = end - 2 if closed else end - 1
+        # Segment i runs from end point i - 1 to end point i, so its reverse
+        # runs from end point i to end point i - 1.
+        drawn = np.arange(last, start, -1)
+        segments += [[-1], drawn] + ([[-1]] if closed else [])
+        points += [[last], drawn - 1] + ([[last]] if closed else [])
+        closes += [[False], np.zeros(len(drawn), dtype=bool)] + (
+            [[True]] if closed else [])
+    if not segments:
+        return Outline()
+    segment = np.concatenate(segments).astype(np.intp)
+    point_index = np.concatenate(points).astype(np.intp)
+    closing = np.concatenate(closes)
+    arcs = (segment >= 0) & (kinds[segment] == Segment.ARC)
+    new_kinds = np.where(arcs, Segment.ARC, Segment.LINE)
+    new_kinds[segment < 0] = Segment.MOVE
+    new_kinds[closing] = Segment.CLOSE
+
+    def arc_values(values, dtype=float):
+        return np.where(arcs, np.frombuffer(values, dtype=dtype)[segment], 0)
+    x = np.frombuffer(outline.x)[point_index]
+    y = np.frombuffer(outline.y)[point_index]
+    last_move = np.flatnonzero(new_kinds == Segment.MOVE)[-1]
+    return from_arrays(
+        new_kinds, x, y, arc_values(outline.radius_x),
+        arc_values(outline.radius_y),
+        arc_values(outline.large_arc, np.uint8),
+        arc_values(outline.sweep, np.uint8) ^ arcs,
+        (float(x[last_move]), float(y[last_move])))
+
+
+def digest(outline: Outline, *parameters) -> str:
+    '''Return a hash of outline's segments, and of parameters, in hex.
+
+    Equal outlines, with equal parameters, have equal digests, across runs.
+
+    '''
+    h = hashlib.sha1()
+    for values in (outline.kinds, outline.x, outline.y, outline.radius_x,
+                   outline.radius_y, outline.large_arc, outline.sweep):
+        h.update(values.tobytes())
+    h.update(repr(parameters).encode())
+    return h.hexdigest()
+
+
+def canonical_digest(outlines: list[tuple[Outline, float, float]],
+                     precision: float = 1e-6) -> str:
+    '''Return a hash of outlines' cut geometry, in hex.
+
+    outlines has (outline, dx, dy) for each outline, moved by (dx, dy). The
+    hash only depends on the segments that are cut, so outlines that draw
+    the same segments in another order, or backwards, or that start their
+    subpaths elsewhere, have equal hashes:
+
+      Coordinates and radii are rounded to multiples of precision.
+      MOVEs only set start points, and CLOSEs are lines to the subpath's
+      start. Segments that round to zero length are dropped.
+      Each segment runs from its smaller end point, by (x, y). Arcs that
+      are turned around sweep the other way.
+      Segments are sorted.
+
+    '''
+    rows = []
+    for outline, dx, dy in outlines:
+        kinds = np.frombuffer(outline.kinds, dtype=np.uint8)
+        if not len(kinds):
+            continue
+        x = np.frombuffer(outline.x) + dx
+        y = np.frombuffer(outline.y) + dy
+        # Segment i starts at end point i - 1. The first segment is a MOVE.
+        rows.append(np.stack([
+            np.where(kinds == Segment.CLOSE, Segment.LINE, kinds),
+            np.roll(x, 1), np.roll(y, 1), x, y,
+            np.frombuffer(outline.radius_x), np.frombuffer(outline.radius_y),
+            np.frombuffer(outline.large_arc, dtype=np.uint8),
+            np.frombuffer(outline.sweep, dtype=np.uint8),
+        ], axis=1)[kinds != Segment.MOVE])
+    if not rows:
+        return hashlib.sha1().hexdigest()
+    segments = np.concatenate(rows)
+    kinds = segments[:, 0].astype(np.int64)
+    lengths = np.rint(segments[:, 1:7] / precision).astype(np.int64)
+    flags = segments[:, 7:].astype(np.int64)
+    start, end = lengths[:, 0:2], lengths[:, 2:4]
+    keep = (start != end).any(axis=1)
+    backwards = (end[:, 0] < start[:, 0]) | ((end[:, 0] == start[:, 0]) &
+                                             (end[:, 1] < start[:, 1]))
+    start, end = (np.where(backwards[:, np.newaxis], end, start),
+                  np.where(backwards[:, np.newaxis], start, end))
+    flags[:, 1] ^= backwards & (kinds == Segment.ARC)
+    segments = np.column_stack([kinds, start, end, lengths[:, 4:6],
+                                flags])[keep]
+    segments = segments[np.lexsort(segments.T[::-1])]
+    return hashlib.sha1(segments.tobytes()).hexdigest()
+
+
+def arc_centers(x0, y0, x1, y1, radius_x, radius_y, large_arc, sweep
+                ) -> tuple:
+    '''Convert arcs from endpoint to center parameterization.
+
+    Arguments are numpy arrays, with one entry per arc, or single values.
+    This follows the SVG implementation notes, section F.6.5, for arcs with
+    no x-axis rotation. Radii that are too small to reach the end point are
+    scaled up, as SVG renderers do. Returns (center_x, center_y, radius_x,
+    radius_y, start_angle, sweep_angle). Arcs that end where they start, or
+    have a zero radius, are centered on their start point, with their radii
+    unchanged, and sweep zero.
+
+    '''
+    radius_x = np.abs(radius_x)
+    radius_y = np.abs(radius_y)
+    # Half of the chord from the end point to the start point.
+    hx = (x0 - x1) / 2
+    hy = (y0 - y1) / 2
+    valid = ((hx != 0) | (hy != 0)) & (radius_x > 0) & (radius_y > 0)
+    rx = np.where(valid, radius_x, 1)
+    ry = np.where(valid, radius_y, 1)
+    scale = np.sqrt(np.maximum(1, (hx / rx) ** 2 + (hy / ry) ** 2))
+    rx = rx * scale
+    ry = ry * scale
+
+    rx2 = rx * rx
+    ry2 = ry * ry
+    numerator = rx2 * ry2 - rx2 * hy * hy - ry2 * hx * hx
+    denominator = np.where(valid, rx2 * hy * hy + ry2 * hx * hx, 1)
+    coefficient = np.sqrt(np.maximum(0, numerator / denominator))
+    coefficient = np.where(large_arc == sweep, -coefficient, coefficient)
+    # Center, relative to the chord's midpoint.
+    cx = coefficient * rx * hy / ry
+    cy = -coefficient * ry * hx / rx
+
+    start_angle = np.arctan2((hy - cy) / ry, (hx - cx) / rx)
+    sweep_angle = np.arctan2((-hy - cy) / ry, (-hx - cx) / rx) - start_angle
+    sweep_angle = np.where((sweep != 0) & (sweep_angle < 0),
+                           sweep_angle + 2 * math.pi, sweep_angle)
+    sweep_angle = np.where((sweep == 0) & (sweep_angle > 0),
+                           sweep_angle - 2 * math.pi, sweep_angle)
+
+    return (np.where(valid, cx + (x0 + x1) / 2, x0),
+            np.where(valid, cy + (y0 + y1) / 2, y0),
+            np.where(valid, rx, radius_x), np.where(valid, ry, radius_y),
+            np.where(valid, start_angle, 0), np.where(valid, sweep_angle, 0))
+
+
+def center_parameters(outline: Outline, i: int) -> EllipticalArc:
+    '''Convert arc segment i from endpoint to center parameterization.
+
+    See arc_centers().
+
+    '''
+    center_x, center_y, radius_x, radius_y, start_angle, sweep_angle = (
+        float(value) for value in arc_centers(
+            outline.x[i - 1], outline.y[i - 1], outline.x[i], outline.y[i],
+            outline.radius_x[i], outline.radius_y[i], outline.large_arc[i],
+            outline.sweep[i]))
+    return EllipticalArc(point.Point(center_x, center_y), radius_x, radius_y,
+                         start_angle, sweep_angle)
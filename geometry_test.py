@@ -0,0 +1,89 @@
+import unittest
+
+from common import path
+from common import point
+
+import geometry
+
+
+def make_outline():
+    # A closed 'D' shape: a line up the y-axis, then an arc back down.
+    outline = geometry.Outline()
+    outline.move(point.Point(0, 1))
+    outline.line(point.Point(0, -1))
+    outline.arc(1, 1, path.Size.SMALL, path.Winding.CW, point.Point(0, 1))
+    outline.close()
+    return outline
+
+
+class TestOutline(unittest.TestCase):
+    def test_builder(self):
+        outline = make_outline()
+        self.assertEqual(len(outline), 4)
+        self.assertEqual(list(outline.kinds),
+                         [geometry.Segment.MOVE, geometry.Segment.LINE,
+                          geometry.Segment.ARC, geometry.Segment.CLOSE])
+        self.assertEqual(list(outline.sweep), [0, 0, 1, 0])
+        self.assertEqual((outline.x[3], outline.y[3]), (0, 1))
+
+    def test_translate(self):
+        outline = geometry.translate(make_outline(), 2, 3)
+        self.assertEqual(list(outline.x), [2, 2, 2, 2])
+        self.assertEqual(list(outline.y), [4, 2, 4, 4])
+        self.assertEqual(list(outline.radius_x), [0, 0, 1, 0])
+
+    def test_mirror(self):
+        outline = geometry.mirror(geometry.translate(make_outline(), 1, 0))
+        self.assertEqual(list(outline.x), [-1, -1, -1, -1])
+        self.assertEqual(list(outline.sweep), [0, 0, 0, 0])
+
+    def test_digest(self):
+        outline = make_outline()
+        self.assertEqual(geometry.digest(outline),
+                         geometry.digest(make_outline()))
+        self.assertNotEqual(geometry.digest(outline),
+                            geometry.digest(geometry.translate(outline, 1, 0)))
+        self.assertNotEqual(geometry.digest(outline, .1),
+                            geometry.digest(outline, .2))
+
+    def test_canonical_digest(self):
+        outline = make_outline()
+        expected = geometry.canonical_digest([(outline, 0, 0)])
+        # Backwards, and starting the subpath at the arc.
+        same = geometry.Outline()
+        same.move(point.Point(0, -1))
+        same.line(point.Point(0, 1))
+        same.arc(1, 1, path.Size.SMALL, path.Winding.CCW, point.Point(0, -1))
+        for outlines in ([(geometry.reverse(outline), 0, 0)],
+                         [(same, 0, 0)],
+                         [(geometry.translate(outline, 2, 0), -2, 0)],
+                         [(geometry.translate(outline, 0, 1e-9), 0, 0)]):
+            self.assertEqual(geometry.canonical_digest(outlines), expected)
+        for outlines in ([(outline, 0, 1e-3)],
+                         [(geometry.mirror(outline), 0, 0)],
+                         [(outline, 0, 0), (outline, 3, 0)]):
+            self.assertNotEqual(geometry.canonical_digest(outlines),
+                                expected)
+        # The order of outlines does not matter.
+        self.assertEqual(
+            geometry.canonical_digest([(outline, 0, 0), (same, 3, 0)]),
+            geometry.canonical_digest([(outline, 3, 0), (same, 0, 0)]))
+
+    def test_reverse(self):
+        outline = geometry.reverse(make_outline())
+        self.assertEqual(list(outline.kinds),
+                         [geometry.Segment.MOVE, geometry.Segment.ARC,
+                          geometry.Segment.LINE, geometry.Segment.CLOSE])
+        self.assertEqual(list(outline.y), [1, -1, 1, 1])
+        self.assertEqual(list(outline.sweep), [0, 0, 0, 0])
+
+        # Reversing twice restores the original geometry.
+        original = make_outline()
+        outline = geometry.reverse(outline)
+        for name in ['kinds', 'x', 'y', 'radius_x', 'radius_y', 'large_arc',
+                     'sweep']:
+            self.assertEqual(getattr(outline, name), getattr(original, name))
+
+
+if __name__ == '__main__':
+    unittest.main()
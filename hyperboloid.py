@@ -10,16 +10,17 @@ Generates sliceform templates for a hyperboloid of one sheet.
 # https://www.youtube.com/watch?v=QfBc0fR64EQ
 
 import math
+import typing
 
-import inkex
-from inkex import elements
-from inkex import transforms
+import numpy as np
 
 from common import defaults
-from common import path
 from common import point
 
 import calculations
+import cost
+import generator
+import geometry
 import hyperboloid_calculations
 import render
 
@@ -32,12 +33,22 @@ def near(x, y):
     return abs(x - y) < epsilon
 
 
-class SliceformHyperboloidGenerator(inkex.extensions.GenerateExtension):
-    def add_arguments(self, pars):
-        pars.add_argument('--tab', type=str, dest='tab')
-        pars.add_argument('--units', type=str,
-                          dest='units', default='mm',
-                          help='Units')
+def past(cut_start: point.Point, cut_end: point.Point,
+         corner: point.Point) -> typing.Callable[[point.Point], float]:
+    '''Return a point's signed distance from a cut, away from corner.'''
+    dx = cut_end.x - cut_start.x
+    dy = cut_end.y - cut_start.y
+    scale = math.hypot(dx, dy)
+    if dx * (corner.y - cut_start.y) - dy * (corner.x - cut_start.x) > 0:
+        scale = -scale
+    return lambda p: (dx * (p.y - cut_start.y) -
+                      dy * (p.x - cut_start.x)) / scale
+
+
+class SliceformHyperboloidGenerator(generator.SliceformGenerator):
+    fit_model = 'hyperboloid'
+
+    def add_model_arguments(self, pars):
         pars.add_argument('--outer_edge_radius', type=float,
                           dest='outer_edge_radius', default='60',
                           help='Outer edge radius')
@@ -53,21 +64,11 @@ class SliceformHyperboloidGenerator(inkex.extensions.GenerateExtension):
         pars.add_argument('--num_slices', type=int,
                           dest='num_slices', default='18',
                           help='Number of slices')
-        pars.add_argument('--material_thickness', type=float,
-                          dest='material_thickness', default='.25',
-                          help='Thickness of material')
-        pars.add_argument('--material_width', type=float,
-                          dest='material_width', default='203',
-                          help='Width of material')
-
-    def to_uu(self, n: float):
-        '''Convert from self.units to user units.'''
-        return self.svg.unittouu(str(n) + self.units)
 
     def render_slice(
             self, angles, slice_width, slice_height, fill_color,
             outer_inner: hyperboloid_calculations.OuterInner
-    ) -> elements.PathElement:
+    ) -> render.Template:
         '''Draw a rectangular slice with slice_width and slice_height.
 
                                         (outer_waist_radius, half_slice_height)
@@ -124,173 +125,176 @@ class SliceformHyperboloidGenerator(inkex.extensions.GenerateExtension):
 
         # NOTE: The names 'top' and 'bottom' refer to display coordinates,
         # where the positive Y-axis points downward.
-        if forward_intersections[0].outer[0] is None:
-            # The first and last intersections clip the bottom left and top
-            # left corners: one slot wall intersects the slice, but the other
-            # does not.
-            assert forward_intersections[0].middle[0] is None
-            assert forward_intersections[0].inner[0] is None
-            assert forward_intersections[0].outer[1] is not None
-            assert forward_intersections[0].middle[1] is not None
-            assert forward_intersections[0].inner[1] is not None
-
-            assert forward_intersections[-1].outer[0] is not None
-            assert forward_intersections[-1].middle[0] is not None
-            assert forward_intersections[-1].inner[0] is not None
-            assert forward_intersections[-1].outer[1] is None
-            assert forward_intersections[-1].middle[1] is None
-            assert forward_intersections[-1].inner[1] is None
-
-            bottom_left = forward_intersections[0].outer[1]
-            top_left = forward_intersections[-1].outer[0]
-            inner_edge_corners = [forward_intersections[-1].inner[0],
-                                  forward_intersections[0].inner[1]]
-
-            # Remove first and last intersections, they are handled separately.
-            forward_intersections = forward_intersections[1:][:-1]
-        else:
-            bottom_left = point.Point(self.inner_radius, half_slice_height)
-            top_left = point.Point(self.inner_radius, -half_slice_height)
-            inner_edge_corners = None
+        #
+        # The first and last slots can clip the bottom left and top left
+        # corners: one slot wall intersects the slice, but the other does
+        # not. The corner is inside the slot, so it is cut off along the
+        # other wall, on outer and inner slices alike. With many slices,
+        # several slots clip each corner, and the last one cuts it off.
+        bottom_cuts = next((i for i, intersection in
+                            enumerate(forward_intersections)
+                            if intersection.outer[0] is not None),
+                           len(forward_intersections))
+        top_cuts = next((i for i, intersection in
+                         enumerate(reversed(forward_intersections))
+                         if intersection.outer[1] is not None),
+                        len(forward_intersections))
+        bottom_left = point.Point(self.inner_radius, half_slice_height)
+        top_left = point.Point(self.inner_radius, -half_slice_height)
+        # Where the cuts meet the left edge, and each cut's past() function.
+        inner_bottom_left = inner_top_left = None
+        cuts = []
+        if bottom_cuts:
+            cut = forward_intersections[bottom_cuts - 1]
+            cuts.append(past(cut.inner[1], cut.outer[1], bottom_left))
+            bottom_left = cut.outer[1]
+            inner_bottom_left = cut.inner[1]
+        if top_cuts:
+            cut = forward_intersections[-top_cuts]
+            cuts.append(past(cut.inner[0], cut.outer[0], top_left))
+            top_left = cut.outer[0]
+            inner_top_left = cut.inner[0]
+        forward_intersections = forward_intersections[
+            bottom_cuts:len(forward_intersections) - top_cuts]
+
+        def notches(outer_inner, intersections):
+            '''Merge slots into notches, and clip them to the cuts.
+
+            Notches that overlap a cut end on it, instead of crossing it.
 
-        # Start at the bottom left corner.
-        commands = path.move_abs(bottom_left)
+            '''
+            notches = render.merge_slots([
+                render.slot_corners(intersection, outer_inner)
+                for intersection in intersections])
+            for cut in cuts:
+                notches = [notch for notch in (render.clip_notch(notch, cut)
+                                               for notch in notches)
+                           if notch is not None]
+            return notches
+
+        def on_cut(p):
+            return any(near(cut(p), 0) for cut in cuts)
+
+        outline = geometry.Outline()
+        slots = []
+
+        def draw(points):
+            '''Draw lines to points, except to the current point.'''
+            for p in points:
+                if p != outline.end_point(len(outline) - 1):
+                    outline.line(p)
 
-        # Draw the outer (bottom, right, top) edges.
         bottom_right = point.Point(self.inner_radius + slice_width,
                                    half_slice_height)
         top_right = point.Point(self.inner_radius + slice_width,
                                 -half_slice_height)
 
         if outer_inner == hyperboloid_calculations.OuterInner.OUTER:
-            # Draw the bottom edge.
-            omit_bottom_right = False
-            for intersection in forward_intersections:
-                if not near(intersection.outer[0].y, half_slice_height):
-                    # No more bottom edge intersections.
-                    break
-                commands += path.line_abs(intersection.outer[0])
-                commands += path.line_abs(intersection.middle[0])
-                commands += path.line_abs(intersection.middle[1])
-                commands += path.line_abs(intersection.outer[1])
-
-                if not near(intersection.outer[1].y, half_slice_height):
-                    # The slot intersected the bottom_right corner, so don't
-                    # draw the bottom_right corner.
-                    omit_bottom_right = True
-                    break
-
-            if not omit_bottom_right:
-                commands += path.line_abs(bottom_right)
-
-            # Draw the right edge.
-            found_right_edge = False
-            omit_top_right = False
-            for intersection in forward_intersections:
-                if not found_right_edge:
-                    if not near(intersection.outer[0].x,
-                                self.inner_radius + slice_width):
-                        continue
-                    else:
-                        found_right_edge = True
-
-                if not near(intersection.outer[0].x,
-                            self.inner_radius + slice_width):
-                    # No more right edge intersections.
-                    break
-                commands += path.line_abs(intersection.outer[0])
-                commands += path.line_abs(intersection.middle[0])
-                commands += path.line_abs(intersection.middle[1])
-                commands += path.line_abs(intersection.outer[1])
-
-                if not near(intersection.outer[1].x,
-                            self.inner_radius + slice_width):
-                    # The slot intersected the top_right corner, so don't
-                    # draw the top_right corner.
-                    omit_top_right = True
-                    break
-
-            if not omit_top_right:
-                commands += path.line_abs(top_right)
-
-            # Draw the top edge.
-            found_top_edge = False
-            for intersection in forward_intersections:
-                if not found_top_edge:
-                    if not near(intersection.outer[0].y, -half_slice_height):
-                        continue
-                    else:
-                        found_top_edge = True
-
-                commands += path.line_abs(intersection.outer[0])
-                commands += path.line_abs(intersection.middle[0])
-                commands += path.line_abs(intersection.middle[1])
-                commands += path.line_abs(intersection.outer[1])
-
-            # Draw the top_left corner.
-            commands += path.line_abs(top_left)
+            # Draw the bottom, right and top edges. Slots that overlap or
+            # touch are merged into one notch, even across a corner, and
+            # corners inside a notch are not drawn.
+            right = self.inner_radius + slice_width
+
+            def position(p):
+                '''Return how far along the outer edges p is.'''
+                if near(p.y, half_slice_height):
+                    return p.x
+                if near(p.x, right):
+                    return right + half_slice_height - p.y
+                if near(p.y, -half_slice_height):
+                    return 2 * right + 2 * half_slice_height - p.x
+                # p is on a cut, before the bottom edge, or after the top.
+                return -math.inf if p.y > 0 else math.inf
+
+            edge_notches = notches(hyperboloid_calculations.OuterInner.OUTER,
+                                   forward_intersections)
+            if edge_notches and on_cut(edge_notches[0][0]):
+                bottom_left = edge_notches[0][0]
+            if edge_notches and on_cut(edge_notches[-1][-1]):
+                top_left = edge_notches[-1][-1]
+
+            # Start at the bottom left corner.
+            outline.move(bottom_left)
+            drawn = position(bottom_left)
+            for notch in edge_notches + [[top_left]]:
+                draw([corner for corner in (bottom_right, top_right)
+                      if drawn < position(corner) < position(notch[0])])
+                draw(notch)
+                drawn = position(notch[-1])
+            slots += edge_notches
 
         else:
+            # Start at the bottom left corner.
+            outline.move(bottom_left)
+
             # Draw the bottom edge.
-            commands += path.line_abs(bottom_right)
+            outline.line(bottom_right)
 
             # Draw the right edge.
-            commands += path.line_abs(top_right)
+            outline.line(top_right)
 
             # Draw the top edge.
-            commands += path.line_abs(top_left)
+            outline.line(top_left)
 
         # Draw the left edge.
-        if inner_edge_corners is not None:
-            commands += path.line_abs(inner_edge_corners[0])
-
-        reversed_intersections = render.reverse_intersections(
-            forward_intersections)
+        edge_notches = []
         if outer_inner == hyperboloid_calculations.OuterInner.INNER:
-            for intersection in reversed_intersections:
-                commands += path.line_abs(intersection.inner[0])
-                commands += path.line_abs(intersection.middle[0])
-                commands += path.line_abs(intersection.middle[1])
-                commands += path.line_abs(intersection.inner[1])
-
-        if inner_edge_corners is not None:
-            commands += path.line_abs(inner_edge_corners[1])
-
-        commands += path.line_abs(bottom_left)
-        commands += 'Z'
-
-        element = elements.PathElement()
-        element.style = inkex.styles.Style(style={
-            'stroke-width': self.stroke_width,
-            'stroke': defaults.defaults['cut_color'],
-            'fill': fill_color})
-        element.set_path(commands)
-        return element
-
-    def generate(self):
-        self.stroke_width = str(self.svg.unittouu(
-            defaults.defaults['stroke_width']))
-        self.units = self.options.units
+            edge_notches = notches(
+                hyperboloid_calculations.OuterInner.INNER,
+                render.reverse_intersections(forward_intersections))
+            if edge_notches and on_cut(edge_notches[0][0]):
+                inner_top_left = edge_notches[0][0]
+            if edge_notches and on_cut(edge_notches[-1][-1]):
+                inner_bottom_left = edge_notches[-1][-1]
+        if inner_top_left is not None:
+            outline.line(inner_top_left)
+        for notch in edge_notches:
+            draw(notch)
+        slots += edge_notches
+        if inner_bottom_left is not None:
+            draw([inner_bottom_left])
+
+        outline.line(bottom_left)
+        outline.close()
+        return render.Template(outline=outline, slots=slots,
+                               fill_color=fill_color, position=None)
+
+    def render_marks(
+            self, angles, slice_width, slice_height, fill_color,
+            outer_inner: hyperboloid_calculations.OuterInner
+    ) -> render.Template:
+        '''Draw a slice for the 'marks' preview, see render.slot_marks().
+
+        The edges are render_slice()'s, without slots, and the marks follow
+        each slot angle's center line.
 
+        '''
+        template = self.render_slice([], slice_width, slice_height,
+                                     fill_color, outer_inner)
+        half_slice_height = slice_height / 2
+        slope = np.tan(np.asarray(angles, dtype=float))
+        # Center lines leave through the right edge, or through the top or
+        # bottom edge if they are steeper than the corners.
+        with np.errstate(divide='ignore'):
+            outer_x = np.minimum(self.outer_waist_radius,
+                                 half_slice_height / np.abs(slope))
+        outer = np.stack([outer_x, slope * outer_x], axis=1)
+        inner = np.stack([np.full(len(slope), self.inner_radius),
+                          slope * self.inner_radius], axis=1)
+        # Slots that miss the left edge only cut off the slice's corners.
+        inner[np.abs(inner[:, 1]) > half_slice_height] = np.nan
+        return template._replace(outline=render.slot_marks(
+            template.outline, *render.center_marks(outer, inner, outer_inner)))
+
+    def read_options(self):
+        '''Read the model's options, and find its slot angles and rows.'''
         self.outer_edge_radius = self.to_uu(self.options.outer_edge_radius)
         self.outer_waist_radius = self.to_uu(self.options.outer_waist_radius)
         self.inner_radius = self.to_uu(self.options.inner_radius)
         self.height = self.to_uu(self.options.height)
         self.num_slices = self.options.num_slices
-        self.material_thickness = self.to_uu(self.options.material_thickness)
-        self.material_width = self.to_uu(self.options.material_width)
-
-        # Spacing between templates.
-        self.template_spacing = self.svg.unittouu(
-            defaults.defaults['template_spacing'])
-
-        assert self.num_slices > 0, \
-            'Error: num_slices must be greater than zero'
 
-        assert self.outer_edge_radius > self.outer_waist_radius, \
-            'Error: Outer edge radius must be larger than outer waist radius'
-        assert self.outer_waist_radius > self.inner_radius, \
-            'Error: Outer waist radius must be larger than inner radius'
+        self.check_feasible('hyperboloid')
 
         self.loxodromic_angle = hyperboloid_calculations.loxodromic_angle(
             self.height, self.outer_edge_radius, self.outer_waist_radius)
@@ -298,10 +302,10 @@ class SliceformHyperboloidGenerator(inkex.extensions.GenerateExtension):
         self.slot_width = calculations.slot_width(self.material_thickness,
                                                   self.loxodromic_angle * 2)
 
-        angles = calculations.slot_angles(self.num_slices,
-                                          self.loxodromic_angle)
+        self.angles = calculations.slot_angles(self.num_slices,
+                                               self.loxodromic_angle)
 
-        slice_width = self.outer_waist_radius - self.inner_radius
+        self.slice_width = self.outer_waist_radius - self.inner_radius
 
         # Calculate the diagonal distance from the hyperboloid's center to
         # outer_edge_radius. This makes a right triangle with sides
@@ -315,15 +319,27 @@ class SliceformHyperboloidGenerator(inkex.extensions.GenerateExtension):
         # diagonal_edge_radius² = outer_waist_radius² + half_slice_height²
         half_slice_height = math.sqrt(diagonal_edge_radius ** 2 -
                                       self.outer_waist_radius ** 2)
-        slice_height = 2 * half_slice_height
+        self.slice_height = 2 * half_slice_height
 
         # Lay out templates in rows, with self.material_width as the maximum
         # row width.
-        templates_per_row = math.floor(self.material_width /
-                                       (slice_width + self.template_spacing))
-        num_rows = math.ceil(self.num_slices / templates_per_row)
-
-        def generate_templates(
+        self.templates_per_row = math.floor(
+            self.material_width / (self.slice_width + self.template_spacing))
+        self.num_rows = math.ceil(self.num_slices / self.templates_per_row)
+
+    def template_counts(self):
+        self.read_options()
+        # Each set of slices shares one outline.
+        return [cost.Counts(
+            templates=2 * self.num_slices, outlines=2,
+            slots=self.num_slices - 1,
+            first_row=min(self.templates_per_row, self.num_slices),
+            cavities=False)]
+
+    def generate_templates(self):
+        self.read_options()
+
+        def layout_templates(
                 top_left,
                 outer_inner: hyperboloid_calculations.OuterInner):
             '''Render rows of slices starting at top_left.
@@ -334,36 +350,39 @@ class SliceformHyperboloidGenerator(inkex.extensions.GenerateExtension):
             Returns the point where the top left corner of the next slice
             should be rendered.
             '''
+            # All slices in a set are identical, so they share one template.
+            render_slice = self.render_slice
+            if self.options.fidelity == 'marks':
+                render_slice = self.render_marks
+            template = render_slice(
+                self.angles, self.slice_width, self.slice_height,
+                defaults.defaults['fill_colors'][outer_inner], outer_inner)
             templates_generated = 0
             while templates_generated < self.num_slices:
                 top_left.x = 0
-                num_templates = min(templates_per_row,
+                num_templates = min(self.templates_per_row,
                                     self.num_slices - templates_generated)
                 templates_generated += num_templates
-                for _ in range(num_templates):
-                    element = self.render_slice(
-                        angles, slice_width, slice_height,
-                        defaults.defaults['fill_colors'][outer_inner],
-                        outer_inner)
-
-                    translate = transforms.Transform()
-                    translate.add_translate(top_left.x, top_left.y)
-                    element.transform = translate
-                    yield element
+                for slice_num in range(templates_generated - num_templates,
+                                       templates_generated):
+                    yield template._replace(
+                        position=point.Point(top_left.x, top_left.y),
+                        label=slice_num)
 
-                    top_left.x += slice_width + self.template_spacing
-                top_left.y += slice_height + self.template_spacing
+                    top_left.x += self.slice_width + self.template_spacing
+                top_left.y += self.slice_height + self.template_spacing
 
         # Generate two sets of slice templates. The first set has slots on the
         # outer edge, and the second set has slots on the inner edge.
         top_left = point.Point(0, 0)
-        yield from generate_templates(
+        yield from layout_templates(
             top_left, hyperboloid_calculations.OuterInner.OUTER)
         top_left = point.Point(
             0,
-            num_rows * (slice_height + self.template_spacing))
-        yield from generate_templates(
+            self.num_rows * (self.slice_height + self.template_spacing))
+        yield from layout_templates(
             top_left, hyperboloid_calculations.OuterInner.INNER)
 
 
-SliceformHyperboloidGenerator().run()
+if __name__ == '__main__':
+    SliceformHyperboloidGenerator().run()
@@ -4,6 +4,8 @@ import sys
 
 from common import point
 
+import solve
+
 
 def loxodromic_angle(height: float, outer_edge_radius: float,
                      outer_waist_radius: float) -> float:
@@ -209,43 +211,17 @@ def main():
         help()
 
     corner_angle = 360 / divisor
-    outer_edge_radius = (outer_waist_radius /
-                         math.sin(math.radians(corner_angle / 2)))
+    outer_edge_radius = solve.solve(
+        'hyperboloid', 'corner_angle', math.radians(corner_angle),
+        {'outer_waist_radius': outer_waist_radius},
+        'outer_edge_radius')['outer_edge_radius']
     print(f'outer edge radius: {outer_edge_radius:.2f} mm')
     print(f'outer waist radius: {outer_waist_radius} mm')
 
     # Find the number of slices with slice_width closest to target_slice_width.
     target_slice_width = 10
-    multiplier = 2
-    best_slice_width = 0
-    best_num_slices = 0
-    while True:
-        num_slices = divisor * multiplier
-
-        # Calculate distance between corners.
-        #
-        # There are num_slices corners, so the angle between corners is 2pi /
-        # num_slices.
-        angle_between_corners = 2 * math.pi / num_slices
-
-        # sin(angle_between_corners / 2) =
-        # corner_distance / 2 / outer_edge_radius
-        corner_distance = (math.sin(angle_between_corners / 2) *
-                           outer_edge_radius * 2)
-
-        # sin(pi/2 - angle_between_corners / 2) =
-        # slice_width / (corner_distance / 2)
-        slice_width = (math.sin(math.pi / 2 - angle_between_corners / 2) *
-                       (corner_distance / 2))
-
-        current_error = abs(target_slice_width - slice_width)
-        min_error = abs(target_slice_width - best_slice_width)
-        if best_slice_width > 0 and current_error > min_error:
-            break
-        else:
-            best_slice_width = slice_width
-            best_num_slices = num_slices
-            multiplier += 1
+    best_num_slices, best_slice_width = solve.hyperboloid_num_slices(
+        outer_edge_radius, divisor, target_slice_width)
 
     print(f'inner radius: {(outer_waist_radius - best_slice_width):.2f} mm')
     print(f'height: {1.25 * outer_edge_radius:.2f} mm')
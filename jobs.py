@@ -0,0 +1,152 @@
+'''Run generator jobs in the background, with progress and cancellation.
+
+Large jobs take long enough that callers should not wait on them. A JobQueue
+runs jobs on a shared pool of worker threads, and each Job reports progress
+as its templates are generated, and then written:
+
+  async def main():
+      queue = jobs.JobQueue(workers=2)
+      job = queue.submit({'model': 'cylinder', 'num_slices': 1000,
+                          'slice_shape': 'ring'}, channel='session 1')
+      async for progress in job.progress():
+          print(progress.phase, progress.templates)
+      result = await job.result()
+
+Requests are the same JSON objects that service.py accepts, checked the same
+way, and results are service.Result objects. Submitting a job on a channel
+cancels the channel's previous job, so a job for parameters that the user has
+since changed stops as soon as its worker notices: after its next template.
+A cancelled job's progress ends, and its result() raises, once its worker has
+stopped, and so has given its thread back to the pool.
+
+'''
+
+import asyncio
+import collections
+import concurrent.futures
+import threading
+
+import generator
+import service
+
+# phase: 'generating' while the generator yields templates, then 'writing'
+#        while it writes their path elements.
+# templates: Number of templates generated, or written, so far.
+Progress = collections.namedtuple('Progress', ['phase', 'templates'])
+
+
+class Cancelled(Exception):
+    '''Raised in a worker, to stop a cancelled job's generator.'''
+    pass
+
+
+class Job:
+    def __init__(self, model: generator.SliceformGenerator, output: str):
+        self.model = model
+        self.output = output
+        self.cancelled = threading.Event()
+        self.updates = asyncio.Queue()
+        # The worker's future, set by JobQueue.submit().
+        self.future = None
+
+    def cancel(self):
+        '''Stop the job, after its current template.'''
+        self.cancelled.set()
+
+    async def progress(self):
+        '''Yield Progress updates, until the job is done.'''
+        while True:
+            update = await self.updates.get()
+            if update is None:
+                return
+            yield update
+
+    async def result(self) -> service.Result:
+        '''Wait for the job, and return its result.
+
+        Raises asyncio.CancelledError if the job was cancelled.
+
+        '''
+        try:
+            return await self.future
+        except Cancelled:
+            raise asyncio.CancelledError()
+
+    def run(self, report) -> service.Result:
+        '''Run the job, in a worker thread.
+
+        report is called with each Progress update, and then with None,
+        when the worker stops. Raises Cancelled, from the generator's
+        on_template() callback, once the job is cancelled, or before it
+        starts if it was cancelled while queued.
+
+        '''
+        def on_update(phase, templates):
+            if self.cancelled.is_set():
+                raise Cancelled()
+            report(Progress(phase, templates))
+
+        try:
+            if self.cancelled.is_set():
+                raise Cancelled()
+            warnings = []
+            self.model.warn = warnings.append
+            self.model.on_template = lambda count: on_update('generating',
+                                                             count)
+            elements = []
+            for element in self.model.generate():
+                elements.append(element)
+                on_update('writing', len(elements))
+            return service.result(self.model, elements, self.output,
+                                  warnings)
+        finally:
+            report(None)
+
+
+class JobQueue:
+    '''Jobs that share a pool of worker threads.'''
+    def __init__(self, workers: int = 2):
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self.running = set()
+        # The latest job on each channel.
+        self.channels = {}
+
+    def submit(self, parameters: dict, channel: str = None) -> Job:
+        '''Start a job, and return it.
+
+        Must be called from the event loop. Invalid parameters raise
+        AssertionError here, before the job is queued.
+
+        '''
+        loop = asyncio.get_running_loop()
+        service.check_request(parameters)
+        job = Job(service.model_generator(parameters),
+                  service.output_format(parameters))
+        if channel is not None:
+            previous = self.channels.get(channel)
+            if previous is not None:
+                previous.cancel()
+            self.channels[channel] = job
+
+        def report(progress):
+            loop.call_soon_threadsafe(job.updates.put_nowait, progress)
+
+        def done(future):
+            # Only jobs that the executor dropped, at shutdown, before they
+            # started, are done without their worker ending their updates.
+            if future.cancelled():
+                job.updates.put_nowait(None)
+            self.running.discard(job)
+            if channel is not None and self.channels.get(channel) is job:
+                del self.channels[channel]
+
+        job.future = loop.run_in_executor(self.executor, job.run, report)
+        job.future.add_done_callback(done)
+        self.running.add(job)
+        return job
+
+    def shutdown(self):
+        '''Cancel all jobs, and stop the workers.'''
+        for job in list(self.running):
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import jobs
+
+
+async def run(job):
+    updates = [update async for update in job.progress()]
+    return updates, await job.result()
+
+
+class TestJobs(unittest.TestCase):
+    def setUp(self):
+        self.queue = jobs.JobQueue(workers=1)
+        self.addCleanup(self.queue.shutdown)
+
+    def test_progress(self):
+        async def main():
+            job = self.queue.submit({'model': 'torus', 'num_slices': 6})
+            return await run(job)
+        updates, result = asyncio.run(main())
+        generating = [u.templates for u in updates if u.phase == 'generating']
+        self.assertEqual(generating, list(range(1, 13)))
+        self.assertEqual(updates[-1].phase, 'writing')
+        self.assertIn(b'<svg', result.body)
+
+    def test_preview_progress(self):
+        # Previews report their templates too.
+        async def main():
+            job = self.queue.submit({'model': 'torus', 'num_slices': 6,
+                                     'fidelity': 'marks'})
+            return await run(job)
+        updates, _ = asyncio.run(main())
+        self.assertIn(jobs.Progress('generating', 12), updates)
+
+    def test_cancel(self):
+        async def main():
+            first = self.queue.submit({'model': 'cylinder',
+                                       'num_slices': 400}, channel='user')
+            second = self.queue.submit({'model': 'torus', 'num_slices': 6},
+                                       channel='user')
+            self.assertTrue(first.cancelled.is_set())
+            with self.assertRaises(asyncio.CancelledError):
+                await first.result()
+            result = await second.result()
+            # Let the done callbacks run.
+            await asyncio.sleep(0)
+            return result
+        result = asyncio.run(main())
+        self.assertIn(b'<svg', result.body)
+        self.assertEqual(self.queue.channels, {})
+
+    def test_cancel_waits_for_worker(self):
+        # A cancelled job's updates end only once its worker has stopped
+        # generating, not as soon as it is cancelled.
+        stopped = threading.Event()
+
+        class Stopped(jobs.Cancelled):
+            def __init__(self):
+                stopped.set()
+
+        async def main():
+            job = self.queue.submit({'model': 'cylinder', 'num_slices': 400})
+            updates = job.progress()
+            await updates.__anext__()
+            job.cancel()
+            async for _ in updates:
+                pass
+            self.assertTrue(stopped.is_set())
+            with self.assertRaises(asyncio.CancelledError):
+                await job.result()
+            # Let the done callback run.
+            await asyncio.sleep(0)
+            self.assertNotIn(job, self.queue.running)
+        with mock.patch.object(jobs, 'Cancelled', Stopped):
+            asyncio.run(main())
+
+    def test_rejected(self):
+        async def main():
+            self.queue.submit({'model': 'torus', 'metrics_file': 'out.json'})
+        with self.assertRaisesRegex(AssertionError,
+                                    'Unknown parameter metrics_file'):
+            asyncio.run(main())
+        self.assertEqual(self.queue.running, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,291 @@
+'''Compensate for the cutter's kerf by offsetting outlines analytically.
+
+A cutter removes a strip of material, kerf wide, centered on the path it
+follows. Offsetting each outline away from its material by half the kerf makes
+the cut parts match the drawn templates: edges grow outwards, holes shrink,
+slot walls move in by half the kerf each, and slot bottoms move towards the
+slot's opening.
+
+Each segment is offset as a curve, not flattened:
+
+   line: Moved along its normal. Exact.
+    arc: Same center, with both radii changed by the offset. Exact for
+         circles. For ellipses, the true offset curve is not an ellipse, and
+         this differs from it by much less than the offset.
+
+Neighbouring offset segments are then intersected, in closed form for lines,
+and by Newton's method from the original corner for two arcs. Segments that
+continue each other smoothly, like two arcs of the same ellipse on either side
+of a skipped slot, meet at the corner moved along its normal. Short segments
+can run backwards once offset, where their neighbours' offsets meet past
+them, so they are dropped, and their neighbours intersected instead. If those
+are parallel, the kerf is wider than the gap between them, so it cannot be
+cut.
+
+'''
+
+import math
+
+from common import point
+
+import flatten
+import geometry
+import metrics
+
+# Offset primitives. Lines are (LINE, point, unit direction), and arcs are
+# (ARC, center, radius_x, radius_y).
+LINE = geometry.Segment.LINE
+ARC = geometry.Segment.ARC
+
+epsilon = 1e-9
+
+
+def subpath_sides(outline: geometry.Outline) -> list[int]:
+    '''Return, for each subpath, which side of the path its material is on.
+
+    1 means the material is on the right of the drawing direction, in the
+    same sense as the normal (dy, -dx), and -1 means it is on the left.
+    Holes are found by the evenodd fill rule, as in metrics.measure_outline().
+
+    '''
+    xs, ys = outline.x, outline.y
+    size = max(max(xs) - min(xs), max(ys) - min(ys)) if len(outline) else 1
+    flat = flatten.flatten(outline, size * 1e-3)
+    polygons = []
+    for i, kind in enumerate(flat.kinds):
+        if kind == geometry.Segment.MOVE:
+            polygons.append([])
+        if kind != geometry.Segment.CLOSE:
+            polygons[-1].append((flat.x[i], flat.y[i]))
+    sides = []
+    for i, polygon in enumerate(polygons):
+        area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in
+                   zip(polygon, polygon[1:] + polygon[:1]))
+        x, y = polygon[0]
+        depth = sum(metrics.contains(other, x, y)
+                    for j, other in enumerate(polygons) if j != i)
+        # Positive area has the inside on the left of the normal (dy, -dx).
+        inside = -1 if area > 0 else 1
+        sides.append(inside if depth % 2 == 0 else -inside)
+    return sides
+
+
+def tangent(outline: geometry.Outline, i: int, at_end: bool) -> tuple:
+    '''Return segment i's unit drawing direction, at its start or end.'''
+    if outline.kinds[i] == ARC:
+        arc = geometry.center_parameters(outline, i)
+        if arc.sweep_angle != 0:
+            t = arc.start_angle + (arc.sweep_angle if at_end else 0)
+            sign = 1 if arc.sweep_angle > 0 else -1
+            dx = -arc.radius_x * math.sin(t) * sign
+            dy = arc.radius_y * math.cos(t) * sign
+            length = math.hypot(dx, dy)
+            return dx / length, dy / length
+    dx = outline.x[i] - outline.x[i - 1]
+    dy = outline.y[i] - outline.y[i - 1]
+    length = math.hypot(dx, dy)
+    return dx / length, dy / length
+
+
+def offset_segment(outline: geometry.Outline, i: int, distance: float,
+                   side: int) -> tuple:
+    '''Return segment i's offset primitive.
+
+    Positive distances move the segment away from the material, on side.
+
+    '''
+    start = point.Point(outline.x[i - 1], outline.y[i - 1])
+    if outline.kinds[i] == ARC:
+        arc = geometry.center_parameters(outline, i)
+        if arc.sweep_angle != 0:
+            dx, dy = tangent(outline, i, False)
+            # The offset moves away from the material, which is away from the
+            # center when the material is on the center's side.
+            away = ((start.x - arc.center.x) * dy * side -
+                    (start.y - arc.center.y) * dx * side)
+            change = -distance if away > 0 else distance
+            assert (arc.radius_x + change > 0 and
+                    arc.radius_y + change > 0), \
+                'Error: Kerf is too large for an arc with radius {:g}'.format(
+                    min(arc.radius_x, arc.radius_y))
+            return (ARC, arc.center, arc.radius_x + change,
+                    arc.radius_y + change)
+    dx, dy = tangent(outline, i, False)
+    shift = -distance * side
+    return (LINE, point.Point(start.x + dy * shift, start.y - dx * shift),
+            (dx, dy))
+
+
+def same(first: tuple, second: tuple) -> bool:
+    '''Return True if two primitives are the same curve.'''
+    if first[0] != second[0]:
+        return False
+    if first[0] == ARC:
+        return (abs(first[1].x - second[1].x) < epsilon and
+                abs(first[1].y - second[1].y) < epsilon and
+                abs(first[2] - second[2]) < epsilon and
+                abs(first[3] - second[3]) < epsilon)
+    p, (dx, dy) = first[1], first[2]
+    q, (ex, ey) = second[1], second[2]
+    return (abs(dx * ey - dy * ex) < epsilon and
+            abs((q.x - p.x) * dy - (q.y - p.y) * dx) < epsilon)
+
+
+def intersect_lines(first: tuple, second: tuple) -> point.Point:
+    p, (dx, dy) = first[1], first[2]
+    q, (ex, ey) = second[1], second[2]
+    s = ((q.x - p.x) * ey - (q.y - p.y) * ex) / (dx * ey - dy * ex)
+    return point.Point(p.x + s * dx, p.y + s * dy)
+
+
+def intersect_line_arc(line: tuple, arc: tuple,
+                       near: point.Point) -> point.Point:
+    '''Return the intersection of line and arc's ellipse closest to near.'''
+    p, (dx, dy) = line[1], line[2]
+    px, py = p.x, p.y
+    center, radius_x, radius_y = arc[1], arc[2], arc[3]
+    # Points on the line are p + s * d. Substitute into the ellipse's
+    # equation, and solve a * s² + b * s + c = 0.
+    x0 = (px - center.x) / radius_x
+    y0 = (py - center.y) / radius_y
+    ux = dx / radius_x
+    uy = dy / radius_y
+    a = ux * ux + uy * uy
+    b = 2 * (x0 * ux + y0 * uy)
+    c = x0 * x0 + y0 * y0 - 1
+    root = math.sqrt(max(0, b * b - 4 * a * c))
+    candidates = [point.Point(px + s * dx, py + s * dy)
+                  for s in ((-b - root) / (2 * a), (-b + root) / (2 * a))]
+    return min(candidates,
+               key=lambda p: math.hypot(p.x - near.x, p.y - near.y))
+
+
+def intersect_arcs(first: tuple, second: tuple,
+                   near: point.Point) -> point.Point:
+    '''Return the intersection of two arcs' ellipses, by Newton's method.'''
+    x, y = near.x, near.y
+    for _ in range(50):
+        values = []
+        gradients = []
+        for _, center, radius_x, radius_y in (first, second):
+            u = (x - center.x) / radius_x
+            v = (y - center.y) / radius_y
+            values.append(u * u + v * v - 1)
+            gradients.append((2 * u / radius_x, 2 * v / radius_y))
+        (a, b), (c, d) = gradients
+        determinant = a * d - b * c
+        if determinant == 0:
+            break
+        step_x = (d * values[0] - b * values[1]) / determinant
+        step_y = (a * values[1] - c * values[0]) / determinant
+        x -= step_x
+        y -= step_y
+        if abs(step_x) + abs(step_y) < epsilon:
+            break
+    return point.Point(x, y)
+
+
+def large_arc(arc: tuple, start: point.Point, end: point.Point,
+              sweep: int) -> int:
+    '''Return the large arc flag for arc, from start to end.
+
+    Offsetting an arc that is close to half of its ellipse can move it past
+    half, or back, so the flag is found from the arc's center.
+
+    '''
+    _, center, radius_x, radius_y = arc
+    start_angle = math.atan2((start.y - center.y) / radius_y,
+                             (start.x - center.x) / radius_x)
+    end_angle = math.atan2((end.y - center.y) / radius_y,
+                           (end.x - center.x) / radius_x)
+    sweep_angle = (end_angle - start_angle) * (1 if sweep else -1)
+    return 1 if sweep_angle % (2 * math.pi) > math.pi else 0
+
+
+def corner(outline: geometry.Outline, i: int, first: tuple,
+           second: tuple, distance: float, side: int) -> point.Point:
+    '''Return the offset corner between segment i and the next segment.'''
+    original = point.Point(outline.x[i], outline.y[i])
+    dx, dy = tangent(outline, i, True)
+    shift = -distance * side
+    moved = point.Point(original.x + dy * shift, original.y - dx * shift)
+    if same(first, second):
+        return moved
+    if first[0] == LINE and second[0] == LINE:
+        p, (dx, dy) = first[1], first[2]
+        q, (ex, ey) = second[1], second[2]
+        # Parallel lines only meet here once a segment between them is
+        # dropped, because the offset moved them past each other.
+        assert abs(dx * ey - dy * ex) > epsilon, \
+            'Error: Kerf is too large for a gap {:g} wide'.format(
+                2 * abs(distance) -
+                abs((q.x - p.x) * dy - (q.y - p.y) * dx))
+        return intersect_lines(first, second)
+    if first[0] == LINE:
+        return intersect_line_arc(first, second, moved)
+    if second[0] == LINE:
+        return intersect_line_arc(second, first, moved)
+    return intersect_arcs(first, second, moved)
+
+
+def flipped(outline: geometry.Outline, i: int, start: point.Point,
+            end: point.Point) -> bool:
+    '''Return True if segment i, offset from start to end, runs backwards.'''
+    return ((end.x - start.x) * (outline.x[i] - outline.x[i - 1]) +
+            (end.y - start.y) * (outline.y[i] - outline.y[i - 1])) < 0
+
+
+def offset(outline: geometry.Outline, distance: float) -> geometry.Outline:
+    '''Return outline, offset away from its material by distance.
+
+    Subpaths that are not closed are copied unchanged, because they have no
+    material side.
+
+    '''
+    result = geometry.Outline()
+    sides = subpath_sides(outline)
+    starts = [i for i, kind in enumerate(outline.kinds)
+              if kind == geometry.Segment.MOVE] + [len(outline)]
+    for side, start, end in zip(sides, starts, starts[1:]):
+        closed = outline.kinds[end - 1] == geometry.Segment.CLOSE
+        if not closed:
+            for i in range(start, end):
+                result.append(outline.kinds[i], outline.x[i], outline.y[i],
+                              outline.radius_x[i], outline.radius_y[i],
+                              outline.large_arc[i], outline.sweep[i])
+            continue
+        # Segments with length, including the closing line, if any.
+        segments = [i for i in range(start + 1, end)
+                    if (outline.x[i], outline.y[i]) !=
+                    (outline.x[i - 1], outline.y[i - 1])]
+        primitives = [offset_segment(outline, i, distance, side)
+                      for i in segments]
+        while True:
+            corners = [corner(outline, i, primitives[n],
+                              primitives[(n + 1) % len(segments)], distance,
+                              side)
+                       for n, i in enumerate(segments)]
+            kept = [n for n, i in enumerate(segments)
+                    if not flipped(outline, i, corners[n - 1], corners[n])]
+            if len(kept) == len(segments):
+                break
+            assert len(kept) > 2, \
+                'Error: Kerf is too large for a part {:g} wide'.format(
+                    max(max(outline.x[start:end]) - min(outline.x[start:end]),
+                        max(outline.y[start:end]) - min(outline.y[start:end])))
+            segments = [segments[n] for n in kept]
+            primitives = [primitives[n] for n in kept]
+        result.move(corners[-1])
+        for n, i in enumerate(segments):
+            if outline.kinds[i] == geometry.Segment.CLOSE:
+                continue
+            if primitives[n][0] == ARC:
+                result.append(ARC, corners[n].x, corners[n].y,
+                              primitives[n][2], primitives[n][3],
+                              large_arc(primitives[n], corners[n - 1],
+                                        corners[n], outline.sweep[i]),
+                              outline.sweep[i])
+            else:
+                result.line(corners[n])
+        result.close()
+    return result
@@ -0,0 +1,127 @@
+import math
+import unittest
+
+from common import path
+from common import point
+
+import geometry
+import kerf
+import metrics
+import testing
+
+
+def slotted_square() -> geometry.Outline:
+    '''Return a 10 by 10 square, with a 2 wide and 3 deep slot at the top.'''
+    outline = geometry.Outline()
+    outline.move(point.Point(0, 0))
+    for x, y in [(4, 0), (4, 3), (6, 3), (6, 0), (10, 0), (10, 10),
+                 (0, 10)]:
+        outline.line(point.Point(x, y))
+    outline.close()
+    return outline
+
+
+class TestKerf(unittest.TestCase):
+    def test_ring(self):
+        # The outer edge grows, and the hole shrinks.
+        offset = kerf.offset(testing.ring_outline(2, 1), .1)
+        self.assertEqual(list(offset.kinds),
+                         list(testing.ring_outline(2, 1).kinds))
+        self.assertEqual(sorted(set(offset.radius_x)), [0, .9, 2.1])
+        self.assertAlmostEqual(metrics.measure_outline(offset).area,
+                               math.pi * (2.1 ** 2 - .9 ** 2))
+
+    def test_slotted_square(self):
+        expected = [(-.5, -.5), (4.5, -.5), (4.5, 2.5), (5.5, 2.5),
+                    (5.5, -.5), (10.5, -.5), (10.5, 10.5), (-.5, 10.5)]
+        for outline in (slotted_square(),
+                        geometry.reverse(slotted_square())):
+            offset = kerf.offset(outline, .5)
+            corners = sorted(zip(offset.x, offset.y))
+            for actual, corner in zip(sorted(set(corners)), sorted(expected)):
+                self.assertAlmostEqual(actual[0], corner[0])
+                self.assertAlmostEqual(actual[1], corner[1])
+            # The slot is 1 narrower, and .5 shallower.
+            self.assertAlmostEqual(metrics.measure_outline(offset).area,
+                                   121 - 1 * 3)
+
+    def test_line_and_arc(self):
+        # A half disk, with its straight edge on the y-axis.
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 1))
+        outline.arc(1, 1, path.Size.SMALL, path.Winding.CCW,
+                    point.Point(0, -1))
+        outline.close()
+        offset = kerf.offset(outline, .1)
+        y = math.sqrt(1.1 ** 2 - .1 ** 2)
+        self.assertAlmostEqual(offset.x[0], -.1)
+        self.assertAlmostEqual(abs(offset.y[0]), y)
+        self.assertAlmostEqual(offset.x[1], -.1)
+        self.assertAlmostEqual(offset.y[1], -offset.y[0])
+        self.assertEqual(offset.radius_x[1], 1.1)
+        # The arc is now more than half of its circle.
+        self.assertEqual(offset.large_arc[1], 1)
+        cap = 1.1 ** 2 * math.acos(.1 / 1.1) - .1 * y
+        self.assertAlmostEqual(metrics.measure_outline(offset).area,
+                               math.pi * 1.1 ** 2 - cap)
+
+    def test_two_arcs(self):
+        # A crescent, like a torus slice: two circles of radius 5, with their
+        # centers 4 apart, meeting on the y-axis.
+        top = point.Point(0, -math.sqrt(5 ** 2 - 2 ** 2))
+        bottom = point.Point(0, -top.y)
+        outline = geometry.Outline()
+        outline.move(bottom)
+        outline.arc(5, 5, path.Size.LARGE, path.Winding.CCW, top)
+        outline.arc(5, 5, path.Size.SMALL, path.Winding.CW, bottom)
+        outline.close()
+        outer = geometry.center_parameters(outline, 1).center
+        inner = geometry.center_parameters(outline, 2).center
+        offset = kerf.offset(outline, .1)
+        self.assertEqual(list(offset.radius_x), [0, 5.1, 4.9, 0])
+        # Each corner is on both offset circles, which meet .25 off the
+        # y-axis.
+        for i in (0, 1):
+            corner = point.Point(offset.x[i], offset.y[i])
+            self.assertAlmostEqual(
+                math.hypot(corner.x - outer.x, corner.y - outer.y), 5.1)
+            self.assertAlmostEqual(
+                math.hypot(corner.x - inner.x, corner.y - inner.y), 4.9)
+            self.assertAlmostEqual(abs(corner.x), .25)
+
+    def test_open_subpath(self):
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 0))
+        outline.line(point.Point(1, 0))
+        offset = kerf.offset(outline, .1)
+        self.assertEqual(list(offset.x), [0, 1])
+        self.assertEqual(list(offset.y), [0, 0])
+
+    def test_too_large(self):
+        with self.assertRaises(AssertionError):
+            kerf.offset(testing.ring_outline(2, 1), 1.5)
+        # The slot's walls would pass each other.
+        with self.assertRaisesRegex(AssertionError,
+                                    'Error: Kerf is too large for a gap 2 '):
+            kerf.offset(slotted_square(), 1.5)
+
+    def test_flipped_segment(self):
+        # A tapered slot, with a bottom much shorter than the kerf. Its walls
+        # meet below the bottom, which is dropped.
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 0))
+        for x, y in [(4, 0), (4.9, 3), (5.1, 3), (6, 0), (10, 0), (10, 10),
+                     (0, 10)]:
+            outline.line(point.Point(x, y))
+        outline.close()
+        offset = kerf.offset(outline, .5)
+        self.assertEqual(len(offset), len(outline) - 1)
+        tip = [(x, y) for x, y in zip(offset.x, offset.y) if y > 0 and
+               4 < x < 6]
+        self.assertEqual(len(tip), 1)
+        self.assertAlmostEqual(tip[0][0], 5)
+        self.assertLess(tip[0][1], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+'''Single-stroke slice numbers, for cutting machines with a pen.
+
+A pen draws lines, not filled shapes, so each digit is a few strokes, from
+GLYPHS, instead of a font's outlines. Labels are placed on their template's
+material, as close as they fit to the top of the template, where
+ring-assembly.md expects each slice's number.
+
+'''
+
+import functools
+import typing
+
+import numpy as np
+
+from common import point
+
+import flatten
+import geometry
+
+# Stroke color for labels. Cutting machine software assigns pen or cut
+# operations by color.
+PEN_COLOR = '#0000ff'
+
+# Each digit's strokes, as polylines on a grid one unit wide and GLYPH_HEIGHT
+# units tall, with y pointing down. 6 and 9 are underlined, because slices
+# are often handled upside down.
+GLYPHS = {
+    '0': [[(0, 0), (1, 0), (1, 2), (0, 2), (0, 0)]],
+    '1': [[(.5, 0), (.5, 2)]],
+    '2': [[(0, 0), (1, 0), (1, 1), (0, 1), (0, 2), (1, 2)]],
+    '3': [[(0, 0), (1, 0), (1, 2), (0, 2)], [(0, 1), (1, 1)]],
+    '4': [[(0, 0), (0, 1), (1, 1)], [(1, 0), (1, 2)]],
+    '5': [[(1, 0), (0, 0), (0, 1), (1, 1), (1, 2), (0, 2)]],
+    '6': [[(1, 0), (0, 0), (0, 2), (1, 2), (1, 1), (0, 1)],
+          [(0, 2.5), (1, 2.5)]],
+    '7': [[(0, 0), (1, 0), (1, 2)]],
+    '8': [[(0, 0), (1, 0), (1, 2), (0, 2), (0, 0)], [(0, 1), (1, 1)]],
+    '9': [[(1, 1), (0, 1), (0, 0), (1, 0), (1, 2), (0, 2)],
+          [(0, 2.5), (1, 2.5)]],
+}
+GLYPH_HEIGHT = 2
+# Distance from each digit's left edge to the next digit's left edge.
+ADVANCE = 1.5
+
+# Space around a label, relative to its height.
+MARGIN = .25
+# Each height that is tried is this fraction of the previous height.
+SHRINK = .8
+# Heights that are tried, down to this fraction of the largest height.
+SMALLEST = .25
+# Label tops are tried down to this many label heights below the top of the
+# outline first, where ring-assembly.md expects each slice's number.
+BAND = 2
+
+
+def check(label: str):
+    assert label and all(c in GLYPHS for c in label), \
+        'Error: Labels can only have digits, not {!r}'.format(label)
+
+
+def extent(label: str) -> tuple[float, float]:
+    '''Return label's (width, depth), relative to its digits' height.
+
+    The depth includes any underlines.
+
+    '''
+    check(label)
+    depth = max(y for c in label for stroke in GLYPHS[c] for _, y in stroke)
+    return ((len(label) - 1) * ADVANCE + 1) / GLYPH_HEIGHT, \
+        depth / GLYPH_HEIGHT
+
+
+@functools.lru_cache(maxsize=256)
+def text(label: str, height: float) -> geometry.Outline:
+    '''Return label's strokes, with digits height tall.
+
+    The label's top left corner is at the origin. Outlines are cached, so
+    callers must not change them.
+
+    '''
+    check(label)
+    scale = height / GLYPH_HEIGHT
+    outline = geometry.Outline()
+    for i, c in enumerate(label):
+        for stroke in GLYPHS[c]:
+            x, y = stroke[0]
+            outline.move(point.Point((i * ADVANCE + x) * scale, y * scale))
+            for x, y in stroke[1:]:
+                outline.line(point.Point((i * ADVANCE + x) * scale,
+                                         y * scale))
+    return outline
+
+
+def clear(lines: np.ndarray, lefts: np.ndarray, tops: np.ndarray,
+          width: float, height: float) -> np.ndarray:
+    '''Return whether boxes on a grid are on the material, and clear of lines.
+
+    Boxes are width by height, with their top left corners at each of lefts,
+    in each of tops. Returns a (len(tops), len(lefts)) array. A box is on the
+    material if its center is inside lines, by the evenodd rule, and clear if
+    no line touches it.
+
+    Boxes in a row only meet lines level with the row. Each of those lines'
+    part within the row covers an interval of x, and the box is clear if it
+    overlaps none of them. Intervals are sorted by their left ends, so each
+    box only compares with the farthest right end of those that start before
+    its right edge.
+
+    '''
+    x0, y0, x1, y1 = (lines[:, i] for i in range(4))
+    line_top = np.minimum(y0, y1)
+    line_bottom = np.maximum(y0, y1)
+    centers = lefts + width / 2
+    result = np.zeros((len(tops), len(lefts)), dtype=bool)
+    for row, top in enumerate(tops):
+        bottom = top + height
+        level = np.flatnonzero((line_bottom >= top) & (line_top <= bottom))
+        ax, ay, bx, by = x0[level], y0[level], x1[level], y1[level]
+        # The part of each line within the row, from its parameters where it
+        # crosses the row's top and bottom.
+        dy = np.where(ay == by, 1, by - ay)
+        at_top = (top - ay) / dy
+        at_bottom = (bottom - ay) / dy
+        start = np.where(ay == by, 0, np.clip(np.minimum(at_top, at_bottom),
+                                             0, 1))
+        end = np.where(ay == by, 1, np.clip(np.maximum(at_top, at_bottom),
+                                           0, 1))
+        start_x = ax + start * (bx - ax)
+        end_x = ax + end * (bx - ax)
+        low = np.minimum(start_x, end_x)
+        order = np.argsort(low)
+        reach = np.maximum.accumulate(np.maximum(start_x, end_x)[order])
+        before = np.searchsorted(low[order], lefts + width, side='right')
+        touched = (before > 0) & (reach[np.maximum(before, 1) - 1] >= lefts)
+
+        # Lines that span the row's middle, where they cross it, to the right
+        # of each box's center.
+        middle = top + height / 2
+        spans = (ay > middle) != (by > middle)
+        crossings = np.sort(ax[spans] + (middle - ay[spans]) *
+                            (bx[spans] - ax[spans]) / dy[spans])
+        right = len(crossings) - np.searchsorted(crossings, centers,
+                                                 side='right')
+        result[row] = (right % 2 == 1) & ~touched
+    return result
+
+
+def place(outline: geometry.Outline, label: str, height: float
+          ) -> typing.Optional[tuple[point.Point, float]]:
+    '''Find where label fits on outline's material.
+
+    Tries heights from height down, and returns the label's top left corner,
+    and its height, for the largest label that fits with a margin, as close
+    as possible to the top of the outline. The band below the top edge,
+    BAND label heights deep, is searched first, and the rest of the outline
+    only if no label fits there. Returns None if no label fits.
+
+    '''
+    assert height > 0, 'Error: Label height must be greater than zero'
+    width, depth = extent(label)
+    lines, _ = flatten.polyline(outline, height * MARGIN / 4)
+    if not len(lines):
+        return None
+    xs = lines[:, [0, 2]]
+    ys = lines[:, [1, 3]]
+    left, top, right, bottom = xs.min(), ys.min(), xs.max(), ys.max()
+    # The middle of the outline's top edge.
+    anchor_x = np.mean(xs[ys <= top + height * MARGIN / 4])
+
+    band = top + BAND * height
+    for low, high in ((top, band), (band, bottom)):
+        size = height
+        while size >= SMALLEST * height:
+            margin = size * MARGIN
+            box_width = width * size + 2 * margin
+            box_height = depth * size + 2 * margin
+            step = size / 4
+            lefts = np.arange(left, right - box_width, step)
+            tops = np.arange(low, min(high, bottom - box_height), step)
+            fits = clear(lines, lefts, tops, box_width, box_height).ravel()
+            if fits.any():
+                x, y = np.meshgrid(lefts, tops)
+                x = x.ravel()
+                y = y.ravel()
+                # Closest to the anchor, measured from the top of each box.
+                order = np.argsort(np.hypot(x + box_width / 2 - anchor_x,
+                                            y - top), kind='stable')
+                i = order[np.argmax(fits[order])]
+                return point.Point(float(x[i]) + margin,
+                                   float(y[i]) + margin), size
+            size *= SHRINK
+    return None
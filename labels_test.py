@@ -0,0 +1,88 @@
+import unittest
+
+from common import point
+
+import geometry
+import labels
+
+
+def rectangle(left, top, right, bottom):
+    outline = geometry.Outline()
+    outline.move(point.Point(left, top))
+    for x, y in ((right, top), (right, bottom), (left, bottom)):
+        outline.line(point.Point(x, y))
+    outline.close()
+    return outline
+
+
+class TestLabels(unittest.TestCase):
+    def test_extent(self):
+        self.assertEqual(labels.extent('7'), (.5, 1))
+        self.assertEqual(labels.extent('12'), (1.25, 1))
+        # Underlined.
+        self.assertEqual(labels.extent('16'), (1.25, 1.25))
+        with self.assertRaisesRegex(AssertionError, 'Error: Labels'):
+            labels.extent('1a')
+
+    def test_text(self):
+        outline = labels.text('20', 4)
+        self.assertIs(labels.text('20', 4), outline)
+        # One stroke for each digit.
+        self.assertEqual(list(outline.kinds).count(geometry.Segment.MOVE), 2)
+        self.assertEqual((min(outline.x), max(outline.x)), (0, 5))
+        self.assertEqual((min(outline.y), max(outline.y)), (0, 4))
+
+    def test_place(self):
+        # Centered at the top, clear of the margin.
+        corner, height = labels.place(rectangle(0, 0, 40, 20), '12', 4)
+        self.assertEqual(height, 4)
+        self.assertAlmostEqual(corner.x + 2.5, 20, delta=1)
+        self.assertGreater(corner.y, 1)
+        self.assertLessEqual(corner.y, 2)
+
+        # A notch from the top edge pushes the label aside.
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 0))
+        for x, y in ((19, 0), (19, 10), (21, 10), (21, 0), (40, 0), (40, 20),
+                     (0, 20)):
+            outline.line(point.Point(x, y))
+        outline.close()
+        corner, height = labels.place(outline, '12', 4)
+        self.assertTrue(corner.x + 5 < 19 or corner.x > 21)
+        self.assertLess(corner.y, 10)
+
+        # Labels shrink to fit, down to a quarter of the height.
+        corner, height = labels.place(rectangle(0, 0, 40, 3), '12', 4)
+        self.assertLess(height, 2)
+        self.assertGreaterEqual(corner.y, height * labels.MARGIN)
+        self.assertIsNone(labels.place(rectangle(0, 0, 40, .5), '12', 4))
+        with self.assertRaisesRegex(AssertionError, 'Error: Label height'):
+            labels.place(rectangle(0, 0, 40, 20), '12', 0)
+
+    def test_band(self):
+        # A thin strip above a hole. A smaller label in the strip, below the
+        # top edge, beats a larger one below the hole.
+        outline = rectangle(0, 0, 40, 100)
+        outline.extend(rectangle(1, 2.5, 39, 50))
+        corner, height = labels.place(outline, '12', 4)
+        self.assertLess(height, 2)
+        self.assertLess(corner.y, 2.5)
+        # No label fits in a thinner strip, so the rest of the outline is
+        # searched.
+        outline = rectangle(0, 0, 40, 100)
+        outline.extend(rectangle(1, 1, 39, 50))
+        corner, height = labels.place(outline, '12', 4)
+        self.assertEqual(height, 4)
+        self.assertGreater(corner.y, 50)
+
+    def test_inside(self):
+        # A rectangle with a rectangular hole.
+        outline = rectangle(0, 0, 10, 10)
+        outline.extend(rectangle(4, 4, 6, 6))
+        corner, height = labels.place(outline, '8', 2)
+        self.assertEqual(height, 2)
+        self.assertFalse(4 - 1.5 < corner.x < 6 and 4 - 2.5 < corner.y < 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,398 @@
+'''Measure material use and cutting work for a job.
+
+Metrics come from each template's geometry.Outline, so arcs are measured
+exactly: elliptical arc lengths use Carlson's symmetric elliptic integrals,
+and areas integrate each arc in closed form. Lengths are in the outlines'
+units, usually user units, and areas are in square units.
+
+   sheet_width,
+  sheet_height: Bounding box of all templates, as placed on the sheet.
+    sheet_area: sheet_width * sheet_height.
+     part_area: Total area of all templates, with holes removed, as the
+                evenodd fill rule fills them.
+   utilization: part_area, as a percentage of sheet_area.
+    cut_length: Total length of all edges, including slot walls.
+       pierces: Number of places the cutter starts a cut, one per subpath.
+
+'''
+
+import collections
+import json
+import math
+
+import numpy as np
+
+import flatten
+import geometry
+
+Metrics = collections.namedtuple(
+    'Metrics', ['sheet_width', 'sheet_height', 'sheet_area', 'part_area',
+                'utilization', 'cut_length', 'pierces'])
+
+# Per outline measurements, in template coordinates.
+#
+#  bounds: (xmin, ymin, xmax, ymax).
+OutlineMetrics = collections.namedtuple(
+    'OutlineMetrics', ['bounds', 'area', 'cut_length', 'pierces'])
+
+# Duplication stops when the arguments agree to this relative error. The
+# series' error is about the sixth power of it, which is below float64
+# precision.
+RF_TOLERANCE = .0025
+RD_TOLERANCE = .0015
+
+
+def carlson_rf(x, y, z):
+    '''Carlson's elliptic integral of the first kind, R_F(x, y, z).
+
+    x, y, and z are non-negative, and at most one of them is zero. They are
+    numbers, or numpy arrays, and duplication goes on until every entry
+    agrees.
+
+    '''
+    while True:
+        sx, sy, sz = np.sqrt(x), np.sqrt(y), np.sqrt(z)
+        lam = sx * (sy + sz) + sy * sz
+        x, y, z = (x + lam) / 4, (y + lam) / 4, (z + lam) / 4
+        mean = (x + y + z) / 3
+        dx, dy, dz = (mean - x) / mean, (mean - y) / mean, (mean - z) / mean
+        if np.all(np.maximum(np.maximum(np.abs(dx), np.abs(dy)),
+                             np.abs(dz)) < RF_TOLERANCE):
+            break
+    e2 = dx * dy - dz * dz
+    e3 = dx * dy * dz
+    return (1 + (e2 / 24 - .1 - 3 * e3 / 44) * e2 + e3 / 14) / np.sqrt(mean)
+
+
+def carlson_rd(x, y, z):
+    '''Carlson's elliptic integral of the second kind, R_D(x, y, z).
+
+    x and y are non-negative, at most one of them is zero, and z is
+    positive. They are numbers, or numpy arrays, as for carlson_rf().
+
+    '''
+    total = 0
+    factor = 1
+    while True:
+        sx, sy, sz = np.sqrt(x), np.sqrt(y), np.sqrt(z)
+        lam = sx * (sy + sz) + sy * sz
+        total += factor / (sz * (z + lam))
+        factor /= 4
+        x, y, z = (x + lam) / 4, (y + lam) / 4, (z + lam) / 4
+        mean = (x + y + 3 * z) / 5
+        dx, dy, dz = (mean - x) / mean, (mean - y) / mean, (mean - z) / mean
+        if np.all(np.maximum(np.maximum(np.abs(dx), np.abs(dy)),
+                             np.abs(dz)) < RD_TOLERANCE):
+            break
+    ea = dx * dy
+    eb = dz * dz
+    ec = ea - eb
+    ed = ea - 6 * eb
+    ee = ed + 2 * ec
+    c1, c2, c3, c4 = 3 / 14, 1 / 6, 9 / 22, 3 / 26
+    return 3 * total + factor * (
+        1 + ed * (-c1 + c3 / 4 * ed - 1.5 * c4 * dz * ee) +
+        dz * (c2 * ee + dz * (-c3 * ec + dz * c4 * ea))) / (mean *
+                                                             np.sqrt(mean))
+
+
+def elliptic_e(phi, m):
+    '''Incomplete elliptic integral of the second kind, E(phi, m).
+
+    phi is between 0 and pi / 2, and m is at most 1. Both are numbers, or
+    numpy arrays.
+
+    '''
+    s = np.sin(phi)
+    c = np.cos(phi)
+    q = 1 - m * s * s
+    return (s * carlson_rf(c * c, q, 1) -
+            m * s ** 3 / 3 * carlson_rd(c * c, q, 1))
+
+
+def ellipse_length(radius_x, radius_y, t):
+    '''Return the signed length of an ellipse, from parameter 0 to t.
+
+    The speed along the ellipse, sqrt(radius_x² sin²(u) + radius_y² cos²(u)),
+    repeats every pi, and is symmetric about 0. So the length is a whole
+    number of half ellipses, plus the incomplete elliptic integral of the
+    second kind, E(phi, m), for the remainder:
+
+      radius_y * E(phi, m), with m = 1 - radius_x² / radius_y²
+
+    Arguments are numbers, or numpy arrays, with one entry per ellipse.
+
+    '''
+    m = 1 - (radius_x / radius_y) ** 2
+    half_turns = np.round(t / math.pi)
+    remainder = t - half_turns * math.pi
+    return radius_y * (half_turns * 2 * elliptic_e(math.pi / 2, m) +
+                       np.copysign(elliptic_e(np.abs(remainder), m),
+                                   remainder))
+
+
+def arc_lengths(radius_x, radius_y, start_angle, sweep_angle):
+    '''Return the lengths of arcs, in center parameterization.
+
+    Arguments are numbers, or numpy arrays, with one entry per arc, as
+    returned by geometry.arc_centers().
+
+    '''
+    return np.abs(ellipse_length(radius_x, radius_y,
+                                 start_angle + sweep_angle) -
+                  ellipse_length(radius_x, radius_y, start_angle))
+
+
+def arc_length(arc: geometry.EllipticalArc) -> float:
+    return float(arc_lengths(arc.radius_x, arc.radius_y, arc.start_angle,
+                             arc.sweep_angle))
+
+
+def arc_areas(center_x, center_y, radius_x, radius_y, start_angle,
+              sweep_angle):
+    '''Return half the integral of (x dy - y dx) along arcs.
+
+    Summed with (x0 y1 - x1 y0) / 2 for each line, this is the signed area
+    enclosed by a closed path, positive when y increases counterclockwise
+    from x. Arguments are as for arc_lengths().
+
+    '''
+    t0 = start_angle
+    t1 = start_angle + sweep_angle
+    return (radius_x * radius_y * sweep_angle +
+            center_x * radius_y * (np.sin(t1) - np.sin(t0)) -
+            center_y * radius_x * (np.cos(t1) - np.cos(t0))) / 2
+
+
+def arc_area(arc: geometry.EllipticalArc) -> float:
+    '''Return half the integral of (x dy - y dx) along arc.'''
+    return float(arc_areas(arc.center.x, arc.center.y, arc.radius_x,
+                           arc.radius_y, arc.start_angle, arc.sweep_angle))
+
+
+def arcs_bounds(center_x, center_y, radius_x, radius_y, start_angle,
+                sweep_angle) -> tuple:
+    '''Return arcs' bounding boxes, as arrays (xmin, ymin, xmax, ymax).
+
+    Each box is set by the arc's ends, and any of the ellipse's extremes,
+    at multiples of pi / 2, that the arc passes. Arguments are as for
+    arc_lengths().
+
+    '''
+    low = np.minimum(start_angle, start_angle + sweep_angle)
+    high = np.maximum(start_angle, start_angle + sweep_angle)
+
+    def passes(angle):
+        '''Return whether each arc passes angle, or a whole turn from it.'''
+        return (np.floor((high - angle) / (2 * math.pi)) >=
+                np.ceil((low - angle) / (2 * math.pi)))
+    xs = center_x + radius_x * np.cos([low, high])
+    ys = center_y + radius_y * np.sin([low, high])
+    return (np.where(passes(math.pi), center_x - radius_x, np.min(xs, 0)),
+            np.where(passes(-math.pi / 2), center_y - radius_y,
+                     np.min(ys, 0)),
+            np.where(passes(0), center_x + radius_x, np.max(xs, 0)),
+            np.where(passes(math.pi / 2), center_y + radius_y,
+                     np.max(ys, 0)))
+
+
+def arc_bounds(arc: geometry.EllipticalArc) -> tuple:
+    '''Return arc's bounding box, as (xmin, ymin, xmax, ymax).'''
+    return tuple(float(value) for value in arcs_bounds(
+        arc.center.x, arc.center.y, arc.radius_x, arc.radius_y,
+        arc.start_angle, arc.sweep_angle))
+
+
+def segments(outline: geometry.Outline) -> tuple:
+    '''Return outline's segments as numpy arrays, with their arcs.
+
+    Returns (kinds, x0, y0, x1, y1, arcs, centers), with each segment's
+    start and end point. arcs has the indices of the segments drawn as
+    arcs, and centers their geometry.arc_centers(). Arcs with zero radii,
+    or that end where they start, are drawn as lines, and left out.
+
+    '''
+    kinds = np.frombuffer(outline.kinds, dtype=np.uint8)
+    x1 = np.frombuffer(outline.x)
+    y1 = np.frombuffer(outline.y)
+    # Each segment starts at the previous segment's end point, and the
+    # first segment, a MOVE, at its own.
+    x0 = np.concatenate([x1[:1], x1[:-1]])
+    y0 = np.concatenate([y1[:1], y1[:-1]])
+    arcs = np.flatnonzero(kinds == geometry.Segment.ARC)
+    centers = geometry.arc_centers(
+        x0[arcs], y0[arcs], x1[arcs], y1[arcs],
+        np.frombuffer(outline.radius_x)[arcs],
+        np.frombuffer(outline.radius_y)[arcs],
+        np.frombuffer(outline.large_arc, dtype=np.uint8)[arcs],
+        np.frombuffer(outline.sweep, dtype=np.uint8)[arcs])
+    drawn = centers[5] != 0
+    return (kinds, x0, y0, x1, y1, arcs[drawn],
+            tuple(values[drawn] for values in centers))
+
+
+def contains(polygon: list[tuple], x: float, y: float) -> bool:
+    '''Return True if (x, y) is inside polygon, by the evenodd rule.'''
+    inside = False
+    for (x0, y0), (x1, y1) in zip(polygon, polygon[-1:] + polygon[:-1]):
+        if (y0 > y) != (y1 > y) and \
+           x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+    return inside
+
+
+def outline_bounds(outline: geometry.Outline) -> tuple:
+    '''Return outline's bounding box, as (xmin, ymin, xmax, ymax).'''
+    if not len(outline):
+        return math.inf, math.inf, -math.inf, -math.inf
+    _, _, _, x, y, _, centers = segments(outline)
+    return segment_bounds(x, y, centers)
+
+
+def segment_bounds(x: np.ndarray, y: np.ndarray, centers: tuple) -> tuple:
+    '''Return the bounding box of segments, see segments().
+
+    x and y are the segments' end points, and centers their arcs'.
+
+    '''
+    xmin, ymin, xmax, ymax = arcs_bounds(*centers)
+    return (float(min(np.min(x), np.min(xmin, initial=math.inf))),
+            float(min(np.min(y), np.min(ymin, initial=math.inf))),
+            float(max(np.max(x), np.max(xmax, initial=-math.inf))),
+            float(max(np.max(y), np.max(ymax, initial=-math.inf))))
+
+
+def measure_outline(outline: geometry.Outline) -> OutlineMetrics:
+    '''Measure one outline, in template coordinates.
+
+    Subpaths that are not closed are closed with a line for the area, as
+    fill closes them. Holes are found by testing each subpath's start point
+    against the other subpaths, so subpaths must not cross each other.
+
+    '''
+    kinds, x0, y0, x1, y1, arcs, centers = segments(outline)
+    moves = np.flatnonzero(kinds == geometry.Segment.MOVE)
+    pierces = len(moves)
+    if not pierces:
+        return OutlineMetrics(bounds=outline_bounds(outline), area=0,
+                              cut_length=0, pierces=0)
+    drawn = kinds != geometry.Segment.MOVE
+    lengths = np.where(drawn, np.hypot(x1 - x0, y1 - y0), 0)
+    # Each segment's part of its subpath's signed area.
+    parts = np.where(drawn, (x0 * y1 - x1 * y0) / 2, 0)
+    lengths[arcs] = arc_lengths(*centers[2:])
+    parts[arcs] = arc_areas(*centers)
+    # The line that closes each subpath, from its last point to its start.
+    last = np.append(moves[1:] - 1, len(kinds) - 1)
+    closing = (x1[last] * y1[moves] - x1[moves] * y1[last]) / 2
+    # Signed area of each subpath.
+    subpaths = np.cumsum(~drawn) - 1
+    areas = closing + np.bincount(subpaths[moves[0]:],
+                                  weights=parts[moves[0]:],
+                                  minlength=pierces)
+    cut_length = float(np.sum(lengths))
+
+    bounds = segment_bounds(x1, y1, centers)
+    xmin, ymin, xmax, ymax = bounds
+    depth = np.zeros(pierces, dtype=np.intp)
+    if pierces > 1:
+        # Flattening is only used to find holes, so a coarse tolerance does.
+        lines, source = flatten.polyline(
+            outline, max(xmax - xmin, ymax - ymin) * 1e-3)
+        # Open subpaths are closed, as fill closes them.
+        lines = np.concatenate([lines, np.column_stack(
+            [x1[last], y1[last], x1[moves], y1[moves]])])
+        owner = np.append(subpaths[source], np.arange(pierces))
+        # Crossings of a ray to the left of each subpath's start point, by
+        # the evenodd rule, as in contains().
+        x, y = x1[moves, np.newaxis], y1[moves, np.newaxis]
+        lx0, ly0, lx1, ly1 = lines.T
+        spans = (ly0 > y) != (ly1 > y)
+        crossed = spans & (x < lx0 + (y - ly0) * (lx1 - lx0) /
+                           np.where(spans, ly1 - ly0, 1))
+        counts = crossed.astype(np.intp) @ (
+            owner[:, np.newaxis] == np.arange(pierces))
+        np.fill_diagonal(counts, 0)
+        depth = np.sum(counts % 2, axis=1)
+    area = float(np.sum(np.where(depth % 2 == 0, 1, -1) * np.abs(areas)))
+    return OutlineMetrics(bounds=bounds, area=area,
+                          cut_length=cut_length, pierces=pierces)
+
+
+def bounds(templates: list) -> tuple:
+    '''Return placed render.Templates' bounding box, or None if empty.
+
+    The box is (xmin, ymin, xmax, ymax), in the outlines' units.
+
+    '''
+    measured = {}
+    xmin = ymin = math.inf
+    xmax = ymax = -math.inf
+    for template in templates:
+        key = id(template.outline)
+        if key not in measured:
+            measured[key] = outline_bounds(template.outline)
+        box = measured[key]
+        x, y = template.position.x, template.position.y
+        xmin = min(xmin, box[0] + x)
+        ymin = min(ymin, box[1] + y)
+        xmax = max(xmax, box[2] + x)
+        ymax = max(ymax, box[3] + y)
+    if xmin == math.inf:
+        return None
+    return xmin, ymin, xmax, ymax
+
+
+def measure(templates: list) -> Metrics:
+    '''Measure placed render.Templates.
+
+    Templates that share an outline share its measurements, so each distinct
+    outline is measured once.
+
+    '''
+    measured = {}
+    xmin = ymin = math.inf
+    xmax = ymax = -math.inf
+    part_area = cut_length = 0
+    pierces = 0
+    for template in templates:
+        key = id(template.outline)
+        if key not in measured:
+            measured[key] = measure_outline(template.outline)
+        outline = measured[key]
+        if not outline.pierces:
+            continue
+        x, y = template.position.x, template.position.y
+        xmin = min(xmin, outline.bounds[0] + x)
+        ymin = min(ymin, outline.bounds[1] + y)
+        xmax = max(xmax, outline.bounds[2] + x)
+        ymax = max(ymax, outline.bounds[3] + y)
+        part_area += outline.area
+        cut_length += outline.cut_length
+        pierces += outline.pierces
+
+    if pierces == 0:
+        return Metrics(0, 0, 0, 0, 0, 0, 0)
+    sheet_area = (xmax - xmin) * (ymax - ymin)
+    return Metrics(sheet_width=xmax - xmin, sheet_height=ymax - ymin,
+                   sheet_area=sheet_area, part_area=part_area,
+                   utilization=(100 * part_area / sheet_area
+                                if sheet_area else 0),
+                   cut_length=cut_length, pierces=pierces)
+
+
+def scale(metrics: Metrics, factor: float) -> Metrics:
+    '''Convert metrics to other units, factor units per current unit.'''
+    return metrics._replace(
+        sheet_width=metrics.sheet_width * factor,
+        sheet_height=metrics.sheet_height * factor,
+        sheet_area=metrics.sheet_area * factor * factor,
+        part_area=metrics.part_area * factor * factor,
+        cut_length=metrics.cut_length * factor)
+
+
+def write_json(values: dict, filename: str):
+    '''Write metrics, and any other values, to a JSON sidecar file.'''
+    with open(filename, 'w') as f:
+        json.dump(values, f, indent=2)
+        f.write('\n')
@@ -0,0 +1,115 @@
+import json
+import math
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from common import point
+
+import geometry
+import metrics
+import testing
+
+
+class TestMetrics(unittest.TestCase):
+    def test_ellipse_length(self):
+        # Ramanujan's second approximation is within 1e-9 for this ellipse.
+        a, b = 3, 2
+        h = ((a - b) / (a + b)) ** 2
+        perimeter = math.pi * (a + b) * (1 + 3 * h / (10 + math.sqrt(4 -
+                                                                    3 * h)))
+        self.assertAlmostEqual(metrics.ellipse_length(a, b, 2 * math.pi),
+                               perimeter, places=6)
+        self.assertAlmostEqual(metrics.ellipse_length(2, 2, 1.3), 2.6)
+        self.assertAlmostEqual(metrics.ellipse_length(a, b, -1),
+                               -metrics.ellipse_length(a, b, 1))
+
+    def test_ellipse_length_midpoint(self):
+        # Matches the midpoint rule, summed finely.
+        a, b, t = 5, 1, 2.5
+        n = 20000
+        expected = sum(math.hypot(a * math.sin((k + .5) * t / n),
+                                  b * math.cos((k + .5) * t / n))
+                       for k in range(n)) * t / n
+        self.assertAlmostEqual(metrics.ellipse_length(a, b, t), expected,
+                               places=6)
+
+    def test_arc_bounds(self):
+        arc = geometry.EllipticalArc(point.Point(1, 1), 2, 3, 0, math.pi)
+        bounds = metrics.arc_bounds(arc)
+        for actual, expected in zip(bounds, (-1, 1, 3, 4)):
+            self.assertAlmostEqual(actual, expected)
+
+    def test_arcs_bounds(self):
+        # Matches finely sampled arcs, in both directions and past a turn.
+        start = np.array([-4, -1, 0, 2, 5.5])
+        sweep = np.array([1, 7, -2.5, -6, 0.3])
+        boxes = np.array(metrics.arcs_bounds(1, -2, 3, 0.5, start, sweep)).T
+        t = start[:, np.newaxis] + sweep[:, np.newaxis] * np.linspace(
+            0, 1, 100001)
+        x = 1 + 3 * np.cos(t)
+        y = -2 + 0.5 * np.sin(t)
+        np.testing.assert_allclose(
+            boxes, np.column_stack([x.min(axis=1), y.min(axis=1),
+                                    x.max(axis=1), y.max(axis=1)]),
+            atol=1e-8)
+
+    def test_ring(self):
+        measured = metrics.measure_outline(testing.ring_outline(2, 1))
+        self.assertAlmostEqual(measured.area, 3 * math.pi)
+        self.assertAlmostEqual(measured.cut_length, 6 * math.pi)
+        self.assertEqual(measured.pierces, 2)
+        for actual, expected in zip(measured.bounds, (-2, -2, 2, 2)):
+            self.assertAlmostEqual(actual, expected)
+
+    def test_square_with_slot(self):
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 0))
+        for x, y in [(4, 0), (4, 3), (6, 3), (6, 0), (10, 0), (10, 10),
+                     (0, 10)]:
+            outline.line(point.Point(x, y))
+        outline.close()
+        measured = metrics.measure_outline(outline)
+        self.assertAlmostEqual(measured.area, 100 - 6)
+        self.assertAlmostEqual(measured.cut_length, 40 + 6)
+        self.assertEqual(measured.pierces, 1)
+
+    def test_measure(self):
+        outline = testing.ring_outline(2, 1)
+        job = metrics.measure([testing.template(outline, 2, 2),
+                               testing.template(outline, 7, 2)])
+        self.assertAlmostEqual(job.sheet_width, 9)
+        self.assertAlmostEqual(job.sheet_height, 4)
+        self.assertAlmostEqual(job.part_area, 6 * math.pi)
+        self.assertAlmostEqual(job.utilization, 100 * 6 * math.pi / 36)
+        self.assertAlmostEqual(job.cut_length, 12 * math.pi)
+        self.assertEqual(job.pierces, 4)
+
+        scaled = metrics.scale(job, 10)
+        self.assertAlmostEqual(scaled.sheet_area, job.sheet_area * 100)
+        self.assertAlmostEqual(scaled.cut_length, job.cut_length * 10)
+        self.assertEqual(scaled.utilization, job.utilization)
+
+    def test_bounds(self):
+        outline = testing.ring_outline(2, 1)
+        box = metrics.bounds([testing.template(outline, 2, 2),
+                              testing.template(outline, 7, 3)])
+        for actual, expected in zip(box, (0, 0, 9, 5)):
+            self.assertAlmostEqual(actual, expected)
+        self.assertIsNone(metrics.bounds([]))
+
+    def test_write_json(self):
+        job = metrics.measure([testing.template(testing.ring_outline(2, 1))])
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'metrics.json')
+            metrics.write_json(dict(job._asdict(), units='mm'), filename)
+            with open(filename) as f:
+                written = json.load(f)
+        self.assertEqual(written['units'], 'mm')
+        self.assertEqual(written['pierces'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+'''Place templates inside other templates' empty cavities.
+
+Ring slices enclose an empty ellipse, and 'C' slices enclose half of one.
+Templates that fit are moved into those cavities, instead of taking their
+own place on the sheet.
+
+Each cavity is packed with shelves: horizontal bands, filled with templates
+from left to right. The first shelf is centered on the ellipse, where it is
+widest, and later shelves stack above or below, whichever is wider. A
+template fits on a shelf when its bounding box, with spacing around it, is
+inside the ellipse. The ellipse is convex, so the box is inside when its
+corners are, and the corners are checked by the ellipse's chord at the
+shelf's top and bottom edges.
+
+'''
+
+import math
+
+from common import point
+
+import metrics
+import render
+
+
+class Shelves:
+    '''Shelves packed into one render.Cavity.'''
+    def __init__(self, cavity: render.Cavity, spacing: float):
+        self.cavity = cavity
+        self.spacing = spacing
+        # [top, height, next x, right], in template coordinates.
+        self.shelves = []
+        # Top of the highest shelf, and bottom of the lowest shelf.
+        self.upper = self.lower = None
+
+    def chord(self, top: float, bottom: float) -> tuple:
+        '''Return the empty (left, right) span, from top to bottom.
+
+        The span is inside the cavity at every height between top and
+        bottom, with spacing from the cavity's edge.
+
+        '''
+        cavity = self.cavity
+        top -= self.spacing
+        bottom += self.spacing
+        # The chord is shortest at the edge farthest from the center.
+        offset = max(abs(top - cavity.center.y), abs(bottom - cavity.center.y))
+        if offset >= cavity.radius_y:
+            return 0, -1
+        half = cavity.radius_x * math.sqrt(1 - (offset / cavity.radius_y) ** 2)
+        left = max(cavity.center.x - half, cavity.min_x) + self.spacing
+        return left, cavity.center.x + half - self.spacing
+
+    def add_shelf(self, top: float, height: float) -> list:
+        left, right = self.chord(top, top + height)
+        shelf = [top, height, left, right]
+        self.shelves.append(shelf)
+        if self.upper is None:
+            self.upper, self.lower = top, top + height
+        else:
+            self.upper = min(self.upper, top)
+            self.lower = max(self.lower, top + height)
+        return shelf
+
+    def place(self, width: float, height: float) -> point.Point:
+        '''Reserve a width by height box, and return its top left corner.
+
+        Returns None if the box does not fit.
+
+        '''
+        for shelf in self.shelves:
+            top, shelf_height, x, right = shelf
+            if height <= shelf_height and x + width <= right:
+                shelf[2] = x + width + self.spacing
+                return point.Point(x, top)
+
+        if self.upper is None:
+            candidates = [self.cavity.center.y - height / 2]
+        else:
+            candidates = [self.upper - self.spacing - height,
+                          self.lower + self.spacing]
+        best = None
+        for top in candidates:
+            left, right = self.chord(top, top + height)
+            if left + width <= right and (
+                    best is None or right - left > best[2] - best[1]):
+                best = (top, left, right)
+        if best is None:
+            return None
+        shelf = self.add_shelf(best[0], height)
+        shelf[2] = best[1] + width + self.spacing
+        return point.Point(best[1], best[0])
+
+
+def find_places(templates: list[render.Template],
+                spacing: float) -> dict:
+    '''Find templates that fit into other templates' cavities.
+
+    Returns {template index: (host index, origin)}, where origin is where the
+    template's origin goes, relative to its host's origin. Larger templates
+    are placed first. Templates that hold other templates stay where they
+    are, and moved templates do not hold others.
+
+    '''
+    bounds = {}
+    for template in templates:
+        key = id(template.outline)
+        if key not in bounds:
+            bounds[key] = metrics.outline_bounds(template.outline)
+
+    def size(i):
+        xmin, ymin, xmax, ymax = bounds[id(templates[i].outline)]
+        return xmax - xmin, ymax - ymin
+
+    # Cavities, by the index of the template that holds them.
+    shelves = {i: [Shelves(cavity, spacing) for cavity in template.cavities]
+               for i, template in enumerate(templates) if template.cavities}
+    places = {}
+    if not shelves:
+        return places
+    hosts = set()
+    order = sorted(range(len(templates)),
+                   key=lambda i: -size(i)[0] * size(i)[1])
+    for i in order:
+        if i in hosts:
+            continue
+        width, height = size(i)
+        for host, cavities in shelves.items():
+            if host == i or host in places:
+                continue
+            for cavity in cavities:
+                corner = cavity.place(width, height)
+                if corner is not None:
+                    break
+            if corner is not None:
+                break
+        else:
+            continue
+        xmin, ymin = bounds[id(templates[i].outline)][:2]
+        places[i] = (host, point.Point(corner.x - xmin, corner.y - ymin))
+        hosts.add(host)
+    return places
+
+
+def fill_cavities(templates: list[render.Template],
+                  spacing: float) -> list[render.Template]:
+    '''Move templates into other templates' cavities, where they fit.
+
+    Returns templates, in the same order, with new positions for the moved
+    templates, as found by find_places().
+
+    '''
+    templates = list(templates)
+    for i, (host, origin) in find_places(templates, spacing).items():
+        position = templates[host].position
+        templates[i] = templates[i]._replace(
+            position=point.Point(position.x + origin.x, position.y + origin.y),
+            cavities=())
+    return templates
+
+
+def arrange_blocks(blocks: list[list[render.Template]], material_width: float,
+                   spacing: float,
+                   fill: bool = True) -> list[render.Template]:
+    '''Lay out blocks of placed templates together, as one job.
+
+    Each block keeps its own layout, like the templates of one model. With
+    fill, templates are first moved into any block's cavities, by
+    find_places(). Blocks are then placed in rows no wider than
+    material_width, each block as wide as the templates that stay in it.
+    Blocks with no templates left take no space.
+
+    Returns the templates of all blocks, in order.
+
+    '''
+    templates = [template for block in blocks for template in block]
+    block_of = [b for b, block in enumerate(blocks) for _ in block]
+    places = find_places(templates, spacing) if fill else {}
+
+    bounds = {}
+    boxes = [[math.inf, math.inf, -math.inf, -math.inf] for _ in blocks]
+    for i, template in enumerate(templates):
+        key = id(template.outline)
+        if key not in bounds:
+            bounds[key] = metrics.outline_bounds(template.outline)
+        if i in places:
+            continue
+        box = boxes[block_of[i]]
+        xmin, ymin, xmax, ymax = bounds[key]
+        box[0] = min(box[0], template.position.x + xmin)
+        box[1] = min(box[1], template.position.y + ymin)
+        box[2] = max(box[2], template.position.x + xmax)
+        box[3] = max(box[3], template.position.y + ymax)
+
+    # Offset of each block's templates.
+    offsets = [None] * len(blocks)
+    x = y = row_height = 0
+    for b, (xmin, ymin, xmax, ymax) in enumerate(boxes):
+        if xmin > xmax:
+            continue
+        width = xmax - xmin
+        if x > 0 and x + width > material_width:
+            x = 0
+            y += row_height + spacing
+            row_height = 0
+        offsets[b] = point.Point(x - xmin, y - ymin)
+        x += width + spacing
+        row_height = max(row_height, ymax - ymin)
+
+    result = list(templates)
+    for i, template in enumerate(templates):
+        if i not in places:
+            offset = offsets[block_of[i]]
+            result[i] = template._replace(position=point.Point(
+                template.position.x + offset.x,
+                template.position.y + offset.y))
+    for i, (host, origin) in places.items():
+        position = result[host].position
+        result[i] = templates[i]._replace(
+            position=point.Point(position.x + origin.x, position.y + origin.y),
+            cavities=())
+    return result
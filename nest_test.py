@@ -0,0 +1,103 @@
+import math
+import unittest
+
+from common import point
+
+import nest
+import render
+import testing
+
+
+def inside(template: render.Template, host: render.Template,
+           spacing: float) -> bool:
+    '''Return True if template's corners are inside host's cavity.'''
+    cavity = host.cavities[0]
+    size = template.outline.x[1]
+    for dx in (-spacing, size + spacing):
+        for dy in (-spacing, size + spacing):
+            x = template.position.x + dx - host.position.x - cavity.center.x
+            y = template.position.y + dy - host.position.y - cavity.center.y
+            distance = (x / cavity.radius_x) ** 2 + (y / cavity.radius_y) ** 2
+            if distance > 1 + 1e-9 or x + cavity.center.x < cavity.min_x:
+                return False
+    return True
+
+
+class TestNest(unittest.TestCase):
+    def test_chord(self):
+        shelves = nest.Shelves(render.Cavity(point.Point(0, 0), 10, 5), 0)
+        left, right = shelves.chord(-3, 3)
+        self.assertAlmostEqual(right, 8)
+        self.assertAlmostEqual(left, -8)
+        self.assertLess(shelves.chord(-6, 0)[1], shelves.chord(-6, 0)[0])
+
+    def test_half_cavity(self):
+        shelves = nest.Shelves(
+            render.Cavity(point.Point(0, 0), 10, 10, min_x=0), 1)
+        corner = shelves.place(4, 4)
+        self.assertEqual(corner.x, 1)
+        self.assertIsNone(shelves.place(9, 4))
+
+    def test_fill_ring(self):
+        host = testing.ring(50, 30, 100, 100)
+        templates = [host] + [testing.square(10, 200 + 20 * i, 0)
+                              for i in range(6)]
+        nested = nest.fill_cavities(templates, 2)
+        self.assertEqual(nested[0], host)
+        for template in nested[1:]:
+            self.assertTrue(inside(template, host, 2))
+        # No two squares overlap.
+        for i, a in enumerate(nested[1:]):
+            for b in nested[i + 2:]:
+                self.assertTrue(
+                    abs(a.position.x - b.position.x) >= 12 or
+                    abs(a.position.y - b.position.y) >= 12)
+
+    def test_too_large(self):
+        templates = [testing.ring(50, 30), testing.square(45, 200, 0)]
+        self.assertEqual(nest.fill_cavities(templates, 2), templates)
+
+    def test_identical_rings(self):
+        # Identical rings do not fit in each other, and hosts stay put.
+        templates = [testing.ring(50, 30, 100 * i, 0) for i in range(3)]
+        self.assertEqual(nest.fill_cavities(templates, 2), templates)
+
+    def test_small_ring(self):
+        # A small ring moves into a large ring, and cannot host in turn.
+        templates = [testing.ring(50, 30), testing.ring(20, 10, 200, 0),
+                     testing.square(6, 300, 0)]
+        nested = nest.fill_cavities(templates, 1)
+        self.assertLess(math.hypot(nested[1].position.x,
+                                   nested[1].position.y), 30 - 20)
+        self.assertEqual(nested[1].cavities, ())
+        square_position = nested[2].position
+        self.assertLess(math.hypot(square_position.x, square_position.y),
+                        30)
+
+    def test_arrange_blocks(self):
+        # Two rings side by side, and a block of squares that fits inside
+        # them, so the squares' block takes no space.
+        rings = [testing.ring(50, 30, 0, 0), testing.ring(50, 30, 102, 0)]
+        squares = [testing.square(10, 0, 0), testing.square(10, 12, 0)]
+        templates = nest.arrange_blocks([rings, squares], 500, 2)
+        self.assertEqual(templates[0].position, point.Point(50, 50))
+        self.assertEqual(templates[1].position, point.Point(152, 50))
+        for template in templates[2:]:
+            self.assertLess(math.hypot(template.position.x - 50,
+                                       template.position.y - 50), 30)
+
+    def test_arrange_blocks_rows(self):
+        blocks = [[testing.square(10, 5, 5)], [testing.square(10)],
+                  [testing.square(10)]]
+        templates = nest.arrange_blocks(blocks, 25, 2)
+        self.assertEqual([t.position for t in templates],
+                         [point.Point(0, 0), point.Point(12, 0),
+                          point.Point(0, 12)])
+        # Without filling, blocks keep their templates.
+        templates = nest.arrange_blocks(
+            [[testing.ring(50, 30)], [testing.square(10)]], 500, 2, fill=False)
+        self.assertEqual(templates[1].position, point.Point(102, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
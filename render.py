@@ -1,16 +1,40 @@
 import collections
 import enum
+import math
 import typing
 
+import numpy as np
+
 from common import path
 from common import point
 
+import geometry
+
 #  outer: Where the slot intersects the slice's outer edge.
 #  inner: Where the slot intersects the slice's inner edge.
 # middle: Midpoints between the outer and inner intersections.
 Intersection = collections.namedtuple(
     'Intersection', ['outer', 'middle', 'inner'])
 
+# An empty elliptical region inside a template, in template coordinates, where
+# nest.fill_cavities() can place other templates. Only the part of the
+# ellipse with x >= min_x is empty.
+Cavity = collections.namedtuple(
+    'Cavity', ['center', 'radius_x', 'radius_y', 'min_x'],
+    defaults=[-math.inf])
+
+#    outline: The template's geometry.Outline, in template coordinates.
+#      slots: Corners of each slot or notch drawn in the outline, as
+#             returned by merge_slots().
+# fill_color: Fill color for the template's path element.
+#   position: Where the template's origin is placed, in user units.
+#   cavities: Cavity regions that no other template covers, once the
+#             template is placed.
+#      label: The slice's number, which --labels writes on it, or None.
+Template = collections.namedtuple(
+    'Template', ['outline', 'slots', 'fill_color', 'position', 'cavities',
+                 'label'], defaults=[(), None])
+
 
 def reverse_intersections(
         intersections: list[Intersection]) -> list[Intersection]:
@@ -44,12 +68,194 @@ class OuterInner(enum.IntEnum):
     INNER = 1
 
 
+def slot_corners(intersection: Intersection,
+                 outer_inner: OuterInner) -> list[point.Point]:
+    """Return a slot's corners [a, b, c, d], in drawing order.
+
+    The first slot wall is a line between points (a) and (b), the bottom of
+    the slot is a line between points (b) and (c), and the second slot wall is
+    a line between points (c) and (d).
+
+    """
+    if outer_inner == OuterInner.OUTER:
+        return [intersection.outer[0], intersection.middle[0],
+                intersection.middle[1], intersection.outer[1]]
+    else:
+        return [intersection.inner[0], intersection.middle[0],
+                intersection.middle[1], intersection.inner[1]]
+
+
+def overlaps(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Return whether each pair of slots overlaps or touches.
+
+    first and second are (n, 4, 2) arrays, with the corners [a, b, c, d] of n
+    slots each. Slots are convex quadrilaterals, which are disjoint if and
+    only if the normal of one of their sides separates them.
+
+    """
+    quads = np.concatenate([first, second], axis=1)
+    sides = np.concatenate([np.roll(first, -1, axis=1) - first,
+                            np.roll(second, -1, axis=1) - second], axis=1)
+    # Each side's normal, for the corners of both slots.
+    normals = np.stack([-sides[..., 1], sides[..., 0]], axis=-1)
+    along = np.einsum('nij,nkj->nik', normals, quads)
+    a = along[..., :4]
+    b = along[..., 4:]
+    separated = ((a.max(axis=2) < b.min(axis=2)) |
+                 (b.max(axis=2) < a.min(axis=2)))
+    return ~separated.any(axis=1)
+
+
+def slots_overlap(first: list[point.Point],
+                  second: list[point.Point]) -> bool:
+    """Return True if two slots overlap or touch. See overlaps()."""
+    return bool(overlaps(np.array([[(p.x, p.y) for p in first]]),
+                         np.array([[(p.x, p.y) for p in second]]))[0])
+
+
+def merge_slots(slots: list[list[point.Point]],
+                cyclic: bool = False) -> list[list[point.Point]]:
+    """Merge consecutive slots that overlap or touch into notches.
+
+    slots are corners [a, b, c, d], in drawing order. Each notch starts at the
+    first slot's (a) and (b), and ends at the (c) and (d) of the slot whose
+    second wall is farthest along. The bottom of the notch follows the
+    bottoms of the merged slots, so the notch covers every merged slot, plus
+    the slivers between their walls, and is never deeper than the slots.
+    Slots that end before the notch's second wall are inside the notch
+    already, and add no corners.
+
+    If cyclic, slots go around a closed edge, and the last notch also merges
+    with the first one. The merged notch is returned last.
+
+    Slots that do not need merging are returned unchanged.
+
+    """
+    def side(wall_start, wall_end, p):
+        return ((wall_end.x - wall_start.x) * (p.y - wall_start.y) -
+                (wall_end.y - wall_start.y) * (p.x - wall_start.x))
+
+    def toward(start, end, p, q):
+        """Return a value that is positive if p is on q's side of a line."""
+        return side(start, end, p) * side(start, end, q)
+
+    def crossing(start, end, wall_start, wall_end):
+        """Return where start to end crosses the wall, or None."""
+        before = side(wall_start, wall_end, start)
+        after = side(wall_start, wall_end, end)
+        if (before * after >= 0 or side(start, end, wall_start) *
+                side(start, end, wall_end) >= 0):
+            return None
+        t = before / (before - after)
+        return point.Point(start.x + t * (end.x - start.x),
+                           start.y + t * (end.y - start.y))
+
+    if not slots:
+        return []
+    corners = np.array([[(p.x, p.y) for p in slot] for slot in slots])
+    # Whether each slot overlaps the slot before it.
+    follows = overlaps(corners[:-1], corners[1:])
+
+    notches = []
+    starts = []
+    # The slot whose second wall ends the last notch.
+    end = None
+    for i, slot in enumerate(slots):
+        if i == 0 or not (follows[i - 1] or (
+                end != i - 1 and slots_overlap(slots[end], slot))):
+            notches.append(list(slot))
+            starts.append(i)
+            end = i
+            continue
+        last = slots[end]
+        if toward(last[2], last[3], slot[3], last[0]) > 0:
+            # This slot ends inside the notch.
+            continue
+        notch = notches[-1]
+        # Drop the last slot's top corner (d), and keep its bottom corner
+        # (c), unless it is past this slot's first wall. If only c is past
+        # that wall, the notch turns where the last slot's bottom crosses it.
+        # If only this slot's bottom corner (b) is past the last slot's
+        # second wall, the notch turns where this slot's bottom crosses that
+        # wall, instead of at b. Either way, the notch follows both bottoms,
+        # instead of cutting across to b.
+        del notch[-1]
+        c = notch.pop()
+        b = slot[1]
+        c_inside = toward(slot[0], slot[1], c, slot[3]) > 0
+        b_inside = toward(last[2], last[3], b, last[0]) > 0
+        if c_inside and not b_inside:
+            turn = crossing(notch[-1], c, slot[0], slot[1])
+            if turn:
+                notch.append(turn)
+        elif b_inside and not c_inside:
+            notch.append(c)
+            b = crossing(slot[1], slot[2], c, last[3]) or b
+        elif not c_inside:
+            notch.append(c)
+        notch += [b] + slot[2:]
+        end = i
+
+    if cyclic and len(notches) > 1 and slots_overlap(slots[end], slots[0]):
+        # Start from the second notch, so the last notch runs on into the
+        # first one.
+        return merge_slots(slots[starts[1]:] + slots[:starts[1]])
+    return notches
+
+
+def clip_notch(
+        notch: list[point.Point],
+        distance: typing.Callable[[point.Point], float]
+) -> typing.Optional[list[point.Point]]:
+    """Return the part of a notch where distance() is not negative.
+
+    distance() is linear, like a signed distance from a line. Corners before
+    the first kept corner are replaced by the point where the notch crosses
+    the line, and so are corners after the last one. Returns None if no
+    corner is kept.
+
+    """
+    distances = [distance(p) for p in notch]
+    kept = [i for i, d in enumerate(distances) if d >= 0]
+    if not kept:
+        return None
+
+    def crossing(i, j):
+        t = distances[i] / (distances[i] - distances[j])
+        return point.Point(notch[i].x + t * (notch[j].x - notch[i].x),
+                           notch[i].y + t * (notch[j].y - notch[i].y))
+
+    first, last = kept[0], kept[-1]
+    clipped = notch[first:last + 1]
+    if first > 0:
+        clipped.insert(0, crossing(first - 1, first))
+    if last < len(notch) - 1:
+        clipped.append(crossing(last, last + 1))
+    return clipped
+
+
 def elliptical_slotted_path(
-        intersections: list[Intersection], outer_inner: OuterInner,
-        winding: path.Winding, radius_x: float, radius_y: float,
-        end: point.Point, skip: typing.Callable[[int], bool]) -> str:
-    """Return path commands to render a slotted elliptical curve.
+        outline: geometry.Outline, intersections: list[Intersection],
+        outer_inner: OuterInner, winding: path.Winding, radius_x: float,
+        radius_y: float, end: point.Point,
+        skip: typing.Callable[[int], bool],
+        min_x: float = -math.inf,
+        back_edge: bool = False) -> list[list[point.Point]]:
+    """Append segments that render a slotted elliptical curve to outline.
+
+    Returns the corners of each slot that was drawn. Slots that overlap or
+    touch are drawn as one notch, see merge_slots().
 
+    Notches are clipped to x >= min_x, see clip_notch(). The curve must then
+    start and end on the line x = min_x, like the back of a 'C' slice, or the
+    points of a crescent. A notch that crosses the line starts where the
+    curve starts, or ends where it ends, instead of at the crossing. If
+    back_edge is set, the edges before and after the curve run along the
+    line, so the notch is cut along it instead: the previous edge is moved
+    to end at the crossing, and the curve ends at the crossing, instead of
+    at end, so callers continue from outline's end point.
+
+    :param outline: Receives the segments.
     :param intersections: Specifies slot locations
     :param outer_inner: Chooses between rendering the outer and inner edges
     :param winding: Drawing direction: clockwise (Winding.CW) or
@@ -58,37 +264,179 @@ def elliptical_slotted_path(
     :param radius_y: Vertical ellipse radius.
     :param end: End point for the elliptical path.
     :param skip: Function that returns true when a slot should not be rendered.
+    :param min_x: Smallest x of the drawn notches.
+    :param back_edge: Whether the curve's neighbouring edges run along the
+        line x = min_x.
 
     """
-    commands = ''
-    for i, intersection in enumerate(intersections):
-        if skip(i):
+    slots = [slot_corners(intersection, outer_inner)
+             for i, intersection in enumerate(intersections) if not skip(i)]
+    start = outline.end_point(len(outline) - 1)
+    notches = []
+    clipped_end = False
+    for notch in merge_slots(slots):
+        clipped = clip_notch(notch, lambda p: p.x - min_x)
+        if clipped is None:
             continue
-
-        # Draw a slot. The first slot wall is a line between points (a) and
-        # (b), the bottom of the slot is a line between points (b) and (c), and
-        # the second slot wall is a line between points (c) and (d).
+        if notch[0].x < min_x:
+            if back_edge:
+                outline.replace_end(clipped[0])
+                start = clipped[0]
+            else:
+                clipped[0] = start
+        if notch[-1].x < min_x:
+            if back_edge:
+                clipped_end = True
+            else:
+                clipped[-1] = end
+        notches.append(clipped)
+    for notch in notches:
+        # Draw a slot:
         #
         # 1. Draw an elliptical arc to the first top corner (a)
         # 2. Draw a straight line to the first bottom corner (b)
         # 3. Draw a straight line to the second bottom corner (c)
         # 4. Draw a straight line to the second top corner (d)
-        b = intersection.middle[0]
-        c = intersection.middle[1]
-        if outer_inner == OuterInner.OUTER:
-            a = intersection.outer[0]
-            d = intersection.outer[1]
-        else:
-            a = intersection.inner[0]
-            d = intersection.inner[1]
-
-        commands += path.arc_abs(
-            radius_x, radius_y, path.Size.SMALL, winding, a)
-        commands += path.line_abs(b)
-        commands += path.line_abs(c)
-        commands += path.line_abs(d)
+        #
+        # Merged notches have more bottom corners.
+        if notch[0] is not start:
+            outline.arc(radius_x, radius_y, path.Size.SMALL, winding,
+                        notch[0])
+        for corner in notch[1:]:
+            outline.line(corner)
 
     # Draw the last segment of the elliptical arc, to 'end'.
-    commands += path.arc_abs(
-        radius_x, radius_y, path.Size.SMALL, winding, end)
-    return commands
+    if not clipped_end and (not notches or notches[-1][-1] is not end):
+        outline.arc(radius_x, radius_y, path.Size.SMALL, winding, end)
+    return notches
+
+
+def elliptical_slotted_ring(
+        outline: geometry.Outline, right: list[Intersection],
+        left: list[Intersection], outer_inner: OuterInner, radius_x: float,
+        radius_y: float,
+        skip: typing.Callable[[int], bool]) -> list[list[point.Point]]:
+    """Append a slotted ellipse, centered at (0, 0), to outline.
+
+    The ellipse is a closed subpath, drawn counterclockwise from its bottom.
+    right and left specify the slot locations on its right and left halves,
+    in drawing order, and skip() gets each slot's index in its half. Returns
+    the corners of each slot that was drawn.
+
+    Slots that overlap or touch are drawn as one notch, see merge_slots(),
+    even across the top or bottom of the ellipse. If a notch covers the
+    bottom, the subpath starts at the end of that notch instead.
+
+    """
+    def position(p):
+        """Return how far around the ellipse p is, from its bottom."""
+        return math.atan2(p.x, p.y) % (2 * math.pi)
+
+    slots = [slot_corners(intersection, outer_inner)
+             for half in (right, left)
+             for i, intersection in enumerate(half) if not skip(i)]
+    notches = merge_slots(slots, cyclic=True)
+    bottom = point.Point(0, radius_y)
+    top = point.Point(0, -radius_y)
+    # A notch that covers the bottom is last.
+    wraps = bool(notches) and (position(notches[-1][-1]) <
+                               position(notches[-1][0]))
+    start = notches[-1][-1] if wraps else bottom
+    outline.move(start)
+
+    def arc(start, end, p):
+        """Draw the ellipse from position start to p, at position end."""
+        # Split arcs at the top, so each one is less than half the ellipse.
+        if start < math.pi < end:
+            outline.arc(radius_x, radius_y, path.Size.SMALL, path.Winding.CCW,
+                        top)
+        outline.arc(radius_x, radius_y, path.Size.SMALL, path.Winding.CCW, p)
+
+    drawn = position(start)
+    for notch in notches:
+        arc(drawn, position(notch[0]), notch[0])
+        for corner in notch[1:]:
+            outline.line(corner)
+        drawn = position(notch[-1])
+    if not wraps:
+        arc(drawn, 2 * math.pi, bottom)
+    outline.close()
+    return notches
+
+
+def center_crossings(radius_x: float, radius_y: float, center_x: float,
+                     angles: np.ndarray) -> np.ndarray:
+    """Return where each slot's center line leaves an ellipse.
+
+    The center lines are y = tan(angle) * x, as in slot_corners() with no
+    width, and the ellipse is centered at (center_x, 0), with the given
+    radii. Returns an (n, 2) array, with the crossing with the larger x for
+    each angle.
+
+    """
+    slope = np.tan(np.asarray(angles, dtype=float))
+    # Substitute the line into the ellipse's equation, and solve
+    # a * x^2 + b * x + c = 0 for the positive root, as in
+    # cylinder_calculations.intersect_ellipse_line().
+    a = 1 / (radius_x * radius_x) + slope * slope / (radius_y * radius_y)
+    b = -2 * center_x / (radius_x * radius_x)
+    c = center_x * center_x / (radius_x * radius_x) - 1
+    x = (-b + np.sqrt(b * b - 4 * a * c)) / (2 * a)
+    return np.stack([x, slope * x], axis=1)
+
+
+def center_marks(outer: np.ndarray, inner: np.ndarray,
+                 outer_inner: OuterInner) -> tuple[np.ndarray, np.ndarray]:
+    """Return the starts and ends of the marks of slots on one edge.
+
+    outer and inner are (n, 2) arrays of where each slot's center crosses
+    the slice's outer and inner edges. Marks run from outer_inner's edge to
+    the slot's bottom, halfway between the edges.
+
+    """
+    start = outer if outer_inner == OuterInner.OUTER else inner
+    return start, (outer + inner) / 2
+
+
+def ring_marks(outer: np.ndarray, inner: np.ndarray,
+               slice_num: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return the starts and ends of a ring's marks, see center_marks().
+
+    The ring's right half has the slots of outer and inner, and its left
+    half has them mirrored, in reverse order, as drawn by
+    elliptical_slotted_ring(). In each half, slots before slice_num are on
+    the inner edge, and the others are on the outer edge.
+
+    """
+    mirror = np.array([-1, 1])
+    outer = np.concatenate([outer, outer[::-1] * mirror])
+    inner = np.concatenate([inner, inner[::-1] * mirror])
+    on_outer = np.tile(np.arange(len(outer) // 2) >= slice_num, 2)
+    return (np.where(on_outer[:, np.newaxis], outer, inner),
+            (outer + inner) / 2)
+
+
+def slot_marks(edges: geometry.Outline, starts: np.ndarray,
+               ends: np.ndarray) -> geometry.Outline:
+    """Return edges, with a line from each start to its end.
+
+    The lines mark slots without cutting them, from where the slot's center
+    crosses the edge to the slot's bottom. This is much simpler to draw
+    than the slots themselves. starts and ends are (n, 2) arrays, and marks
+    with NaN ends, for slots that miss the slice, are skipped.
+
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+    drawn = ~(np.isnan(starts).any(axis=1) | np.isnan(ends).any(axis=1))
+    # Each mark is a move, then a line, so the points alternate.
+    points = np.stack([starts[drawn], ends[drawn]], axis=1).reshape(-1, 2)
+    kinds = np.tile([geometry.Segment.MOVE, geometry.Segment.LINE],
+                    int(np.count_nonzero(drawn)))
+    zeros = np.zeros(len(points))
+    result = edges.copy()
+    result.extend(geometry.from_arrays(
+        kinds, points[:, 0], points[:, 1], zeros, zeros, zeros, zeros,
+        tuple(map(float, points[-2])) if len(points) else
+        edges.subpath_start))
+    return result
@@ -0,0 +1,234 @@
+import math
+import unittest
+
+import numpy as np
+
+from common import path
+from common import point
+
+import cylinder_calculations
+import geometry
+import render
+import torus_calculations
+
+
+def slot(x: float, width: float, depth: float = 4,
+         tilt: float = 0) -> list[point.Point]:
+    '''Return corners of a slot cut down from y = 0, with tilted walls.'''
+    return [point.Point(x, 0), point.Point(x + tilt, depth),
+            point.Point(x + width + tilt, depth), point.Point(x + width, 0)]
+
+
+def coordinates(points: list[point.Point]) -> list[tuple[float, float]]:
+    return [(p.x, p.y) for p in points]
+
+
+class TestMergeSlots(unittest.TestCase):
+    def test_separate_slots(self):
+        slots = [slot(0, 1), slot(2, 1)]
+        self.assertEqual(render.merge_slots(slots), slots)
+        self.assertFalse(render.slots_overlap(*slots))
+
+    def test_overlapping_slots(self):
+        notches = render.merge_slots([slot(0, 2), slot(1, 2), slot(5, 1)])
+        self.assertEqual(len(notches), 2)
+        # The first slot's bottom corner (c) is inside the second slot.
+        self.assertEqual(coordinates(notches[0]),
+                         [(0, 0), (0, 4), (1, 4), (3, 4), (3, 0)])
+        self.assertEqual(coordinates(notches[1]), coordinates(slot(5, 1)))
+
+    def test_crossing_bottom(self):
+        # The first slot's bottom corner (c) is past the second slot's first
+        # wall, but the second slot's bottom corner (b) is not inside the
+        # first slot. The notch turns where the first bottom crosses that
+        # wall, instead of cutting across to (b).
+        slots = [slot(0, 2, depth=3), slot(.5, 2, tilt=1.8)]
+        expected = [(0, 0), (0, 3), (1.85, 3), (2.3, 4), (4.3, 4), (2.5, 0)]
+        notches = render.merge_slots(slots)
+        self.assertEqual(len(notches), 1)
+        np.testing.assert_allclose(coordinates(notches[0]), expected)
+        # Mirrored, and drawn the other way, the second slot's bottom turns
+        # where it crosses the first slot's second wall.
+        mirrored = [[point.Point(-p.x, p.y) for p in reversed(corners)]
+                    for corners in reversed(slots)]
+        notches = render.merge_slots(mirrored)
+        np.testing.assert_allclose(coordinates(notches[0]),
+                                   [(-x, y) for x, y in reversed(expected)])
+
+    def test_touching_slots(self):
+        self.assertTrue(render.slots_overlap(slot(0, 1), slot(1, 1)))
+        notches = render.merge_slots([slot(0, 1), slot(1, 1)])
+        self.assertEqual(len(notches), 1)
+
+    def test_crossing_walls(self):
+        # The second slot's first wall leans back across the first slot's
+        # second wall, leaving a sliver between them at the bottom. The merged
+        # notch keeps both bottoms, and drops the sliver.
+        first = slot(0, 1)
+        second = slot(.9, 1, tilt=.5)
+        notches = render.merge_slots([first, second])
+        self.assertEqual(len(notches), 1)
+        self.assertEqual(coordinates(notches[0]),
+                         coordinates(first[:3] + second[1:]))
+
+
+    def test_nested_slots(self):
+        # The second slot is inside the first one, and the third slot only
+        # overlaps the first one. The notch ends with the third slot.
+        notches = render.merge_slots([slot(0, 3), slot(1, .5), slot(2.5, 1)])
+        self.assertEqual(len(notches), 1)
+        self.assertEqual(coordinates(notches[0]),
+                         [(0, 0), (0, 4), (2.5, 4), (3.5, 4), (3.5, 0)])
+
+    def test_cyclic(self):
+        slots = [slot(0, 1), slot(3, 1), slot(6, 1), slot(6.5, 1)]
+        self.assertEqual(len(render.merge_slots(slots)), 3)
+        self.assertEqual(len(render.merge_slots(slots, cyclic=True)), 3)
+        # The last slot overlaps the first one, around the edge.
+        slots[-1] = slot(-.5, 1)
+        notches = render.merge_slots(slots, cyclic=True)
+        self.assertEqual([coordinates(notch)[0] for notch in notches],
+                         [(3, 0), (6, 0), (-.5, 0)])
+        self.assertEqual(coordinates(notches[-1])[-1], (1, 0))
+
+    def test_overlaps(self):
+        corners = np.array([coordinates(s) for s in (
+            slot(0, 1), slot(1, 1), slot(1.1, 1), slot(.9, 1, tilt=.5))])
+        np.testing.assert_array_equal(
+            render.overlaps(corners[[0, 0, 0]], corners[1:]),
+            [True, False, True])
+
+
+class TestEllipticalPaths(unittest.TestCase):
+    def intersection(self, angle, radius):
+        '''Return a slot one unit wide, at angle, across a circle's edge.
+
+        Angles are clockwise from the x-axis, because y points down, so the
+        slot's corners are in counterclockwise order.
+
+        '''
+        def corners(r):
+            return [point.Point(r * math.cos(angle + t),
+                                r * math.sin(angle + t))
+                    for t in (.5 / r, -.5 / r)]
+        return render.Intersection(outer=corners(radius),
+                                   middle=corners(radius / 2),
+                                   inner=corners(radius / 4))
+
+    def test_ring_seam(self):
+        # Slots on both sides of the top of a circle are one notch, and the
+        # circle is split at the top between the others.
+        right = [self.intersection(a, 10) for a in (.5, -math.pi / 2 + .03)]
+        left = render.mirror_intersections(render.reverse_intersections(right))
+        outline = geometry.Outline()
+        notches = render.elliptical_slotted_ring(
+            outline, right, left, render.OuterInner.OUTER, 10, 10,
+            skip=lambda i: False)
+        self.assertEqual(len(notches), 3)
+        self.assertGreater(notches[1][0].x, 0)
+        self.assertLess(notches[1][-1].x, 0)
+        self.assertEqual(outline.kinds[0], geometry.Segment.MOVE)
+        self.assertEqual(outline.kinds[-1], geometry.Segment.CLOSE)
+        self.assertEqual(outline.end_point(0), point.Point(0, 10))
+
+    def test_ring_bottom(self):
+        # A notch across the bottom of the circle starts the subpath.
+        right = [self.intersection(a, 10) for a in (math.pi / 2 - .03, 0)]
+        left = render.mirror_intersections(render.reverse_intersections(right))
+        outline = geometry.Outline()
+        notches = render.elliptical_slotted_ring(
+            outline, right, left, render.OuterInner.OUTER, 10, 10,
+            skip=lambda i: False)
+        self.assertEqual(len(notches), 3)
+        self.assertEqual(outline.end_point(0), notches[-1][-1])
+        self.assertEqual(outline.end_point(len(outline) - 2),
+                         notches[-1][-1])
+
+    def test_clip(self):
+        # The slot crosses the back of a 'C', at x = 0.
+        intersection = self.intersection(math.pi / 2 - .03, 10)
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 10))
+        notches = render.elliptical_slotted_path(
+            outline, [intersection], render.OuterInner.OUTER,
+            path.Winding.CCW, 10, 10, point.Point(0, -10),
+            skip=lambda i: False, min_x=0)
+        self.assertEqual(len(notches), 1)
+        self.assertGreater(min(p.x for p in notches[0]), -1e-12)
+        # The notch starts where the curve starts, on the back, instead of
+        # where the slot crosses it.
+        self.assertEqual(notches[0][0], point.Point(0, 10))
+        self.assertEqual(outline.end_point(1), notches[0][1])
+        self.assertIsNone(render.clip_notch(notches[0], lambda p: p.x - 100))
+
+        # Along the back's edge, the notch is cut along the back instead,
+        # from where the slot crosses it.
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 10))
+        notches = render.elliptical_slotted_path(
+            outline, [intersection], render.OuterInner.OUTER,
+            path.Winding.CCW, 10, 10, point.Point(0, -10),
+            skip=lambda i: False, min_x=0, back_edge=True)
+        self.assertEqual(notches[0][0].x, 0)
+        self.assertLess(notches[0][0].y, 10)
+        self.assertEqual(outline.end_point(0), notches[0][0])
+        self.assertEqual(outline.subpath_start,
+                         (notches[0][0].x, notches[0][0].y))
+
+
+class TestSlotMarks(unittest.TestCase):
+    def test_slot_marks(self):
+        # A square, with marks down from its top edge.
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 0))
+        for x, y in [(10, 0), (10, 10), (0, 10)]:
+            outline.line(point.Point(x, y))
+        outline.close()
+
+        # Marks with NaN ends are skipped.
+        marks = render.slot_marks(outline,
+                                  [(2.5, 0), (6.5, 0), (np.nan, np.nan)],
+                                  [(2.5, 4), (6.5, 4), (8, 4)])
+        self.assertEqual(
+            [(kind, x, y) for kind, x, y in zip(marks.kinds, marks.x,
+                                                 marks.y)],
+            [(geometry.Segment.MOVE, 0, 0), (geometry.Segment.LINE, 10, 0),
+             (geometry.Segment.LINE, 10, 10), (geometry.Segment.LINE, 0, 10),
+             (geometry.Segment.CLOSE, 0, 0),
+             (geometry.Segment.MOVE, 2.5, 0), (geometry.Segment.LINE, 2.5, 4),
+             (geometry.Segment.MOVE, 6.5, 0),
+             (geometry.Segment.LINE, 6.5, 4)])
+        self.assertEqual(len(outline), 5)
+
+    def test_center_crossings(self):
+        # Slot centers are slots with no width.
+        angles = [-1.2, -0.3, 0, 0.5, 1.4]
+        crossings = render.center_crossings(3, 5, 0, angles)
+        for angle, crossing in zip(angles, crossings):
+            expected = cylinder_calculations.slot_corners(3, 5, angle, 0)[0]
+            self.assertAlmostEqual(crossing[0], expected.x)
+            self.assertAlmostEqual(crossing[1], expected.y)
+        crossings = render.center_crossings(4, 4, -1.5, angles)
+        for angle, crossing in zip(angles, crossings):
+            expected = torus_calculations.slot_corners(4, -1.5, 0, angle)[0]
+            self.assertAlmostEqual(crossing[0], expected.x)
+            self.assertAlmostEqual(crossing[1], expected.y)
+
+    def test_ring_marks(self):
+        outer = np.array([[4, -2], [5, 0], [4, 2]])
+        inner = outer / 2
+        starts, ends = render.ring_marks(outer, inner, 1)
+        # The first slot in each half is on the inner edge. The left half
+        # is mirrored, in reverse order.
+        np.testing.assert_array_equal(
+            starts, [[2, -1], [5, 0], [4, 2], [-2, 1], [-5, 0], [-4, -2]])
+        np.testing.assert_array_equal(ends, 0.75 * np.concatenate(
+            [outer, [[-4, 2], [-5, 0], [-4, -2]]]))
+        starts, ends = render.center_marks(outer, inner,
+                                           render.OuterInner.INNER)
+        np.testing.assert_array_equal(starts, inner)
+        np.testing.assert_array_equal(ends, 0.75 * outer)
+
+
+if __name__ == '__main__':
+    unittest.main()
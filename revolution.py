@@ -0,0 +1,614 @@
+'''Slice any solid of revolution, from its profile.
+
+The hand-coded models each work out their slices' geometry by hand. This
+finds it numerically instead, from the solid's profile, so a new shape only
+needs the radii of its surfaces at each height:
+
+   outer(z), inner(z): Radii of the solid's outer and inner surfaces, at
+                       heights z from the shape's bottom to its top. Inner
+                       radius 0 is solid.
+
+As in fit.py, each slice lies in a plane through the shape's center, whose
+template y-axis climbs at tilt: the loxodromic angle for the slices with
+slots on the outer edge, and minus the loxodromic angle for their mirror
+images. Template point (x, y) is at height z = y sin(tilt), and at distance
+sqrt(x² + (z / tan(tilt))²) from the axis, so the slice covers
+
+   inner_x(y) <= x <= outer_x(y), with edge_x(y) = sqrt(edge(z)² -
+                                                        (z / tan(tilt))²)
+
+where edge_x is 0 where the surface is closer to the axis than the plane.
+By default, the loxodromic angle is the smallest at which the slices reach
+the shape's top and bottom, the largest |z| / outer(z). That is the
+cylinder's and the truncated sphere's angle. Shapes can set their own, as
+the torus and the hyperboloid do.
+
+Each profile is sampled once, at SAMPLES heights, closer together near the
+top and bottom, and cached. The slices' edges are polylines through the
+samples. Slot corners are found on the exact profile: the polylines bracket
+where each slot wall crosses the edges, and every crossing is bisected at
+once. Slices are 'C' shaped, and slots with only one wall on the slice cut
+off the corner past that wall, as in hyperboloid.py.
+
+SHAPES has the hand-coded models, with fit.py's parameters, to cross-check
+them, and shapes that have no hand-coded model:
+
+        cone: Straight sides, from bottom_radius to top_radius.
+   ellipsoid: A spheroid with equator radius, cut to height, where its
+              radius is top_radius.
+        vase: Radius bottom_radius at the bottom, radius halfway up, and
+              top_radius at the top, with a parabolic profile.
+
+Their walls are wall_width wide, horizontally.
+
+'''
+
+import collections
+import functools
+import math
+
+import numpy as np
+
+from common import point
+
+import calculations
+import geometry
+import hyperboloid_calculations
+import render
+
+# Each profile is first sampled at SAMPLES heights. Then, for up to
+# REFINEMENTS rounds, heights are added halfway between neighbouring samples
+# wherever the slices' edges are further than TOLERANCE, relative to the
+# shape's height, from the straight lines between the samples.
+SAMPLES = 64
+REFINEMENTS = 16
+TOLERANCE = 1e-5
+
+# Number of bisections, on the exact profile, of each bracket between
+# samples: where the edges reach x = 0, and where slot walls cross them.
+BISECTIONS = 48
+
+#       parameters: Names of the shape's parameters, all lengths.
+#          profile: Function that takes an array of heights, and the
+#                   parameters as keyword arguments, and returns arrays of
+#                   the outer and inner radii at those heights.
+#          heights: Function that takes the parameters, as keyword
+#                   arguments, and returns the (bottom, top) heights.
+# loxodromic_angle: Function that takes the parameters, as keyword
+#                   arguments, and returns the loxodromic angle, or None
+#                   for the smallest angle that reaches the top and bottom.
+Shape = collections.namedtuple(
+    'Shape', ['parameters', 'profile', 'heights', 'loxodromic_angle'],
+    defaults=[None])
+
+# A sampled shape.
+#
+#            shape: Its SHAPES name.
+#       parameters: Its parameters, as a dict.
+#      bottom, top: Its heights.
+#                z: Sampled heights, from bottom to top.
+#     outer, inner: Radii at each sampled height.
+# loxodromic_angle: The slices' tilt, in radians.
+Surface = collections.namedtuple(
+    'Surface', ['shape', 'parameters', 'bottom', 'top', 'z', 'outer',
+                'inner', 'loxodromic_angle'])
+
+
+def centered(height, **parameters):
+    return -height / 2, height / 2
+
+
+def cylinder_profile(z, outer_radius, inner_radius, height):
+    return np.full_like(z, outer_radius), np.full_like(z, inner_radius)
+
+
+def truncated_sphere_profile(z, outer_radius, inner_radius, height):
+    return (np.sqrt(np.maximum(outer_radius ** 2 - z ** 2, 0)),
+            np.sqrt(np.maximum(inner_radius ** 2 - z ** 2, 0)))
+
+
+def torus_profile(z, major_radius, minor_radius):
+    half_width = np.sqrt(np.maximum(minor_radius ** 2 - z ** 2, 0))
+    return major_radius + half_width, major_radius - half_width
+
+
+def hyperboloid_profile(z, outer_edge_radius, outer_waist_radius,
+                        inner_radius, height):
+    # Both surfaces are ruled by lines in the slice planes, which climb at
+    # the loxodromic angle, so the slices are rectangles.
+    slope = (outer_edge_radius ** 2 - outer_waist_radius ** 2) / (
+        height / 2) ** 2
+    return (np.sqrt(outer_waist_radius ** 2 + slope * z ** 2),
+            np.sqrt(inner_radius ** 2 + slope * z ** 2))
+
+
+def walls(outer, wall_width):
+    return outer, np.maximum(outer - wall_width, 0)
+
+
+def cone_profile(z, bottom_radius, top_radius, height, wall_width):
+    t = z / height + .5
+    return walls(bottom_radius + (top_radius - bottom_radius) * t,
+                 wall_width)
+
+
+def ellipsoid_profile(z, radius, top_radius, height, wall_width):
+    flattening = 1 - (top_radius / radius) ** 2
+    return walls(radius * np.sqrt(np.maximum(
+        1 - flattening * (2 * z / height) ** 2, 0)), wall_width)
+
+
+def vase_profile(z, bottom_radius, radius, top_radius, height, wall_width):
+    # Lagrange interpolation, through the bottom, middle and top radii.
+    t = 2 * z / height
+    return walls(np.maximum(radius * (1 - t * t) +
+                            bottom_radius * t * (t - 1) / 2 +
+                            top_radius * t * (t + 1) / 2, 0), wall_width)
+
+
+SHAPES = {
+    'cylinder': Shape(['outer_radius', 'inner_radius', 'height'],
+                      cylinder_profile, centered),
+    'truncated_sphere': Shape(['outer_radius', 'inner_radius', 'height'],
+                              truncated_sphere_profile, centered),
+    'torus': Shape(
+        ['major_radius', 'minor_radius'], torus_profile,
+        lambda major_radius, minor_radius: (-minor_radius, minor_radius),
+        lambda major_radius, minor_radius: math.asin(minor_radius /
+                                                     major_radius)),
+    'hyperboloid': Shape(
+        ['outer_edge_radius', 'outer_waist_radius', 'inner_radius',
+         'height'], hyperboloid_profile, centered,
+        lambda outer_edge_radius, outer_waist_radius, inner_radius, height:
+        hyperboloid_calculations.loxodromic_angle(
+            height, outer_edge_radius, outer_waist_radius)),
+    'cone': Shape(['bottom_radius', 'top_radius', 'height', 'wall_width'],
+                  cone_profile, centered),
+    'ellipsoid': Shape(['radius', 'top_radius', 'height', 'wall_width'],
+                       ellipsoid_profile, centered),
+    'vase': Shape(['bottom_radius', 'radius', 'top_radius', 'height',
+                   'wall_width'], vase_profile, centered),
+}
+
+# Shapes that only this module generates.
+NEW_SHAPES = ['cone', 'ellipsoid', 'vase']
+
+
+def axis_heights(shape: str, parameters: dict, z: np.ndarray,
+                 loxodromic_angle: float) -> np.ndarray:
+    '''Return heights between samples z where the slices' edges reach x = 0.
+
+    Those are corners, like the top of the cylinder's hole, where the inner
+    edge crosses the template's y-axis, or tips, like the torus's, where it
+    touches the y-axis. They are found by bisecting each crossing, and by a
+    golden section search around each lowest sample, for every edge at
+    once.
+
+    '''
+    def gap(z, edge):
+        radii = np.stack(SHAPES[shape].profile(z, **parameters))
+        return (radii[edge, np.arange(len(z))] -
+                np.abs(z) / math.tan(loxodromic_angle))
+
+    heights = np.stack(SHAPES[shape].profile(z, **parameters)) - np.abs(
+        z) / math.tan(loxodromic_angle)
+    edge, i = np.nonzero(np.diff(heights > 0, axis=1))
+    lo, hi = z[i], z[i + 1]
+    lo_outside = gap(lo, edge) > 0
+    for _ in range(BISECTIONS):
+        middle = (lo + hi) / 2
+        same = (gap(middle, edge) > 0) == lo_outside
+        lo = np.where(same, middle, lo)
+        hi = np.where(same, hi, middle)
+    crossings = (lo + hi) / 2
+
+    edge, i = np.nonzero((heights[:, 1:-1] < heights[:, :-2]) &
+                         (heights[:, 1:-1] <= heights[:, 2:]))
+    lo, hi = z[i], z[i + 2]
+    ratio = (math.sqrt(5) - 1) / 2
+    for _ in range(BISECTIONS):
+        left = hi - ratio * (hi - lo)
+        right = lo + ratio * (hi - lo)
+        lower = gap(left, edge) < gap(right, edge)
+        hi = np.where(lower, right, hi)
+        lo = np.where(lower, lo, left)
+    middle = (lo + hi) / 2
+    tolerance = 1e-9 * (z[-1] - z[0])
+    return np.concatenate([crossings,
+                           middle[np.abs(gap(middle, edge)) < tolerance]])
+
+
+@functools.lru_cache(maxsize=64)
+def sample(shape: str, parameters: tuple) -> Surface:
+    '''Return the Surface for a shape, with parameters as sorted items.'''
+    parameters = dict(parameters)
+    bottom, top = SHAPES[shape].heights(**parameters)
+    assert top > bottom, 'Error: Height must be greater than zero'
+    # Chebyshev points, which sample curves that turn steeply near the top
+    # and bottom, like a sphere's, evenly by angle.
+    z = (top + bottom) / 2 - (top - bottom) / 2 * np.cos(
+        np.linspace(0, math.pi, SAMPLES))
+    outer, inner = SHAPES[shape].profile(z, **parameters)
+    assert np.all(outer > 0), \
+        'Error: Outer radius must be greater than zero at every height'
+    assert np.all(inner >= 0), 'Error: Inner radius must not be negative'
+    assert np.all(outer >= inner), \
+        'Error: Outer radius must be larger than inner radius'
+
+    def default_angle(z):
+        return math.atan(np.max(np.abs(z) /
+                                SHAPES[shape].profile(z, **parameters)[0]))
+    if SHAPES[shape].loxodromic_angle is None:
+        loxodromic_angle = default_angle(z)
+    else:
+        loxodromic_angle = SHAPES[shape].loxodromic_angle(**parameters)
+    assert loxodromic_angle > 0, \
+        'Error: The shape must extend above and below its center'
+
+    def edge_points(z):
+        '''Return the slices' (2, len(z)) outer and inner edge x, and y.'''
+        radii = np.stack(SHAPES[shape].profile(z, **parameters))
+        return (np.sqrt(np.maximum(
+            radii ** 2 - (z / math.tan(loxodromic_angle)) ** 2, 0)),
+                z / math.sin(loxodromic_angle))
+
+    tolerance = TOLERANCE * (top - bottom)
+    for _ in range(REFINEMENTS):
+        x, y = edge_points(z)
+        middle = (z[:-1] + z[1:]) / 2
+        middle_x, middle_y = edge_points(middle)
+        chord_x, chord_y = np.diff(x, axis=1), np.diff(y)
+        deviation = np.abs(chord_x * (middle_y - y[:-1]) -
+                           chord_y * (middle_x - x[:, :-1])) / np.hypot(
+                               chord_x, chord_y)
+        split = np.any(deviation > tolerance, axis=0)
+        if not split.any():
+            break
+        z = np.union1d(z, middle[split])
+    if SHAPES[shape].loxodromic_angle is None:
+        loxodromic_angle = default_angle(z)
+
+    z = np.union1d(z, axis_heights(shape, parameters, z, loxodromic_angle))
+    outer, inner = SHAPES[shape].profile(z, **parameters)
+    return Surface(shape=shape, parameters=parameters, bottom=bottom,
+                   top=top, z=z, outer=outer, inner=inner,
+                   loxodromic_angle=loxodromic_angle)
+
+
+def surface(shape: str, **parameters) -> Surface:
+    '''Return a shape's Surface, sampled once for each set of parameters.'''
+    assert shape in SHAPES, 'Error: Unknown shape {}, expected {}'.format(
+        shape, ', '.join(SHAPES))
+    return sample(shape, tuple(sorted(parameters.items())))
+
+
+def edges(surface: Surface, y: np.ndarray,
+          tilt: float) -> tuple[np.ndarray, np.ndarray]:
+    '''Return the x of a slice's inner and outer edges, at template y.
+
+    Both are NaN past the shape's top and bottom.
+
+    '''
+    z = np.asarray(y, dtype=float) * math.sin(tilt)
+    outer, inner = SHAPES[surface.shape].profile(
+        np.clip(z, surface.bottom, surface.top), **surface.parameters)
+    distance = (z / math.tan(tilt)) ** 2
+    # Template y at the top and bottom rounds either way.
+    margin = 1e-12 * (surface.top - surface.bottom)
+    past = (z < surface.bottom - margin) | (z > surface.top + margin)
+    return (np.where(past, np.nan, np.sqrt(np.maximum(inner ** 2 - distance,
+                                                      0))),
+            np.where(past, np.nan, np.sqrt(np.maximum(outer ** 2 - distance,
+                                                      0))))
+
+
+def section(surface: Surface,
+            tilt: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Return a slice's sampled edges, as arrays of y, inner x and outer x.
+
+    There is one point per sampled height, in order of increasing y.
+
+    '''
+    y = surface.z / math.sin(tilt)
+    distance = (surface.z / math.tan(tilt)) ** 2
+    order = np.argsort(y)
+    return (y[order],
+            np.sqrt(np.maximum(surface.inner ** 2 - distance, 0))[order],
+            np.sqrt(np.maximum(surface.outer ** 2 - distance, 0))[order])
+
+
+def wall_crossings(surface: Surface, tilt: float, angles: list[float],
+                   width: float) -> tuple[np.ndarray, np.ndarray]:
+    '''Find where each slot's walls cross the slice's edges.
+
+    The walls are the lines y = tan(angle) * x ± dy, for x >= 0, with dy as
+    in torus_calculations.slot_corners(). Each wall is followed out from the
+    y-axis, to the last stretch where it is on the slice.
+
+    Returns (outer, inner), where the walls leave and enter that stretch.
+    Each is a (len(angles), 2, 2) array, with the +dy wall's point, then
+    the -dy wall's point, NaN where the wall misses the slice.
+
+    '''
+    angles = np.asarray(angles, dtype=float)
+    dy = (width / 2) / np.cos(angles)
+    # Each wall's y-intercept, as a (len(angles), 2) array, and direction.
+    intercept = np.stack([dy, -dy], axis=1)
+    cos = np.cos(angles)[:, np.newaxis]
+    sin = np.sin(angles)[:, np.newaxis]
+
+    # The section's outline, down the outer edge and back up the inner edge,
+    # as in template(). Its vertices are on the exact edges, and edge k runs
+    # from vertex k to vertex k + 1. The two that join the outer and inner
+    # edges are the straight bottom and top.
+    y, inner_x, outer_x = section(surface, tilt)
+    count = len(y)
+    ring_x = np.concatenate([outer_x[::-1], inner_x])
+    ring_y = np.concatenate([y[::-1], y])
+    # Which side of each wall each vertex is on. A wall crosses the edges
+    # whose ends are on opposite sides, and so crosses the exact edge
+    # between those samples.
+    side = (sin[..., np.newaxis] * ring_x -
+            cos[..., np.newaxis] * (ring_y - intercept[..., np.newaxis])) > 0
+    slot, wall, k = np.nonzero(side != np.roll(side, -1, axis=-1))
+    following = (k + 1) % (2 * count)
+    straight = (k == count - 1) | (k == 2 * count - 1)
+    slot_cos, slot_sin = cos[slot, 0], sin[slot, 0]
+
+    def along(u):
+        '''Return the points u of the way along each crossed edge.'''
+        y = ring_y[k] + u * (ring_y[following] - ring_y[k])
+        inner_x, outer_x = edges(surface, y, tilt)
+        x = np.where(straight, ring_x[k] + u * (ring_x[following] - ring_x[k]),
+                     np.where(k < count, outer_x, inner_x))
+        return x, y
+
+    # Bisect every crossing of every slot's walls at once.
+    lo = np.zeros(len(k))
+    hi = np.ones(len(k))
+    lo_side = side[slot, wall, k]
+    for _ in range(BISECTIONS):
+        middle = (lo + hi) / 2
+        x, y = along(middle)
+        same = (slot_sin * x - slot_cos * (y - intercept[slot, wall]) >
+                0) == lo_side
+        lo = np.where(same, middle, lo)
+        hi = np.where(same, hi, middle)
+    x, y = along((lo + hi) / 2)
+    # Each crossing's distance along its wall, in order, with NaN after a
+    # wall's last crossing. The section is at x >= 0, so the walls start on
+    # it, or off it, at the y-axis.
+    crossings = np.full(side.shape, np.nan)
+    crossings[slot, wall, k] = np.maximum(
+        x * slot_cos + (y - intercept[slot, wall]) * slot_sin, 0)
+    crossings.sort(axis=-1)
+    crossed = np.sum(~np.isnan(crossings), axis=-1)[..., np.newaxis]
+    hit = crossed[..., 0] > 0
+
+    # Each wall ends off the slice, so its last crossing leaves the last
+    # stretch on the slice, and the one before enters it. Walls that start
+    # on the slice enter it on the y-axis.
+    leave = np.take_along_axis(crossings, np.maximum(crossed - 1, 0),
+                               axis=-1)[..., 0]
+    enter = np.where(crossed[..., 0] > 1, np.take_along_axis(
+        crossings, np.maximum(crossed - 2, 0), axis=-1)[..., 0], 0)
+
+    def points(t):
+        t = np.where(hit, t, np.nan)
+        return np.stack([t * cos, intercept + t * sin], axis=-1)
+    return points(leave), points(enter)
+
+
+def slots(surface: Surface, num_slices: int,
+          material_thickness: float) -> tuple[list[float], float]:
+    '''Return the slot angles, and the slot width.'''
+    return (calculations.slot_angles(num_slices, surface.loxodromic_angle),
+            calculations.slot_width(material_thickness,
+                                    surface.loxodromic_angle * 2))
+
+
+def intersections(surface: Surface, tilt: float, angles: list[float],
+                  width: float) -> list[render.Intersection]:
+    '''Return each slot's render.Intersection.
+
+    Points are None where a slot wall misses the slice.
+
+    '''
+    outer, inner = wall_crossings(surface, tilt, angles, width)
+
+    def points(corners):
+        '''Return each slot's points, from a (len(angles), 2, 2) array.'''
+        return [[None if math.isnan(x) else point.Point(x, y)
+                 for x, y in walls] for walls in corners.tolist()]
+    return [render.Intersection(outer=outer_points, middle=middle_points,
+                                inner=inner_points)
+            for outer_points, middle_points, inner_points in zip(
+                points(outer), points((outer + inner) / 2), points(inner))]
+
+
+def simplify(polygon: np.ndarray, tolerance: float) -> np.ndarray:
+    '''Drop repeated vertices, and vertices in the middle of straight runs.'''
+    step = np.roll(polygon, -1, axis=0) - polygon
+    polygon = polygon[np.hypot(step[:, 0], step[:, 1]) > tolerance]
+    before = polygon - np.roll(polygon, 1, axis=0)
+    after = np.roll(polygon, -1, axis=0) - polygon
+    turn = np.abs(before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0])
+    return polygon[turn > tolerance * (np.hypot(before[:, 0], before[:, 1]) +
+                                       np.hypot(after[:, 0], after[:, 1]))]
+
+
+def positions(polygon: np.ndarray, points: list[point.Point]
+              ) -> tuple[np.ndarray, list[point.Point]]:
+    '''Return how far along the polygon's edges each point is.
+
+    Position i + u is u of the way along the edge from vertex i to vertex
+    i + 1, at the polygon's closest point. Also returns those closest
+    points.
+
+    '''
+    p = np.array([[q.x, q.y] for q in points])
+    edge = np.roll(polygon, -1, axis=0) - polygon
+    # Each point's offset from each vertex, as (len(points), count) arrays.
+    dx = p[:, 0, np.newaxis] - polygon[:, 0]
+    dy = p[:, 1, np.newaxis] - polygon[:, 1]
+    u = np.clip((dx * edge[:, 0] + dy * edge[:, 1]) /
+                np.sum(edge * edge, axis=-1), 0, 1)
+    dx -= u * edge[:, 0]
+    dy -= u * edge[:, 1]
+    closest = np.argmin(dx * dx + dy * dy, axis=1)
+    along = u[np.arange(len(points)), closest]
+    on_edges = polygon[closest] + along[:, np.newaxis] * edge[closest]
+    return closest + along, [point.Point(float(x), float(y))
+                             for x, y in on_edges]
+
+
+def template(surface: Surface, tilt: float, angles: list[float],
+             width: float, outer_inner: render.OuterInner,
+             fill_color: str) -> render.Template:
+    '''Draw a 'C' shaped slice, with its slots on outer_inner's edge.'''
+    y, inner_x, outer_x = section(surface, tilt)
+    # Down the outer edge from the largest y, which is the bottom in display
+    # coordinates, and back up the inner edge. Where the inner edge is at
+    # x = 0, it is the back of the 'C'.
+    polygon = simplify(np.concatenate([
+        np.stack([outer_x, y], axis=1)[::-1],
+        np.stack([inner_x, y], axis=1)]), 1e-9 * (y[-1] - y[0]))
+    count = len(polygon)
+
+    def forward(start, end):
+        '''Return the distance from start forwards to end, along polygon.'''
+        return (end - start) % count
+
+    # Each slot's corners, or for slots with one wall on the slice, the
+    # slot's angle, that wall, and the wall's ends.
+    cuts = []
+    for angle, intersection in zip(angles, intersections(surface, tilt,
+                                                         angles, width)):
+        on_slice = [wall for wall in range(2)
+                    if intersection.outer[wall] is not None]
+        if len(on_slice) == 2:
+            cuts.append((None, render.slot_corners(intersection,
+                                                   outer_inner)))
+        elif on_slice:
+            wall = on_slice[0]
+            cuts.append(((angle, wall), [intersection.outer[wall],
+                                         intersection.inner[wall]]))
+    # Move the cuts' ends onto the polygon. They are on the exact edges,
+    # which the polygon's straight edges cut across.
+    ends = [p for _, points in cuts for p in (points[0], points[-1])]
+    along, ends = positions(polygon, ends) if ends else ([], [])
+    for i, (_, points) in enumerate(cuts):
+        points[0], points[-1] = ends[2 * i], ends[2 * i + 1]
+    position = dict(zip(map(id, ends), along))
+
+    # Stretches of the polygon that slots replace, as (start, end, points).
+    notches = []
+    clips = []
+    for wall, points in cuts:
+        start, end = position[id(points[0])], position[id(points[-1])]
+        if wall is None:
+            if forward(start, end) > forward(end, start):
+                points.reverse()
+                start, end = end, start
+            notches.append((start, end, points))
+            continue
+        # Cut along the wall, and drop the stretch of the edge past it, which
+        # is the shorter one, as for notches: the side of the wall is lost
+        # to rounding where a wall only grazes a corner. keep() is linear in
+        # p, and not negative on the side of the wall that is kept: the -dy
+        # side of wall 1, or the +dy side of wall 0.
+        angle, wall = wall
+        keep = functools.partial(
+            lambda origin, slope, sign, p: sign * (
+                p.y - origin.y - slope * (p.x - origin.x)),
+            points[0], math.tan(angle), 1 if wall == 0 else -1)
+        if forward(start, end) < forward(end, start):
+            clips.append((start, end, points, keep))
+        else:
+            clips.append((end, start, points[::-1], keep))
+    # With many slices, several slots clip each corner. The one that drops
+    # the longest stretch cuts off the others with it.
+    clips = [clip for clip in clips
+             if not any(other is not clip and
+                        forward(other[0], clip[0]) <=
+                        forward(other[0], clip[1]) <=
+                        forward(other[0], other[1])
+                        for other in clips)]
+
+    # Start at a vertex that is not replaced.
+    first = next(v for v in range(count)
+                 if all(forward(start, v) > forward(start, end)
+                        for start, end, *_ in notches + clips))
+    notches.sort(key=lambda notch: forward(first, notch[0]))
+    # Merged notches start at their first slot's start, and end at their
+    # last slot's end. A notch that reaches into a clip's dropped stretch
+    # ends on the clip's wall instead, and runs on along the wall, in place
+    # of the clip.
+    slots = []
+    stretches = []
+    replaced = set()
+    for notch in render.merge_slots([corners for _, _, corners in notches]):
+        start, end = ends = (position[id(notch[0])], position[id(notch[-1])])
+        before, after = [], []
+        for i, (clip_start, clip_end, points, keep) in enumerate(clips):
+            if not any(forward(clip_start, p) < forward(clip_start, clip_end)
+                       for p in ends):
+                continue
+            clipped = render.clip_notch(notch, keep)
+            if clipped is None:
+                break
+            if clipped[0] is not notch[0]:
+                start, before = clip_start, [points[0]]
+                replaced.add(i)
+            if clipped[-1] is not notch[-1]:
+                end, after = clip_end, [points[-1]]
+                replaced.add(i)
+            notch = clipped
+        else:
+            slots.append(notch)
+            stretches.append((start, end, before + notch + after))
+    stretches += [(start, end, points)
+                  for i, (start, end, points, _) in enumerate(clips)
+                  if i not in replaced]
+    stretches = sorted(
+        ((forward(first, start), forward(first, end), points)
+         for start, end, points in stretches),
+        key=lambda stretch: (stretch[0], -stretch[1]))
+
+    def vertices(start, end):
+        '''Return the vertices strictly between positions start and end.'''
+        return [point.Point(*map(float, polygon[(first + i) % count]))
+                for i in range(math.floor(start) + 1, math.ceil(end))]
+
+    outline = geometry.Outline()
+    outline.move(point.Point(*map(float, polygon[first])))
+    drawn = 0
+    for start, end, points in stretches:
+        if end <= drawn:
+            # Inside a stretch that is already replaced, like a clip along
+            # the back of the 'C', in a notch that runs past it.
+            continue
+        for p in vertices(drawn, start) + points:
+            outline.line(p)
+        drawn = end
+    for p in vertices(drawn, count):
+        outline.line(p)
+    outline.close()
+    return render.Template(outline=outline, slots=slots,
+                           fill_color=fill_color, position=None)
+
+
+def marks(surface: Surface, tilt: float, angles: list[float],
+          outer_inner: render.OuterInner,
+          fill_color: str) -> render.Template:
+    '''Draw a slice for the 'marks' preview, see render.slot_marks().
+
+    The edges are template()'s, without slots, and the marks follow each
+    slot angle's center line.
+
+    '''
+    edges = template(surface, tilt, [], 0, outer_inner, fill_color)
+    outer, inner = wall_crossings(surface, tilt, angles, 0)
+    return edges._replace(outline=render.slot_marks(
+        edges.outline,
+        *render.center_marks(outer[:, 0], inner[:, 0], outer_inner)))
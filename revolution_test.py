@@ -0,0 +1,153 @@
+import math
+import unittest
+
+import numpy as np
+
+import cylinder_calculations
+import fit
+import render
+import revolution
+import torus_calculations
+
+CYLINDER = dict(outer_radius=35, inner_radius=26, height=40)
+TORUS = dict(major_radius=40, minor_radius=17.5)
+
+
+class TestRevolution(unittest.TestCase):
+    def assertMatches(self, model, shape, **parameters):
+        # The engine finds the same slots as the model's hand-coded
+        # calculations.
+        expected = fit.MODELS[model].slots(**parameters)
+        actual = fit.surface_slots(shape, **parameters)
+        self.assertAlmostEqual(actual[1], expected[1])
+        np.testing.assert_allclose(actual[2], expected[2], atol=1e-9)
+        np.testing.assert_allclose(actual[3], expected[3], atol=1e-6)
+
+    def test_hand_coded_models(self):
+        self.assertMatches('cylinder', 'cylinder', num_slices=7,
+                           material_thickness=.25, **CYLINDER)
+        self.assertMatches('truncated_sphere', 'truncated_sphere',
+                           num_slices=14, material_thickness=.25, **CYLINDER)
+        self.assertMatches('torus', 'torus', num_slices=10,
+                           material_thickness=.25, **TORUS)
+        self.assertMatches('hyperboloid', 'hyperboloid',
+                           outer_edge_radius=60, outer_waist_radius=30,
+                           inner_radius=20, height=60, num_slices=18,
+                           material_thickness=.25)
+
+    def test_corners(self):
+        surface = revolution.surface('cylinder', **CYLINDER)
+        angles, width = revolution.slots(surface, 7, .25)
+        self.assertAlmostEqual(
+            surface.loxodromic_angle,
+            cylinder_calculations.loxodromic_angle(40, 35))
+        for angle, intersection in zip(angles, revolution.intersections(
+                surface, surface.loxodromic_angle, angles, width)):
+            expected = cylinder_calculations.slot_corners(
+                35, math.hypot(35, 20), angle, width)
+            for actual, corner in zip(intersection.outer, expected):
+                self.assertAlmostEqual(actual.x, corner.x)
+                self.assertAlmostEqual(actual.y, corner.y)
+
+        surface = revolution.surface('torus', **TORUS)
+        angles, width = revolution.slots(surface, 10, .25)
+        for angle, intersection in zip(angles, revolution.intersections(
+                surface, surface.loxodromic_angle, angles, width)):
+            expected = torus_calculations.slot_corners(40, -17.5, width,
+                                                       angle)
+            for actual, corner in zip(intersection.inner, expected):
+                self.assertAlmostEqual(actual.x, corner.x)
+                self.assertAlmostEqual(actual.y, corner.y)
+
+    def test_wall_crossings(self):
+        # The walls cross the slice's exact edges, or its straight top and
+        # bottom, and are on the slice between their crossings.
+        surface = revolution.surface('vase', bottom_radius=30, radius=40,
+                                     top_radius=20, height=50, wall_width=8)
+        angles, width = revolution.slots(surface, 200, .25)
+        for tilt in (surface.loxodromic_angle, -surface.loxodromic_angle):
+            y, _, _ = revolution.section(surface, tilt)
+            outer, inner = revolution.wall_crossings(surface, tilt, angles,
+                                                     width)
+            hit = ~np.isnan(outer[..., 0])
+            self.assertGreater(np.sum(hit), len(angles))
+            outer, inner = outer[hit], inner[hit]
+            for points in (outer, inner[inner[:, 0] > 0]):
+                inner_x, outer_x = revolution.edges(surface, points[:, 1],
+                                                    tilt)
+                distance = np.min(np.abs([
+                    points[:, 0] - inner_x, points[:, 0] - outer_x,
+                    points[:, 1] - y[0], points[:, 1] - y[-1]]), axis=0)
+                np.testing.assert_allclose(distance, 0, atol=1e-9)
+            middle = (outer + inner) / 2
+            inner_x, outer_x = revolution.edges(surface, middle[:, 1], tilt)
+            self.assertTrue(np.all((middle[:, 0] >= inner_x) &
+                                   (middle[:, 0] <= outer_x)))
+
+    def test_new_shapes(self):
+        parameters = {
+            'cone': dict(bottom_radius=30, top_radius=20, height=50,
+                         wall_width=8),
+            'ellipsoid': dict(radius=40, top_radius=20, height=50,
+                              wall_width=8),
+            'vase': dict(bottom_radius=30, radius=40, top_radius=20,
+                         height=50, wall_width=8),
+        }
+        for shape in revolution.NEW_SHAPES:
+            for num_slices in (8, 15):
+                self.assertEqual(fit.verify(
+                    shape, num_slices=num_slices, material_thickness=.25,
+                    **parameters[shape]), [], shape)
+
+    def test_section(self):
+        # Hyperboloid slices are rectangles.
+        surface = revolution.surface(
+            'hyperboloid', outer_edge_radius=60, outer_waist_radius=30,
+            inner_radius=20, height=60)
+        for tilt in (surface.loxodromic_angle, -surface.loxodromic_angle):
+            y, inner_x, outer_x = revolution.section(surface, tilt)
+            np.testing.assert_allclose(outer_x, 30, atol=1e-9)
+            np.testing.assert_allclose(inner_x, 20, atol=1e-9)
+            self.assertTrue(np.all(np.diff(y) > 0))
+
+        # Torus slices are Villarceau circles, with the major radius.
+        surface = revolution.surface('torus', **TORUS)
+        y, inner_x, outer_x = revolution.section(surface,
+                                                 surface.loxodromic_angle)
+        self.assertAlmostEqual(y[-1] - y[0], 80, places=6)
+        self.assertAlmostEqual(max(outer_x), 57.5, places=6)
+        self.assertGreaterEqual(min(inner_x), 0)
+
+    def test_template(self):
+        surface = revolution.surface(
+            'cone', bottom_radius=30, top_radius=20, height=50, wall_width=8)
+        angles, width = revolution.slots(surface, 9, .25)
+        for outer_inner in render.OuterInner:
+            template = revolution.template(surface,
+                                           surface.loxodromic_angle, angles,
+                                           width, outer_inner, 'red')
+            # Slots that overlap are merged.
+            self.assertIn(len(template.slots), range(1, 9))
+            self.assertEqual(template.fill_color, 'red')
+            self.assertGreaterEqual(min(template.outline.x), -1e-9)
+
+    def test_errors(self):
+        with self.assertRaisesRegex(AssertionError, 'Error: Unknown shape'):
+            revolution.surface('sphere', radius=1)
+        with self.assertRaisesRegex(AssertionError, 'Error: Height'):
+            revolution.surface('cylinder', outer_radius=35, inner_radius=26,
+                               height=0)
+        with self.assertRaisesRegex(AssertionError,
+                                    'Error: Outer radius must be larger'):
+            revolution.surface('cylinder', outer_radius=26, inner_radius=35,
+                               height=40)
+
+    def test_cache(self):
+        revolution.sample.cache_clear()
+        first = revolution.surface('cylinder', **CYLINDER)
+        self.assertIs(revolution.surface('cylinder', **CYLINDER), first)
+        self.assertEqual(revolution.sample.cache_info().hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+'''Serve sliceform templates over HTTP, from a long-running process.
+
+Running an extension script pays for starting Python and importing inkex and
+lxml on every call. This keeps the generators loaded, and answers requests on
+localhost, or on a Unix socket:
+
+  POST /render  Body is a JSON object that names its model, and sets that
+                model's parameters, as in a combined job file. "format"
+                chooses the response:
+
+                  svg: An SVG document, in millimeters, sized to the
+                       templates. This is the default.
+                paths: A JSON object, with each template's path data,
+                       transform and fill color, and any warnings.
+
+   GET /models  Lists the models.
+
+For example:
+
+  python3 service.py --port 8470 &
+  curl -d '{"model": "torus", "major_radius": 40, "format": "paths"}' \\
+      localhost:8470/render
+
+Requests may only set the model's own parameters, and the material and
+output options in SHARED_PARAMETERS. Other options, which read or write files
+on the server, are rejected with status 400, like other invalid requests.
+Requests that fail while generating get status 500.
+
+Results are kept in a least recently used cache, keyed by the request's
+parameters, so repeated requests skip generation entirely. Warnings, like
+slot collisions, are returned in the X-Sliceform-Warnings header.
+
+'''
+
+import argparse
+import collections
+import contextlib
+import functools
+import http.server
+import io
+import json
+import os
+import socketserver
+
+import inkex
+from lxml import etree
+
+import combined
+import generator
+import metrics
+
+MODELS = combined.MODELS
+
+FORMATS = ['svg', 'paths']
+
+# Options that requests may set, besides each model's own parameters. Options
+# that read or write files on the server, like metrics_file, machine_profile
+# and update, are rejected.
+SHARED_PARAMETERS = ['units', 'material_thickness', 'material_width',
+                     'precision', 'flatten_tolerance', 'kerf', 'fidelity',
+                     'fill_cavities', 'validate', 'labels', 'label_height',
+                     'max_seconds', 'max_megabytes']
+
+# Empty document, with user units in millimeters.
+DOCUMENT = ('<svg xmlns="http://www.w3.org/2000/svg" width="210mm" '
+            'height="297mm" viewBox="0 0 210 297"/>')
+
+# content_type: MIME type of body.
+#         body: Response bytes.
+#     warnings: The generator's warnings.
+Result = collections.namedtuple('Result', ['content_type', 'body', 'warnings'])
+
+
+def canonical(parameters: dict) -> str:
+    '''Return a request's cache key, the same for equal parameters.'''
+    return json.dumps(parameters, sort_keys=True, separators=(',', ':'))
+
+
+@functools.lru_cache(maxsize=None)
+def allowed_parameters(model_name: str) -> frozenset[str]:
+    '''Return the parameters that a model's requests may set.'''
+    pars = argparse.ArgumentParser(add_help=False)
+    MODELS[model_name]().add_model_arguments(pars)
+    return frozenset([action.dest for action in pars._actions] +
+                     SHARED_PARAMETERS)
+
+
+def check_request(parameters: dict):
+    '''Stop with an error if a client's request sets other options.
+
+    Local callers, like watch.py and batch.py, may set any option.
+
+    '''
+    assert isinstance(parameters, dict), 'Error: Expected a JSON object'
+    model_name = parameters.get('model')
+    assert model_name in MODELS, \
+        'Error: Unknown model {}, expected {}'.format(model_name,
+                                                      ', '.join(MODELS))
+    unknown = sorted(set(parameters) - {'model', 'format'} -
+                     allowed_parameters(model_name))
+    assert not unknown, 'Error: Unknown parameter{} {}, expected {}'.format(
+        '' if len(unknown) == 1 else 's', ', '.join(unknown),
+        ', '.join(sorted(allowed_parameters(model_name))))
+
+
+def model_generator(parameters: dict) -> generator.SliceformGenerator:
+    '''Return a request's generator, with its options and a new document.'''
+    parameters = dict(parameters)
+    model_name = parameters.pop('model', None)
+    parameters.pop('format', None)
+    assert model_name in MODELS, \
+        'Error: Unknown model {}, expected {}'.format(model_name,
+                                                      ', '.join(MODELS))
+    model = MODELS[model_name]()
+    messages = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(messages):
+            model.options = model.arg_parser.parse_args(
+                ['--{}={}'.format(name, value)
+                 for name, value in parameters.items()])
+    except SystemExit:
+        raise AssertionError(messages.getvalue().strip().splitlines()[-1])
+    model.svg = inkex.load_svg(DOCUMENT).getroot()
+    return model
+
+
+def output_format(parameters: dict) -> str:
+    '''Return a request's format, one of FORMATS.'''
+    output = parameters.get('format', 'svg')
+    assert output in FORMATS, 'Error: Unknown format {}, expected {}'.format(
+        output, ', '.join(FORMATS))
+    return output
+
+
+def result(model: generator.SliceformGenerator,
+           elements: list[inkex.PathElement], output: str,
+           warnings: list[str]) -> Result:
+    '''Return a generated model's elements, in output format.'''
+    if output == 'paths':
+        # Labels are paths inside a group.
+        paths = [{'d': element.get('d'),
+                  'transform': element.get('transform'),
+                  'fill': element.style.get('fill'),
+                  'stroke': element.style.get('stroke')}
+                 for group in elements for element in group.iter()
+                 if element.get('d') is not None]
+        body = json.dumps({'paths': paths, 'warnings': warnings})
+        return Result('application/json', body.encode(), warnings)
+
+    document = model.svg
+    group = inkex.Group()
+    for element in elements:
+        group.append(element)
+    document.append(group)
+    # Measure the templates, instead of the parsed path data, which is much
+    # slower. Kerf compensation grows each outline by up to half the kerf.
+    box = metrics.bounds(model.templates)
+    if box is not None:
+        margin = model.kerf / 2
+        left, top = box[0] - margin, box[1] - margin
+        width = box[2] - box[0] + 2 * margin
+        height = box[3] - box[1] + 2 * margin
+        document.set('width', '{:g}mm'.format(width))
+        document.set('height', '{:g}mm'.format(height))
+        document.set('viewBox', '{:g} {:g} {:g} {:g}'.format(
+            left, top, width, height))
+    return Result('image/svg+xml', etree.tostring(document), warnings)
+
+
+def render(key: str) -> Result:
+    '''Generate the templates for a canonical() request.'''
+    parameters = json.loads(key)
+    output = output_format(parameters)
+    model = model_generator(parameters)
+    warnings = []
+    model.warn = warnings.append
+    elements = list(model.generate())
+    return result(model, elements, output, warnings)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately. With Nagle's algorithm, on a
+    # kept-alive connection, the body waits for the client's delayed
+    # acknowledgement of the headers.
+    disable_nagle_algorithm = True
+
+    def address_string(self):
+        # Unix socket clients have no address.
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return 'local'
+
+    def respond(self, status: int, content_type: str, body: bytes,
+                warnings: list[str] = ()):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if warnings:
+            self.send_header('X-Sliceform-Warnings', ' | '.join(warnings))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/models':
+            self.respond(404, 'text/plain', b'Not found\n')
+            return
+        self.respond(200, 'application/json',
+                     json.dumps(list(MODELS)).encode())
+
+    def do_POST(self):
+        if self.path != '/render':
+            self.respond(404, 'text/plain', b'Not found\n')
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            parameters = json.loads(self.rfile.read(length))
+            check_request(parameters)
+            result = self.server.render(canonical(parameters))
+        except (AssertionError, ValueError) as e:
+            self.respond(400, 'text/plain', '{}\n'.format(e).encode())
+            return
+        except Exception as e:
+            # Parameters that pass the checks can still fail in the
+            # generator's calculations. The server keeps running.
+            self.respond(500, 'text/plain', 'Error: {}: {}\n'.format(
+                type(e).__name__, e).encode())
+            return
+        self.respond(200, result.content_type, result.body, result.warnings)
+
+
+class UnixHandler(Handler):
+    # Unix sockets have no Nagle's algorithm to disable.
+    disable_nagle_algorithm = False
+
+
+def make_server(cache_size: int, port: int = 0, host: str = '127.0.0.1',
+                socket_path: str = None) -> socketserver.BaseServer:
+    '''Return a server, listening on socket_path, or on host and port.
+
+    Requests are handled one at a time, by one process, so the generators
+    and the cache are not shared between threads.
+
+    '''
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = socketserver.UnixStreamServer(socket_path, UnixHandler)
+    else:
+        server = http.server.HTTPServer((host, port), Handler)
+    server.render = functools.lru_cache(maxsize=cache_size)(render)
+    return server
+
+
+def warm(server: socketserver.BaseServer):
+    '''Render each model once, so the first request is as fast as later ones.
+
+    The defaults stay cached.
+
+    '''
+    for model in MODELS:
+        server.render(canonical({'model': model}))
+
+
+def main():
+    pars = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    pars.add_argument('--host', default='127.0.0.1',
+                      help='Address to listen on')
+    pars.add_argument('--port', type=int, default=8470,
+                      help='Port to listen on')
+    pars.add_argument('--socket', dest='socket_path', default='',
+                      help='Unix socket to listen on, instead of a port')
+    pars.add_argument('--cache_size', type=int, default=256,
+                      help='Number of results to keep')
+    options = pars.parse_args()
+    server = make_server(options.cache_size, options.port, options.host,
+                         options.socket_path)
+    warm(server)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+import service
+
+
+class TestService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Keep the test output quiet.
+        cls.quiet = mock.patch.object(service.Handler, 'log_message')
+        cls.quiet.start()
+        cls.server = service.make_server(cache_size=4)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.thread.join()
+        cls.server.server_close()
+        cls.quiet.stop()
+
+    def post(self, body) -> tuple[int, bytes]:
+        request = urllib.request.Request(
+            'http://127.0.0.1:{}/render'.format(self.server.server_port),
+            data=json.dumps(body).encode())
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            with e:
+                return e.code, e.read()
+
+    def test_render(self):
+        status, body = self.post({'model': 'torus', 'format': 'paths'})
+        self.assertEqual(status, 200)
+        paths = json.loads(body)['paths']
+        self.assertEqual(len(paths), 20)
+        self.assertTrue(all(path['d'] for path in paths))
+
+    def test_cache(self):
+        key = service.canonical({'model': 'torus', 'num_slices': 6})
+        first = self.server.render(key)
+        self.assertIs(self.server.render(service.canonical(
+            {'num_slices': 6, 'model': 'torus'})), first)
+        self.assertGreaterEqual(self.server.render.cache_info().hits, 1)
+
+    def test_rejected(self):
+        for body, message in (
+                ([], b'Expected a JSON object'),
+                ({'model': 'cube'}, b'Unknown model'),
+                ({'model': 'torus', 'metrics_file': 'out.json'},
+                 b'Unknown parameter metrics_file'),
+                ({'model': 'torus', 'machine_profile': 'profile.json'},
+                 b'Unknown parameter machine_profile'),
+                ({'model': 'torus', 'update': True},
+                 b'Unknown parameter update'),
+                ({'model': 'torus', 'num_slices': 'many'}, b'num_slices'),
+                ({'model': 'cylinder', 'units': 'furlong'},
+                 b'Unknown units furlong'),
+                ({'model': 'torus', 'format': 'png'}, b'Unknown format')):
+            status, response = self.post(body)
+            self.assertEqual(status, 400, body)
+            self.assertIn(message, response)
+
+    def test_failure(self):
+        # Failures inside a generator still get a response.
+        render = self.server.render
+
+        def fail(key):
+            raise ZeroDivisionError('division by zero')
+        self.server.render = fail
+        try:
+            status, response = self.post({'model': 'torus'})
+        finally:
+            self.server.render = render
+        self.assertEqual(status, 500)
+        self.assertIn(b'ZeroDivisionError', response)
+        # The server is still running.
+        self.assertEqual(self.post({'model': 'torus'})[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+'''Check that the models' cut geometry matches stored snapshots.
+
+Each case in MATRIX is a service.py request. Its templates are generated and
+laid out, as the extension does, and reduced to two hashes from
+geometry.canonical_digest(), which ignore the order and direction that
+segments are drawn in, and differences below PRECISION:
+
+     shapes: The templates' outlines, each at its own origin.
+     layout: The outlines, at their positions on the material.
+
+So a change that only reorders or reverses path segments keeps its
+snapshots, a change to a template's shape changes both hashes, and a change
+to the layout only changes layout. Run it before and after changing the
+geometry code:
+
+  python3 snapshot.py                  # Check every case.
+  python3 snapshot.py torus_default    # Check some cases.
+  python3 snapshot.py --update         # Store new snapshots.
+
+It exits with status 1 if any snapshot differs.
+
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import geometry
+import render
+import service
+
+SNAPSHOTS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'snapshots.json')
+
+# Coordinates are compared to this precision, in user units.
+PRECISION = 1e-6
+
+# Parameters that every case shares. Validation only reports problems, and
+# never changes the templates.
+COMMON = {'validate': False, 'max_seconds': 0, 'max_megabytes': 0}
+
+MATRIX = {
+    'cylinder_default': {'model': 'cylinder'},
+    'cylinder_ring': {'model': 'cylinder', 'slice_shape': 'ring'},
+    'cylinder_many_thin': {'model': 'cylinder', 'num_slices': 30,
+                           'material_thickness': .1, 'height': 60},
+    'cylinder_inches': {'model': 'cylinder', 'units': 'in',
+                        'outer_radius': 1.5, 'inner_radius': 1,
+                        'height': 1.5, 'material_thickness': .01,
+                        'material_width': 8},
+    'cylinder_fill': {'model': 'cylinder', 'fill_cavities': True},
+    'cylinder_ring_many': {'model': 'cylinder', 'slice_shape': 'ring',
+                           'num_slices': 40, 'outer_radius': 60,
+                           'inner_radius': 50},
+    'truncated_sphere_default': {'model': 'truncated_sphere'},
+    'truncated_sphere_thick': {'model': 'truncated_sphere',
+                               'material_thickness': 3, 'height': 20},
+    'truncated_sphere_ring': {'model': 'truncated_sphere',
+                              'slice_shape': 'ring', 'num_slices': 9},
+    'torus_default': {'model': 'torus'},
+    'torus_many': {'model': 'torus', 'num_slices': 24,
+                   'minor_radius': 25},
+    'hyperboloid_default': {'model': 'hyperboloid'},
+    'hyperboloid_many': {'model': 'hyperboloid', 'num_slices': 30,
+                         'height': 90, 'inner_radius': 10},
+    'surface_vase': {'model': 'surface'},
+    'surface_cone': {'model': 'surface', 'shape': 'cone', 'num_slices': 9},
+    'surface_ellipsoid': {'model': 'surface', 'shape': 'ellipsoid',
+                          'material_thickness': 1},
+}
+
+
+def generate(parameters: dict) -> list[render.Template]:
+    '''Return a case's templates, with their final positions.'''
+    model = service.model_generator(dict(COMMON, **parameters))
+    model.warn = lambda message: None
+    model.setup()
+    return model.layout()
+
+
+def snapshot(templates: list[render.Template]) -> dict:
+    '''Return a snapshot of templates' geometry.'''
+    return {
+        'templates': len(templates),
+        'shapes': geometry.canonical_digest(
+            [(t.outline, 0, 0) for t in templates], PRECISION),
+        'layout': geometry.canonical_digest(
+            [(t.outline, t.position.x, t.position.y) for t in templates],
+            PRECISION),
+    }
+
+
+def differences(expected: dict, actual: dict) -> list[str]:
+    '''Return the names of the snapshot's values that differ.'''
+    return [name for name in actual if expected.get(name) != actual[name]]
+
+
+def main():
+    pars = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    pars.add_argument('cases', nargs='*', help='Cases to check, all by '
+                      'default: {}'.format(', '.join(MATRIX)))
+    pars.add_argument('--update', action='store_true',
+                      help='Store the new snapshots')
+    options = pars.parse_args()
+    for name in options.cases:
+        assert name in MATRIX, 'Error: Unknown case {}'.format(name)
+
+    try:
+        with open(SNAPSHOTS) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = {}
+    failed = 0
+    for name in options.cases or MATRIX:
+        start = time.perf_counter()
+        actual = dict(snapshot(generate(MATRIX[name])),
+                      parameters=MATRIX[name])
+        seconds = time.perf_counter() - start
+        changed = differences(stored.get(name, {}), actual)
+        if options.update:
+            stored[name] = actual
+            status = 'updated' if changed else 'ok'
+        elif name not in stored:
+            status = 'missing, run with --update'
+            failed += 1
+        elif changed:
+            status = 'changed: ' + ', '.join(changed)
+            failed += 1
+        else:
+            status = 'ok'
+        print('{:<28} {:>7.2f} s  {}'.format(name, seconds, status),
+              flush=True)
+
+    if options.update:
+        # Cases that are no longer in the matrix are dropped.
+        stored = {name: stored[name] for name in MATRIX if name in stored}
+        with open(SNAPSHOTS, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write('\n')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+'''Find model parameters that meet design targets.
+
+Each surface has targets, which are functions of the model's parameters,
+like the loxodromic angle or the slice width. solve() finds the value of one
+parameter that meets a target, given the other parameters. It uses a closed
+form solution when there is one, and bracketed root finding otherwise.
+
+Lengths are in any consistent unit, and angles are in radians.
+
+Example:
+
+  python3 solve.py cylinder loxodromic_angle=30 height \\
+      outer_radius=40 inner_radius=30
+
+'''
+
+import collections
+import math
+import sys
+
+import cylinder_calculations
+import hyperboloid_calculations
+
+# targets: Functions that calculate each target from a dict of the model's
+#          parameters.
+# inverses: Closed form solutions, keyed by (target, parameter). Each takes
+#           the target's value and a dict of the other parameters, and
+#           returns the parameter's value.
+# feasible: Function that returns an error message if the known parameters
+#           cannot make a model, or None.
+Surface = collections.namedtuple('Surface',
+                                 ['targets', 'inverses', 'feasible'])
+
+# Maximum number of iterations for find_root(), including expanding the
+# bracket. Bisection halves the bracket each iteration, so 200 iterations
+# reach any float64 tolerance.
+MAX_ITERATIONS = 200
+
+
+def find_root(function, low: float, high: float, tolerance: float = 1e-9,
+              max_iterations: int = MAX_ITERATIONS) -> float:
+    '''Find x between low and high, where function(x) is zero.
+
+    function(low) and function(high) must have opposite signs. Bisects the
+    bracket until it is narrower than tolerance, or for max_iterations.
+
+    '''
+    f_low = function(low)
+    f_high = function(high)
+    assert f_low * f_high <= 0, \
+        'Error: No solution between {} and {}'.format(low, high)
+    if f_low == 0:
+        return low
+    if f_high == 0:
+        return high
+    for _ in range(max_iterations):
+        middle = (low + high) / 2
+        if high - low <= tolerance:
+            break
+        f_middle = function(middle)
+        if f_middle == 0:
+            return middle
+        if (f_middle < 0) == (f_low < 0):
+            low, f_low = middle, f_middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def bracket(function, start: float,
+            max_iterations: int = MAX_ITERATIONS) -> tuple:
+    '''Find (low, high) around start, where function changes sign.
+
+    Lengths are positive, so the bracket grows by doubling and halving start,
+    for at most max_iterations steps.
+
+    '''
+    low = high = start
+    f_start = function(start)
+    for _ in range(max_iterations):
+        if f_start * function(low) <= 0:
+            return low, low * 2
+        if f_start * function(high) <= 0:
+            return high / 2, high
+        low /= 2
+        high *= 2
+    assert False, 'Error: No solution found near {}'.format(start)
+
+
+def constraint(larger, smaller, message, factor=1):
+    '''Return a feasibility test for parameters[larger] > smaller * factor.
+
+    The test passes when either parameter is unknown.
+
+    '''
+    def test(parameters):
+        if larger not in parameters or smaller not in parameters:
+            return None
+        if parameters[larger] > parameters[smaller] * factor:
+            return None
+        return message
+    return test
+
+
+def all_constraints(*tests):
+    '''Return the first failing test's message, or None.'''
+    def test(parameters):
+        for message in (t(parameters) for t in tests):
+            if message is not None:
+                return message
+        return None
+    return test
+
+
+SURFACES = {
+    'cylinder': Surface(
+        targets={
+            'loxodromic_angle': lambda p: cylinder_calculations.
+            loxodromic_angle(p['height'], p['outer_radius']),
+            'slice_width': lambda p: p['outer_radius'] - p['inner_radius'],
+            # Height of each slice template.
+            'slice_height': lambda p: 2 * math.hypot(p['outer_radius'],
+                                                     p['height'] / 2),
+        },
+        inverses={
+            ('loxodromic_angle', 'height'):
+            lambda v, p: cylinder_calculations.calculate_height(
+                p['outer_radius'], v),
+            ('loxodromic_angle', 'outer_radius'):
+            lambda v, p: (p['height'] / 2) / math.tan(v),
+            ('slice_width', 'inner_radius'):
+            lambda v, p: p['outer_radius'] - v,
+            ('slice_width', 'outer_radius'):
+            lambda v, p: p['inner_radius'] + v,
+        },
+        feasible=constraint(
+            'outer_radius', 'inner_radius',
+            'Outer radius must be larger than inner radius')),
+    'truncated_sphere': Surface(
+        targets={
+            'loxodromic_angle': lambda p: math.asin(
+                (p['height'] / 2) / p['outer_radius']),
+            'slice_width': lambda p: p['outer_radius'] - p['inner_radius'],
+            # Radius of the hole in the top and bottom of the model.
+            'top_radius': lambda p: p['inner_radius'] * math.cos(math.asin(
+                (p['height'] / 2) / p['outer_radius'])),
+        },
+        inverses={
+            ('loxodromic_angle', 'height'):
+            lambda v, p: 2 * p['outer_radius'] * math.sin(v),
+            ('loxodromic_angle', 'outer_radius'):
+            lambda v, p: (p['height'] / 2) / math.sin(v),
+            ('slice_width', 'inner_radius'):
+            lambda v, p: p['outer_radius'] - v,
+            ('slice_width', 'outer_radius'):
+            lambda v, p: p['inner_radius'] + v,
+            # cos(loxodromic_angle) = top_radius / inner_radius
+            ('top_radius', 'height'):
+            lambda v, p: 2 * p['outer_radius'] * math.sin(
+                math.acos(v / p['inner_radius'])),
+        },
+        feasible=all_constraints(
+            constraint('outer_radius', 'inner_radius',
+                       'Outer radius must be larger than inner radius'),
+            constraint('outer_radius', 'height',
+                       'Height must be less than outer radius * 2', .5))),
+    'torus': Surface(
+        targets={
+            'loxodromic_angle': lambda p: math.asin(
+                p['minor_radius'] / p['major_radius']),
+            # Overall diameter of the model.
+            'diameter': lambda p: 2 * (p['major_radius'] +
+                                       p['minor_radius']),
+        },
+        inverses={
+            ('loxodromic_angle', 'minor_radius'):
+            lambda v, p: p['major_radius'] * math.sin(v),
+            ('loxodromic_angle', 'major_radius'):
+            lambda v, p: p['minor_radius'] / math.sin(v),
+            ('diameter', 'major_radius'):
+            lambda v, p: v / 2 - p['minor_radius'],
+            ('diameter', 'minor_radius'):
+            lambda v, p: v / 2 - p['major_radius'],
+        },
+        feasible=constraint(
+            'major_radius', 'minor_radius',
+            'Major radius must be larger than minor radius')),
+    'hyperboloid': Surface(
+        targets={
+            'loxodromic_angle': lambda p: hyperboloid_calculations.
+            loxodromic_angle(p['height'], p['outer_edge_radius'],
+                             p['outer_waist_radius']),
+            # Angle between neighbouring corners of the top edge.
+            'corner_angle': lambda p: 2 * math.asin(
+                p['outer_waist_radius'] / p['outer_edge_radius']),
+            'slice_width': lambda p: (p['outer_waist_radius'] -
+                                      p['inner_radius']),
+        },
+        inverses={
+            ('corner_angle', 'outer_edge_radius'):
+            lambda v, p: p['outer_waist_radius'] / math.sin(v / 2),
+            ('corner_angle', 'outer_waist_radius'):
+            lambda v, p: p['outer_edge_radius'] * math.sin(v / 2),
+            ('loxodromic_angle', 'height'):
+            lambda v, p: 2 * math.tan(v) * math.sqrt(
+                p['outer_edge_radius'] ** 2 - p['outer_waist_radius'] ** 2),
+            ('slice_width', 'inner_radius'):
+            lambda v, p: p['outer_waist_radius'] - v,
+        },
+        feasible=all_constraints(
+            constraint('outer_edge_radius', 'outer_waist_radius',
+                       'Outer edge radius must be larger than outer waist '
+                       'radius'),
+            constraint('outer_waist_radius', 'inner_radius',
+                       'Outer waist radius must be larger than inner '
+                       'radius'))),
+}
+
+
+def solve(surface: str, target: str, value: float, parameters: dict,
+          unknown: str) -> dict:
+    '''Find the value of parameter unknown, where target equals value.
+
+    parameters has the surface's other parameters. Returns a copy of
+    parameters, with unknown added. Parameters without a closed form
+    solution are found with find_root(), starting from the largest known
+    length.
+
+    '''
+    assert surface in SURFACES, 'Error: Unknown surface {}'.format(surface)
+    surface = SURFACES[surface]
+    assert target in surface.targets, 'Error: Unknown target {}'.format(
+        target)
+    parameters = dict(parameters)
+    inverse = surface.inverses.get((target, unknown))
+    if inverse is not None:
+        parameters[unknown] = inverse(value, parameters)
+    else:
+        def error(x):
+            parameters[unknown] = x
+            try:
+                return surface.targets[target](parameters) - value
+            except (ValueError, ZeroDivisionError):
+                return math.nan
+
+        start = max([abs(v) for v in parameters.values()] + [1])
+        low, high = bracket(error, start)
+        parameters[unknown] = find_root(error, low, high,
+                                        tolerance=start * 1e-12)
+
+    message = surface.feasible(parameters)
+    assert message is None, 'Error: ' + message
+    return parameters
+
+
+def hyperboloid_num_slices(outer_edge_radius: float, divisor: int,
+                           slice_width: float) -> tuple:
+    '''Find a hyperboloid's number of slices, for a target slice width.
+
+    The slices touch along the outer edge, so the number of slices is a
+    multiple of the number of corners, divisor, and at least twice divisor.
+    Returns (num_slices, slice_width), with slice width closest to
+    slice_width.
+
+    '''
+    def width(num_slices):
+        # There are num_slices corners, so the angle between corners is 2pi /
+        # num_slices. The corners are 2 * sin(pi / num_slices) *
+        # outer_edge_radius apart, and the slice is that distance times
+        # cos(pi / num_slices) / 2 wide.
+        return outer_edge_radius * math.sin(2 * math.pi / num_slices) / 2
+
+    # Slice width decreases with num_slices, from num_slices = 4. Try the
+    # multiples around the closed form solution, and the smallest multiples.
+    multipliers = {2, 3}
+    ratio = 2 * slice_width / outer_edge_radius
+    if ratio < 1:
+        exact = 2 * math.pi / math.asin(ratio) / divisor
+        multipliers |= {max(2, math.floor(exact)), max(2, math.ceil(exact))}
+    num_slices = min((divisor * m for m in multipliers),
+                     key=lambda n: (abs(width(n) - slice_width), n))
+    return num_slices, width(num_slices)
+
+
+def main():
+    if len(sys.argv) < 4 or sys.argv[1] not in SURFACES:
+        print('Usage: solve.py SURFACE TARGET=VALUE UNKNOWN NAME=VALUE...')
+        for name, surface in SURFACES.items():
+            print('  {} targets: {}'.format(name, ' '.join(surface.targets)))
+        print('Angles are in degrees.')
+        sys.exit(1)
+
+    surface = sys.argv[1]
+    target, value = sys.argv[2].split('=', 1)
+    value = float(value)
+    if target.endswith('angle'):
+        value = math.radians(value)
+    unknown = sys.argv[3]
+    parameters = {name: float(value) for name, value in
+                  (argument.split('=', 1) for argument in sys.argv[4:])}
+    parameters = solve(surface, target, value, parameters, unknown)
+    for name, value in sorted(parameters.items()):
+        print(f'{name} {value:.2f}')
+    for name, function in SURFACES[surface].targets.items():
+        value = function(parameters)
+        if name.endswith('angle'):
+            print(f'{name} {math.degrees(value):.2f}°')
+        else:
+            print(f'{name} {value:.2f}')
+
+
+if __name__ == '__main__':
+    main()
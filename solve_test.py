@@ -0,0 +1,80 @@
+import math
+import unittest
+
+import cylinder_calculations
+import solve
+
+
+class TestSolve(unittest.TestCase):
+    def test_find_root(self):
+        self.assertAlmostEqual(
+            solve.find_root(lambda x: x * x - 2, 0, 2), math.sqrt(2))
+
+    def test_find_root_bounded(self):
+        # Stops after max_iterations, even with zero tolerance.
+        root = solve.find_root(lambda x: x - 1, 0, 3, tolerance=0,
+                               max_iterations=10)
+        self.assertAlmostEqual(root, 1, places=2)
+
+    def test_bracket(self):
+        low, high = solve.bracket(lambda x: x - 1000, 1)
+        self.assertLessEqual(low, 1000)
+        self.assertGreaterEqual(high, 1000)
+
+    def test_cylinder_height(self):
+        parameters = solve.solve('cylinder', 'loxodromic_angle',
+                                 math.radians(30), {'outer_radius': 40},
+                                 'height')
+        self.assertAlmostEqual(
+            cylinder_calculations.loxodromic_angle(parameters['height'], 40),
+            math.radians(30))
+
+    def test_root_finding(self):
+        # slice_height has no closed form for height.
+        parameters = solve.solve('cylinder', 'slice_height', 100,
+                                 {'outer_radius': 40}, 'height')
+        self.assertAlmostEqual(parameters['height'], 60)
+
+    def test_truncated_sphere_top_radius(self):
+        parameters = solve.solve('truncated_sphere', 'top_radius', 20,
+                                 {'outer_radius': 40, 'inner_radius': 30},
+                                 'height')
+        self.assertAlmostEqual(
+            solve.SURFACES['truncated_sphere'].targets['top_radius'](
+                parameters), 20)
+
+    def test_torus_diameter(self):
+        parameters = solve.solve('torus', 'diameter', 100,
+                                 {'minor_radius': 10}, 'major_radius')
+        self.assertAlmostEqual(parameters['major_radius'], 40)
+
+    def test_hyperboloid_corner_angle(self):
+        parameters = solve.solve('hyperboloid', 'corner_angle',
+                                 math.radians(60),
+                                 {'outer_waist_radius': 30},
+                                 'outer_edge_radius')
+        self.assertAlmostEqual(parameters['outer_edge_radius'], 60)
+
+    def test_infeasible(self):
+        with self.assertRaises(AssertionError):
+            solve.solve('cylinder', 'loxodromic_angle', math.radians(30),
+                        {'outer_radius': 30, 'inner_radius': 40}, 'height')
+        with self.assertRaises(AssertionError):
+            solve.solve('cylinder', 'no_such_target', 1, {}, 'height')
+
+    def test_hyperboloid_num_slices(self):
+        # Matches a search over every multiple of divisor.
+        for outer_edge_radius, divisor, target in [(60, 6, 10), (35, 4, 10),
+                                                    (100, 5, 3), (20, 3, 20)]:
+            def width(n):
+                return outer_edge_radius * math.sin(2 * math.pi / n) / 2
+            expected = min((divisor * m for m in range(2, 1000)),
+                           key=lambda n: (abs(width(n) - target), n))
+            num_slices, slice_width = solve.hyperboloid_num_slices(
+                outer_edge_radius, divisor, target)
+            self.assertEqual(num_slices, expected)
+            self.assertAlmostEqual(slice_width, width(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
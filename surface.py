@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+'''Inkscape extension that generates sliceform templates for other shapes.
+
+Generates 'C' shaped slices for any solid of revolution in revolution.SHAPES
+that has no hand-coded model, from its profile.
+
+'''
+
+import math
+
+from common import defaults
+from common import point
+
+import cost
+import generator
+import render
+import revolution
+
+__version__ = '0.3.1'
+
+
+class SliceformSurfaceGenerator(generator.SliceformGenerator):
+    def add_model_arguments(self, pars):
+        pars.add_argument('--shape', type=str,
+                          dest='shape', default='vase',
+                          help='Shape: {}'.format(
+                              ', '.join(revolution.NEW_SHAPES)))
+        pars.add_argument('--bottom_radius', type=float,
+                          dest='bottom_radius', default='30',
+                          help='Bottom radius')
+        pars.add_argument('--radius', type=float,
+                          dest='radius', default='40',
+                          help='Radius halfway up')
+        pars.add_argument('--top_radius', type=float,
+                          dest='top_radius', default='20',
+                          help='Top radius')
+        pars.add_argument('--height', type=float,
+                          dest='height', default='50',
+                          help='height')
+        pars.add_argument('--wall_width', type=float,
+                          dest='wall_width', default='8',
+                          help='Horizontal width of the walls')
+        pars.add_argument('--num_slices', type=int,
+                          dest='num_slices', default='14',
+                          help='Number of slices')
+
+    def read_options(self):
+        '''Read the model's options, and find its slot angles and rows.'''
+        assert self.options.shape in revolution.NEW_SHAPES, \
+            'Error: Unknown shape {}, expected {}'.format(
+                self.options.shape, ', '.join(revolution.NEW_SHAPES))
+        self.fit_model = self.options.shape
+        self.num_slices = self.options.num_slices
+        assert self.num_slices > 0, \
+            'Error: Number of slices must be greater than zero'
+        self.surface = revolution.surface(self.options.shape, **{
+            name: self.to_uu(getattr(self.options, name))
+            for name in revolution.SHAPES[self.options.shape].parameters})
+
+        self.angles, self.slot_width = revolution.slots(
+            self.surface, self.num_slices, self.material_thickness)
+
+        # The slices with slots on the inner edge are mirror images, through
+        # the shape's base, so they are upside down.
+        self.tilts = [self.surface.loxodromic_angle,
+                      -self.surface.loxodromic_angle]
+        y, inner_x, outer_x = revolution.section(self.surface, self.tilts[0])
+        self.slice_height = y[-1] - y[0]
+        self.top = [y[0], -y[-1]]
+
+        # Each slice's back fits into the previous slice's hole, as far as
+        # the widest part of the slice, from its inner edge to its outer
+        # edge, allows.
+        self.additional_slice_width = max(outer_x - inner_x)
+        material_width = self.material_width - max(outer_x)
+        self.templates_per_row = (
+            1 + math.floor(material_width /
+                           (self.additional_slice_width +
+                            self.template_spacing)))
+        self.num_rows = math.ceil(self.num_slices / self.templates_per_row)
+
+    def template_counts(self):
+        self.read_options()
+        # Each set of slices shares one outline. Its edges are polylines
+        # through the profile's samples.
+        return [cost.Counts(
+            templates=2 * self.num_slices, outlines=2,
+            slots=self.num_slices - 1,
+            first_row=min(self.templates_per_row, self.num_slices),
+            cavities=False, edges=2 * len(self.surface.z))]
+
+    def generate_templates(self):
+        self.read_options()
+
+        # Generate two sets of slice templates. The first set has slots on
+        # the outer edge, and the second set has slots on the inner edge.
+        def layout_templates(top_left: point.Point,
+                             outer_inner: render.OuterInner):
+            # All slices in a set are identical, so they share one template.
+            if self.options.fidelity == 'marks':
+                template = revolution.marks(
+                    self.surface, self.tilts[outer_inner], self.angles,
+                    outer_inner, defaults.defaults['fill_colors'][outer_inner])
+            else:
+                template = revolution.template(
+                    self.surface, self.tilts[outer_inner], self.angles,
+                    self.slot_width, outer_inner,
+                    defaults.defaults['fill_colors'][outer_inner])
+            templates_generated = 0
+            while templates_generated < self.num_slices:
+                top_left.x = 0
+                num_templates = min(self.templates_per_row,
+                                    self.num_slices - templates_generated)
+                templates_generated += num_templates
+                for slice_num in range(templates_generated - num_templates,
+                                       templates_generated):
+                    # Place the top of the slice at top_left.y.
+                    yield template._replace(position=point.Point(
+                        top_left.x, top_left.y - self.top[outer_inner]),
+                        label=slice_num)
+
+                    top_left.x += (self.additional_slice_width +
+                                   self.template_spacing)
+                top_left.y += self.slice_height + self.template_spacing
+
+        top_left = point.Point(0, 0)
+        yield from layout_templates(top_left, render.OuterInner.OUTER)
+        top_left = point.Point(
+            0, self.num_rows * (self.slice_height + self.template_spacing))
+        yield from layout_templates(top_left, render.OuterInner.INNER)
+
+
+if __name__ == '__main__':
+    SliceformSurfaceGenerator().run()
@@ -0,0 +1,96 @@
+import math
+
+import geometry
+
+
+class PathWriter:
+    '''Serialize path segments as compact path data.
+
+    Coordinates are rounded to a fixed grid, and written with relative
+    commands. A command letter is omitted when it repeats the previous command
+    letter, so a run of slot walls shares a single 'l'.
+
+    The grid is the largest power of ten that is no coarser than 'precision'.
+    Rounding happens in absolute grid coordinates, before calculating relative
+    offsets, so rounding errors do not accumulate along the path, and the same
+    geometry always produces the same path data.
+
+    '''
+    def __init__(self, precision: float):
+        assert precision > 0, 'Error: precision must be greater than zero'
+        self.decimals = max(0, math.ceil(-math.log10(precision)))
+        self.scale = 10 ** self.decimals
+        self.tokens = []
+        self.command = None
+        # Current point and subpath start point, in grid coordinates.
+        self.current = (0, 0)
+        self.start = (0, 0)
+
+    def format(self, n: int) -> str:
+        '''Format grid value n, without redundant zeros.'''
+        sign = '-' if n < 0 else ''
+        digits = str(abs(n)).rjust(self.decimals + 1, '0')
+        whole = digits[:len(digits) - self.decimals]
+        fraction = digits[len(digits) - self.decimals:].rstrip('0')
+        if not fraction:
+            return sign + whole
+        if whole == '0':
+            whole = ''
+        return sign + whole + '.' + fraction
+
+    def emit(self, command: str, implicit: str, numbers: list[str]):
+        if implicit is None or self.command != implicit:
+            self.tokens.append(command)
+        self.tokens.extend(numbers)
+        self.command = command
+
+    def relative(self, x: float, y: float) -> list[str]:
+        grid_x = round(x * self.scale)
+        grid_y = round(y * self.scale)
+        dx = grid_x - self.current[0]
+        dy = grid_y - self.current[1]
+        self.current = (grid_x, grid_y)
+        return [self.format(dx), self.format(dy)]
+
+    def write(self, kind: geometry.Segment, x: float, y: float,
+              radius_x: float, radius_y: float, large_arc: int, sweep: int):
+        if kind == geometry.Segment.LINE:
+            # Coordinate pairs following a moveto are implicit linetos.
+            implicit = 'm' if self.command == 'm' else 'l'
+            self.emit('l', implicit, self.relative(x, y))
+        elif kind == geometry.Segment.ARC:
+            self.emit('a', 'a',
+                      [self.format(round(radius_x * self.scale)),
+                       self.format(round(radius_y * self.scale)),
+                       '0', str(large_arc), str(sweep)] +
+                      self.relative(x, y))
+        elif kind == geometry.Segment.MOVE:
+            self.emit('m', None, self.relative(x, y))
+            self.start = self.current
+        else:
+            self.tokens.append('z')
+            self.command = 'z'
+            self.current = self.start
+
+    def __str__(self):
+        # Numbers are separated by spaces, except before a minus sign, which
+        # also acts as a separator. Command letters need no separators.
+        data = []
+        previous = 'm'
+        for token in self.tokens:
+            if (not previous.isalpha() and not token.isalpha() and
+                    not token.startswith('-')):
+                data.append(' ')
+            data.append(token)
+            previous = token
+        return ''.join(data)
+
+
+def encode(outline: geometry.Outline, precision: float) -> str:
+    '''Return compact SVG path data for outline.'''
+    writer = PathWriter(precision)
+    for segment in zip(outline.kinds, outline.x, outline.y,
+                       outline.radius_x, outline.radius_y,
+                       outline.large_arc, outline.sweep):
+        writer.write(*segment)
+    return str(writer)
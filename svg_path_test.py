@@ -0,0 +1,56 @@
+import unittest
+
+from common import path
+from common import point
+
+import geometry
+import svg_path
+
+
+class TestPathWriter(unittest.TestCase):
+    def test_format(self):
+        writer = svg_path.PathWriter(.001)
+        self.assertEqual(writer.format(0), '0')
+        self.assertEqual(writer.format(1000), '1')
+        self.assertEqual(writer.format(1500), '1.5')
+        self.assertEqual(writer.format(500), '.5')
+        self.assertEqual(writer.format(-5), '-.005')
+        self.assertEqual(writer.format(-12345), '-12.345')
+
+        # Precision is rounded to a power of ten, and never becomes coarser.
+        writer = svg_path.PathWriter(.005)
+        self.assertEqual(writer.decimals, 3)
+        writer = svg_path.PathWriter(1)
+        self.assertEqual(writer.format(-7), '-7')
+
+    def test_relative_commands(self):
+        outline = geometry.Outline()
+        outline.move(point.Point(1, 1))
+        outline.line(point.Point(2, 1))
+        outline.line(point.Point(2, 2.5))
+        outline.arc(1, 2, path.Size.SMALL, path.Winding.CW,
+                    point.Point(1, 1))
+        outline.arc(1, 2, path.Size.LARGE, path.Winding.CCW,
+                    point.Point(0, 0))
+        outline.close()
+        outline.move(point.Point(1.5, 1.5))
+        outline.line(point.Point(1.25, 1.5))
+        self.assertEqual(svg_path.encode(outline, .01),
+                         'm1 1 1 0 0 1.5a1 2 0 0 1-1-1.5 1 2 0 1 0-1-1'
+                         'zm.5 .5-.25 0')
+
+    def test_rounding_does_not_accumulate(self):
+        # Offsets are calculated between rounded absolute positions, so the
+        # sum of many rounded offsets still ends at the rounded end point.
+        outline = geometry.Outline()
+        outline.move(point.Point(0, 0))
+        for i in range(1, 101):
+            outline.line(point.Point(.04 * i, 0))
+        offsets = [float(n) for n in
+                   svg_path.encode(outline, .1)[len('m0 0'):].split()[::2]]
+        self.assertEqual(len(offsets), 100)
+        self.assertAlmostEqual(sum(offsets), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+'''Shapes that several tests share.'''
+
+from common import path
+from common import point
+
+import geometry
+import render
+
+
+def ring_outline(outer: float, inner: float) -> geometry.Outline:
+    '''Return a circular ring, centered on the origin.'''
+    outline = geometry.Outline()
+    for radius in (outer, inner):
+        outline.move(point.Point(0, radius))
+        outline.arc(radius, radius, path.Size.SMALL, path.Winding.CW,
+                    point.Point(0, -radius))
+        outline.arc(radius, radius, path.Size.SMALL, path.Winding.CW,
+                    point.Point(0, radius))
+        outline.close()
+    return outline
+
+
+def template(outline: geometry.Outline, x: float = 0, y: float = 0,
+             slots=()) -> render.Template:
+    return render.Template(outline=outline, slots=list(slots),
+                           fill_color='', position=point.Point(x, y))
+
+
+def ring(outer: float, inner: float, x: float = 0,
+         y: float = 0) -> render.Template:
+    '''Return a circular ring template, with its hole as a cavity.'''
+    return template(ring_outline(outer, inner), x, y)._replace(
+        cavities=(render.Cavity(point.Point(0, 0), inner, inner),))
+
+
+def square(size: float, x: float = 0, y: float = 0,
+           slots=()) -> render.Template:
+    '''Return a square template, with slots cut down from its top edge.
+
+    Each slot is (x, width, depth).
+
+    '''
+    outline = geometry.Outline()
+    outline.move(point.Point(0, 0))
+    corners = []
+    for slot_x, width, depth in slots:
+        corners.append([point.Point(slot_x, 0), point.Point(slot_x, depth),
+                        point.Point(slot_x + width, depth),
+                        point.Point(slot_x + width, 0)])
+        for corner in corners[-1]:
+            outline.line(corner)
+    outline.line(point.Point(size, 0))
+    outline.line(point.Point(size, size))
+    outline.line(point.Point(0, size))
+    outline.close()
+    return template(outline, x, y, corners)
@@ -0,0 +1,168 @@
+'''Estimate how often slots are too tight or too loose.
+
+calculations.slot_width() gives the exact slot width for one material
+thickness and lie flat angle. Real material varies in thickness, cutters
+remove a kerf, and assemblies are folded to slightly different angles. This
+samples all three at once, with numpy, and counts the slots that do not fit:
+
+     tight: The slot is narrower than the width needed to fold the slices to
+            the lie flat angle, by more than interference.
+     loose: The slot is wider than that, by more than clearance.
+
+It also finds the slot width, as drawn, that fits the most samples.
+
+Each distribution is one of:
+
+          VALUE: Always VALUE.
+  normal:MEAN:SD: Normally distributed.
+ uniform:LOW:HIGH: Uniformly distributed.
+
+Lengths are in millimeters, and angles in degrees. A positive kerf widens the
+slot, by the width of material that the cutter removes.
+
+Example:
+
+  python3 tolerance.py material_thickness=normal:.25:.01 \\
+      kerf=uniform:.05:.15 lie_flat_angle=normal:60:2 clearance=.1
+
+'''
+
+import collections
+import math
+import sys
+
+import numpy as np
+
+import calculations
+
+# Probabilities that a slot with slot_width, as drawn, is too tight or too
+# loose.
+Fit = collections.namedtuple('Fit', ['slot_width', 'tight', 'loose'])
+
+DEFAULTS = {
+    'material_thickness': '.25',
+    'kerf': '0',
+    'lie_flat_angle': '60',
+    'clearance': '.1',
+    'interference': '0',
+    'samples': '1000000',
+    'seed': '0',
+}
+
+
+def sample(distribution: str, size: int,
+           rng: np.random.Generator) -> np.ndarray:
+    '''Draw size samples from a distribution, as described above.'''
+    kind, *values = distribution.split(':')
+    if not values:
+        return np.full(size, float(kind))
+    assert len(values) == 2, \
+        'Error: Expected {}:A:B, got {}'.format(kind, distribution)
+    a, b = (float(v) for v in values)
+    if kind == 'normal':
+        return rng.normal(a, b, size)
+    assert kind == 'uniform', 'Error: Unknown distribution {}'.format(kind)
+    return rng.uniform(a, b, size)
+
+
+def mean(distribution: str) -> float:
+    '''Return a distribution's mean.'''
+    kind, *values = distribution.split(':')
+    if not values:
+        return float(kind)
+    a, b = (float(v) for v in values)
+    return a if kind == 'normal' else (a + b) / 2
+
+
+def needed_width(material_thickness: np.ndarray,
+                 lie_flat_angle: np.ndarray) -> np.ndarray:
+    '''Vectorized calculations.slot_width().'''
+    lie_flat_angle = np.where(lie_flat_angle > math.pi / 2,
+                              math.pi - lie_flat_angle, lie_flat_angle)
+    return (material_thickness / np.tan(lie_flat_angle) +
+            material_thickness / np.sin(lie_flat_angle))
+
+
+def fit(slot_width: float, needed: np.ndarray, interference: float,
+        clearance: float) -> Fit:
+    '''Return the fit of slots drawn slot_width wide.
+
+    needed has each sample's slot width, as drawn, that fits exactly: the
+    needed width, less the kerf.
+
+    '''
+    return Fit(slot_width=slot_width,
+               tight=float(np.mean(slot_width < needed - interference)),
+               loose=float(np.mean(slot_width > needed + clearance)))
+
+
+def recommend(needed: np.ndarray, interference: float,
+              clearance: float) -> float:
+    '''Return the slot width, as drawn, that fits the most samples.
+
+    A slot fits samples with needed widths from slot_width - clearance to
+    slot_width + interference, so this slides a window that wide over the
+    sorted samples.
+
+    '''
+    needed = np.sort(needed)
+    ends = np.searchsorted(needed, needed + (interference + clearance),
+                           side='right')
+    start = int(np.argmax(ends - np.arange(len(needed))))
+    # Center the window between the first and last samples it holds, so
+    # that it fits as much of the distribution as possible in between.
+    low = needed[start]
+    high = needed[ends[start] - 1]
+    return float((low + clearance + high - interference) / 2)
+
+
+def analyze(material_thickness: str = DEFAULTS['material_thickness'],
+            kerf: str = DEFAULTS['kerf'],
+            lie_flat_angle: str = DEFAULTS['lie_flat_angle'],
+            clearance: float = float(DEFAULTS['clearance']),
+            interference: float = float(DEFAULTS['interference']),
+            samples: int = int(DEFAULTS['samples']), seed: int = 0,
+            slot_width: float = None) -> tuple[Fit, Fit]:
+    '''Return the fit of slot_width, and the recommended slot width's fit.
+
+    material_thickness, kerf and lie_flat_angle are distributions, as
+    described above. slot_width defaults to calculations.slot_width(), for
+    the mean thickness and angle, which is what the extensions draw.
+
+    '''
+    rng = np.random.default_rng(seed)
+    thickness = sample(material_thickness, samples, rng)
+    angle = np.radians(sample(lie_flat_angle, samples, rng))
+    needed = needed_width(thickness, angle) - sample(kerf, samples, rng)
+    if slot_width is None:
+        slot_width = calculations.slot_width(
+            mean(material_thickness), math.radians(mean(lie_flat_angle)))
+    return (fit(slot_width, needed, interference, clearance),
+            fit(recommend(needed, interference, clearance), needed,
+                interference, clearance))
+
+
+def main():
+    parameters = dict(DEFAULTS)
+    for argument in sys.argv[1:]:
+        name, _, value = argument.partition('=')
+        if name not in DEFAULTS and name != 'slot_width':
+            print('Usage: tolerance.py [NAME=VALUE]...')
+            print('  ' + ' '.join(list(DEFAULTS) + ['slot_width']))
+            sys.exit(1)
+        parameters[name] = value
+    slot_width = parameters.pop('slot_width', None)
+    results = analyze(
+        parameters['material_thickness'], parameters['kerf'],
+        parameters['lie_flat_angle'], float(parameters['clearance']),
+        float(parameters['interference']), int(parameters['samples']),
+        int(parameters['seed']),
+        None if slot_width is None else float(slot_width))
+    for label, result in zip(['Drawn', 'Recommended'], results):
+        print('{}: slot width {:.4f}, {:.2%} too tight, {:.2%} too '
+              'loose'.format(label, result.slot_width, result.tight,
+                             result.loose))
+
+
+if __name__ == '__main__':
+    main()
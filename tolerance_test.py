@@ -0,0 +1,62 @@
+import math
+import unittest
+
+import numpy as np
+
+import calculations
+import tolerance
+
+
+class TestTolerance(unittest.TestCase):
+    def test_needed_width(self):
+        for degrees in (30, 60, 90, 120):
+            angle = math.radians(degrees)
+            self.assertAlmostEqual(
+                tolerance.needed_width(np.array([.25]), np.array([angle]))[0],
+                calculations.slot_width(.25, angle))
+
+    def test_sample(self):
+        rng = np.random.default_rng(0)
+        self.assertTrue(np.all(tolerance.sample('2', 10, rng) == 2))
+        values = tolerance.sample('uniform:1:3', 100000, rng)
+        self.assertGreaterEqual(values.min(), 1)
+        self.assertLess(values.max(), 3)
+        values = tolerance.sample('normal:5:.5', 100000, rng)
+        self.assertAlmostEqual(values.mean(), 5, places=2)
+        self.assertAlmostEqual(values.std(), .5, places=2)
+        with self.assertRaises(AssertionError):
+            tolerance.sample('gamma:1:2', 10, rng)
+
+    def test_exact(self):
+        # The drawn slot width fits exact material.
+        drawn, recommended = tolerance.analyze(samples=1000)
+        self.assertEqual((drawn.tight, drawn.loose), (0, 0))
+        self.assertEqual((recommended.tight, recommended.loose), (0, 0))
+
+    def test_kerf(self):
+        # A kerf wider than the clearance makes every drawn slot loose, and
+        # the recommended width takes the kerf off.
+        drawn, recommended = tolerance.analyze(kerf='.2', clearance=.1,
+                                               samples=1000)
+        self.assertEqual(drawn.loose, 1)
+        self.assertEqual((recommended.tight, recommended.loose), (0, 0))
+        self.assertLess(recommended.slot_width, drawn.slot_width - .1)
+
+    def test_thin_material(self):
+        drawn, _ = tolerance.analyze(material_thickness='normal:.25:.02',
+                                     clearance=.1, samples=100000)
+        # About half of the samples are thicker than the mean.
+        self.assertAlmostEqual(drawn.tight, .5, places=1)
+
+    def test_recommend(self):
+        # The widest window of samples is [1, 1.1], and the slot is centered
+        # in the widths that fit all of them.
+        needed = np.array([0, 1, 1.05, 1.1, 3])
+        self.assertAlmostEqual(tolerance.recommend(needed, .1, .1), 1.05)
+        fit = tolerance.fit(1.05, needed, .1, .1)
+        self.assertAlmostEqual(fit.tight, .2)
+        self.assertAlmostEqual(fit.loose, .2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,27 +8,25 @@ Assembly video: https://www.youtube.com/watch?v=WVE-HeVFJ1k
 '''
 
 import math
-import inkex
-from inkex import elements
-from inkex import transforms
 
 from common import defaults
 from common import path
 from common import point
 
 import calculations
+import cost
+import generator
+import geometry
 import render
 import torus_calculations
 
 __version__ = '0.3.1'
 
 
-class SliceformTorusGenerator(inkex.extensions.GenerateExtension):
-    def add_arguments(self, pars):
-        pars.add_argument('--tab', type=str, dest='tab')
-        pars.add_argument('--units', type=str,
-                          dest='units', default='mm',
-                          help='Units')
+class SliceformTorusGenerator(generator.SliceformGenerator):
+    fit_model = 'torus'
+
+    def add_model_arguments(self, pars):
         pars.add_argument('--major_radius', type=float,
                           dest='major_radius', default='40',
                           help='Major radius')
@@ -38,19 +36,9 @@ class SliceformTorusGenerator(inkex.extensions.GenerateExtension):
         pars.add_argument('--num_slices', type=int,
                           dest='num_slices', default='10',
                           help='Number of slices')
-        pars.add_argument('--material_thickness', type=float,
-                          dest='material_thickness', default='.25',
-                          help='Thickness of material')
-        pars.add_argument('--material_width', type=float,
-                          dest='material_width', default='203',
-                          help='Width of material')
-
-    def to_uu(self, n: float):
-        '''Convert from self.units to user units.'''
-        return self.svg.unittouu(str(n) + self.units)
 
     def render_slice(self, angles, fill_color, outer_inner: render.OuterInner,
-                     top_point) -> elements.PathElement:
+                     top_point) -> render.Template:
         # Draw a crescent moon shape, oriented like a closing parenthesis, with
         # the crescent moon's points vertically aligned on the left.
         #
@@ -93,7 +81,9 @@ class SliceformTorusGenerator(inkex.extensions.GenerateExtension):
                 outer=outer_points, middle=middle_points, inner=inner_points))
 
         # Start at the bottom point.
-        commands = path.move_abs(bottom_point)
+        outline = geometry.Outline()
+        outline.move(bottom_point)
+        slots = []
 
         def is_inner(i):
             '''Returns True iff slot `i` is on the inner edge.'''
@@ -102,15 +92,15 @@ class SliceformTorusGenerator(inkex.extensions.GenerateExtension):
         # Draw the outer (larger) arc of the crescent moon, counterclockwise
         # from the bottom point.
         if outer_inner == render.OuterInner.OUTER:
-            commands += render.elliptical_slotted_path(
-                intersections=forward_intersections,
+            slots += render.elliptical_slotted_path(
+                outline=outline, intersections=forward_intersections,
                 outer_inner=render.OuterInner.OUTER,
                 winding=path.Winding.CCW, radius_x=self.major_radius,
-                radius_y=self.major_radius, end=top_point, skip=is_inner)
+                radius_y=self.major_radius, end=top_point, skip=is_inner,
+                min_x=0)
         else:
-            commands += path.arc_abs(
-                self.major_radius, self.major_radius,
-                path.Size.LARGE, path.Winding.CCW, top_point)
+            outline.arc(self.major_radius, self.major_radius,
+                       path.Size.LARGE, path.Winding.CCW, top_point)
 
         def is_outer(i):
             return not is_inner(i)
@@ -119,42 +109,42 @@ class SliceformTorusGenerator(inkex.extensions.GenerateExtension):
         # top point.
         reverse_intersections = render.reverse_intersections(
             forward_intersections)
-        commands += render.elliptical_slotted_path(
-            intersections=reverse_intersections,
+        slots += render.elliptical_slotted_path(
+            outline=outline, intersections=reverse_intersections,
             outer_inner=render.OuterInner.INNER, winding=path.Winding.CW,
             radius_x=self.major_radius, radius_y=self.major_radius,
-            end=bottom_point, skip=is_outer)
-
-        commands += 'Z'
-
-        element = elements.PathElement()
-        element.style = inkex.styles.Style(style={
-            'stroke-width': self.stroke_width,
-            'stroke': defaults.defaults['cut_color'],
-            'fill': fill_color})
-        element.set_path(commands)
-        return element
-
-    def generate(self):
-        self.stroke_width = str(self.svg.unittouu(
-            defaults.defaults['stroke_width']))
-        self.units = self.options.units
-
+            end=bottom_point, skip=is_outer, min_x=0)
+
+        outline.close()
+        return render.Template(outline=outline, slots=slots,
+                               fill_color=fill_color, position=None)
+
+    def render_marks(self, angles, fill_color, outer_inner: render.OuterInner,
+                     top_point) -> render.Template:
+        '''Draw a slice for the 'marks' preview, see render.slot_marks().
+
+        The edges are render_slice()'s, without slots, and the marks follow
+        each slot angle's center line.
+
+        '''
+        # Without slots, the inner set's outline draws the outer edge as one
+        # large arc, for either set.
+        template = self.render_slice([], fill_color, render.OuterInner.INNER,
+                                     top_point)
+        outer = render.center_crossings(self.major_radius, self.major_radius,
+                                        self.minor_radius, angles)
+        inner = render.center_crossings(self.major_radius, self.major_radius,
+                                        -self.minor_radius, angles)
+        return template._replace(outline=render.slot_marks(
+            template.outline, *render.center_marks(outer, inner, outer_inner)))
+
+    def read_options(self):
+        '''Read the model's options, and find its slot angles and rows.'''
         self.major_radius = self.to_uu(self.options.major_radius)
         self.minor_radius = self.to_uu(self.options.minor_radius)
         self.num_slices = self.options.num_slices
-        self.material_thickness = self.to_uu(self.options.material_thickness)
-        self.material_width = self.to_uu(self.options.material_width)
-
-        # Spacing between templates.
-        self.template_spacing = self.svg.unittouu(
-            defaults.defaults['template_spacing'])
 
-        assert self.num_slices > 0, \
-            'Error: num_slices must be greater than zero'
-
-        assert self.major_radius > self.minor_radius, \
-            'Error: Major radius must be larger than minor radius'
+        self.check_feasible('torus')
 
         # loxodromic_angle is the slice angle, relative to the base of the
         # torus.
@@ -173,23 +163,23 @@ class SliceformTorusGenerator(inkex.extensions.GenerateExtension):
         self.slot_width = calculations.slot_width(self.material_thickness,
                                                   self.loxodromic_angle * 2)
 
-        angles = calculations.slot_angles(self.num_slices,
-                                          self.loxodromic_angle)
+        self.angles = calculations.slot_angles(self.num_slices,
+                                               self.loxodromic_angle)
 
         # top_point is the top left point where the inner and outer edges
         # meet. Note that the top left corner of the bounding box is a
         # different point. Calculate this point's coordinates by intersecting a
         # vertical line through (0, 0) with the outer edge.
-        top_point = torus_calculations.intersect_circle_line(
+        self.top_point = torus_calculations.intersect_circle_line(
             self.major_radius, self.minor_radius, math.pi / 2, 0)
 
         # Find the point where the horizontal line through top_point intersects
         # with the current slice's outer edge. That point's x-coordinate is how
         # far we have to shift subsequent slices to the right so slices don't
         # overlap.
-        additional_slice_width = torus_calculations.intersect_circle_line(
-            self.major_radius, self.minor_radius, 0, top_point.y).x
-        slice_height = self.major_radius * 2
+        self.additional_slice_width = torus_calculations.intersect_circle_line(
+            self.major_radius, self.minor_radius, 0, self.top_point.y).x
+        self.slice_height = self.major_radius * 2
 
         # Lay out templates in rows, with self.material_width as the maximum
         # row width.
@@ -201,40 +191,57 @@ class SliceformTorusGenerator(inkex.extensions.GenerateExtension):
         first_slice_width = torus_calculations.intersect_circle_line(
             self.major_radius, self.minor_radius, 0, 0).x
         material_width = self.material_width - first_slice_width
-        templates_per_row = (
+        self.templates_per_row = (
             1 + math.floor(material_width /
-                           (additional_slice_width + self.template_spacing)))
-        num_rows = math.ceil(self.num_slices / templates_per_row)
+                           (self.additional_slice_width +
+                            self.template_spacing)))
+        self.num_rows = math.ceil(self.num_slices / self.templates_per_row)
+
+    def template_counts(self):
+        self.read_options()
+        # Each set of slices shares one outline.
+        return [cost.Counts(
+            templates=2 * self.num_slices, outlines=2,
+            slots=self.num_slices - 1,
+            first_row=min(self.templates_per_row, self.num_slices),
+            cavities=False)]
+
+    def generate_templates(self):
+        self.read_options()
 
         # Generate two rows of slice templates. The top row has slots on the
         # outer edge, and the bottom row has slots on the inner edge.
-        def generate_templates(top_left: point.Point,
-                               outer_inner: render.OuterInner):
+        def layout_templates(top_left: point.Point,
+                             outer_inner: render.OuterInner):
+            # All slices in a set are identical, so they share one template.
+            render_slice = self.render_slice
+            if self.options.fidelity == 'marks':
+                render_slice = self.render_marks
+            template = render_slice(
+                self.angles, defaults.defaults['fill_colors'][outer_inner],
+                outer_inner, self.top_point)
             templates_generated = 0
             while templates_generated < self.num_slices:
                 top_left.x = 0
-                num_templates = min(templates_per_row,
+                num_templates = min(self.templates_per_row,
                                     self.num_slices - templates_generated)
                 templates_generated += num_templates
-                for _ in range(num_templates):
-                    element = self.render_slice(
-                        angles, defaults.defaults['fill_colors'][outer_inner],
-                        outer_inner, top_point)
-
-                    translate = transforms.Transform()
-                    translate.add_translate(top_left.x, top_left.y)
-                    element.transform = translate
-                    yield element
+                for slice_num in range(templates_generated - num_templates,
+                                       templates_generated):
+                    yield template._replace(
+                        position=point.Point(top_left.x, top_left.y),
+                        label=slice_num)
 
-                    top_left.x += (additional_slice_width +
+                    top_left.x += (self.additional_slice_width +
                                    self.template_spacing)
-                top_left.y += slice_height + self.template_spacing
+                top_left.y += self.slice_height + self.template_spacing
 
         top_left = point.Point(0, 0)
-        yield from generate_templates(top_left, render.OuterInner.OUTER)
+        yield from layout_templates(top_left, render.OuterInner.OUTER)
         top_left = point.Point(
-            0, num_rows * (slice_height + self.template_spacing))
-        yield from generate_templates(top_left, render.OuterInner.INNER)
+            0, self.num_rows * (self.slice_height + self.template_spacing))
+        yield from layout_templates(top_left, render.OuterInner.INNER)
 
 
-SliceformTorusGenerator().run()
+if __name__ == '__main__':
+    SliceformTorusGenerator().run()
@@ -4,27 +4,25 @@
 
 
 import math
-import inkex
-from inkex import elements
-from inkex import transforms
 
 from common import defaults
 from common import path
 from common import point
 
 import calculations
+import cost
 import cylinder_calculations
+import generator
+import geometry
 import render
 
 __version__ = '0.3.1'
 
 
-class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
-    def add_arguments(self, pars):
-        pars.add_argument('--tab', type=str, dest='tab')
-        pars.add_argument('--units', type=str,
-                          dest='units', default='mm',
-                          help='Units')
+class SliceformTruncatedSphereGenerator(generator.SliceformGenerator):
+    fit_model = 'truncated_sphere'
+
+    def add_model_arguments(self, pars):
         pars.add_argument('--outer_radius', type=float,
                           dest='outer_radius', default='35',
                           help='Outer radius')
@@ -40,20 +38,10 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
         pars.add_argument('--slice_shape', type=str,
                           dest='slice_shape', default='c',
                           help='Slice shape')
-        pars.add_argument('--material_thickness', type=float,
-                          dest='material_thickness', default='.25',
-                          help='Thickness of material')
-        pars.add_argument('--material_width', type=float,
-                          dest='material_width', default='203',
-                          help='Width of material')
-
-    def to_uu(self, n: float):
-        '''Convert from self.units to user units.'''
-        return self.svg.unittouu(str(n) + self.units)
 
     def render_slice(self, slice_shape: str, angles, fill_color,
                      outer_inner: render.OuterInner,
-                     slice_num: int) -> elements.PathElement:
+                     slice_num: int) -> render.Template:
         # For each slot angle, collect three pairs of points:
         #  outer: Where the slot intersects the slice's outer edge.
         #  inner: Where the slot intersects the slice's inner edge.
@@ -72,9 +60,8 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
             forward_intersections.append(render.Intersection(
                 outer=outer_points, middle=middle_points, inner=inner_points))
 
-        # Start at the bottom of the outer edge.
-        outer_bottom = point.Point(0, self.outer_radius)
-        commands = path.move_abs(outer_bottom)
+        outline = geometry.Outline()
+        slots = []
 
         if slice_shape == 'c':
             # Draw a backwards 'C' shape. The 'C' opens to the left.
@@ -100,15 +87,18 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
             #
             # NOTE: The names 'top' and 'bottom' refer to display coordinates,
             # where the positive Y-axis points downward.
+            outer_bottom = point.Point(0, self.outer_radius)
+            outline.move(outer_bottom)
             outer_top = point.Point(0, -self.outer_radius)
-            commands += render.elliptical_slotted_path(
-                intersections=forward_intersections,
+            slots += render.elliptical_slotted_path(
+                outline=outline, intersections=forward_intersections,
                 outer_inner=render.OuterInner.OUTER, winding=path.Winding.CCW,
                 radius_x=self.outer_radius, radius_y=self.outer_radius,
-                end=outer_top, skip=is_inner)
+                end=outer_top, skip=is_inner, min_x=0,
+                back_edge=True)
 
             inner_top = point.Point(0, -self.inner_radius)
-            commands += path.line_abs(inner_top)
+            outline.line(inner_top)
 
             def is_outer(i):
                 return not is_inner(i)
@@ -117,11 +107,13 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
             reverse_intersections = render.reverse_intersections(
                 forward_intersections)
             inner_bottom = point.Point(0, self.inner_radius)
-            commands += render.elliptical_slotted_path(
-                intersections=reverse_intersections,
+            slots += render.elliptical_slotted_path(
+                outline=outline, intersections=reverse_intersections,
                 outer_inner=render.OuterInner.INNER, winding=path.Winding.CW,
                 radius_x=self.inner_radius, radius_y=self.inner_radius,
-                end=inner_bottom, skip=is_outer)
+                end=inner_bottom, skip=is_outer, min_x=0,
+                back_edge=True)
+            outline.close()
         elif slice_shape == 'ring':
             # Draw a ring-shaped slice centered at (0, 0).
             #
@@ -138,80 +130,64 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
             left_intersections = render.mirror_intersections(
                 render.reverse_intersections(forward_intersections))
 
-            # Draw the right half of the outer ellipse.
-            outer_top = point.Point(0, -self.outer_radius)
-            commands += render.elliptical_slotted_path(
-                intersections=right_intersections,
-                outer_inner=render.OuterInner.OUTER, winding=path.Winding.CCW,
+            # Draw the outer ellipse.
+            slots += render.elliptical_slotted_ring(
+                outline=outline, right=right_intersections,
+                left=left_intersections, outer_inner=render.OuterInner.OUTER,
                 radius_x=self.outer_radius, radius_y=self.outer_radius,
-                end=outer_top, skip=is_outer)
-
-            # Draw the left half of the outer ellipse.
-            commands += render.elliptical_slotted_path(
-                intersections=left_intersections,
-                outer_inner=render.OuterInner.OUTER, winding=path.Winding.CCW,
-                radius_x=self.outer_radius, radius_y=self.outer_radius,
-                end=outer_bottom, skip=is_outer)
-            commands += 'Z'
-
-            # Move to the bottom of the inner ellipse.
-            inner_bottom = point.Point(0, self.inner_radius)
-            commands += path.move_abs(inner_bottom)
+                skip=is_outer)
 
             def is_inner(i):
                 return not is_outer(i)
 
-            # Draw the right half of the inner ellipse.
-            inner_top = point.Point(0, -self.inner_radius)
-            commands += render.elliptical_slotted_path(
-                intersections=right_intersections,
-                outer_inner=render.OuterInner.INNER, winding=path.Winding.CCW,
-                radius_x=self.inner_radius, radius_y=self.inner_radius,
-                end=inner_top, skip=is_inner)
-
-            # Draw the left half of the inner ellipse.
-            commands += render.elliptical_slotted_path(
-                intersections=left_intersections,
-                outer_inner=render.OuterInner.INNER, winding=path.Winding.CCW,
+            # Draw the inner ellipse.
+            slots += render.elliptical_slotted_ring(
+                outline=outline, right=right_intersections,
+                left=left_intersections, outer_inner=render.OuterInner.INNER,
                 radius_x=self.inner_radius, radius_y=self.inner_radius,
-                end=inner_bottom, skip=is_inner)
-
-        commands += 'Z'
+                skip=is_inner)
 
-        element = elements.PathElement()
-        element.style = inkex.styles.Style(style={
-            'stroke-width': self.stroke_width,
-            'stroke': defaults.defaults['cut_color'],
-            'fill': fill_color,
-            'fill-rule': 'evenodd'})
-        element.set_path(commands)
-        return element
+        # The inner ellipse is empty. 'C' slices only enclose its right half.
+        cavity = render.Cavity(center=point.Point(0, 0),
+                               radius_x=self.inner_radius,
+                               radius_y=self.inner_radius)
+        if slice_shape == 'c':
+            cavity = cavity._replace(min_x=0)
+        return render.Template(outline=outline, slots=slots,
+                               fill_color=fill_color, position=None,
+                               cavities=(cavity,))
 
-    def generate(self):
-        self.stroke_width = str(self.svg.unittouu(
-            defaults.defaults['stroke_width']))
-        self.units = self.options.units
+    def render_marks(self, slice_shape: str, angles, fill_color,
+                     outer_inner: render.OuterInner,
+                     slice_num: int) -> render.Template:
+        '''Draw a slice for the 'marks' preview, see render.slot_marks().
+
+        The edges are render_slice()'s, without slots, and the marks follow
+        each slot angle's center line.
+
+        '''
+        template = self.render_slice(slice_shape, [], fill_color,
+                                     outer_inner, slice_num)
+        outer = render.center_crossings(self.outer_radius, self.outer_radius,
+                                        0, angles)
+        inner = render.center_crossings(self.inner_radius, self.inner_radius,
+                                        0, angles)
+        if slice_shape == 'c':
+            marks = render.center_marks(outer, inner, outer_inner)
+        else:
+            marks = render.ring_marks(outer, inner, slice_num)
+        return template._replace(
+            outline=render.slot_marks(template.outline, *marks))
 
+    def read_options(self):
+        '''Read the model's options, and find its slot angles and rows.'''
         self.outer_radius = self.to_uu(self.options.outer_radius)
         self.inner_radius = self.to_uu(self.options.inner_radius)
         self.height = self.to_uu(self.options.height)
         self.num_slices = self.options.num_slices
         self.slice_shape = self.options.slice_shape
-        self.material_thickness = self.to_uu(self.options.material_thickness)
-        self.material_width = self.to_uu(self.options.material_width)
 
-        # Spacing between templates.
-        self.template_spacing = self.svg.unittouu(
-            defaults.defaults['template_spacing'])
-
-        assert self.num_slices > 0, \
-            'Error: num_slices must be greater than zero'
-
-        assert self.outer_radius > self.inner_radius, \
-            'Error: Outer radius must be larger than inner radius'
-
-        assert self.height < self.outer_radius * 2, \
-            'Error: Height must be less than outer diameter'
+        self.check_feasible('truncated_sphere')
 
         self.loxodromic_angle = math.asin((self.height / 2) /
                                           self.outer_radius)
@@ -219,17 +195,17 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
         self.slot_width = calculations.slot_width(self.material_thickness,
                                                   self.loxodromic_angle * 2)
 
-        angles = calculations.slot_angles(self.num_slices,
-                                          self.loxodromic_angle)
+        self.angles = calculations.slot_angles(self.num_slices,
+                                               self.loxodromic_angle)
 
-        slice_height = 2 * self.outer_radius
+        self.slice_height = 2 * self.outer_radius
 
         if self.slice_shape == 'c':
             # Find the point where the horizontal line at inner_radius
             # intersects the outer radius. That point's x-coordinate is how far
             # we have to shift subsequent slices to the right so slices don't
             # overlap.
-            additional_slice_width = (
+            self.additional_slice_width = (
                 cylinder_calculations.intersect_ellipse_line(
                     self.outer_radius, self.outer_radius, 0,
                     self.inner_radius).x)
@@ -238,24 +214,46 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
             material_width = self.material_width - self.outer_radius
         else:
             assert self.slice_shape == 'ring'
-            additional_slice_width = 2 * self.outer_radius
-            material_width = self.material_width - additional_slice_width
+            self.additional_slice_width = 2 * self.outer_radius
+            material_width = (self.material_width -
+                              self.additional_slice_width)
 
         # Lay out templates in rows, with self.material_width as the maximum
         # row width.
         #
         # Each additional slice requires 'slice width' additional horizontal
         # space.
-        templates_per_row = (
+        self.templates_per_row = (
             1 + math.floor(material_width /
-                           (additional_slice_width + self.template_spacing)))
+                           (self.additional_slice_width +
+                            self.template_spacing)))
         if self.slice_shape == 'c':
             num_slices = self.num_slices
         else:
             num_slices = math.ceil(self.num_slices / 2)
-        num_rows = math.ceil(num_slices / templates_per_row)
+        self.num_rows = math.ceil(num_slices / self.templates_per_row)
 
-        def generate_templates(top_left, outer_inner: render.OuterInner):
+    def template_counts(self):
+        self.read_options()
+        if self.slice_shape == 'c':
+            # Each set of 'C' slices shares one outline.
+            return [cost.Counts(
+                templates=2 * self.num_slices, outlines=2,
+                slots=self.num_slices - 1,
+                first_row=min(self.templates_per_row, self.num_slices),
+                cavities=True)]
+        # Each ring has the slots of two 'C' slices.
+        return [cost.Counts(
+            templates=self.num_slices, outlines=self.num_slices,
+            slots=2 * (self.num_slices - 1),
+            first_row=min(self.templates_per_row,
+                          math.ceil(self.num_slices / 2)),
+            cavities=True)]
+
+    def generate_templates(self):
+        self.read_options()
+
+        def layout_templates(top_left, outer_inner: render.OuterInner):
             '''Render rows of slices starting at top_left.
 
             outer_inner determines whether the slots appear on the outer or
@@ -264,6 +262,9 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
             Returns the point where the top left corner of the next slice
             should be rendered.
             '''
+            render_slice = self.render_slice
+            if self.options.fidelity == 'marks':
+                render_slice = self.render_marks
             if self.slice_shape == 'c':
                 slice_range = range(self.num_slices)
             else:
@@ -272,34 +273,43 @@ class SliceformTruncatedSphereGenerator(inkex.extensions.GenerateExtension):
                 else:
                     slice_range = range(1, self.num_slices, 2)
             templates_generated = 0
+            template = None
             for slice_num in slice_range:
-                element = self.render_slice(
-                    self.slice_shape, angles,
-                    defaults.defaults['fill_colors'][outer_inner],
-                    outer_inner, slice_num)
-
-                translate = transforms.Transform()
-                translate.add_translate(top_left.x, top_left.y)
-                element.transform = translate
-                yield element
+                # 'C' shaped slices in a set are identical, so they share one
+                # template.
+                if template is None or self.slice_shape == 'ring':
+                    template = render_slice(
+                        self.slice_shape, self.angles,
+                        defaults.defaults['fill_colors'][outer_inner],
+                        outer_inner, slice_num)
+
+                # Each 'C' slice's cavity holds the previous slice's outer
+                # edge, except for the first slice in each row.
+                cavities = template.cavities
+                if self.slice_shape == 'c' and templates_generated > 0:
+                    cavities = ()
+                yield template._replace(
+                    position=point.Point(top_left.x, top_left.y),
+                    cavities=cavities, label=slice_num)
 
                 templates_generated += 1
 
-                if templates_generated < templates_per_row:
-                    top_left.x += (additional_slice_width +
+                if templates_generated < self.templates_per_row:
+                    top_left.x += (self.additional_slice_width +
                                    self.template_spacing)
                 else:
                     templates_generated = 0
                     top_left.x = 0
-                    top_left.y += slice_height + self.template_spacing
+                    top_left.y += self.slice_height + self.template_spacing
 
         # Generate two sets of slice templates. The first set has slots on the
         # outer edge, and the second set has slots on the inner edge.
         top_left = point.Point(0, 0)
-        yield from generate_templates(top_left, render.OuterInner.OUTER)
+        yield from layout_templates(top_left, render.OuterInner.OUTER)
         top_left = point.Point(
-            0, num_rows * (slice_height + self.template_spacing))
-        yield from generate_templates(top_left, render.OuterInner.INNER)
+            0, self.num_rows * (self.slice_height + self.template_spacing))
+        yield from layout_templates(top_left, render.OuterInner.INNER)
 
 
-SliceformTruncatedSphereGenerator().run()
+if __name__ == '__main__':
+    SliceformTruncatedSphereGenerator().run()
@@ -1,6 +1,8 @@
 import math
 import sys
 
+import solve
+
 
 def main():
     """Calculate truncated sphere height from inner_radius and top_radius.
@@ -16,11 +18,13 @@ def main():
     inner_radius = float(sys.argv[2])
     top_radius = float(sys.argv[3])
 
-    # cos(loxodromic_angle) = top_radius / inner_radius
-    loxodromic_angle = math.acos(top_radius / inner_radius)
-
-    # sin(loxodromic_angle) = (height / 2) / outer_radius
-    height = math.sin(loxodromic_angle) * outer_radius * 2
+    parameters = solve.solve(
+        'truncated_sphere', 'top_radius', top_radius,
+        {'outer_radius': outer_radius, 'inner_radius': inner_radius},
+        'height')
+    height = parameters['height']
+    loxodromic_angle = solve.SURFACES['truncated_sphere'].targets[
+        'loxodromic_angle'](parameters)
 
     print(f'height {height:.2f}')
     print(f'loxodromic_angle {math.degrees(loxodromic_angle):.2f}')
@@ -0,0 +1,458 @@
+'''Find colliding slots, edges, and templates.
+
+Checks run on numpy arrays, because a model with many slices has hundreds of
+thousands of segment pairs that are close enough to need testing. A uniform
+grid, or spatial hash, finds the nearby pairs, and the exact tests run on all
+of those pairs at once.
+
+Templates usually share outlines, so each distinct outline is checked once,
+and each distinct arrangement of two outlines is checked once.
+
+'''
+
+import collections
+import enum
+import itertools
+import operator
+
+import numpy as np
+
+from common import point
+
+import flatten
+import geometry
+
+
+class Kind(enum.Enum):
+    # Two slots overlap or touch.
+    SLOT_SLOT = 'slot-slot'
+    # A slot crosses an edge of its own template.
+    SLOT_EDGE = 'slot-edge'
+    # A template's edges cross each other.
+    EDGE_EDGE = 'edge-edge'
+    # Two templates overlap on the sheet.
+    TEMPLATE_TEMPLATE = 'template-template'
+
+
+# A collision, at location, in sheet coordinates.
+#
+# first and second are template indices, in the order the templates were
+# generated. Collisions within a template have first == second. Templates that
+# share an outline also share its collisions, which are only reported for the
+# first of those templates.
+Collision = collections.namedtuple(
+    'Collision', ['kind', 'first', 'second', 'location'])
+
+# Multiplier for row_hashes(), from the golden ratio, which spreads bits well.
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# Rows per chunk in in_chunks(), and pairs per block in candidate_pairs().
+# The temporary arrays of a chunk stay in the processor cache, which makes
+# tests on pairs several times faster than on all pairs at once.
+CHUNK_ROWS = 8192
+
+
+def candidate_pairs(boxes: np.ndarray, groups: np.ndarray = None,
+                    active: np.ndarray = None
+                    ) -> tuple[np.ndarray, np.ndarray]:
+    '''Return index pairs (i, j), i < j, of boxes that overlap or touch.
+
+    boxes is an (n, 4) array, with one row of (xmin, ymin, xmax, ymax) per
+    box. Boxes are sorted into a uniform grid, and only boxes that share a
+    cell are compared. Cells are twice the size of an average box, so most
+    boxes cover a few cells, and long boxes cover as many cells as they
+    need. If groups has an integer for each box, each group has its own
+    grid, so only boxes in the same group are paired. If active has a
+    boolean for each box, pairs of inactive boxes are skipped.
+
+    '''
+    empty = np.empty(0, dtype=np.intp)
+    n = len(boxes)
+    if n < 2:
+        return empty, empty
+    extent = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    cell = 2 * np.mean(extent)
+    if cell <= 0:
+        cell = max(1e-9, np.max(boxes[:, 2:]) - np.min(boxes[:, :2]))
+    cells = np.floor(boxes / cell).astype(np.int64)
+    cells -= np.tile(np.min(cells[:, :2], axis=0), 2)
+    width = cells[:, 2] - cells[:, 0] + 1
+    counts = width * (cells[:, 3] - cells[:, 1] + 1)
+
+    # One entry per (box, cell) pair, sorted by cell.
+    owner = np.repeat(np.arange(n), counts)
+    offset = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+    column = cells[owner, 0] + offset % width[owner]
+    row = cells[owner, 1] + offset // width[owner]
+    columns = np.max(cells[:, 2]) + 1
+    rows = np.max(cells[:, 3]) + 1
+    if groups is None:
+        groups = np.zeros(n, dtype=np.int64)
+    key = (groups[owner] * columns + column) * rows + row
+    if active is None:
+        active = np.ones(n, dtype=bool)
+    # Active entries come first in each cell.
+    order = np.argsort(2 * key + ~active[owner], kind='stable')
+    key = key[order]
+    owner = owner[order]
+    column = column[order]
+    row = row[order]
+    # Each entry's box, in the same order, so that pairs of entries, which
+    # are close together, read nearby values.
+    left, top, right, bottom = np.ascontiguousarray(boxes[owner].T)
+    box_column = cells[owner, 0]
+    box_row = cells[owner, 1]
+
+    # Pair each entry with the entries after it in the same cell.
+    boundaries = np.flatnonzero(np.diff(key)) + 1
+    group_starts = np.concatenate([[0], boundaries])
+    group_ends = np.concatenate([boundaries, [len(key)]])
+    partners = np.where(active[owner],
+                        np.repeat(group_ends, group_ends - group_starts) -
+                        np.arange(len(key)) - 1, 0)
+    # Pairs are made, and tested, a block of entries at a time, with about
+    # CHUNK_ROWS pairs in each block, so that the temporary arrays stay in
+    # the processor cache.
+    pair_ends = np.cumsum(partners)
+    blocks = np.unique(np.concatenate([
+        [0], np.searchsorted(pair_ends, np.arange(0, pair_ends[-1],
+                                                  CHUNK_ROWS), side='right'),
+        [len(key)]]))
+    a, b = [], []
+    for start, stop in zip(blocks[:-1], blocks[1:]):
+        counts = partners[start:stop]
+        first = np.repeat(np.arange(start, stop), counts)
+        second = first + 1 + (np.arange(len(first)) -
+                              np.repeat(np.cumsum(counts) - counts, counts))
+        overlap = ((left[first] <= right[second]) &
+                   (left[second] <= right[first]) &
+                   (top[first] <= bottom[second]) &
+                   (top[second] <= bottom[first]))
+        first = first[overlap]
+        second = second[overlap]
+        # Boxes that share several cells are paired in each of them. Keep
+        # only the pair from the cell that holds the top left corner of the
+        # boxes' intersection, which is in exactly one cell.
+        keep = ((column[first] ==
+                 np.maximum(box_column[first], box_column[second])) &
+                (row[first] == np.maximum(box_row[first], box_row[second])))
+        a.append(owner[first[keep]])
+        b.append(owner[second[keep]])
+    a = np.concatenate(a)
+    b = np.concatenate(b)
+    return np.minimum(a, b), np.maximum(a, b)
+
+
+def bounds(lines: np.ndarray) -> np.ndarray:
+    '''Return the bounding box of each line, as in candidate_pairs().'''
+    return np.stack([np.minimum(lines[:, 0], lines[:, 2]),
+                     np.minimum(lines[:, 1], lines[:, 3]),
+                     np.maximum(lines[:, 0], lines[:, 2]),
+                     np.maximum(lines[:, 1], lines[:, 3])], axis=1)
+
+
+def crossings(first: np.ndarray, second: np.ndarray,
+              touching: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    '''Test whether lines cross, row by row.
+
+    Returns a boolean array that is true where first[i] and second[i] cross
+    at a point that is not an end point of either line, and an (n, 2) array of
+    crossing points. If touching is set, lines that only share a point, or
+    that overlap along the same line, count too.
+
+    '''
+    def orient(a, b, c):
+        return ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) -
+                (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+    p0, p1 = first[:, :2], first[:, 2:]
+    q0, q1 = second[:, :2], second[:, 2:]
+    d0 = orient(q0, q1, p0)
+    d1 = orient(q0, q1, p1)
+    e0 = orient(p0, p1, q0)
+    e1 = orient(p0, p1, q1)
+    if not touching:
+        crossed = (d0 * d1 < 0) & (e0 * e1 < 0)
+    else:
+        collinear = (d0 == 0) & (d1 == 0) & (e0 == 0) & (e1 == 0)
+        crossed = (d0 * d1 <= 0) & (e0 * e1 <= 0) & ~collinear
+    t = d0 / np.where(crossed, d0 - d1, 1)
+    location = p0 + (p1 - p0) * t[:, np.newaxis]
+    if touching:
+        # Collinear lines touch where their bounding boxes overlap. The
+        # middle of the overlap is on both lines.
+        low = np.maximum(np.minimum(p0, p1), np.minimum(q0, q1))
+        high = np.minimum(np.maximum(p0, p1), np.maximum(q0, q1))
+        overlap = collinear & (low <= high).all(axis=1)
+        crossed = crossed | overlap
+        location[overlap] = ((low + high) / 2)[overlap]
+    return crossed, location
+
+
+def quads_overlap(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    '''Test whether convex quadrilaterals overlap or touch, row by row.
+
+    first and second are (n, 4, 2) arrays of corners. Two convex shapes are
+    disjoint if and only if one of their edge normals separates them.
+
+    '''
+    # Corner coordinates, as (4, n) arrays, so that reductions over corners
+    # run across rows.
+    first_x, first_y = np.ascontiguousarray(np.transpose(first, (2, 1, 0)))
+    second_x, second_y = np.ascontiguousarray(
+        np.transpose(second, (2, 1, 0)))
+    overlap = np.ones(len(first), dtype=bool)
+    for x, y in ((first_x, first_y), (second_x, second_y)):
+        # Edge normals, as (4, 1, n) arrays, projected onto (1, 4, n) corners.
+        normal_x = (y - np.roll(y, -1, axis=0))[:, np.newaxis]
+        normal_y = (np.roll(x, -1, axis=0) - x)[:, np.newaxis]
+        a = normal_x * first_x + normal_y * first_y
+        b = normal_x * second_x + normal_y * second_y
+        separated = ((a.max(axis=1) < b.min(axis=1)) |
+                     (b.max(axis=1) < a.min(axis=1)))
+        overlap &= ~separated.any(axis=0)
+    return overlap
+
+
+def in_chunks(test, first: np.ndarray, second: np.ndarray, *args):
+    '''Return test(first, second, *args), run on chunks of rows.
+
+    test returns an array, or a tuple of arrays, with a row for each row of
+    first and second.
+
+    '''
+    if len(first) <= CHUNK_ROWS:
+        return test(first, second, *args)
+    results = [test(first[start:start + CHUNK_ROWS],
+                    second[start:start + CHUNK_ROWS], *args)
+               for start in range(0, len(first), CHUNK_ROWS)]
+    if isinstance(results[0], tuple):
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+    return np.concatenate(results)
+
+
+def row_hashes(rows: np.ndarray) -> np.ndarray:
+    '''Return a hash of each row of rows, which is equal for equal rows.'''
+    # Adding zero turns -0.0 into 0.0, which has other bits.
+    bits = np.ascontiguousarray(rows + 0.0).view(np.uint64)
+    hashes = np.zeros(len(rows), dtype=np.uint64)
+    for column in bits.T:
+        hashes = (hashes ^ column) * HASH_MULTIPLIER
+    return hashes
+
+
+def match_rows(keys: np.ndarray, table: np.ndarray) -> np.ndarray:
+    '''Return the index of a row of table equal to each row of keys, or -1.'''
+    if not len(table):
+        return np.full(len(keys), -1, dtype=np.intp)
+    table_hashes = row_hashes(table)
+    order = np.argsort(table_hashes)
+    key_hashes = row_hashes(keys)
+    found = order[np.minimum(np.searchsorted(table_hashes[order], key_hashes),
+                             len(table) - 1)]
+    equal = (table[found] == keys).all(axis=1)
+    return np.where(equal, found, -1)
+
+
+def slot_labels(outline: geometry.Outline, groups: np.ndarray,
+                corners: np.ndarray, counts: np.ndarray,
+                slot_groups: np.ndarray) -> np.ndarray:
+    '''Return the index of the slot that draws each outline segment, or -1.
+
+    corners holds each slot's corners, one slot after another, and counts
+    the number of corners of each slot. groups and slot_groups have the
+    group of each segment and slot, and slots only draw segments in their
+    own group.
+
+    '''
+    kinds = np.frombuffer(outline.kinds, dtype=np.uint8)
+    x = np.frombuffer(outline.x)
+    y = np.frombuffer(outline.y)
+    segments = np.column_stack([groups, np.roll(x, 1), np.roll(y, 1), x, y])
+    # Each pair of neighbouring corners of a slot is one of its sides.
+    owner = np.repeat(np.arange(len(counts)), counts)
+    side = np.flatnonzero(owner[:-1] == owner[1:])
+    sides = np.column_stack([slot_groups[owner[side]], corners[side],
+                             corners[side + 1]])
+    # Index -1, for segments that no side matches, gets label -1.
+    labels = np.append(owner[side], -1)[match_rows(segments, sides)]
+    return np.where(kinds == geometry.Segment.LINE, labels, -1)
+
+
+def outline_collisions(outline: geometry.Outline, groups: np.ndarray,
+                       slots: list[list[point.Point]],
+                       slot_groups: np.ndarray, lines: np.ndarray,
+                       source: np.ndarray
+                       ) -> list[tuple[int, Kind, float, float]]:
+    '''Return (group, kind, x, y) for each collision within outlines.
+
+    outline holds several outlines, one after another, that are checked at
+    once. groups has the outline that each of its segments belongs to, and
+    slot_groups the outline that each slot is drawn on. lines and source
+    come from flatten.polyline(outline).
+
+    '''
+    collisions = []
+    counts = np.array([len(corners) for corners in slots], dtype=np.intp)
+    points = list(itertools.chain.from_iterable(slots))
+    corners = np.column_stack([
+        np.fromiter(map(operator.attrgetter(name), points), dtype=float,
+                    count=len(points)) for name in ('x', 'y')])
+
+    # Neighbouring slots that overlap were merged into notches as they were
+    # drawn, but slots can still overlap slots further along the edge.
+    # Merged notches are not convex, so they are checked by their walls
+    # below, instead of as quadrilaterals.
+    simple = np.flatnonzero(counts == 4)
+    if len(simple):
+        first_corner = np.cumsum(counts) - counts
+        quads = corners[first_corner[simple, np.newaxis] + np.arange(4)]
+        i, j = candidate_pairs(np.concatenate(
+            [quads.min(axis=1), quads.max(axis=1)], axis=1),
+            slot_groups[simple])
+        hits = in_chunks(quads_overlap, quads[i], quads[j])
+        centers = (quads[i[hits]].mean(axis=1) +
+                   quads[j[hits]].mean(axis=1)) / 2
+        collisions += [(group, Kind.SLOT_SLOT, x, y) for group, (x, y) in
+                       zip(slot_groups[simple[i[hits]]], centers)]
+
+    labels = slot_labels(outline, groups, corners, counts,
+                         slot_groups)[source]
+    merged = np.append(counts > 4, False)
+    # Walls of slots that were not merged only collide with edges, and
+    # notches. Collisions between slots were found above.
+    i, j = candidate_pairs(bounds(lines), groups[source],
+                           active=merged[labels] | (labels < 0))
+    crossed, location = in_chunks(crossings, lines[i], lines[j])
+    first = labels[i[crossed]]
+    second = labels[j[crossed]]
+    crossed_groups = groups[source[i[crossed]]]
+    # Label -1 indexes the last entry of merged, which is False.
+    notch_walls = ((first >= 0) & (second >= 0) & (first != second) &
+                   (merged[first] | merged[second]))
+    for kind, found in ((Kind.SLOT_SLOT, notch_walls),
+                        (Kind.SLOT_EDGE, (first < 0) != (second < 0)),
+                        (Kind.EDGE_EDGE, (first < 0) & (second < 0))):
+        collisions += [(group, kind, x, y) for group, (x, y) in
+                       zip(crossed_groups[found], location[crossed][found])]
+    return collisions
+
+
+def template_collision(first: np.ndarray, second: np.ndarray, dx: float,
+                       dy: float) -> tuple[float, float]:
+    '''Return a point where first overlaps second moved by (dx, dy), or None.
+
+    Templates overlap where their edges cross or touch, or where one is
+    inside the other. Templates that only nest, like a ring placed in another
+    ring's hole, do not overlap, and are not reported.
+
+    '''
+    second = second + (dx, dy, dx, dy)
+    # Only lines inside the other template's bounding box can cross it.
+    first_bounds = bounds(first)
+    second_bounds = bounds(second)
+
+    def near(line_bounds, other_bounds):
+        return ((line_bounds[:, :2] <= other_bounds[:, 2:].max(axis=0)) &
+                (line_bounds[:, 2:] >= other_bounds[:, :2].min(axis=0))
+                ).all(axis=1)
+    near_first = first[near(first_bounds, second_bounds)]
+    near_second = second[near(second_bounds, first_bounds)]
+
+    lines = np.concatenate([near_first, near_second])
+    i, j = candidate_pairs(bounds(lines))
+    between = (i < len(near_first)) & (j >= len(near_first))
+    crossed, location = in_chunks(crossings, lines[i[between]],
+                                  lines[j[between]], True)
+    if crossed.any():
+        return tuple(location[np.argmax(crossed)])
+    # Templates whose edges do not meet are apart, unless one is inside the
+    # other.
+    for lines, other in ((first, second), (second, first)):
+        if flatten.inside(other, lines[:1, 0], lines[:1, 1])[0]:
+            return tuple(lines[0, :2])
+    return None
+
+
+def validate(templates: list, tolerance: float) -> list[Collision]:
+    '''Return collisions in a list of positioned render.Template objects.
+
+    Arcs are flattened with chord error tolerance before testing.
+
+    '''
+    # The first template with each distinct outline.
+    firsts = {}
+    for index, template in enumerate(templates):
+        firsts.setdefault(id(template.outline), index)
+    distinct = list(firsts.values())
+
+    # All distinct outlines are flattened, and checked, at once.
+    outline = geometry.Outline()
+    for index in distinct:
+        outline.extend(templates[index].outline)
+    groups = np.repeat(np.arange(len(distinct)),
+                       [len(templates[index].outline) for index in distinct])
+    slots = [corners for index in distinct
+             for corners in templates[index].slots]
+    slot_groups = np.repeat(np.arange(len(distinct)),
+                            [len(templates[index].slots)
+                             for index in distinct])
+    lines, source = flatten.polyline(outline, tolerance)
+    collisions = []
+    for group, kind, x, y in sorted(
+            outline_collisions(outline, groups, slots, slot_groups, lines,
+                               source), key=lambda collision: collision[0]):
+        template = templates[distinct[group]]
+        collisions.append(Collision(
+            kind, distinct[group], distinct[group],
+            point.Point(x + template.position.x, y + template.position.y)))
+
+    # Lines, and their bounding box, of each distinct outline.
+    shapes = {}
+    group_ends = np.searchsorted(groups[source],
+                                 np.arange(len(distinct) + 1))
+    for group, index in enumerate(distinct):
+        shape = lines[group_ends[group]:group_ends[group + 1]]
+        if len(shape):
+            shapes[id(templates[index].outline)] = (
+                shape, np.concatenate([shape[:, :2].min(axis=0),
+                                       shape[:, 2:].max(axis=0)]))
+
+    # Sweep template bounding boxes from left to right, then test outlines
+    # whose boxes overlap.
+    placed = [(index, template) for index, template in enumerate(templates)
+              if id(template.outline) in shapes]
+    if len(placed) < 2:
+        return collisions
+    offsets = np.array([(t.position.x, t.position.y) for _, t in placed])
+    boxes = np.array([shapes[id(t.outline)][1] for _, t in placed])
+    boxes += np.tile(offsets, 2)
+    order = np.argsort(boxes[:, 0], kind='stable')
+    sorted_left = boxes[order, 0]
+    ends = np.searchsorted(sorted_left, boxes[order, 2], side='right')
+    counts = np.maximum(0, ends - np.arange(len(order)) - 1)
+    a = np.repeat(np.arange(len(order)), counts)
+    b = a + 1 + (np.arange(len(a)) - np.repeat(np.cumsum(counts) - counts,
+                                               counts))
+    a = order[a]
+    b = order[b]
+    overlapping = ((boxes[a, 1] <= boxes[b, 3]) & (boxes[b, 1] <= boxes[a, 3]))
+
+    results = {}
+    for i, j in zip(a[overlapping], b[overlapping]):
+        i, j = min(i, j), max(i, j)
+        (first, t), (second, u) = placed[i], placed[j]
+        dx = u.position.x - t.position.x
+        dy = u.position.y - t.position.y
+        key = (id(t.outline), id(u.outline),
+               round(dx / tolerance), round(dy / tolerance))
+        if key not in results:
+            results[key] = template_collision(
+                shapes[id(t.outline)][0], shapes[id(u.outline)][0], dx, dy)
+        if results[key] is not None:
+            x, y = results[key]
+            collisions.append(Collision(
+                Kind.TEMPLATE_TEMPLATE, first, second,
+                point.Point(x + t.position.x, y + t.position.y)))
+    return collisions
+
@@ -0,0 +1,116 @@
+import unittest
+
+import numpy as np
+
+from common import point
+
+import service
+import testing
+import validate
+
+
+class TestValidate(unittest.TestCase):
+    def test_candidate_pairs(self):
+        boxes = np.array([[0, 0, 1, 1], [.5, .5, 1.5, 1.5], [5, 5, 6, 6],
+                          [0, 0, 10, .1]], dtype=float)
+        i, j = validate.candidate_pairs(boxes)
+        pairs = set(zip(i, j))
+        self.assertIn((0, 1), pairs)
+        self.assertIn((0, 3), pairs)
+        self.assertNotIn((0, 2), pairs)
+        # Each pair appears once.
+        self.assertEqual(len(pairs), len(i))
+
+    def test_crossings(self):
+        first = np.array([[0, 0, 2, 2], [0, 0, 1, 0], [0, 0, 1, 0]],
+                         dtype=float)
+        second = np.array([[0, 2, 2, 0], [1, 0, 1, 1], [0, 1, 1, 1]],
+                          dtype=float)
+        crossed, location = validate.crossings(first, second)
+        # Lines that only share an end point, or miss, do not cross.
+        self.assertEqual(list(crossed), [True, False, False])
+        self.assertEqual(tuple(location[0]), (1, 1))
+
+        # Unless touching counts, as does overlapping along the same line.
+        first = np.concatenate([first, [[0, 0, 2, 0], [0, 0, 1, 1]]])
+        second = np.concatenate([second, [[1, 0, 3, 0], [2, 2, 3, 3]]])
+        crossed, location = validate.crossings(first, second, touching=True)
+        self.assertEqual(list(crossed), [True, True, False, True, False])
+        self.assertEqual(tuple(location[1]), (1, 0))
+        self.assertEqual(tuple(location[3]), (1.5, 0))
+
+    def test_quads_overlap(self):
+        quad = np.array([[[0, 0], [0, 1], [1, 1], [1, 0]]], dtype=float)
+        diamond = np.array([[[.9, 1.5], [1.5, 2.1], [2.1, 1.5], [1.5, .9]]])
+        self.assertTrue(validate.quads_overlap(quad, quad + .5)[0])
+        self.assertTrue(validate.quads_overlap(quad, quad + (1, 0))[0])
+        # The bounding boxes overlap, but the shapes do not.
+        self.assertFalse(validate.quads_overlap(quad, diamond)[0])
+
+    def test_no_collisions(self):
+        template = testing.square(10, slots=[(2, 1, 4), (5, 1, 4)])
+        templates = [template,
+                     template._replace(position=point.Point(11, 0))]
+        self.assertEqual(validate.validate(templates, .001), [])
+
+    def test_slot_collisions(self):
+        template = testing.square(10,
+                                  slots=[(2, 2, 4), (3, 2, 4), (7, 1, 11)])
+        collisions = validate.validate(
+            [template._replace(position=point.Point(100, 0))], .001)
+        kinds = [c.kind for c in collisions]
+        self.assertEqual(kinds.count(validate.Kind.SLOT_SLOT), 1)
+        self.assertIn(validate.Kind.SLOT_EDGE, kinds)
+        self.assertNotIn(validate.Kind.TEMPLATE_TEMPLATE, kinds)
+        # Locations are in sheet coordinates.
+        slot_slot = collisions[kinds.index(validate.Kind.SLOT_SLOT)]
+        self.assertAlmostEqual(slot_slot.location.x, 103.5)
+
+    def test_template_collisions(self):
+        template = testing.square(10)
+        templates = [template,
+                     template._replace(position=point.Point(9, 5)),
+                     template._replace(position=point.Point(30, 0))]
+        collisions = validate.validate(templates, .001)
+        self.assertEqual(len(collisions), 1)
+        self.assertEqual(collisions[0].kind,
+                         validate.Kind.TEMPLATE_TEMPLATE)
+        self.assertEqual((collisions[0].first, collisions[0].second), (0, 1))
+
+    def test_overlapping_templates(self):
+        # Templates that overlap without their edges crossing.
+        for first, second in (
+                # In the same place.
+                (testing.square(10), testing.square(10)),
+                # One inside the other.
+                (testing.square(20), testing.square(5, 5, 5)),
+                (testing.square(5, 5, 5), testing.square(20)),
+                # Overlapping by half, in the same row.
+                (testing.square(10), testing.square(10, 5, 0))):
+            collisions = validate.validate([first, second], .001)
+            self.assertEqual([c.kind for c in collisions],
+                             [validate.Kind.TEMPLATE_TEMPLATE])
+        # Templates that touch collide, but a template in another's hole
+        # does not.
+        self.assertEqual(len(validate.validate(
+            [testing.square(10), testing.square(10, 10, 0)], .001)), 1)
+        self.assertEqual(validate.validate(
+            [testing.ring(30, 20), testing.ring(15, 5)], .001), [])
+
+    def test_models(self):
+        # Slots crowd each other, the back of a 'C', and corners that slots
+        # clip, but the models still draw them without collisions.
+        for parameters in ({'model': 'cylinder', 'num_slices': 400},
+                           {'model': 'truncated_sphere', 'num_slices': 400},
+                           {'model': 'torus', 'num_slices': 400},
+                           {'model': 'hyperboloid', 'num_slices': 1000},
+                           {'model': 'surface', 'num_slices': 400}):
+            model = service.model_generator(parameters)
+            model.setup()
+            self.assertEqual(
+                validate.validate(model.layout(), model.precision), [],
+                parameters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+'''Render a parameter file again each time it is saved.
+
+The parameter file is a JSON object, like a service.py request, that names
+its model and sets its parameters:
+
+  {"model": "cylinder", "num_slices": 400, "slice_shape": "ring"}
+
+Each time the file changes, the templates are written to an SVG file, or
+with "format": "paths", a JSON file, that an open viewer can reload:
+
+  python3 watch.py cylinder.json --output cylinder.svg
+
+Geometry is kept in memory between saves. Changing only the parameters in
+OUTPUT_PARAMETERS, like the kerf, reuses the last templates and their
+collision check, and reverting a change reuses its result. Slots are
+checked again for each kerf.
+
+'''
+
+import argparse
+import collections
+import functools
+import json
+import os
+import time
+
+import service
+import validate
+
+# Parameters that change how templates are written, but not the templates.
+OUTPUT_PARAMETERS = ['format', 'kerf', 'flatten_tolerance', 'metrics_file',
+                     'metrics_metadata', 'machine_profile']
+
+#    templates: Final templates, with their positions.
+#     warnings: Collision warnings for the templates.
+# fit_warnings: Fit warnings for the templates, by kerf, which
+#               generator.SliceformGenerator.check_fit() checks slots with.
+#        paths: Path data, by (kerf, flatten_tolerance), then by id(outline),
+#               as in generator.SliceformGenerator.template_element().
+# label_places,
+#   label_data: Label placements and path data, as in
+#               generator.SliceformGenerator.label_group().
+Geometry = collections.namedtuple(
+    'Geometry', ['templates', 'warnings', 'fit_warnings', 'paths',
+                 'label_places', 'label_data'])
+
+
+class Watcher:
+    def __init__(self, filename: str, output: str, cache_size: int = 8):
+        self.filename = filename
+        self.output = output
+        self.cache_size = cache_size
+        # Geometry, by its parameters, least recently used first.
+        self.geometry = collections.OrderedDict()
+        self.render = functools.lru_cache(maxsize=cache_size)(self.render)
+        self.state = None
+
+    def changed(self) -> bool:
+        '''Return True if the file has changed since the last call.'''
+        try:
+            status = os.stat(self.filename)
+        except FileNotFoundError:
+            # Some editors replace the file, so it is briefly missing.
+            return False
+        state = (status.st_mtime_ns, status.st_size, status.st_ino)
+        if state == self.state:
+            return False
+        self.state = state
+        return True
+
+    def cached_geometry(self, parameters: dict) -> tuple:
+        '''Return the geometry's key, and the geometry, or None.'''
+        key = service.canonical({name: value
+                                 for name, value in parameters.items()
+                                 if name not in OUTPUT_PARAMETERS})
+        geometry = self.geometry.get(key)
+        if geometry is not None:
+            self.geometry.move_to_end(key)
+        return key, geometry
+
+    def render(self, key: str) -> service.Result:
+        '''Generate the templates for a canonical() parameter file.'''
+        parameters = json.loads(key)
+        output = service.output_format(parameters)
+        model = service.model_generator(parameters)
+        warnings = []
+        model.warn = warnings.append
+        model.setup()
+        model.preflight()
+
+        geometry_key, geometry = self.cached_geometry(parameters)
+        checked = model.options.fidelity == 'full' and model.options.validate
+        if geometry is None:
+            templates = model.layout()
+            if checked:
+                model.report(validate.validate(templates, model.precision))
+            geometry = Geometry(templates, list(warnings), {}, {}, {}, {})
+            self.geometry[geometry_key] = geometry
+            while len(self.geometry) > self.cache_size:
+                self.geometry.popitem(last=False)
+        else:
+            warnings.extend(geometry.warnings)
+        if checked and model.fit_model is not None:
+            # Slots are checked with the kerf, which is not part of the key.
+            if model.kerf not in geometry.fit_warnings:
+                start = len(warnings)
+                model.check_fit(geometry.templates)
+                geometry.fit_warnings[model.kerf] = warnings[start:]
+            else:
+                warnings.extend(geometry.fit_warnings[model.kerf])
+
+        model.templates = geometry.templates
+        # The cached templates keep their outlines, so path data encoded for
+        # them stays valid.
+        model.path_data = geometry.paths.setdefault(
+            (model.kerf, model.flatten_tolerance), {})
+        model.digests = {}
+        model.label_places = geometry.label_places
+        model.label_data = geometry.label_data
+        elements = list(model.emit(model.templates))
+        if model.options.fidelity == 'full' and (
+                model.options.metrics_file or model.options.metrics_metadata):
+            model.write_metrics(model.templates)
+        return service.result(model, elements, output, warnings)
+
+    def update(self):
+        '''Render the parameter file, and write the result.'''
+        start = time.perf_counter()
+        try:
+            with open(self.filename) as f:
+                parameters = json.load(f)
+            assert isinstance(parameters, dict), \
+                'Error: Expected a JSON object'
+            result = self.render(service.canonical(parameters))
+        except (AssertionError, ValueError, OSError) as e:
+            # The file may be half written, so wait for the next save.
+            print(e, flush=True)
+            return
+        temporary = self.output + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(result.body)
+        # Viewers that reload the output never see it partly written.
+        os.replace(temporary, self.output)
+        for warning in result.warnings:
+            print(warning)
+        print('Wrote {} in {:.0f} ms'.format(
+            self.output, (time.perf_counter() - start) * 1000), flush=True)
+
+    def watch(self, interval: float):
+        '''Poll the file every interval seconds, and update it on changes.'''
+        while True:
+            if self.changed():
+                self.update()
+            time.sleep(interval)
+
+
+def main():
+    pars = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    pars.add_argument('filename', help='Parameter file')
+    pars.add_argument('--output', default='',
+                      help='Output file, the parameter file\'s name with '
+                      '.svg by default')
+    pars.add_argument('--interval', type=float, default=.01,
+                      help='Seconds between checks for changes')
+    pars.add_argument('--cache_size', type=int, default=8,
+                      help='Number of results, and geometries, to keep')
+    options = pars.parse_args()
+    output = options.output or os.path.splitext(options.filename)[0] + '.svg'
+    watcher = Watcher(options.filename, output, options.cache_size)
+    try:
+        watcher.watch(options.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
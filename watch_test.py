@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import generator
+import watch
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'torus.json')
+        self.output = os.path.join(directory.name, 'torus.svg')
+        self.watcher = watch.Watcher(self.filename, self.output)
+        quiet = mock.patch('builtins.print')
+        quiet.start()
+        self.addCleanup(quiet.stop)
+        layout = mock.patch.object(
+            generator.SliceformGenerator, 'layout', autospec=True,
+            side_effect=generator.SliceformGenerator.layout)
+        self.layout = layout.start()
+        self.addCleanup(layout.stop)
+        check_fit = mock.patch.object(
+            generator.SliceformGenerator, 'check_fit', autospec=True,
+            side_effect=generator.SliceformGenerator.check_fit)
+        self.check_fit = check_fit.start()
+        self.addCleanup(check_fit.stop)
+
+    def save(self, parameters: dict):
+        with open(self.filename, 'w') as f:
+            json.dump(parameters, f)
+        # Saves within the file system's timestamp resolution can look
+        # unchanged, so forget the last state.
+        self.watcher.state = None
+        self.assertTrue(self.watcher.changed())
+        self.watcher.update()
+        with open(self.output, 'rb') as f:
+            return f.read()
+
+    def test_geometry_reused(self):
+        first = self.save({'model': 'torus', 'num_slices': 6})
+        self.assertIn(b'<svg', first)
+        self.assertFalse(self.watcher.changed())
+
+        # Output parameters reuse the templates.
+        kerf = self.save({'model': 'torus', 'num_slices': 6, 'kerf': .2})
+        self.assertNotEqual(kerf, first)
+        paths = self.save({'model': 'torus', 'num_slices': 6,
+                           'format': 'paths'})
+        self.assertEqual(len(json.loads(paths)['paths']), 12)
+        self.assertEqual(self.layout.call_count, 1)
+        self.assertEqual(len(self.watcher.geometry), 1)
+        # Slots are checked again for the new kerf only.
+        self.assertEqual(self.check_fit.call_count, 2)
+
+        # Other parameters generate new templates, and reverting a change
+        # reuses its result.
+        self.save({'model': 'torus', 'num_slices': 8})
+        self.assertEqual(self.layout.call_count, 2)
+        self.assertEqual(self.save({'model': 'torus', 'num_slices': 6}),
+                         first)
+        self.assertEqual(self.layout.call_count, 2)
+
+    def test_labels(self):
+        unlabeled = self.save({'model': 'torus', 'num_slices': 6})
+        labeled = self.save({'model': 'torus', 'num_slices': 6,
+                             'labels': True})
+        self.assertNotIn(b'Labels', unlabeled)
+        self.assertIn(b'Labels', labeled)
+        # Labels are kept with the geometry, for output parameters.
+        kerf = self.save({'model': 'torus', 'num_slices': 6,
+                          'labels': True, 'kerf': .2})
+        self.assertIn(b'Labels', kerf)
+        self.assertEqual(self.layout.call_count, 2)
+
+    def test_invalid(self):
+        # Errors leave the last output in place.
+        first = self.save({'model': 'torus', 'num_slices': 6})
+        self.assertEqual(self.save({'model': 'cube'}), first)
+        with open(self.filename, 'w') as f:
+            f.write('{"model": ')
+        self.watcher.update()
+        with open(self.output, 'rb') as f:
+            self.assertEqual(f.read(), first)
+
+
+if __name__ == '__main__':
+    unittest.main()